@@ -0,0 +1,200 @@
+"""
+Address search over philippine_addresses.json, reloadable without a restart.
+
+- AddressIndex: built once from the address list and never changed afterwards.
+  Each full_address is lowered up front, and a trigram -> address-ids posting
+  list narrows a query to the addresses that can contain it. Results match the
+  old linear scan: file order, the first limit*3 matches, then sorted by
+  confidence_level.
+- AddressDatabase: holds the current generation, an index together with its
+  own result cache, in one attribute. reload() builds the new index off to the
+  side while searches keep using the old one. It then swaps the generation in
+  with a single assignment, so a search sees either the old index and cache
+  or the new index with an empty cache. It never sees a half-built index or
+  cached results from the old data.
+
+Reloads happen when the file's mtime or size changes, polled every
+`poll_interval` seconds by a daemon thread that watch() starts, or on
+request (app.py: POST /api/admin/addresses/reload). A file that fails to
+load keeps the previous index in service.
+"""
+import json
+import os
+import threading
+import time
+from array import array
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+CONFIDENCE_ORDER = {"high": 3, "medium": 2, "low": 1}
+_GRAM = 3
+# Let searches on other threads run while a large index builds
+_YIELD_EVERY = 2000
+
+
+def _grams(text: str) -> Iterable[str]:
+    return {text[i:i + _GRAM] for i in range(len(text) - _GRAM + 1)}
+
+
+class AddressIndex:
+    def __init__(self, addresses: Sequence[Dict[str, Any]], version: str = "") -> None:
+        self.addresses: Tuple[Dict[str, Any], ...] = tuple(addresses)
+        self.version = version
+        self.loaded_at = time.time()
+        self._lowered = tuple(str(a.get("full_address") or "").lower() for a in self.addresses)
+        postings: Dict[str, List[int]] = defaultdict(list)
+        for i, text in enumerate(self._lowered):
+            for gram in _grams(text):
+                postings[gram].append(i)
+            if i and i % _YIELD_EVERY == 0:
+                time.sleep(0)
+        self._postings = {gram: array("i", ids) for gram, ids in postings.items()}
+
+    def __len__(self) -> int:
+        return len(self.addresses)
+
+    def _candidates(self, lowered_query: str) -> Sequence[int]:
+        """Ascending ids of addresses that contain every trigram of the query (all of them if too short)."""
+        if len(lowered_query) < _GRAM:
+            return range(len(self.addresses))
+        smallest: Sequence[int] = range(len(self.addresses))
+        for gram in _grams(lowered_query):
+            ids = self._postings.get(gram)
+            if ids is None:
+                return ()
+            if len(ids) < len(smallest):
+                smallest = ids
+        return smallest
+
+    def search(self, query: str, limit: int) -> List[Dict[str, Any]]:
+        lowered_query = query.lower()
+        matches = []
+        for i in self._candidates(lowered_query):
+            if lowered_query in self._lowered[i]:
+                matches.append(self.addresses[i])
+                # Enough to sort by confidence and still fill the limit
+                if len(matches) >= limit * 3:
+                    break
+        matches.sort(key=lambda a: CONFIDENCE_ORDER.get(a.get("confidence_level"), 0), reverse=True)
+        return matches[:limit]
+
+
+class _Generation:
+    """An index and the results cached from it; replaced together."""
+
+    __slots__ = ("index", "signature", "cache", "cache_lock")
+
+    def __init__(self, index: AddressIndex, signature: Optional[Tuple[int, int]]) -> None:
+        self.index = index
+        self.signature = signature
+        self.cache: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self.cache_lock = threading.Lock()
+
+
+class AddressDatabase:
+    def __init__(self, path: str, cache_size: int = 100, poll_interval: float = 30.0) -> None:
+        self.path = path
+        self.cache_size = max(0, int(cache_size))
+        self.poll_interval = float(poll_interval)
+        self._current = _Generation(AddressIndex(()), None)
+        self._reload_lock = threading.Lock()
+        self._watch_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def index(self) -> AddressIndex:
+        return self._current.index
+
+    def search(self, query: str, limit: int) -> Tuple[List[Dict[str, Any]], bool]:
+        """(suggestions, served_from_cache) for a query, from one consistent generation."""
+        generation = self._current
+        key = f"{query.lower()}:{limit}"
+        with generation.cache_lock:
+            cached = generation.cache.get(key)
+        if cached is not None:
+            return cached, True
+        suggestions = generation.index.search(query, limit)
+        if self.cache_size:
+            with generation.cache_lock:
+                if key not in generation.cache and len(generation.cache) >= self.cache_size:
+                    # Remove oldest entry (simple FIFO)
+                    generation.cache.popitem(last=False)
+                generation.cache[key] = suggestions
+        return suggestions, False
+
+    def clear_cache(self) -> None:
+        generation = self._current
+        with generation.cache_lock:
+            generation.cache.clear()
+
+    # ------------------------------------------------------------------
+    # Reloading
+    # ------------------------------------------------------------------
+    def _signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def install(self, database: Dict[str, Any], signature: Optional[Tuple[int, int]] = None) -> AddressIndex:
+        """Build an index for `database` ({"addresses": [...]}) and swap it in with a fresh cache."""
+        version = f"{signature[0]}-{signature[1]}" if signature else f"mem-{time.time_ns()}"
+        index = AddressIndex(database.get("addresses") or [], version=version)
+        self._current = _Generation(index, signature)
+        return index
+
+    def reload(self, force: bool = False) -> bool:
+        """Load the file again if it changed (or `force`); False when there was nothing to do.
+
+        Raises on a missing or unreadable file, leaving the current index in place.
+        """
+        with self._reload_lock:
+            signature = self._signature()
+            if signature is None:
+                raise FileNotFoundError(self.path)
+            if not force and signature == self._current.signature:
+                return False
+            with open(self.path, "r", encoding="utf-8") as f:
+                database = json.load(f)
+            # The file may have been replaced while it was read; the next poll catches up then
+            index = self.install(database, signature)
+        print({"level": "info", "event": "address_db_reloaded", "addresses": len(index), "version": index.version})
+        return True
+
+    def watch(self) -> "AddressDatabase":
+        """Start the background file poller (once; not when poll_interval <= 0)."""
+        if self._watcher is not None or self.poll_interval <= 0:
+            return self
+        with self._watch_lock:
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self._poll, name="address-db-watch", daemon=True)
+                self._watcher.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _poll(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                print({"level": "error", "event": "address_db_reload_failed", "error": str(e)})
+
+    def status(self) -> Dict[str, Any]:
+        index = self.index
+        return {
+            "addresses": len(index),
+            "version": index.version,
+            "loaded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(index.loaded_at)),
+            "watching": self._watcher is not None and not self._stop.is_set(),
+        }
+
+
+__all__ = [
+    "CONFIDENCE_ORDER",
+    "AddressIndex",
+    "AddressDatabase",
+]
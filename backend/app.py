@@ -1,28 +1,67 @@
+import csv
+import functools
+import hmac
+import io
 import json
+import math
 import os
+import statistics
 import sys
 import threading
 import time
 import subprocess
-import requests
-from typing import Any, Dict, List
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
 # Add the current directory to Python path for local modules
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, make_response, request
 from flask_cors import CORS
-import pandas as pd
 from collections import defaultdict, deque
 
-from psgc_mapper import to_lamudi_province, is_supported
-from src.adapters.lamudi_adapter import scrape_and_normalize
-from supabase_client import update_appraisal, log_error
+from psgc_mapper import to_lamudi_province, is_supported, is_supported_slug, province_code, resolve_scope
+from src.adapters.records import columnar
+from src.adapters.registry import source_report
+from src.scraper.detail_levels import DETAIL_LEVEL_CARD
+from src.analytics.projections import PROJECTION_COLUMNS, ProjectionStore
+from src.analytics.dedupe import unit_prices
+from src.geo.psgc_index import place_key
+from src.observability.metrics import (
+    CACHE_HITS,
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    OUTBOX_BACKLOG,
+    OUTBOX_OLDEST_AGE,
+    PHASE_SECONDS,
+    SEMAPHORE_IN_USE,
+    SEMAPHORE_LIMIT,
+    render_metrics,
+)
+from src.observability.run_history import GROUP_BY as RUN_GROUP_BY, record_cached_lookup, run_history_store
+from src.observability.tracing import span, traced, tracer_from_env
+from cma_jobs import JOB_CANCELLED, JOB_QUEUED, CmaJobQueue, CmaJobWorkers, QueueFull
+from scrape_coordinator import JOB_DONE, JOB_FAILED, JOB_RUNNING, ScrapeCoordinator
+from scrape_runner import runner_from_env
+from src.scraper.cancellation import CancelToken, ScrapeCancelled, cancel_scope, check_cancelled
+from src.scraper.deadline import Deadline, analytics_reserve_sec, deadline_scope
+from supabase_client import update_appraisal, log_error, outbox_stats
+from address_index import AddressDatabase
+from response_encoding import RecordJSONProvider, compress_response, etag_for, etag_matches
+
+# pandas, bs4, requests and the scraping stack load on first scrape, not at
+# boot, so /health and address search answer quickly after a cold start.
+if TYPE_CHECKING:
+    from scraper_pool import RemoteScraperPool
+    from src.analytics.snapshot import ListingSnapshot
+    from src.scraper.fetch_pool import FetchPool
 
 # -----------------------------------------------------------------------------
 # Flask app setup
 # -----------------------------------------------------------------------------
 app = Flask(__name__)
+# orjson when installed; Property records encode as their API dicts
+app.json = RecordJSONProvider(app)
 
 # Add CORS - allow requests from frontend and mobile devices
 CORS(app, resources={
@@ -34,18 +73,35 @@ CORS(app, resources={
     }
 })
 
-# Semaphore to limit concurrent scrapes (max 3 simultaneous)
-_scrape_semaphore = threading.Semaphore(3)
+
+@app.after_request
+def encode_response(response: Any) -> Any:
+    """gzip/brotli for large JSON bodies when the client accepts it (response_encoding.py)."""
+    return compress_response(request, response)
+
+# Limit concurrent scrapes (max 3 simultaneous across all gunicorn workers, see get_scrape_coordinator)
+SCRAPE_SLOTS = 3
+# Read at /metrics scrape time only
+SEMAPHORE_LIMIT.set(SCRAPE_SLOTS, semaphore="scrape")
+SEMAPHORE_IN_USE.set_function(lambda: get_scrape_coordinator().in_use(), semaphore="scrape")
+# The outbox file is shared, so every worker reports the same backlog
+OUTBOX_BACKLOG.set_function(lambda: outbox_stats()["backlog"])
+OUTBOX_OLDEST_AGE.set_function(lambda: outbox_stats()["oldest_age_sec"])
 _progress_lock = threading.Lock()
-_scrape_progress: Dict[str, Any] = {"active": False, "pages_scanned": 0, "max_pages": None}
 
 # Rate limiting for address search (100 requests per minute per IP)
 _rate_limit_storage = defaultdict(deque)
 _rate_limit_lock = threading.Lock()
 
-# Simple cache for address search results (max 100 entries)
-_address_cache = {}
-_cache_lock = threading.Lock()
+# Recent CMA results keyed by (province, property_type, detail_level) for batch reuse
+_cma_cache: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+_cma_cache_lock = threading.Lock()
+
+# Live FetchPools of this worker's running batches, keyed by batch_id (guarded by _progress_lock)
+_batch_pools: Dict[str, "FetchPool"] = {}
+
+# Opt-in request tracing (CMA_TRACE=off|slow|always, CMA_TRACE_SLOW_MS, CMA_TRACE_KEEP)
+_tracer = tracer_from_env()
 
 # Paths
 BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -53,27 +109,142 @@ DATA_DIR = os.path.join(BACKEND_DIR, "data")
 OUTPUT_CSV = os.path.join(DATA_DIR, "output.csv")
 SCRAPER_PATH = os.path.join(BACKEND_DIR, "lamudi_scraper.py")
 ADDRESS_DB_PATH = os.path.join(DATA_DIR, "philippine_addresses.json")
+PROJECTIONS_DB_PATH = os.getenv("PROJECTIONS_DB_PATH", os.path.join(DATA_DIR, "listing_history.sqlite3"))
+SCRAPE_COORDINATION_DB_PATH = os.getenv("SCRAPE_COORDINATION_DB_PATH", os.path.join(DATA_DIR, "scrape_coordination.sqlite3"))
+LISTING_SNAPSHOT_PATH = os.getenv("LISTING_SNAPSHOT_PATH", os.path.join(DATA_DIR, "listing_snapshot.bin"))
 
-# Load address database once at startup
-_address_database = None
+# Address search index (and its 100-entry result cache), reloaded in the
+# background when the file changes; polling starts with the first search
+ADDRESS_DB_POLL_SEC = float(os.getenv("ADDRESS_DB_POLL_SEC", "30"))
+_address_db = AddressDatabase(ADDRESS_DB_PATH, cache_size=100, poll_interval=ADDRESS_DB_POLL_SEC)
 try:
-    with open(ADDRESS_DB_PATH, 'r', encoding='utf-8') as f:
-        _address_database = json.load(f)
-    app.logger.info(f"Loaded {len(_address_database.get('addresses', []))} addresses from database")
+    _address_db.reload()
+    app.logger.info(f"Loaded {len(_address_db.index)} addresses from database")
 except Exception as e:
     app.logger.error(f"Failed to load address database: {e}")
-    _address_database = {"addresses": []}
+
+
+def get_address_database() -> AddressDatabase:
+    """This worker's address database, with its file watcher started (not at import, so gunicorn can preload/fork)."""
+    return _address_db.watch()
 
 # Config
 MAX_COUNT = int(os.getenv("SCRAPER_MAX_COUNT", "100"))
+# Deadline for a whole CMA request (list + detail + analytics); clients may ask for less with timeout_sec
 SCRAPER_TIMEOUT_SEC = int(os.getenv("SCRAPER_TIMEOUT_SEC", "600"))
+# Share of that deadline the progress-reporting lamudi_scraper.py subprocess may use
+CMA_SUBPROCESS_BUDGET_SHARE = float(os.getenv("CMA_SUBPROCESS_BUDGET_SHARE", "0.5"))
+# Queued CMA jobs (/api/cma/jobs): job threads per gunicorn worker, result retention, queue cap
+CMA_JOB_WORKERS = int(os.getenv("CMA_JOB_WORKERS", str(SCRAPE_SLOTS)))
+CMA_JOB_RESULT_TTL_SEC = int(os.getenv("CMA_JOB_RESULT_TTL_SEC", "3600"))
+CMA_JOB_MAX_QUEUED = int(os.getenv("CMA_JOB_MAX_QUEUED", "100"))
+# Default detail level for /api/cma ("full" or "card"); requests may pass mode="fast"
+SCRAPER_DETAIL_LEVEL = os.getenv("SCRAPER_DETAIL_LEVEL", "full").strip().lower()
+CARD_ENRICH_DEFAULT = int(os.getenv("SCRAPER_CARD_ENRICH", "0"))
+CARD_ENRICH_MAX = 20
+CMA_CACHE_TTL_SEC = int(os.getenv("CMA_CACHE_TTL_SEC", "900"))
+BATCH_MAX_ITEMS = int(os.getenv("CMA_BATCH_MAX_ITEMS", "8"))
+# Minimum seconds between listing snapshot rebuilds after scrapes
+LISTING_SNAPSHOT_REBUILD_SEC = float(os.getenv("LISTING_SNAPSHOT_REBUILD_SEC", "60"))
+# Address search requests per minute per IP
+ADDRESS_SEARCH_RATE_LIMIT = int(os.getenv("ADDRESS_SEARCH_RATE_LIMIT", "100"))
+# Shared pacing for all page fetches of one batch
+SCRAPER_FETCH_RATE = float(os.getenv("SCRAPER_FETCH_RATE", "2"))
+SCRAPER_FETCH_CONCURRENCY = int(os.getenv("SCRAPER_FETCH_CONCURRENCY", "4"))
 
 # Scraper mode configuration
 SCRAPER_MODE = os.getenv('SCRAPER_MODE', 'local')
 SCRAPER_URL = os.getenv('SCRAPER_URL', 'http://localhost:3000')
+# Comma-separated list of scraper backends; falls back to the single SCRAPER_URL
+SCRAPER_URLS = [u.strip() for u in os.getenv('SCRAPER_URLS', SCRAPER_URL).split(',') if u.strip()]
+SCRAPER_HEALTH_INTERVAL_SEC = float(os.getenv('SCRAPER_HEALTH_INTERVAL_SEC', '15'))
+
+# In-process scrapes on the request thread, or in a process pool (CMA_SCRAPE_ISOLATION=process)
+_scrape_runner = runner_from_env(SCRAPE_SLOTS, SCRAPER_TIMEOUT_SEC)
+
+_scraper_pool = None
+_scraper_pool_lock = threading.Lock()
+
+
+def get_scraper_pool() -> "RemoteScraperPool":
+    """Lazily build the remote backend pool and start its health probes."""
+    from scraper_pool import RemoteScraperPool
+
+    global _scraper_pool
+    with _scraper_pool_lock:
+        if _scraper_pool is None:
+            _scraper_pool = RemoteScraperPool(SCRAPER_URLS, health_interval=SCRAPER_HEALTH_INTERVAL_SEC)
+            _scraper_pool.start_health_checks()
+        return _scraper_pool
+
+
+def trace_request(name: str):
+    """Trace the wrapped view per _tracer; ?trace=1 or X-Trace: 1 forces a kept trace.
+
+    Kept traces are announced in the X-Trace-Id response header.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            force = request.args.get("trace") == "1" or request.headers.get("X-Trace") == "1"
+            trace = _tracer.start(name, force=force, path=request.path)
+            if trace is None:
+                return view(*args, **kwargs)
+            try:
+                response = make_response(view(*args, **kwargs))
+            finally:
+                kept = _tracer.finish(trace)
+            if kept:
+                response.headers["X-Trace-Id"] = trace.trace_id
+            return response
+        return wrapper
+    return decorator
+
+
+def scrape_and_normalize(*args: Any, **kwargs: Any) -> Tuple[List[Dict[str, Any]], List[float]]:
+    """Lazy entry point to the enabled listing sources (src/adapters/registry.py, via CMA_SCRAPE_ISOLATION)."""
+    return _scrape_runner.run(*args, **kwargs)
+
 
+def execute_unit(unit: Dict[str, Any]) -> Dict[str, Any]:
+    """Lazy entry point to src.scraper.sharding.execute_unit."""
+    from src.scraper.sharding import execute_unit as _execute_unit
+    return _execute_unit(unit)
 
-def check_rate_limit(ip: str, max_requests: int = 100, window_seconds: int = 60) -> bool:
+
+def relay_to_scraper_pool(path: str, body: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """POST body to the remote scraper pool (SCRAPER_MODE=remote); returns (payload, status)."""
+    import requests
+    from scraper_pool import NoScraperBackendAvailable
+
+    try:
+        response = get_scraper_pool().post(path, json=body, timeout=SCRAPER_TIMEOUT_SEC)
+
+        if response.status_code == 200:
+            app.logger.info("Remote scraper completed successfully")
+        else:
+            app.logger.warning(f"Remote scraper returned status {response.status_code}")
+
+        return response.json(), response.status_code
+
+    except requests.Timeout:
+        app.logger.error("Remote scraper timeout")
+        return {"error": "Scraper timeout"}, 504
+    except (requests.ConnectionError, NoScraperBackendAvailable) as e:
+        app.logger.error(f"Cannot connect to remote scraper: {e}")
+        return {"error": "Scraper service unavailable"}, 503
+    except Exception as e:
+        app.logger.error(f"Remote scraper error: {e}")
+        return {"error": "Scraper error"}, 500
+
+
+def forward_to_scraper_pool(path: str, body: Dict[str, Any]) -> Any:
+    """Relay a request to the remote scraper pool (SCRAPER_MODE=remote)."""
+    payload, status = relay_to_scraper_pool(path, body)
+    return jsonify(payload), status
+
+
+def check_rate_limit(ip: str, max_requests: int = ADDRESS_SEARCH_RATE_LIMIT, window_seconds: int = 60) -> bool:
     """Check if IP has exceeded rate limit (100 requests per minute)."""
     current_time = time.time()
     
@@ -91,42 +262,501 @@ def check_rate_limit(ip: str, max_requests: int = 100, window_seconds: int = 60)
         return True
 
 
+@traced("analyze_neighborhoods")
 def analyze_neighborhoods(properties: List[Dict[str, Any]]) -> Dict[str, Any]:
-    """Simple pandas-based neighborhood analysis following existing patterns."""
+    """count/mean/min/max price for the 20 neighborhoods with most listings (at least 2 each).
+
+    Re-posts of one unit (same cluster_id) count once.
+    """
     if not properties:
         return {}
-    
-    try:
-        df = pd.DataFrame(properties)
-        df = df[df['neighborhood'].str.len() > 0]  # Filter empty neighborhoods
-        df = df[df['price'] > 0]  # Filter zero prices
-        
-        if df.empty:
+
+    with PHASE_SECONDS.time(phase="analytics"):
+        try:
+            # One pass over the records; a DataFrame per request costs more than it saves here
+            prices_by_neighborhood: Dict[str, List[float]] = {}
+            units = set()
+            for prop in properties:
+                unit = getattr(prop, "cluster_id", None)
+                if unit is not None:
+                    if unit in units:
+                        continue
+                    units.add(unit)
+                neighborhood = prop.get("neighborhood")
+                price = float(prop.get("price") or 0)
+                if isinstance(neighborhood, str) and neighborhood and price > 0:
+                    prices_by_neighborhood.setdefault(neighborhood, []).append(price)
+
+            ranked = sorted(prices_by_neighborhood.items(), key=lambda item: -len(item[1]))
+            return {
+                name: {
+                    "count": len(prices),
+                    "mean": round(math.fsum(prices) / len(prices), 2),
+                    "min": round(min(prices), 2),
+                    "max": round(max(prices), 2),
+                }
+                for name, prices in ranked[:20]
+                if len(prices) >= 2
+            }
+        except Exception:
             return {}
-        
-        # Use pandas groupby like existing stats calculation
-        grouped = df.groupby('neighborhood')['price'].agg(['count', 'mean', 'min', 'max'])
-        grouped = grouped[grouped['count'] >= 2]  # Min 2 properties
-        grouped = grouped.sort_values('count', ascending=False).head(20)
-        
-        return grouped.round(2).to_dict('index')
+
+
+# The /api/cma body fields a queued job relays to the scraper pool in remote mode
+CMA_REQUEST_FIELDS = ("psgc_province_code", "psgc_city_code", "property_type", "count", "mode", "enrich",
+                      "timeout_sec", "appraisal_id")
+
+
+def parse_cma_request(body: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Validate a /api/cma request body. Returns (params, None) or (None, error)."""
+    psgc_province_code = str(body.get("psgc_province_code", "")).strip()
+    psgc_city_code = str(body.get("psgc_city_code") or "").strip()
+    property_type = str(body.get("property_type", "")).strip().lower()
+    try:
+        count = int(body.get("count", 50))
     except Exception:
-        return {}
+        return None, "Invalid count"
+
+    if not psgc_province_code or len(psgc_province_code) > 10 or len(psgc_city_code) > 10:
+        return None, "Invalid PSGC code"
+
+    if property_type != "condo":
+        return None, "Unsupported property_type"
+
+    if count < 1:
+        count = 1
+    if count > MAX_COUNT:
+        count = MAX_COUNT
+
+    mode = str(body.get("mode", SCRAPER_DETAIL_LEVEL)).strip().lower()
+    detail_level = DETAIL_LEVEL_CARD if mode in ("fast", DETAIL_LEVEL_CARD) else "full"
+    try:
+        enrich = int(body.get("enrich", CARD_ENRICH_DEFAULT))
+    except Exception:
+        return None, "Invalid enrich"
+    enrich = max(0, min(enrich, CARD_ENRICH_MAX))
+
+    timeout_sec = None
+    if body.get("timeout_sec") is not None:
+        try:
+            timeout_sec = max(10, min(int(body["timeout_sec"]), SCRAPER_TIMEOUT_SEC))
+        except Exception:
+            return None, "Invalid timeout_sec"
+
+    if not is_supported(psgc_province_code):
+        return None, "Unsupported province"
+
+    province = to_lamudi_province(psgc_province_code)
+    if not province:
+        return None, "Unsupported province"
+
+    # A city or barangay code (psgc_city_code, or in psgc_province_code) narrows the result to its city
+    scope = resolve_scope(psgc_city_code or psgc_province_code)
+    if psgc_city_code and (not scope or scope["province"] != province):
+        return None, "Unsupported city"
+    if not scope or not scope["city"]:
+        scope = None
+
+    return {
+        "psgc_province_code": psgc_province_code,
+        "province": province,
+        "scope": scope,
+        "property_type": property_type,
+        "count": count,
+        "detail_level": detail_level,
+        "enrich": enrich,
+        "timeout_sec": timeout_sec,
+        "appraisal_id": body.get("appraisal_id"),
+    }, None
+
+
+_projection_store = None
+_projection_store_lock = threading.Lock()
+
+
+def get_projection_store() -> ProjectionStore:
+    global _projection_store
+    with _projection_store_lock:
+        if _projection_store is None:
+            _projection_store = ProjectionStore(PROJECTIONS_DB_PATH)
+        return _projection_store
+
+
+_scrape_coordinator = None
+_scrape_coordinator_lock = threading.Lock()
+
+
+def get_scrape_coordinator() -> ScrapeCoordinator:
+    """Global scrape slots and job progress shared by all workers on this box."""
+    global _scrape_coordinator
+    with _scrape_coordinator_lock:
+        if _scrape_coordinator is None:
+            _scrape_coordinator = ScrapeCoordinator(SCRAPE_COORDINATION_DB_PATH, slots=SCRAPE_SLOTS)
+        return _scrape_coordinator
+
+
+_cma_job_queue = None
+_cma_job_workers = None
+_cma_jobs_lock = threading.Lock()
+
+
+def get_cma_job_queue() -> CmaJobQueue:
+    """Lazily open the CMA job queue (same SQLite file as the scrape coordinator)."""
+    global _cma_job_queue
+    with _cma_jobs_lock:
+        if _cma_job_queue is None:
+            _cma_job_queue = CmaJobQueue(SCRAPE_COORDINATION_DB_PATH, result_ttl=CMA_JOB_RESULT_TTL_SEC,
+                                         max_queued=CMA_JOB_MAX_QUEUED, stale_after=SCRAPER_TIMEOUT_SEC * 2)
+        return _cma_job_queue
+
+
+def get_cma_job_workers() -> CmaJobWorkers:
+    """Start this process's CMA job threads on first use (not at import, so gunicorn can preload/fork)."""
+    global _cma_job_workers
+    queue = get_cma_job_queue()
+    with _cma_jobs_lock:
+        if _cma_job_workers is None:
+            _cma_job_workers = CmaJobWorkers(
+                queue, run_cma_job, workers=CMA_JOB_WORKERS,
+                has_capacity=lambda: SCRAPER_MODE == 'remote' or get_scrape_coordinator().in_use() < SCRAPE_SLOTS,
+            )
+        return _cma_job_workers.start()
+
+
+_listing_snapshot = None
+_snapshot_rebuilder = None
+_listing_snapshot_lock = threading.Lock()
+
+
+def get_listing_snapshot() -> Optional["ListingSnapshot"]:
+    """This worker's read-only mapping of the listing snapshot (None until the first build).
+
+    Remapped when a rebuild has replaced the file; workers share the pages through the OS cache.
+    """
+    global _listing_snapshot
+    from src.analytics.snapshot import ListingSnapshot
+    with _listing_snapshot_lock:
+        _listing_snapshot = ListingSnapshot.open(LISTING_SNAPSHOT_PATH, _listing_snapshot)
+        return _listing_snapshot
+
+
+def rebuild_listing_snapshot() -> None:
+    """Compact and prune the Parquet export, then fold what is new into the listing snapshot."""
+    from src.analytics.snapshot import build_snapshot
+    from src.scraper.columnar import compact_parquet
+    compacted = compact_parquet()
+    if any(compacted.values()):
+        app.logger.info("parquet_compacted expired=%s compacted=%s", compacted["expired"], compacted["compacted"])
+    build_snapshot(LISTING_SNAPSHOT_PATH)
+
+
+def schedule_snapshot_rebuild() -> None:
+    """Fold new Parquet export files into the listing snapshot in the background (debounced).
+
+    Workers that scraped at the same time queue on the snapshot's build lock;
+    the first folds every new file in and the rest return without work.
+    """
+    global _snapshot_rebuilder
+    try:
+        from src.analytics.snapshot import SnapshotRebuilder
+        with _listing_snapshot_lock:
+            if _snapshot_rebuilder is None:
+                _snapshot_rebuilder = SnapshotRebuilder(rebuild_listing_snapshot,
+                                                        min_interval=LISTING_SNAPSHOT_REBUILD_SEC)
+        _snapshot_rebuilder.request()
+    except Exception as e:
+        app.logger.error(f"Failed to schedule listing snapshot rebuild: {e}")
+
+
+def record_projection_history(psgc_code: str, province: str, properties: List[Dict[str, Any]]) -> None:
+    """Fold a finished scrape into the projections rollups (never fails the request).
+
+    Rollups are keyed by the province's canonical code, so "1376", "137600000"
+    and a Makati city code all feed one Metro Manila row. A city-scoped CMA
+    still scrapes the whole province, and its listings are filed there.
+    """
+    if not properties:
+        return
+    try:
+        area_name = province.replace("-", " ").title()
+        get_projection_store().record_scrape(province_code(psgc_code) or psgc_code, area_name, properties)
+    except Exception as e:
+        app.logger.error(f"Failed to record projection history for {province}: {e}")
+
+
+def compute_price_stats(price_series: List[float]) -> Dict[str, Any]:
+    """count/avg/median/min/max over a price series (non-numeric values dropped)."""
+    with PHASE_SECONDS.time(phase="analytics"):
+        stats: Dict[str, Any] = {"count": int(len(price_series))}
+        prices = []
+        for value in price_series:
+            try:
+                price = float(value)
+            except (TypeError, ValueError):
+                continue
+            if not math.isnan(price):
+                prices.append(price)
+        if prices:
+            stats.update({
+                "avg": math.fsum(prices) / len(prices),
+                "median": float(statistics.median(prices)),
+                "min": min(prices),
+                "max": max(prices),
+            })
+    return stats
+
+
+def cache_cma_result(province: str, property_type: str, detail_level: str, count: int,
+                     properties: List[Dict[str, Any]], price_series: List[float]) -> None:
+    """Remember a scrape result so batch requests can reuse it within CMA_CACHE_TTL_SEC."""
+    if not properties:
+        return
+    key = (province, property_type, detail_level)
+    with _cma_cache_lock:
+        if key not in _cma_cache and len(_cma_cache) >= 50:
+            # Remove oldest entry (simple FIFO)
+            del _cma_cache[next(iter(_cma_cache))]
+        _cma_cache[key] = {
+            "count": int(count),
+            "properties": list(properties),
+            "price_series": list(price_series),
+            "cached_at": time.time(),
+        }
+
+
+def get_cached_cma(province: str, property_type: str, detail_level: str, count: int) -> Optional[Dict[str, Any]]:
+    """Fresh cached result that covers at least `count` listings, sliced to `count`."""
+    key = (province, property_type, detail_level)
+    with _cma_cache_lock:
+        entry = _cma_cache.get(key)
+        if not entry:
+            return None
+        if time.time() - entry["cached_at"] > CMA_CACHE_TTL_SEC:
+            del _cma_cache[key]
+            return None
+        if entry["count"] < count:
+            return None
+        CACHE_HITS.inc(cache="cma")
+        return {
+            "properties": entry["properties"][:count],
+            "price_series": entry["price_series"][:count],
+            "cached_at": entry["cached_at"],
+        }
+
+
+def run_scraper_subprocess(province: str, property_type: str, count: int, job_id: Optional[str] = None,
+                           deadline: Optional[Deadline] = None) -> Any:
+    """Run lamudi_scraper.py, streaming its progress into job_id's shared progress record.
+
+    Returns pages_scanned as reported by the scraper (None if not reported).
+    With a `deadline` the scraper gets the time left as its own budget and is
+    killed if it still overruns; without one, raises subprocess.TimeoutExpired
+    after SCRAPER_TIMEOUT_SEC. Kills the scraper and raises ScrapeCancelled if
+    the job is cancelled meanwhile.
+    """
+    # Build stdin for the scraper: province, property_type, count
+    stdin_payload = f"{province}\n{property_type}\n{count}\n".encode("utf-8")
+
+    # Run scraper as subprocess and parse stdout to update progress
+    proc = subprocess.Popen(
+        [sys.executable, SCRAPER_PATH],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=BACKEND_DIR,
+        text=True,
+        bufsize=1,
+        env={
+            **os.environ,
+            "TQDM_DISABLE": "1",
+            # Only the in-process scrape is served, so only that one goes into the run history
+            "SCRAPE_RUNS_RECORD": "0",
+            **({"SCRAPER_TIMEOUT_SEC": str(max(1, int(deadline.remaining())))} if deadline is not None else {}),
+        },
+    )
+    assert proc.stdin is not None and proc.stdout is not None
+    proc.stdin.write(stdin_payload.decode("utf-8"))
+    proc.stdin.close()
+
+    _stdout_tail_lines: List[str] = []
+    _stderr_tail = ""
+    pages_scanned = None
+    import re as _re
+    start_read = time.time()
+    while True:
+        line = proc.stdout.readline()
+        if not line:
+            if proc.poll() is not None:
+                break
+            # Prevent tight loop
+            time.sleep(0.05)
+            continue
+        # keep small tail for logs
+        _stdout_tail_lines.append(line)
+        if len(_stdout_tail_lines) > 200:
+            _stdout_tail_lines.pop(0)
+        # parse progress indicators
+        if "list_pages_scanned" in line:
+            update: Dict[str, Any] = {}
+            m = _re.search(r"pages_scanned\'?:\s*(\d+)", line)
+            if m:
+                pages_scanned = update["pages_scanned"] = int(m.group(1))
+            m2 = _re.search(r"capped_max_page_num\'?:\s*(\d+)", line)
+            if m2:
+                update["max_pages"] = int(m2.group(1))
+            if update and job_id:
+                get_scrape_coordinator().update_progress(job_id, **update)
+        try:
+            check_cancelled()
+        except ScrapeCancelled:
+            proc.kill()
+            raise
+        if deadline is not None and deadline.expired:
+            # Its own budget should have stopped it; the request must not wait on it
+            proc.kill()
+            app.logger.warning("scraper_subprocess_overran job_id=%s", job_id)
+            break
+        # basic timeout check
+        if deadline is None and time.time() - start_read > SCRAPER_TIMEOUT_SEC:
+            proc.kill()
+            raise subprocess.TimeoutExpired(SCRAPER_PATH, SCRAPER_TIMEOUT_SEC)
+
+    # Collect remaining stderr for diagnostics
+    try:
+        _stderr_tail = (proc.stderr.read() or "")[-1000:]
+    except Exception:
+        _stderr_tail = ""
+    _stdout_tail = "".join(_stdout_tail_lines)[-1000:]
+    app.logger.info("scraper_stdout_tail: %s", _stdout_tail)
+    if _stderr_tail:
+        app.logger.info("scraper_stderr_tail: %s", _stderr_tail)
+    return pages_scanned
 
 
 @app.get("/health")
 def health() -> Any:
     return jsonify({"status": "ok"})
+@app.get("/metrics")
+def metrics() -> Any:
+    """Prometheus text exposition of scrape/CMA timings, counters and gauges."""
+    return app.response_class(render_metrics(), mimetype=None, content_type=METRICS_CONTENT_TYPE)
+
+
 @app.get("/api/cma/status")
 def cma_status() -> Any:
-    """Lightweight polling endpoint to expose current scrape progress."""
-    with _progress_lock:
-        return jsonify({
-            "active": bool(_scrape_progress.get("active", False)),
-            "pagesScanned": int(_scrape_progress.get("pages_scanned") or 0),
-            "maxPages": _scrape_progress.get("max_pages")
-        })
+    """Lightweight polling endpoint to expose scrape progress (?job_id=, else the latest CMA on any worker)."""
+    job_id = request.args.get("job_id")
+    coordinator = get_scrape_coordinator()
+    job = coordinator.get_job(job_id) if job_id else coordinator.latest_job("cma")
+    if job is None:
+        return jsonify({"active": False, "pagesScanned": 0, "maxPages": None})
+    progress = job["progress"]
+    return jsonify({
+        "active": job["state"] == JOB_RUNNING,
+        "pagesScanned": int(progress.get("pages_scanned") or 0),
+        "maxPages": progress.get("max_pages"),
+        "jobId": job["job_id"],
+        "state": job["state"],
+    })
+
+
+@app.get("/api/diagnostics/outbox")
+def outbox_status() -> Any:
+    """Supabase outbox backlog (queued appraisal updates / activity logs)."""
+    try:
+        return jsonify(outbox_stats())
+    except Exception as e:
+        app.logger.error(f"Outbox stats error: {e}", exc_info=False)
+        return jsonify({"error": "Outbox unavailable"}), 500
+
+
+@app.get("/api/diagnostics/scrapers")
+def scraper_backends_status() -> Any:
+    """Per-backend health, load, latency and error rate in remote mode."""
+    if SCRAPER_MODE != 'remote':
+        return jsonify({"mode": SCRAPER_MODE, "backends": []})
+    return jsonify({"mode": SCRAPER_MODE, "backends": get_scraper_pool().stats()})
+
+
+@app.get("/api/diagnostics/pacing")
+def pacing_status() -> Any:
+    """Adaptive pacer rate, in-flight limit and circuit breaker state per upstream host."""
+    from src.scraper.pacing import pacer_snapshots, pacing_enabled
+    return jsonify({"enabled": pacing_enabled(), "hosts": pacer_snapshots()})
+
+
+@app.get("/api/diagnostics/runs")
+def scrape_runs() -> Any:
+    """Scrape run history: recent runs, or per-group aggregates with ?group_by=.
+
+    Filters: province, property_type, mode (full/card/sharded), outcome, days
+    (look-back window), since/until (epoch seconds). Without group_by returns
+    up to `limit` runs (default 100, max 1000), newest first; with
+    group_by=province|property_type|mode|outcome|day returns counts, cache hit
+    rate, success rate and duration avg/p50/p95 per group.
+    """
+    args = request.args
+    try:
+        since = float(args["since"]) if args.get("since") else None
+        until = float(args["until"]) if args.get("until") else None
+        if args.get("days"):
+            since = max(since or 0.0, time.time() - float(args["days"]) * 86400)
+        limit = min(max(int(args.get("limit", 100)), 1), 1000)
+    except ValueError:
+        return jsonify({"error": "since, until, days and limit must be numbers"}), 400
+    filters = {
+        "province": args.get("province"),
+        "property_type": args.get("property_type"),
+        "mode": args.get("mode"),
+        "outcome": args.get("outcome"),
+        "since": since,
+        "until": until,
+    }
+    group_by = args.get("group_by")
+    if group_by and group_by not in RUN_GROUP_BY:
+        return jsonify({"error": f"group_by must be one of {sorted(RUN_GROUP_BY)}"}), 400
+    store = run_history_store()
+    if group_by:
+        return jsonify({"group_by": group_by, "groups": store.aggregate(group_by, **filters)})
+    return jsonify({"runs": store.runs(limit=limit, **filters)})
+
+
+@app.get("/api/diagnostics/traces")
+def list_traces() -> Any:
+    """Kept CMA traces (slow or explicitly requested), newest first."""
+    return jsonify({"mode": _tracer.mode, "slow_ms": _tracer.slow_ms, "traces": _tracer.store.list()})
+
 
+@app.get("/api/diagnostics/traces/<trace_id>")
+def get_trace(trace_id: str) -> Any:
+    """One trace as Chrome trace-event JSON (open in chrome://tracing or Perfetto)."""
+    trace = _tracer.store.get(trace_id)
+    if trace is None:
+        return jsonify({"error": "Unknown trace"}), 404
+    response = jsonify(trace.to_chrome())
+    response.headers["Content-Disposition"] = f'attachment; filename="trace-{trace_id}.json"'
+    return response
+
+
+@app.post("/api/crawl/unit")
+def crawl_unit() -> Any:
+    """Execute one sharded-crawl work unit for a remote coordinator.
+
+    Disabled unless CRAWL_WORKER_TOKEN is set; coordinators send it as X-Crawl-Token.
+    """
+    token = os.getenv("CRAWL_WORKER_TOKEN")
+    if not token or not hmac.compare_digest(request.headers.get("X-Crawl-Token", ""), token):
+        return jsonify({"error": "Forbidden"}), 403
+    unit = request.get_json(silent=True) or {}
+    if unit.get("property_type") != "condo" or not is_supported_slug(str(unit.get("province", ""))):
+        return jsonify({"error": "Invalid work unit"}), 400
+    try:
+        return jsonify(execute_unit(unit))
+    except ValueError:
+        return jsonify({"error": "Invalid work unit"}), 400
+    except Exception as e:
+        app.logger.error(f"Crawl unit error: {e}", exc_info=False)
+        return jsonify({"error": "Work unit failed"}), 500
 
 
 @app.get("/api/addresses/search")
@@ -157,58 +787,152 @@ def search_addresses() -> Any:
     
     start_time = time.time()
     
-    # Check cache first
-    cache_key = f"{query.lower()}:{limit}"
-    with _cache_lock:
-        if cache_key in _address_cache:
-            cached_result = _address_cache[cache_key]
-            # Return cached result with fresh timestamp
-            cached_result["query_time_ms"] = int((time.time() - start_time) * 1000)
-            return jsonify(cached_result)
-    
     try:
-        # Perform case-insensitive search with early termination
-        lower_query = query.lower()
-        addresses = _address_database.get("addresses", [])
-        
-        # Filter addresses that match the query with early termination
-        matches = []
-        for address in addresses:
-            if lower_query in address["full_address"].lower():
-                matches.append(address)
-                # Early termination if we have enough high-confidence matches
-                if len(matches) >= limit * 3:  # Get 3x limit for better sorting
-                    break
-        
-        # Sort by confidence level (high > medium > low) and limit results
-        confidence_order = {"high": 3, "medium": 2, "low": 1}
-        matches.sort(key=lambda x: confidence_order.get(x["confidence_level"], 0), reverse=True)
-        suggestions = matches[:limit]
+        # Case-insensitive substring match, best confidence first (cached per index generation)
+        suggestions, cached = get_address_database().search(query, limit)
+        if cached:
+            CACHE_HITS.inc(cache="address")
         
-        query_time_ms = int((time.time() - start_time) * 1000)
-        
-        response = {
+        return jsonify({
             "suggestions": suggestions,
             "total": len(suggestions),
-            "query_time_ms": query_time_ms
-        }
-        
-        # Cache the result (limit cache to 100 entries)
-        with _cache_lock:
-            if len(_address_cache) >= 100:
-                # Remove oldest entry (simple FIFO)
-                oldest_key = next(iter(_address_cache))
-                del _address_cache[oldest_key]
-            _address_cache[cache_key] = response.copy()
-        
-        return jsonify(response)
+            "query_time_ms": int((time.time() - start_time) * 1000)
+        })
         
     except Exception as e:
         app.logger.error(f"Address search error: {e}", exc_info=False)
         return jsonify({"error": "Search failed"}), 500
 
 
+@app.post("/api/admin/addresses/reload")
+def reload_addresses() -> Any:
+    """Rebuild this worker's address index from the file now (other workers follow on their next poll).
+
+    Disabled unless ADMIN_TOKEN is set; callers send it as X-Admin-Token.
+    """
+    token = os.getenv("ADMIN_TOKEN")
+    if not token or not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), token):
+        return jsonify({"error": "Forbidden"}), 403
+    database = get_address_database()
+    try:
+        database.reload(force=True)
+    except Exception as e:
+        app.logger.error(f"Address database reload failed: {e}", exc_info=False)
+        return jsonify({"error": "Reload failed", **database.status()}), 500
+    return jsonify(database.status())
+
+
+@app.get("/api/projections")
+def projections() -> Any:
+    """Per-area market projections from stored scrape history.
+
+    Same columns as the dashboard's projections CSV. Optional ?psgc_code= filter
+    (any code inside the province) and ?format=csv for a drop-in CSV download.
+    """
+    psgc_code = (request.args.get("psgc_code") or "").strip() or None
+    if psgc_code:
+        psgc_code = province_code(psgc_code) or psgc_code
+    rows = get_projection_store().projections(psgc_code)
+    if (request.args.get("format") or "").lower() == "csv":
+        buf = io.StringIO()
+        writer = csv.DictWriter(buf, fieldnames=PROJECTION_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+        return app.response_class(buf.getvalue(), mimetype="text/csv")
+    return jsonify({"projections": rows, "count": len(rows)})
+
+
+def snapshot_filters() -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """province (slug or psgc_province_code), city, neighborhood, bedrooms, min/max_price query args."""
+    args = request.args
+    filters: Dict[str, Any] = {}
+    province = (args.get("province") or "").strip().lower()
+    psgc_code = (args.get("psgc_province_code") or "").strip()
+    if psgc_code:
+        province = to_lamudi_province(psgc_code) if is_supported(psgc_code) else ""
+        if not province:
+            return None, "Unsupported province"
+    if province:
+        filters["province"] = province
+    for name in ("city", "neighborhood"):
+        value = (args.get(name) or "").strip()
+        if len(value) > 100:
+            return None, f"Invalid {name}"
+        if value:
+            filters[name] = value
+    try:
+        if args.get("bedrooms") not in (None, ""):
+            filters["bedrooms"] = int(args["bedrooms"])
+        for name in ("min_price", "max_price"):
+            if args.get(name) not in (None, ""):
+                filters[name] = float(args[name])
+    except ValueError:
+        return None, "Invalid filter"
+    return filters, None
+
+
+def snapshot_meta(snapshot: "ListingSnapshot") -> Dict[str, Any]:
+    return {"rows": len(snapshot), "built_at": snapshot.built_at}
+
+
+@app.get("/api/listings/stats")
+def listing_stats() -> Any:
+    """Price and neighborhood stats over every scraped listing, from the memory-mapped snapshot."""
+    filters, error = snapshot_filters()
+    if error:
+        return jsonify({"error": error}), 400
+    snapshot = get_listing_snapshot()
+    if snapshot is None:
+        return jsonify({"error": "No listing snapshot yet"}), 503
+    with PHASE_SECONDS.time(phase="analytics"):
+        selected = snapshot.mask(**filters)
+        return jsonify({
+            "stats": snapshot.price_stats(selected),
+            "neighborhoods": snapshot.neighborhood_stats(selected),
+            "snapshot": snapshot_meta(snapshot),
+        })
+
+
+@app.get("/api/listings/comparables")
+def listing_comparables() -> Any:
+    """Nearest scraped listings to lat/lon within radius_km (default 2), optionally matching sqm and bedrooms."""
+    filters, error = snapshot_filters()
+    if error:
+        return jsonify({"error": error}), 400
+    try:
+        lat = float(request.args["lat"])
+        lon = float(request.args["lon"])
+        radius_km = min(max(float(request.args.get("radius_km", 2)), 0.05), 50.0)
+        sqm = float(request.args["sqm"]) if request.args.get("sqm") else None
+        limit = min(max(int(request.args.get("limit", 10)), 1), 100)
+    except (KeyError, ValueError):
+        return jsonify({"error": "lat and lon are required"}), 400
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return jsonify({"error": "Invalid coordinates"}), 400
+    snapshot = get_listing_snapshot()
+    if snapshot is None:
+        return jsonify({"error": "No listing snapshot yet"}), 503
+    with PHASE_SECONDS.time(phase="analytics"):
+        rows = snapshot.comparables(lat, lon, radius_km=radius_km, sqm=sqm, limit=limit, **filters)
+    return jsonify({"comparables": rows, "count": len(rows), "snapshot": snapshot_meta(snapshot)})
+
+
+def cma_busy_response(message: str = "Server busy, please try again in a moment") -> Any:
+    """429 that says how long the job queue is and when a queued job would start."""
+    queue = get_cma_job_queue()
+    wait = queue.estimated_wait(SCRAPE_SLOTS, get_scrape_coordinator().in_use())
+    response = jsonify({
+        "error": message,
+        "queue_depth": queue.depth(),
+        "estimated_wait_sec": wait,
+        "jobs_url": "/api/cma/jobs",
+    })
+    response.headers["Retry-After"] = str(max(1, int(wait)))
+    return response, 429
+
+
 @app.post("/api/cma")
+@trace_request("cma")
 def cma() -> Any:
     if not request.is_json:
         return jsonify({"error": "Invalid content type"}), 400
@@ -216,71 +940,150 @@ def cma() -> Any:
     body = request.get_json(silent=True) or {}
 
     # Validate and sanitize input
-    psgc_province_code = str(body.get("psgc_province_code", "")).strip()
-    property_type = str(body.get("property_type", "")).strip().lower()
-    appraisal_id = body.get("appraisal_id")
+    params, error = parse_cma_request(body)
+    if error:
+        return jsonify({"error": error}), 400
+
+    # ===== Remote mode check =====
+    if SCRAPER_MODE == 'remote':
+        app.logger.info(f"Remote mode: Forwarding scrape request to pool of {len(SCRAPER_URLS)} backend(s)")
+        return forward_to_scraper_pool("/api/cma", body)
+    # ===== End remote mode check =====
+
+    fmt = response_format(body)
+    if request.headers.get("If-None-Match"):
+        # A client revalidating a result we still hold unchanged gets a 304 without a new scrape
+        cached = get_cached_cma(params["province"], params["property_type"], params["detail_level"], params["count"])
+        if cached:
+            properties, price_series, scope = scope_to_city(cached["properties"], cached["price_series"],
+                                                            params["scope"])
+            cached_payload = shape_payload(build_cma_payload(properties, compute_price_stats(price_series),
+                                                             params["detail_level"], scope), fmt)
+            etag = payload_etag(cached_payload)
+            if etag_matches(request.headers.get("If-None-Match"), etag):
+                record_cached_lookup(params["province"], params["property_type"], params["detail_level"],
+                                     params["count"])
+                return conditional_json(cached_payload, etag)
+
+    # LOCAL MODE: Allow concurrent scrapes up to the global slot limit
+    job_id = str(body.get("job_id") or uuid.uuid4().hex)[:64]
+    coordinator = get_scrape_coordinator()
+    if not coordinator.acquire(job_id, kind="cma", progress=cma_progress(params)):
+        return cma_busy_response()
+
+    payload: Dict[str, Any] = {"error": "Server error"}
+    status = 500
     try:
-        count = int(body.get("count", 50))
-    except Exception:
-        return jsonify({"error": "Invalid count"}), 400
+        payload, status = execute_cma(params, job_id)
+    finally:
+        coordinator.release(job_id, JOB_DONE if status == 200 else JOB_FAILED)
+    if status != 200:
+        return jsonify(payload), status
+    with PHASE_SECONDS.time(phase="serialize"):
+        return conditional_json(shape_payload(payload, fmt))
 
-    if not psgc_province_code or len(psgc_province_code) > 8:
-        return jsonify({"error": "Invalid PSGC code"}), 400
 
-    if property_type != "condo":
-        return jsonify({"error": "Unsupported property_type"}), 400
+def build_cma_payload(properties: List[Dict[str, Any]], stats: Dict[str, Any], detail_level: str,
+                      scope: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """The /api/cma success body for a scrape's listings (also rebuilt from the CMA cache)."""
+    # Cap properties to 100 for response parity
+    properties = properties[:100]
+    payload: Dict[str, Any] = {
+        "properties": properties,
+        "stats": stats,
+        "neighborhoods": analyze_neighborhoods(properties),
+        "data_source": "live",
+    }
+    if detail_level == DETAIL_LEVEL_CARD:
+        payload["meta"] = {
+            "detail_level": DETAIL_LEVEL_CARD,
+            "enriched": sum(1 for p in properties if p.get("detail_level") != DETAIL_LEVEL_CARD),
+        }
+    if scope:
+        payload.setdefault("meta", {})["scope"] = scope
+    return payload
 
-    if count < 1:
-        count = 1
-    if count > MAX_COUNT:
-        count = MAX_COUNT
 
-    if not is_supported(psgc_province_code):
-        return jsonify({"error": "Unsupported province"}), 400
+def scope_to_city(properties: List[Dict[str, Any]], price_series: List[float],
+                  scope: Optional[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[float], Optional[Dict[str, Any]]]:
+    """Narrow a province's listings to the request's city (parse_cma_request "scope").
 
-    province = to_lamudi_province(psgc_province_code)
-    if not province:
-        return jsonify({"error": "Unsupported province"}), 400
+    Lamudi is scraped (and cached) per province, so a city-level request keeps
+    the listings whose address names the city. The price series is rebuilt from
+    those listings, one price per unit. When none match, the province's listings
+    are returned and meta.scope says so. Returns (properties, price_series, meta.scope or None).
+    """
+    if not scope or not scope.get("city"):
+        return properties, price_series, None
+    city = place_key(scope["city"])
+    matched = [p for p in properties
+               if any(place_key(part) == city for part in str(p.get("address") or "").split(","))]
+    meta = {"level": scope["level"], "code": scope["code"], "name": scope["name"], "city": scope["city"],
+            "matched": len(matched)}
+    if not matched:
+        meta["fallback"] = "province"
+        return properties, price_series, meta
+    units = [getattr(p, "cluster_id", None) or i for i, p in enumerate(matched)]
+    return matched, unit_prices([p["price"] for p in matched], units), meta
+
+
+def response_format(body: Optional[Dict[str, Any]] = None) -> str:
+    """"columnar" when asked for with ?format= or the JSON body's "format", else "records"."""
+    fmt = request.args.get("format") or (body or {}).get("format") or ""
+    return "columnar" if str(fmt).strip().lower() == "columnar" else "records"
+
+
+def shape_payload(payload: Dict[str, Any], fmt: str) -> Dict[str, Any]:
+    """format=columnar: properties as parallel per-field arrays instead of one object each."""
+    if fmt != "columnar" or not isinstance(payload.get("properties"), list):
+        return payload
+    return {**payload, "properties": columnar(payload["properties"]), "format": "columnar"}
+
+
+def payload_etag(payload: Dict[str, Any]) -> str:
+    """Strong ETag over the result; data_source (live or cache) does not change it."""
+    return etag_for(app.json.dumps_bytes({k: v for k, v in payload.items() if k != "data_source"}))
+
+
+def conditional_json(payload: Dict[str, Any], etag: Optional[str] = None) -> Any:
+    """jsonify(payload) with its ETag, or an empty 304 when If-None-Match already has it."""
+    etag = etag or payload_etag(payload)
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        response = app.response_class(status=304)
+    else:
+        response = jsonify(payload)
+    response.headers["ETag"] = etag
+    return response
 
-    # ===== Remote mode check =====
-    if SCRAPER_MODE == 'remote':
-        app.logger.info(f"Remote mode: Forwarding scrape request to {SCRAPER_URL}")
-        try:
-            response = requests.post(
-                f"{SCRAPER_URL}/api/cma",
-                json=body,
-                headers={'Content-Type': 'application/json'},
-                timeout=SCRAPER_TIMEOUT_SEC
-            )
-            
-            if response.status_code == 200:
-                app.logger.info("Remote scraper completed successfully")
-            else:
-                app.logger.warning(f"Remote scraper returned status {response.status_code}")
-            
-            return jsonify(response.json()), response.status_code
-            
-        except requests.Timeout:
-            app.logger.error("Remote scraper timeout")
-            return jsonify({"error": "Scraper timeout"}), 504
-        except requests.ConnectionError as e:
-            app.logger.error(f"Cannot connect to remote scraper: {e}")
-            return jsonify({"error": "Scraper service unavailable"}), 503
-        except Exception as e:
-            app.logger.error(f"Remote scraper error: {e}")
-            return jsonify({"error": "Scraper error"}), 500
-    # ===== End remote mode check =====
 
-    # LOCAL MODE: Allow concurrent scrapes with semaphore
-    if not _scrape_semaphore.acquire(blocking=False):
-        return jsonify({"error": "Server busy, please try again in a moment"}), 429
+def cma_progress(params: Dict[str, Any]) -> Dict[str, Any]:
+    return {"pages_scanned": 0, "max_pages": None, "province": params["province"],
+            "property_type": params["property_type"]}
+
+
+def execute_cma(params: Dict[str, Any], job_id: str) -> Tuple[Dict[str, Any], int]:
+    """Scrape and analyse one CMA request; the caller holds job_id's scrape slot.
+
+    Everything runs under one Deadline (timeout_sec, else SCRAPER_TIMEOUT_SEC).
+    When it cuts the scrape short the listings found so far are returned with
+    meta.partial rather than an error. Returns (payload, HTTP status). Raises
+    ScrapeCancelled when the job's cancel token (see cancel_scope) fires.
+    """
+    deadline = Deadline.after(params.get("timeout_sec") or SCRAPER_TIMEOUT_SEC, reserve=analytics_reserve_sec())
+    with deadline_scope(deadline):
+        return _execute_cma(params, job_id, deadline)
+
+
+def _execute_cma(params: Dict[str, Any], job_id: str, deadline: Deadline) -> Tuple[Dict[str, Any], int]:
+    province = params["province"]
+    property_type = params["property_type"]
+    count = params["count"]
+    detail_level = params["detail_level"]
+    enrich = params["enrich"]
+    appraisal_id = params["appraisal_id"]
 
     start_time = time.time()
     try:
-        # Initialize progress for this run
-        with _progress_lock:
-            _scrape_progress.update({"active": True, "pages_scanned": 0, "max_pages": None})
-
         # Clean previous output if exists
         try:
             if os.path.exists(OUTPUT_CSV):
@@ -289,94 +1092,40 @@ def cma() -> Any:
             # Non-fatal — continue, scraper will overwrite
             pass
 
-        # Build stdin for the scraper: province, property_type, count
-        stdin_payload = f"{province}\n{property_type}\n{count}\n".encode("utf-8")
-
-        # Run scraper as subprocess and parse stdout to update progress
-        proc = subprocess.Popen(
-            [sys.executable, SCRAPER_PATH],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            cwd=BACKEND_DIR,
-            text=True,
-            bufsize=1,
-            env={**os.environ, "TQDM_DISABLE": "1"},
-        )
-        assert proc.stdin is not None and proc.stdout is not None
-        proc.stdin.write(stdin_payload.decode("utf-8"))
-        proc.stdin.close()
-
-        _stdout_tail_lines: List[str] = []
-        _stderr_tail = ""
-        import re as _re
-        start_read = time.time()
-        while True:
-            line = proc.stdout.readline()
-            if not line:
-                if proc.poll() is not None:
-                    break
-                # Prevent tight loop
-                time.sleep(0.05)
-                continue
-            # keep small tail for logs
-            _stdout_tail_lines.append(line)
-            if len(_stdout_tail_lines) > 200:
-                _stdout_tail_lines.pop(0)
-            # parse progress indicators
-            if "list_pages_scanned" in line:
-                m = _re.search(r"pages_scanned\'?:\s*(\d+)", line)
-                if m:
-                    with _progress_lock:
-                        _scrape_progress["pages_scanned"] = int(m.group(1))
-                m2 = _re.search(r"capped_max_page_num\'?:\s*(\d+)", line)
-                if m2:
-                    with _progress_lock:
-                        _scrape_progress["max_pages"] = int(m2.group(1))
-            # basic timeout check
-            if time.time() - start_read > SCRAPER_TIMEOUT_SEC:
-                proc.kill()
-                raise subprocess.TimeoutExpired(SCRAPER_PATH, SCRAPER_TIMEOUT_SEC)
-
-        # Collect remaining stderr for diagnostics
-        try:
-            _stderr_tail = (proc.stderr.read() or "")[-1000:]
-        except Exception:
-            _stderr_tail = ""
-        _stdout_tail = "".join(_stdout_tail_lines)[-1000:]
-        app.logger.info("scraper_stdout_tail: %s", _stdout_tail)
-        if _stderr_tail:
-            app.logger.info("scraper_stderr_tail: %s", _stderr_tail)
-        pages_scanned = _scrape_progress.get("pages_scanned")
+        pages_scanned = None
+        if detail_level != DETAIL_LEVEL_CARD:
+            # Its own deadline: the subprocess only reports progress, its output is not served
+            subprocess_deadline = Deadline.after(deadline.remaining() * CMA_SUBPROCESS_BUDGET_SHARE, name="subprocess")
+            with span("scraper_subprocess"):
+                pages_scanned = run_scraper_subprocess(province, property_type, count, job_id, subprocess_deadline)
+            check_cancelled()
 
         # Prefer adapter-normalized in-memory data; keep CSV for diagnostics only
         properties: List[Dict[str, Any]] = []
         price_series: List[float] = []
+        # Per-source status and latency; reported when several sources are enabled (CMA_SOURCES)
+        sources: Dict[str, Any] = {}
         try:
-            properties, price_series = scrape_and_normalize(province, property_type, count)
+            with source_report() as sources:
+                properties, price_series = scrape_and_normalize(
+                    province, property_type, count, detail_level=detail_level, enrich=enrich
+                )
+        except ScrapeCancelled:
+            raise
         except Exception:
             properties, price_series = [], []
+        # The scraper stops early and returns what it has when cancelled
+        check_cancelled()
 
         # Read CSV as a fallback check/diagnostic (do not block response)
         df = None
         try:
             if os.path.exists(OUTPUT_CSV):
+                import pandas as pd
                 df = pd.read_csv(OUTPUT_CSV)
         except Exception:
             df = None
 
-        # Compute stats from adapter price series
-        stats: Dict[str, Any] = {"count": int(len(price_series))}
-        if len(price_series) > 0:
-            series = pd.to_numeric(pd.Series(price_series), errors="coerce").dropna()
-            if len(series) > 0:
-                stats.update({
-                    "avg": float(series.mean()),
-                    "median": float(series.median()),
-                    "min": float(series.min()),
-                    "max": float(series.max()),
-                })
-
         # On empty, return current empty payload with optional meta.reason
         if not properties:
             response: Dict[str, Any] = {
@@ -387,6 +1136,10 @@ def cma() -> Any:
             }
             # Provide a small non-breaking reason when available
             response["meta"] = {"reason": "selector_miss"}
+            if deadline.partial:
+                response["meta"] = {"reason": "deadline", "partial": True, "partial_reasons": deadline.reasons}
+            if len(sources) > 1:
+                response["meta"]["sources"] = sources
             duration_ms = int((time.time() - start_time) * 1000)
             try:
                 app.logger.warning(
@@ -404,14 +1157,21 @@ def cma() -> Any:
                 )
             except Exception:
                 pass
-            return jsonify(response)
+            return response, 200
 
-        # Cap properties to 100 for response parity
-        if len(properties) > 100:
-            properties = properties[:100]
+        # Keep for batch reuse before capping (price_series stays full); a deadline-cut result is not reused
+        if not deadline.partial:
+            cache_cma_result(province, property_type, detail_level, count, properties, price_series)
+        record_projection_history(params["psgc_province_code"], province, properties)
+        schedule_snapshot_rebuild()
 
-        # Analyze neighborhoods
-        neighborhoods = analyze_neighborhoods(properties)
+        # Compute stats from adapter price series, after narrowing to the requested city
+        properties, price_series, scope = scope_to_city(properties, price_series, params.get("scope"))
+        stats = compute_price_stats(price_series)
+
+        payload = build_cma_payload(properties, stats, detail_level, scope)
+        properties = payload["properties"]
+        duration_ms = int((time.time() - start_time) * 1000)
 
         # Update Supabase with successful completion
         if appraisal_id:
@@ -427,7 +1187,6 @@ def cma() -> Any:
                 app.logger.error(f"Failed to update Supabase appraisal {appraisal_id}: {e}")
 
         # Successful response using adapter results
-        duration_ms = int((time.time() - start_time) * 1000)
         try:
             app.logger.info(
                 "cma_success",
@@ -443,13 +1202,20 @@ def cma() -> Any:
             )
         except Exception:
             pass
-        return jsonify({
-            "properties": properties,
-            "stats": stats,
-            "neighborhoods": neighborhoods,
-            "data_source": "live",
-        })
+        if deadline.partial:
+            payload.setdefault("meta", {}).update({"partial": True, "partial_reasons": deadline.reasons})
+        if len(sources) > 1:
+            payload.setdefault("meta", {})["sources"] = sources
+        return payload, 200
 
+    except ScrapeCancelled:
+        app.logger.info("cma_cancelled job_id=%s", job_id)
+        if appraisal_id:
+            try:
+                update_appraisal(appraisal_id, "failed", error_type="cancelled", error_message="Scrape cancelled")
+            except Exception as supabase_error:
+                app.logger.error(f"Failed to update Supabase on cancel: {supabase_error}")
+        raise
     except subprocess.TimeoutExpired as e:
         app.logger.error("scraper_timeout", exc_info=False)
         
@@ -467,7 +1233,7 @@ def cma() -> Any:
             except Exception as supabase_error:
                 app.logger.error(f"Failed to update Supabase on timeout: {supabase_error}")
         
-        return jsonify({"error": "Scrape timed out"}), 504
+        return {"error": "Scrape timed out"}, 504
     except subprocess.CalledProcessError as e:
         try:
             _stdout_tail = (e.stdout or b"").decode("utf-8", errors="ignore")[-1000:]
@@ -487,7 +1253,7 @@ def cma() -> Any:
                     app.logger.error(f"Failed to update Supabase on scraper error: {supabase_error}")
         except Exception:
             app.logger.error("scraper_failed (no stdout/stderr)")
-        return jsonify({"error": "Scrape failed"}), 502
+        return {"error": "Scrape failed"}, 502
     except Exception as e:
         app.logger.error("server_error", exc_info=False)
         
@@ -504,11 +1270,8 @@ def cma() -> Any:
                 app.logger.error(f"Failed to update Supabase on server error: {supabase_error}")
         
         # Sanitized generic error
-        return jsonify({"error": "Server error"}), 500
+        return {"error": "Server error"}, 500
     finally:
-        _scrape_semaphore.release()
-        with _progress_lock:
-            _scrape_progress["active"] = False
         # Cleanup partial output if needed
         try:
             if os.path.exists(OUTPUT_CSV) and os.path.getsize(OUTPUT_CSV) == 0:
@@ -517,5 +1280,284 @@ def cma() -> Any:
             pass
 
 
+def _run_batch_item(params: Dict[str, Any], pool: "FetchPool", batch_id: str, deadline: Deadline) -> Dict[str, Any]:
+    """Scrape one batch item through the shared fetch pool, within the batch's deadline."""
+    try:
+        # Per-item Deadline object (same time) so each item reports its own partial flag
+        item_deadline = Deadline(deadline.at, reserve=deadline.reserve)
+        with deadline_scope(item_deadline), source_report() as sources:
+            properties, price_series = scrape_and_normalize(
+                params["province"], params["property_type"], params["count"],
+                detail_level=params["detail_level"], enrich=params["enrich"], fetch_pool=pool,
+            )
+        if not item_deadline.partial:
+            cache_cma_result(params["province"], params["property_type"], params["detail_level"],
+                             params["count"], properties, price_series)
+        record_projection_history(params["psgc_province_code"], params["province"], properties)
+        schedule_snapshot_rebuild()
+        return {"properties": properties, "price_series": price_series, "data_source": "live",
+                "partial": item_deadline.partial, "sources": sources}
+    finally:
+        get_scrape_coordinator().update_progress(batch_id, increments={"items_done": 1},
+                                                 requests=pool.stats()["requests"])
+
+
+@app.post("/api/cma/batch")
+def cma_batch() -> Any:
+    """Several CMAs (e.g. one per province) in one call.
+
+    All page fetches share one rate-limited FetchPool and cached results are
+    reused. The batch takes a single scrape slot. Poll progress with
+    GET /api/cma/batch/<batch_id>/status (batch_id may be supplied by the client).
+    """
+    if not request.is_json:
+        return jsonify({"error": "Invalid content type"}), 400
+
+    body = request.get_json(silent=True) or {}
+    items = body.get("items")
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "items must be a non-empty list"}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"At most {BATCH_MAX_ITEMS} items per batch"}), 400
+
+    parsed: List[Dict[str, Any]] = []
+    for index, item in enumerate(items):
+        params, error = parse_cma_request(item if isinstance(item, dict) else {})
+        if error:
+            return jsonify({"error": error, "item": index}), 400
+        parsed.append(params)
+
+    if SCRAPER_MODE == 'remote':
+        return forward_to_scraper_pool("/api/cma/batch", body)
+
+    batch_id = str(body.get("batch_id") or uuid.uuid4().hex)[:64]
+    start_time = time.time()
+    deadline = Deadline.after(min(p["timeout_sec"] or SCRAPER_TIMEOUT_SEC for p in parsed),
+                              reserve=analytics_reserve_sec())
+
+    # Serve what the cache already has; scrape the rest
+    results: List[Optional[Dict[str, Any]]] = [None] * len(parsed)
+    to_scrape: List[int] = []
+    for index, params in enumerate(parsed):
+        cached = get_cached_cma(params["province"], params["property_type"], params["detail_level"], params["count"])
+        if cached:
+            results[index] = {**cached, "data_source": "cache"}
+            record_cached_lookup(params["province"], params["property_type"], params["detail_level"],
+                                 params["count"])
+        else:
+            to_scrape.append(index)
+
+    coordinator = get_scrape_coordinator()
+    progress = {
+        "items_total": len(parsed),
+        "items_done": len(parsed) - len(to_scrape),
+        "cache_hits": len(parsed) - len(to_scrape),
+        "requests": 0,
+    }
+    pool: Optional["FetchPool"] = None
+    if to_scrape:
+        # The batch takes a single global scrape slot
+        if not coordinator.acquire(batch_id, kind="batch", progress=progress):
+            return cma_busy_response()
+        job_state = JOB_FAILED
+        try:
+            from src.scraper.fetch_pool import FetchPool
+            pool = FetchPool(rate=SCRAPER_FETCH_RATE, concurrency=SCRAPER_FETCH_CONCURRENCY)
+            with _progress_lock:
+                _batch_pools[batch_id] = pool
+            with ThreadPoolExecutor(max_workers=len(to_scrape), thread_name_prefix="cma-batch") as executor:
+                futures = {index: executor.submit(_run_batch_item, parsed[index], pool, batch_id, deadline)
+                           for index in to_scrape}
+                for index, future in futures.items():
+                    try:
+                        # Items stop at the deadline themselves; this only guards against a hung one
+                        results[index] = future.result(timeout=deadline.remaining() + deadline.reserve + 30)
+                    except Exception as e:
+                        app.logger.error(f"Batch item {index} failed: {e}", exc_info=False)
+                        results[index] = {"error": "Scrape failed"}
+            job_state = JOB_DONE
+        finally:
+            with _progress_lock:
+                _batch_pools.pop(batch_id, None)
+            coordinator.update_progress(batch_id, requests=pool.stats()["requests"] if pool else 0)
+            coordinator.release(batch_id, job_state)
+    else:
+        coordinator.open_job(batch_id, kind="batch", progress=progress)
+        coordinator.finish_job(batch_id, JOB_DONE)
+
+    items_out: List[Dict[str, Any]] = []
+    combined_prices: List[float] = []
+    for params, result in zip(parsed, results):
+        item_out: Dict[str, Any] = {
+            "psgc_province_code": params["psgc_province_code"],
+            "property_type": params["property_type"],
+            "count": params["count"],
+        }
+        if not result or "error" in result:
+            item_out.update({"error": (result or {}).get("error", "Scrape failed"), "properties": [], "stats": {"count": 0}})
+        else:
+            properties, price_series, scope = scope_to_city(result["properties"], result["price_series"],
+                                                            params["scope"])
+            properties = properties[:100]
+            item_out.update({
+                "properties": properties,
+                "stats": compute_price_stats(price_series),
+                "neighborhoods": analyze_neighborhoods(properties),
+                "data_source": result["data_source"],
+            })
+            if scope:
+                item_out["scope"] = scope
+            if result.get("partial"):
+                item_out["partial"] = True
+            if len(result.get("sources") or {}) > 1:
+                item_out["sources"] = result["sources"]
+            combined_prices.extend(price_series)
+        items_out.append(item_out)
+
+    return jsonify({
+        "batch_id": batch_id,
+        "items": items_out,
+        "combined_stats": compute_price_stats(combined_prices),
+        "meta": {
+            "duration_ms": int((time.time() - start_time) * 1000),
+            "cache_hits": len(parsed) - len(to_scrape),
+            "fetch": pool.stats() if pool else {"requests": 0},
+            "partial": any((r or {}).get("partial") for r in results),
+        },
+    })
+
+
+@app.get("/api/cma/batch/<batch_id>/status")
+def cma_batch_status(batch_id: str) -> Any:
+    """Progress for a whole batch: items finished and page requests made so far (any worker can answer)."""
+    job = get_scrape_coordinator().get_job(batch_id)
+    if job is None or job["kind"] != "batch":
+        return jsonify({"error": "Unknown batch"}), 404
+    progress = job["progress"]
+    with _progress_lock:
+        pool = _batch_pools.get(batch_id)
+    return jsonify({
+        "active": job["state"] == JOB_RUNNING,
+        "itemsTotal": progress["items_total"],
+        "itemsDone": progress["items_done"],
+        "cacheHits": progress["cache_hits"],
+        "requests": pool.stats()["requests"] if pool else progress.get("requests", 0),
+    })
+
+
+def run_cma_job(job: Dict[str, Any]) -> Optional[Tuple[Dict[str, Any], int]]:
+    """Run one claimed queue job under a global scrape slot; None if no slot is free yet."""
+    job_id, params = job["job_id"], job["params"]
+    queue = get_cma_job_queue()
+    if SCRAPER_MODE == 'remote':
+        # The pool parses the request itself; a relayed scrape can no longer be cancelled from here
+        if queue.cancel_requested(job_id):
+            raise ScrapeCancelled()
+        return relay_to_scraper_pool("/api/cma", {**params["request"], "job_id": job_id})
+    coordinator = get_scrape_coordinator()
+    if not coordinator.acquire(job_id, kind="cma", progress=cma_progress(params)):
+        return None
+    token = CancelToken(poll=lambda: queue.cancel_requested(job_id))
+    state = JOB_FAILED
+    try:
+        with cancel_scope(token):
+            payload, status = execute_cma(params, job_id)
+        state = JOB_DONE if status == 200 else JOB_FAILED
+        return payload, status
+    except ScrapeCancelled:
+        state = JOB_CANCELLED
+        raise
+    finally:
+        coordinator.release(job_id, state)
+
+
+def cma_job_response(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Queue record merged with live scrape progress and, once finished, the result."""
+    queue = get_cma_job_queue()
+    out: Dict[str, Any] = {
+        "job_id": job["job_id"],
+        "status": job["state"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "cancel_requested": job["cancel_requested"],
+    }
+    if job["state"] == JOB_QUEUED:
+        position = queue.position(job["job_id"])
+        out.update({
+            "queue_position": position,
+            "queue_depth": queue.depth(),
+            "estimated_wait_sec": queue.estimated_wait(SCRAPE_SLOTS, get_scrape_coordinator().in_use(), position),
+        })
+    scrape = get_scrape_coordinator().get_job(job["job_id"])
+    if scrape is not None:
+        progress = scrape["progress"]
+        out["progress"] = {"pages_scanned": int(progress.get("pages_scanned") or 0),
+                           "max_pages": progress.get("max_pages")}
+    if job["finished_at"] is not None:
+        out["status_code"] = job["status_code"]
+        out["result"] = job["result"]
+        out["expires_at"] = job["expires_at"]
+    return out
+
+
+@app.post("/api/cma/jobs")
+def create_cma_job() -> Any:
+    """Queue a CMA and return at once (202); poll GET /api/cma/jobs/<job_id> for progress and the result."""
+    if not request.is_json:
+        return jsonify({"error": "Invalid content type"}), 400
+
+    body = request.get_json(silent=True) or {}
+    params, error = parse_cma_request(body)
+    if error:
+        return jsonify({"error": error}), 400
+
+    queue = get_cma_job_queue()
+    try:
+        request_body = {key: body[key] for key in CMA_REQUEST_FIELDS if key in body}
+        job = queue.enqueue({**params, "request": request_body}, job_id=body.get("job_id"))
+    except QueueFull:
+        return cma_busy_response("Job queue is full, please try again later")
+    workers = get_cma_job_workers()
+    workers.notify()
+    response = jsonify(cma_job_response(job))
+    response.headers["Location"] = f"/api/cma/jobs/{job['job_id']}"
+    return response, 202
+
+
+@app.get("/api/cma/jobs/<job_id>")
+def get_cma_job(job_id: str) -> Any:
+    job = get_cma_job_queue().get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    # Jobs queued by another worker still need threads here if this is the only live one
+    get_cma_job_workers()
+    out = cma_job_response(job)
+    if job["finished_at"] is None:
+        return jsonify(out)
+    # A finished job no longer changes: polls revalidate with If-None-Match
+    if isinstance(out["result"], dict):
+        out["result"] = shape_payload(out["result"], response_format())
+    return conditional_json(out)
+
+
+@app.post("/api/cma/jobs/<job_id>/cancel")
+def cancel_cma_job(job_id: str) -> Any:
+    """Cancel a queued job, or stop a running one at its next page fetch.
+
+    In remote mode a running job's scrape is already with the scraper pool,
+    which has no way to stop it; that gets a 409 and the job runs to the end.
+    """
+    queue = get_cma_job_queue()
+    if SCRAPER_MODE == 'remote':
+        job = queue.get(job_id)
+        if job is not None and job["state"] == JOB_RUNNING:
+            return jsonify({**cma_job_response(job), "error": "Running jobs cannot be cancelled in remote mode"}), 409
+    job = queue.request_cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    return jsonify(cma_job_response(job))
+
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=int(os.getenv("PORT", "8000")), debug=False)
@@ -0,0 +1,116 @@
+"""
+CSV vs Parquet export: bytes on disk and time to answer a two-column query.
+
+Builds `runs` scrape runs of `rows` listings each from synthetic detail pages
+(bench/fixtures), writes them the way scraper() does (full / info / amenities
+CSVs plus debug_features.csv per run) and as the partitioned Parquet dataset
+(src/scraper/columnar.py), then loads price by city from each. Run from
+backend/:
+
+    python -m bench.dataset_bench --runs 30 --rows 100
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+import pandas as pd
+from bs4 import BeautifulSoup as bs
+
+from bench.fixtures import detail_page_html
+from src.scraper.columnar import load_listings, write_parquet
+from src.scraper.scraper import build_staging_df, parse_detail_page
+
+PROVINCES = ['metro-manila', 'cavite', 'laguna', 'rizal', 'bulacan', 'cebu']
+
+
+def _dir_bytes(root: str) -> int:
+    return sum(os.path.getsize(p) for p in glob.glob(os.path.join(root, '**', '*'), recursive=True) if os.path.isfile(p))
+
+
+def _templates(n: int) -> List[Dict[str, Any]]:
+    out = []
+    for i in range(n):
+        sku = f'tpl-001-{i:02d}'
+        row = {'SKU': sku}
+        row.update(parse_detail_page(bs(detail_page_html(sku), 'html.parser')))
+        out.append(row)
+    return out
+
+
+def _write_csvs(root: str, staging_df: pd.DataFrame, data: List[Dict[str, Any]], listing_df: pd.DataFrame, name: str) -> None:
+    # Same files as write_outputs() + write_debug_features(), one set per run
+    info_cols = [c for c in ['SKU', 'Name', 'Location', 'City/Town', 'TCP', 'Floor_Area'] if c in staging_df.columns]
+    amen_cols = [c for c in ['SKU', 'Name', 'Bedrooms', 'Baths', 'Club House', 'Gym', 'Swimming Pool', 'Security',
+                             'CCTV', 'Reception Area', 'Parking Area', 'Source'] if c in staging_df.columns]
+    for sub in ('full', 'info', 'amenities', 'debug'):
+        os.makedirs(os.path.join(root, sub), exist_ok=True)
+    staging_df.to_csv(os.path.join(root, 'full', f'{name}.csv'), index=False)
+    staging_df[info_cols].to_csv(os.path.join(root, 'info', f'{name}_info.csv'), index=False)
+    staging_df[amen_cols].to_csv(os.path.join(root, 'amenities', f'{name}_amenities.csv'), index=False)
+    debug_df = pd.DataFrame(data)[['SKU', 'text_location', 'features']].merge(listing_df, on='SKU', how='left')
+    debug_df.to_csv(os.path.join(root, 'debug', f'{name}_debug_features.csv'), index=False)
+
+
+def run(runs: int, rows: int, seed: int = 7) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    templates = _templates(min(rows, 40))
+    workdir = tempfile.mkdtemp(prefix='kairos-dataset-bench-')
+    csv_root, parquet_root = os.path.join(workdir, 'csv'), os.path.join(workdir, 'parquet')
+    start_day = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    for run_index in range(runs):
+        province = PROVINCES[run_index % len(PROVINCES)]
+        data = []
+        for i in range(rows):
+            row = dict(rng.choice(templates))
+            row['SKU'] = f'{province}-{run_index:03d}-{i:03d}'
+            row['price'] = round(row['price'] * rng.uniform(0.7, 1.4), -3)
+            data.append(row)
+        listing_df = pd.DataFrame([[r['SKU'], f'https://www.lamudi.com.ph/property/{r["SKU"]}/'] for r in data],
+                                  columns=['SKU', 'link'])
+        staging_df = build_staging_df(data, listing_df, province)
+        _write_csvs(csv_root, staging_df, data, listing_df, f'{province}_condo_{run_index:03d}')
+        write_parquet(staging_df, province, 'condo', data=data, root=parquet_root,
+                      scraped_at=start_day + timedelta(days=run_index))
+
+    # Query: median price per city over everything scraped
+    started = time.perf_counter()
+    frames = [pd.read_csv(p) for p in sorted(glob.glob(os.path.join(csv_root, 'full', '*.csv')))]
+    csv_frame = pd.concat(frames, ignore_index=True)
+    csv_answer = csv_frame.groupby('City/Town')['TCP'].median()
+    csv_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    parquet_frame = load_listings(columns=['city', 'price'], root=parquet_root)
+    parquet_answer = parquet_frame.groupby('city')['price'].median()
+    parquet_ms = (time.perf_counter() - started) * 1000
+
+    csv_bytes, parquet_bytes = _dir_bytes(csv_root), _dir_bytes(parquet_root)
+    return {
+        'runs': runs,
+        'rows_per_run': rows,
+        'csv': {'bytes': csv_bytes, 'query_ms': round(csv_ms, 1)},
+        'parquet': {'bytes': parquet_bytes, 'query_ms': round(parquet_ms, 1)},
+        'size_ratio': round(csv_bytes / parquet_bytes, 1) if parquet_bytes else None,
+        'load_speedup': round(csv_ms / parquet_ms, 1) if parquet_ms else None,
+        'same_answer': bool(((csv_answer - parquet_answer).abs() < 1).all()),
+        'workdir': workdir,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='CSV vs Parquet scrape export')
+    parser.add_argument('--runs', type=int, default=30)
+    parser.add_argument('--rows', type=int, default=100)
+    args = parser.parse_args()
+    print(json.dumps(run(args.runs, args.rows), indent=2))
+
+
+if __name__ == '__main__':
+    main()
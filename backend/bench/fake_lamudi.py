@@ -0,0 +1,194 @@
+"""
+Local stand-in for lamudi.com.ph for end-to-end and load testing.
+
+Serves listing pages (/buy/<province>/<type>/?page=N) and detail pages
+(/property/<sku>/) from bench/fixtures (recorded) or the synthetic generator,
+with configurable pagination, latency, error/429 rates and security
+challenge pages. Point the backend at it with LAMUDI_BASE_URL:
+
+    cd backend
+    python -m bench.fake_lamudi --port 8900 --pages 8 --latency lognormal:250:0.6 --challenge-rate 0.02
+    LAMUDI_BASE_URL=http://127.0.0.1:8900 python app.py
+
+GET /__stats returns per-kind request counts.
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+from bench.fixtures import CHALLENGE_PAGE, detail_page_html, listing_page_html, load_recorded_pages
+
+_LIST_RE = re.compile(r'^/buy/([^/]+)/([^/]+)/?$')
+_DETAIL_RE = re.compile(r'^/property/([^/?#]+)/?$')
+
+
+def parse_latency(spec: str):
+    """
+    Latency distribution in ms -> sampler returning seconds.
+
+    fixed:<ms> | uniform:<lo>:<hi> | lognormal:<median>:<sigma>
+    """
+    parts = (spec or 'fixed:0').split(':')
+    kind, args = parts[0], [float(x) for x in parts[1:]]
+    if kind == 'fixed':
+        return lambda rng: args[0] / 1000.0
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(args[0], args[1]) / 1000.0
+    if kind == 'lognormal':
+        mu = math.log(max(args[0], 0.001))
+        return lambda rng: rng.lognormvariate(mu, args[1]) / 1000.0
+    raise ValueError(f'Unknown latency distribution: {spec}')
+
+
+class FakeLamudiConfig:
+    def __init__(self, pages: int = 5, per_page: int = 30, latency: str = 'fixed:0', error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, challenge_rate: float = 0.0, seed: int = 0) -> None:
+        self.pages = int(pages)
+        self.per_page = int(per_page)
+        self.latency = latency
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = float(error_rate)
+        self.rate_limit_rate = float(rate_limit_rate)
+        self.challenge_rate = float(challenge_rate)
+        self.seed = int(seed)
+
+
+class FakeLamudiServer:
+    def __init__(self, config: Optional[FakeLamudiConfig] = None, host: str = '127.0.0.1', port: int = 0) -> None:
+        self.config = config or FakeLamudiConfig()
+        self._rng = random.Random(self.config.seed)
+        self._rng_lock = threading.Lock()
+        self._stats: Dict[str, int] = {}
+        self._stats_lock = threading.Lock()
+        self._recorded_list = load_recorded_pages('list')
+        self._recorded_detail = load_recorded_pages('detail')
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'FakeLamudiServer':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='fake-lamudi', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self._stats[key] = self._stats.get(key, 0) + 1
+
+    def _roll(self) -> Dict[str, Any]:
+        with self._rng_lock:
+            return {
+                'delay': self.config.sample_latency(self._rng),
+                'outcome': self._rng.random(),
+            }
+
+    def respond(self, path: str, query: Dict[str, Any]):
+        """(status, body, content_type) for one request."""
+        if path == '/__stats':
+            return 200, json.dumps(self.stats()), 'application/json'
+        roll = self._roll()
+        if roll['delay'] > 0:
+            time.sleep(roll['delay'])
+        cfg = self.config
+        outcome = roll['outcome']
+        if outcome < cfg.error_rate:
+            self._count('error')
+            return 503, '<html><body>Service Unavailable</body></html>', 'text/html'
+        outcome -= cfg.error_rate
+        if outcome < cfg.rate_limit_rate:
+            self._count('rate_limited')
+            return 429, '<html><body>Too Many Requests</body></html>', 'text/html'
+        outcome -= cfg.rate_limit_rate
+        if outcome < cfg.challenge_rate:
+            self._count('challenge')
+            return 200, CHALLENGE_PAGE, 'text/html'
+
+        m = _LIST_RE.match(path)
+        if m:
+            self._count('list')
+            page = int((query.get('page') or ['1'])[0] or 1)
+            if page > cfg.pages:
+                return 200, listing_page_html(m.group(1), m.group(2), page, per_page=0, max_page=cfg.pages), 'text/html'
+            if self._recorded_list:
+                return 200, self._recorded_list[(page - 1) % len(self._recorded_list)], 'text/html'
+            return 200, listing_page_html(m.group(1), m.group(2), page, per_page=cfg.per_page,
+                                          max_page=cfg.pages, seed=cfg.seed), 'text/html'
+        m = _DETAIL_RE.match(path)
+        if m:
+            self._count('detail')
+            if self._recorded_detail:
+                return 200, self._recorded_detail[zlib.crc32(m.group(1).encode()) % len(self._recorded_detail)], 'text/html'
+            return 200, detail_page_html(m.group(1), seed=cfg.seed), 'text/html'
+        self._count('not_found')
+        return 404, '<html><body>Not Found</body></html>', 'text/html'
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                status, body, content_type = server.respond(parsed.path, parse_qs(parsed.query))
+                payload = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Local Lamudi stand-in server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--pages', type=int, default=5, help='data-pagination-end of every listing')
+    parser.add_argument('--per-page', type=int, default=30)
+    parser.add_argument('--latency', default='fixed:0', help='fixed:<ms> | uniform:<lo>:<hi> | lognormal:<median>:<sigma>')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of 503 responses')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='fraction of 429 responses')
+    parser.add_argument('--challenge-rate', type=float, default=0.0, help='fraction of security challenge pages')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    config = FakeLamudiConfig(args.pages, args.per_page, args.latency, args.error_rate,
+                              args.rate_limit_rate, args.challenge_rate, args.seed)
+    server = FakeLamudiServer(config, host=args.host, port=args.port)
+    print(f'Fake Lamudi serving on {server.base_url} (pages={args.pages}, latency={args.latency})')
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
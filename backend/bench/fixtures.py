@@ -0,0 +1,181 @@
+"""
+Lamudi page corpus for offline benchmarks and the local stand-in server.
+
+Recorded pages (saved browser/curl output) are picked up from
+bench/fixtures/list/*.html and bench/fixtures/detail/*.html when present.
+Otherwise deterministic synthetic pages are generated with the same markup
+the scraper's selectors target (ListingCell rows, Pagination data attribute,
+prices-and-fees / details-item-value / LandmarksPDP blocks), padded with
+navigation/script filler to roughly the size of real pages.
+"""
+import glob
+import html
+import os
+import random
+from typing import Any, Dict, List, Optional
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+NEIGHBORHOODS = [
+    ('Bonifacio Global City', 'Taguig'), ('Salcedo Village', 'Makati'), ('Legazpi Village', 'Makati'),
+    ('Ortigas Center', 'Pasig'), ('Eastwood City', 'Quezon City'), ('Rockwell Center', 'Makati'),
+    ('Kapitolyo', 'Pasig'), ('Malate', 'Manila'), ('Ermita', 'Manila'), ('Alabang', 'Muntinlupa'),
+    ('Greenhills', 'San Juan'), ('Cubao', 'Quezon City'), ('Mandaluyong Central', 'Mandaluyong'),
+]
+BUILDINGS = ['The Rise', 'Avida Towers', 'SMDC Air', 'Uptown Parksuites', 'Grand Hyatt Residences',
+             'One Shangri-La Place', 'Park Triangle', 'Verve Residences', 'Trion Towers', 'Solstice']
+AMENITIES = ['pool', 'fitness_center', 'local_parking', 'security', 'elevator', 'balcony', 'wifi', 'spa']
+
+CHALLENGE_PAGE = (
+    '<html><head><title>Just a moment...</title></head><body>'
+    '<h1>Security verification</h1><p>Please solve this math problem to continue: 3 + 4 = ?</p>'
+    '</body></html>'
+)
+
+
+def _filler(rng: random.Random, blocks: int) -> str:
+    """Nav/footer/script noise so parse cost resembles a real ~150-300KB page."""
+    parts = ['<header class="Header"><nav>']
+    for i in range(blocks):
+        parts.append(f'<ul class="Nav-list-{i}">' + ''.join(
+            f'<li class="Nav-item"><a href="/buy/area-{i}-{j}/">Area {i}-{j}</a></li>' for j in range(8)) + '</ul>')
+    parts.append('</nav></header>')
+    parts.append('<script type="application/json">{"tracking":"' + 'x' * (blocks * 40) + '"}</script>')
+    parts.append(f'<footer class="Footer"><p>Seed {rng.random():.6f}</p></footer>')
+    return ''.join(parts)
+
+
+def listing_sku(province: str, page: int, index: int) -> str:
+    return f'{province}-{page:03d}-{index:02d}'
+
+
+def listing_page_html(province: str, property_type: str = 'condominium', page: int = 1,
+                      per_page: int = 30, max_page: int = 10, seed: int = 0, filler_blocks: int = 60) -> str:
+    """One listing page: `per_page` ListingCell rows plus the pagination container."""
+    rng = random.Random(f'{seed}:{province}:{property_type}:{page}')
+    rows = []
+    for i in range(per_page):
+        sku = listing_sku(province, page, i)
+        neighborhood, city = rng.choice(NEIGHBORHOODS)
+        price = rng.randrange(2_500_000, 45_000_000, 10_000)
+        bedrooms = rng.choice([0, 1, 1, 2, 2, 3])
+        area = rng.randrange(22, 180)
+        lat, lon = 14.4 + rng.random() * 0.3, 120.95 + rng.random() * 0.15
+        title = f'{rng.choice(BUILDINGS)} {"Studio" if bedrooms == 0 else f"{bedrooms}BR"} Unit'
+        rows.append(
+            '<div class="ListingCell-MainImage">'
+            f'<div data-sku="{sku}"><img src="/img/{sku}.jpg" alt=""></div></div>'
+            '<div class="row ListingCell-row ListingCell-agent-redesign">'
+            f'<div class="ListingCell-AllInfo" data-sku="{sku}" data-price="{price}" data-bedrooms="{bedrooms}" '
+            f'data-bathrooms="{max(1, bedrooms)}" data-building_size="{area}" data-geo-point="[{lon:.5f}, {lat:.5f}]">'
+            f'<a href="/property/{sku}/">{html.escape(title)}</a>'
+            f'<span class="ListingCell-KeyInfo-address-text">{neighborhood}, {city}</span>'
+            f'<span class="PriceSection-FirstPrice">₱ {price:,}</span>'
+            f'<span>{"Studio" if bedrooms == 0 else f"{bedrooms} Bedrooms"}</span><span>{area} m²</span>'
+            '</div></div>'
+        )
+    pagination = (f'<div class="BaseSection Pagination" data-pagination-end="{max_page}">' + ''.join(
+        f'<a href="?page={n}">{n}</a>' for n in range(1, min(max_page, 5) + 1)) + '</div>')
+    return ('<html><head><title>Lamudi</title></head><body>' + _filler(rng, filler_blocks)
+            + '<main>' + ''.join(rows) + pagination + '</main></body></html>')
+
+
+def detail_page_html(sku: str, seed: int = 0, filler_blocks: int = 80) -> str:
+    """One detail page with the blocks parse_detail_page() reads."""
+    rng = random.Random(f'{seed}:{sku}')
+    neighborhood, city = rng.choice(NEIGHBORHOODS)
+    price = rng.randrange(2_500_000, 45_000_000, 10_000)
+    bedrooms = rng.choice([1, 1, 2, 2, 3])
+    area = rng.randrange(22, 180)
+    lat, lon = 14.4 + rng.random() * 0.3, 120.95 + rng.random() * 0.15
+    features = [('Bedrooms', bedrooms), ('Baths', max(1, bedrooms - 1)), ('Floor area (m²)', area),
+                ('Building name', rng.choice(BUILDINGS)), ('Furnished', rng.choice(['Yes', 'No', 'Semi']))]
+    amenities = rng.sample(AMENITIES, rng.randrange(2, len(AMENITIES)))
+    return (
+        '<html><head><title>Lamudi</title></head><body>' + _filler(rng, filler_blocks)
+        + f'<div class="Title-pdp-price">₱ {price:,}</div>'
+        + f'<div class="prices-and-fees__price">₱ {price:,}</div>'
+        + f'<div class="view-map__text">{neighborhood}, {city}, Metro Manila</div>'
+        + ''.join(f'<div class="details-item-value">\n{label}\n{value}\n</div>' for label, value in features)
+        + ''.join(f'<span class="material-icons material-icons-outlined">{a}</span>' for a in amenities)
+        + f'<div class="LandmarksPDP-Wrapper" data-lat="{lat:.6f}" data-lon="{lon:.6f}"></div>'
+        + f'<div class="AgentInfoV2-agent-name">Agent {rng.randrange(1000)}</div>'
+        + f'<div class="AgentInfoV2-agent-agency">Agency {rng.randrange(100)}</div>'
+        + f'<div class="ViewMore-text-description">Well kept unit in {neighborhood} near malls and offices.</div>'
+        + '</body></html>'
+    )
+
+
+def load_recorded_pages(kind: str) -> List[str]:
+    """Recorded pages of one kind ('list' or 'detail'); empty when none are saved."""
+    pages = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, kind, '*.html'))):
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            pages.append(f.read())
+    return pages
+
+
+def list_corpus(n: int = 10, seed: int = 0) -> List[str]:
+    return load_recorded_pages('list') or [
+        listing_page_html('metro-manila', page=p, seed=seed) for p in range(1, n + 1)]
+
+
+def detail_corpus(n: int = 50, seed: int = 0) -> List[str]:
+    return load_recorded_pages('detail') or [
+        detail_page_html(listing_sku('metro-manila', 1 + i // 30, i % 30), seed=seed) for i in range(n)]
+
+
+def synthetic_properties(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Normalized property dicts (adapter output shape) for analytics benchmarks."""
+    rng = random.Random(seed)
+    props = []
+    for i in range(n):
+        neighborhood, city = rng.choice(NEIGHBORHOODS)
+        props.append({
+            'source': 'lamudi',
+            'property_id': f'P{i}',
+            'address': f'{neighborhood}, {city}',
+            'neighborhood': neighborhood,
+            'price': float(rng.randrange(2_500_000, 45_000_000, 10_000)),
+            'bedrooms': rng.choice([0, 1, 2, 3]),
+            'bathrooms': rng.choice([1, 2]),
+            'sqm': float(rng.randrange(22, 180)),
+            'property_type': 'condominium',
+            'coordinates': [14.4 + rng.random() * 0.3, 120.95 + rng.random() * 0.15],
+            'url': f'https://www.lamudi.com.ph/property/P{i}/',
+        })
+    return props
+
+
+def synthetic_addresses(n: int, base: Optional[List[Dict[str, Any]]] = None, seed: int = 0) -> Dict[str, Any]:
+    """Address database of size n: the real entries first, then synthetic barangays."""
+    rng = random.Random(seed)
+    addresses = list(base or [])[:n]
+    levels = ['high', 'medium', 'low']
+    i = 0
+    while len(addresses) < n:
+        neighborhood, city = rng.choice(NEIGHBORHOODS)
+        addresses.append({
+            'full_address': f'Barangay {i}, {neighborhood}, {city}, Metro Manila',
+            'psgc_city_code': f'1376{i % 100000:05d}',
+            'psgc_province_code': '1376',
+            'coordinates': [14.4 + rng.random() * 0.3, 120.95 + rng.random() * 0.15],
+            'search_radius_km': 2,
+            'confidence_level': levels[i % 3],
+        })
+        i += 1
+    return {'addresses': addresses}
+
+
+__all__ = [
+    'CHALLENGE_PAGE',
+    'FIXTURES_DIR',
+    'listing_sku',
+    'listing_page_html',
+    'detail_page_html',
+    'load_recorded_pages',
+    'list_corpus',
+    'detail_corpus',
+    'synthetic_properties',
+    'synthetic_addresses',
+]
@@ -0,0 +1,100 @@
+"""
+Cold-start import report for the backend.
+
+Runs `python -X importtime` on a fresh interpreter importing app.py, then a
+second fresh interpreter that times import + first /health and address
+search requests and lists which heavy modules ended up loaded. Run from
+backend/:
+
+    python -m bench.import_report            # table
+    python -m bench.import_report --json     # machine-readable
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('pandas', 'numpy', 'bs4', 'requests', 'supabase', 'tqdm')
+
+_IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$')
+
+_COLD_START_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+client.get('/health')
+health = time.perf_counter()
+client.get('/api/addresses/search', query_string={'q': 'makati'})
+search = time.perf_counter()
+print(json.dumps({
+    'import_ms': round((imported - start) * 1000, 1),
+    'first_health_ms': round((health - start) * 1000, 1),
+    'first_search_ms': round((search - start) * 1000, 1),
+    'heavy_loaded': sorted(m for m in %r if m in sys.modules),
+}))
+"""
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """Top-level imports (depth 0 below `app`'s own line) with cumulative microseconds."""
+    rows = []
+    for line in stderr.splitlines():
+        m = _IMPORTTIME_RE.match(line)
+        if not m:
+            continue
+        self_us, cumulative_us, indent, name = int(m.group(1)), int(m.group(2)), len(m.group(3)), m.group(4)
+        rows.append({'module': name, 'self_us': self_us, 'cumulative_us': cumulative_us, 'depth': (indent - 1) // 2})
+    return rows
+
+
+def import_breakdown(top: int = 15) -> Dict[str, Any]:
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                          cwd=BACKEND_DIR, capture_output=True, text=True)
+    rows = parse_importtime(proc.stderr)
+    app_row = next((r for r in rows if r['module'] == 'app'), None)
+    app_depth = app_row['depth'] if app_row else 0
+    direct = [r for r in rows if r['depth'] == app_depth + 1]
+    direct.sort(key=lambda r: r['cumulative_us'], reverse=True)
+    return {
+        'app_cumulative_ms': round(app_row['cumulative_us'] / 1000, 1) if app_row else None,
+        'top_imports': [{'module': r['module'], 'cumulative_ms': round(r['cumulative_us'] / 1000, 1)} for r in direct[:top]],
+    }
+
+
+def cold_start() -> Dict[str, Any]:
+    proc = subprocess.run([sys.executable, '-c', _COLD_START_PROBE % (HEAVY_MODULES,)],
+                          cwd=BACKEND_DIR, capture_output=True, text=True)
+    lines = [line for line in proc.stdout.splitlines() if line.startswith('{')]
+    if not lines:
+        raise RuntimeError(f'cold start probe failed: {proc.stderr[-2000:]}')
+    return json.loads(lines[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Backend cold-start import report')
+    parser.add_argument('--json', action='store_true')
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    report = {'cold_start': cold_start(), **import_breakdown(args.top)}
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    cs = report['cold_start']
+    print(f"import app:            {cs['import_ms']:>8.1f} ms")
+    print(f"first /health:         {cs['first_health_ms']:>8.1f} ms")
+    print(f"first address search:  {cs['first_search_ms']:>8.1f} ms")
+    print(f"heavy modules loaded:  {', '.join(cs['heavy_loaded']) or 'none'}")
+    print(f"\nSlowest direct imports of app (-X importtime, cumulative):")
+    for row in report['top_imports']:
+        print(f"  {row['module']:<40} {row['cumulative_ms']:>8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
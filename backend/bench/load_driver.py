@@ -0,0 +1,141 @@
+"""
+Concurrent load driver for a running backend.
+
+Fires CMA and address-search requests from separate worker pools for a fixed
+duration and reports per-endpoint throughput, status counts and
+p50/p95/p99 latency. Pair with bench/fake_lamudi.py to avoid touching the
+real site:
+
+    python -m bench.load_driver --target http://127.0.0.1:8000 --duration 60 \\
+        --cma-workers 2 --search-workers 8 --provinces 1376,3400,4000
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+SEARCH_QUERIES = ['makati', 'bgc', 'taguig', 'quezon', 'pasig', 'cebu', 'davao', 'manila', 'ortigas', 'alabang']
+
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list (q in 0..100)."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(-(-q * len(sorted_values) // 100)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class EndpointStats:
+    def __init__(self) -> None:
+        self.latencies_ms: List[float] = []
+        self.statuses: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, latency_ms: float, status: Any) -> None:
+        with self._lock:
+            self.latencies_ms.append(latency_ms)
+            self.statuses[str(status)] += 1
+
+    def summary(self, elapsed_sec: float) -> Dict[str, Any]:
+        with self._lock:
+            values = sorted(self.latencies_ms)
+            statuses = dict(self.statuses)
+        return {
+            'requests': len(values),
+            'throughput_rps': round(len(values) / elapsed_sec, 2) if elapsed_sec > 0 else 0.0,
+            'statuses': statuses,
+            'p50_ms': _round(percentile(values, 50)),
+            'p95_ms': _round(percentile(values, 95)),
+            'p99_ms': _round(percentile(values, 99)),
+            'max_ms': _round(values[-1] if values else None),
+        }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 1) if value is not None else None
+
+
+def _worker(stop_at: float, stats: EndpointStats, send: Callable[[requests.Session], Any]) -> None:
+    session = requests.Session()
+    while time.time() < stop_at:
+        start = time.perf_counter()
+        try:
+            status = send(session).status_code
+        except requests.RequestException as e:
+            status = type(e).__name__
+        stats.record((time.perf_counter() - start) * 1000, status)
+
+
+def run_load(target: str, duration: float, cma_workers: int, search_workers: int,
+             provinces: List[str], property_type: str = 'condo', count: int = 20,
+             timeout: float = 600) -> Dict[str, Any]:
+    target = target.rstrip('/')
+    stats = {'cma': EndpointStats(), 'search': EndpointStats()}
+    province_cycle = itertools.cycle(provinces)
+    query_cycle = itertools.cycle(SEARCH_QUERIES)
+    cycle_lock = threading.Lock()
+
+    def send_cma(session: requests.Session) -> requests.Response:
+        with cycle_lock:
+            province = next(province_cycle)
+        body = {'psgc_province_code': province, 'property_type': property_type, 'count': count}
+        return session.post(f'{target}/api/cma', json=body, timeout=timeout)
+
+    def send_search(session: requests.Session) -> requests.Response:
+        with cycle_lock:
+            query = next(query_cycle)
+        return session.get(f'{target}/api/addresses/search', params={'q': query, 'limit': 5}, timeout=30)
+
+    start = time.time()
+    stop_at = start + duration
+    # Per endpoint: time its last worker finished (a long CMA must not dilute search throughput)
+    finished = {name: start for name in stats}
+
+    def _timed(name: str, send: Callable[[requests.Session], Any]) -> None:
+        _worker(stop_at, stats[name], send)
+        with cycle_lock:
+            finished[name] = max(finished[name], time.time())
+
+    with ThreadPoolExecutor(max_workers=max(1, cma_workers + search_workers)) as pool:
+        futures = [pool.submit(_timed, 'cma', send_cma) for _ in range(cma_workers)]
+        futures += [pool.submit(_timed, 'search', send_search) for _ in range(search_workers)]
+        for future in futures:
+            future.result()
+    elapsed = time.time() - start
+    return {
+        'target': target,
+        'duration_sec': round(elapsed, 1),
+        'workers': {'cma': cma_workers, 'search': search_workers},
+        'endpoints': {name: s.summary(finished[name] - start) for name, s in stats.items()},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Concurrent CMA/address-search load driver')
+    parser.add_argument('--target', default='http://127.0.0.1:8000')
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--cma-workers', type=int, default=2)
+    parser.add_argument('--search-workers', type=int, default=8)
+    parser.add_argument('--provinces', default='1376', help='comma-separated PSGC province codes')
+    parser.add_argument('--property-type', default='condo')
+    parser.add_argument('--count', type=int, default=20)
+    parser.add_argument('--output', default='', help='write the report as JSON')
+    args = parser.parse_args()
+
+    report = run_load(args.target, args.duration, args.cma_workers, args.search_workers,
+                      [p.strip() for p in args.provinces.split(',') if p.strip()],
+                      property_type=args.property_type, count=args.count)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+/api/cma response size and serialization time, before and after.
+
+Builds a 100-listing CMA payload from the synthetic detail pages
+(bench/fixtures) through the real adapter and build_cma_payload(), then
+encodes it the old way (Flask's stdlib-json jsonify, one object per listing,
+uncompressed) and the new ways (orjson, format=columnar, gzip/brotli). Run
+from backend/:
+
+    python -m bench.response_bench --listings 100 --repeat 200
+"""
+import argparse
+import gzip
+import json
+import statistics
+import time
+from typing import Any, Callable, Dict
+
+import pandas as pd
+from bs4 import BeautifulSoup as bs
+from flask.json.provider import DefaultJSONProvider
+
+import app as backend_app
+import response_encoding
+from bench.fixtures import detail_page_html
+from src.adapters.lamudi_adapter import _normalize_row
+from src.scraper.scraper import build_staging_df, parse_detail_page
+
+
+def _payload(listings: int) -> Dict[str, Any]:
+    data = []
+    for i in range(listings):
+        sku = f'metro-manila-001-{i:03d}'
+        row = {'SKU': sku}
+        row.update(parse_detail_page(bs(detail_page_html(sku), 'html.parser')))
+        data.append(row)
+    listing_df = pd.DataFrame([[r['SKU'], f'https://www.lamudi.com.ph/property/{r["SKU"]}/'] for r in data],
+                              columns=['SKU', 'link'])
+    staging_df = build_staging_df(data, listing_df, 'metro-manila')
+    properties = [_normalize_row(row, 'condo') for _, row in staging_df.iterrows()]
+    stats = backend_app.compute_price_stats([p['price'] for p in properties])
+    return backend_app.build_cma_payload(properties, stats, 'full')
+
+
+def _median_ms(fn: Callable[[], Any], repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(times), 3)
+
+
+def run(listings: int, repeat: int) -> Dict[str, Any]:
+    payload = _payload(listings)
+    columnar_payload = backend_app.shape_payload(payload, 'columnar')
+    legacy = DefaultJSONProvider(backend_app.app)
+    legacy.default = staticmethod(lambda o: o.to_dict() if hasattr(o, 'to_dict') else DefaultJSONProvider.default(o))
+    fast = backend_app.app.json
+
+    def stdlib(obj: Any) -> bytes:
+        return legacy.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+    out: Dict[str, Any] = {'listings': listings, 'orjson': response_encoding.orjson is not None}
+    variants = {
+        'before_stdlib_records': (lambda: stdlib(payload)),
+        'orjson_records': (lambda: fast.dumps_bytes(payload)),
+        'orjson_columnar': (lambda: fast.dumps_bytes(columnar_payload)),
+    }
+    for name, encode in variants.items():
+        body = encode()
+        entry = {'bytes': len(body), 'serialize_ms': _median_ms(encode, repeat),
+                 'gzip_bytes': len(gzip.compress(body, compresslevel=response_encoding.GZIP_LEVEL)),
+                 'gzip_ms': _median_ms(lambda: gzip.compress(body, compresslevel=response_encoding.GZIP_LEVEL),
+                                       max(1, repeat // 4))}
+        brotli = response_encoding._load_brotli()
+        if brotli is not None:
+            entry['br_bytes'] = len(brotli.compress(body, quality=response_encoding.BROTLI_QUALITY))
+        out[name] = entry
+    before = out['before_stdlib_records']
+    out['speedup_serialize'] = round(before['serialize_ms'] / out['orjson_records']['serialize_ms'], 1)
+    out['wire_ratio_gzip_columnar'] = round(before['bytes'] / out['orjson_columnar']['gzip_bytes'], 1)
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='/api/cma response encoding')
+    parser.add_argument('--listings', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(run(args.listings, args.repeat), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+"""
+Offline benchmarks for the scraper, adapter and API hot paths.
+
+No network: pages come from bench/fixtures (recorded) or the synthetic
+generator in bench/fixtures.py. Run from backend/:
+
+    python -m bench.run_benchmarks                      # run and print
+    python -m bench.run_benchmarks --save-baseline      # write bench/baseline.json
+    python -m bench.run_benchmarks --compare            # exit 1 on regressions vs baseline
+    python -m bench.run_benchmarks --quick --only parse # subset, skip 100k-row cases
+
+Each case reports the median of --repeat runs; a case regresses when its
+median is more than --threshold (default 25%) slower than the baseline.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+from bs4 import BeautifulSoup as bs
+
+from bench.fixtures import detail_corpus, list_corpus, synthetic_addresses, synthetic_properties
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+
+# name -> (setup() -> (ops, run()), quick)
+Case = Tuple[Callable[[], Tuple[int, Callable[[], Any]]], bool]
+
+
+def measure(run: Callable[[], Any], ops: int, repeat: int) -> Dict[str, Any]:
+    run()  # warm-up (imports, caches, lazy regex compilation)
+    samples = []
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - start)
+    median = statistics.median(samples)
+    return {
+        'median_ms': round(median * 1000, 3),
+        'min_ms': round(min(samples) * 1000, 3),
+        'ops': ops,
+        'per_op_us': round(median * 1e6 / max(1, ops), 2),
+        'ops_per_sec': round(ops / median, 1) if median > 0 else None,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Cases
+# ---------------------------------------------------------------------------
+def _parse_list_pages():
+    pages = list_corpus()
+    return len(pages), lambda: [bs(p, 'html.parser') for p in pages]
+
+
+def _extract_list_candidates():
+    from src.scraper.scraper import detect_max_page, extract_list_candidates
+    soups = [bs(p, 'html.parser') for p in list_corpus()]
+    return len(soups), lambda: [(extract_list_candidates(s), detect_max_page(s)) for s in soups]
+
+
+def _extract_listing_cards():
+    from src.scraper.card_scraper import extract_listing_cards
+    soups = [bs(p, 'html.parser') for p in list_corpus()]
+    return len(soups), lambda: [extract_listing_cards(s) for s in soups]
+
+
+def _parse_detail_pages():
+    pages = detail_corpus()
+    return len(pages), lambda: [bs(p, 'html.parser') for p in pages]
+
+
+def _extract_detail_fields():
+    from src.scraper.scraper import parse_detail_page
+    soups = [bs(p, 'html.parser') for p in detail_corpus()]
+    return len(soups), lambda: [parse_detail_page(s) for s in soups]
+
+
+def _staging_df(rows: int) -> pd.DataFrame:
+    from src.scraper.scraper import build_staging_df, parse_detail_page
+    details = [parse_detail_page(bs(p, 'html.parser')) for p in detail_corpus()]
+    data = []
+    for i in range(rows):
+        row = dict(details[i % len(details)])
+        row['SKU'] = f'SKU-{i}'
+        data.append(row)
+    listing_df = pd.DataFrame([[d['SKU'], f'https://example.test/property/{d["SKU"]}/'] for d in data], columns=['SKU', 'link'])
+    with contextlib.redirect_stdout(io.StringIO()):
+        return build_staging_df(data, listing_df, 'metro-manila')
+
+
+def _build_staging_df():
+    from src.scraper.scraper import build_staging_df, parse_detail_page
+    details = [parse_detail_page(bs(p, 'html.parser')) for p in detail_corpus()]
+    data = [dict(d, SKU=f'SKU-{i}') for i, d in enumerate(details * 20)]
+    listing_df = pd.DataFrame([[d['SKU'], 'https://example.test/'] for d in data], columns=['SKU', 'link'])
+    return len(data), lambda: build_staging_df([dict(d) for d in data], listing_df, 'metro-manila')
+
+
+def _normalize(rows: int):
+    def setup():
+        import src.adapters.lamudi_adapter as adapter
+        staging = _staging_df(rows)
+
+        def run():
+            original = adapter.lamudi_scraper, adapter.sharding_enabled
+            adapter.lamudi_scraper = lambda *a, **k: staging.copy()
+            adapter.sharding_enabled = lambda: False
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    adapter.scrape_and_normalize('metro-manila', 'condominium', rows)
+            finally:
+                adapter.lamudi_scraper, adapter.sharding_enabled = original
+        return rows, run
+    return setup
+
+
+def _analyze_neighborhoods(rows: int):
+    def setup():
+        import app as backend_app
+        props = synthetic_properties(rows)
+        return rows, lambda: backend_app.analyze_neighborhoods(props)
+    return setup
+
+
+def _search_addresses(size: int):
+    queries = ['makati', 'bgc', 'barangay 12', 'quezon city', 'zzz-no-match', 'pasig', 'metro manila', 'cebu']
+
+    def setup():
+        import app as backend_app
+        from address_index import AddressDatabase
+        database = AddressDatabase(backend_app.ADDRESS_DB_PATH, poll_interval=0)
+        database.install(synthetic_addresses(size, base=list(backend_app._address_db.index.addresses)))
+        client = backend_app.app.test_client()
+
+        def run():
+            original = backend_app._address_db, backend_app.check_rate_limit
+            backend_app._address_db = database
+            backend_app.check_rate_limit = lambda ip, *a, **k: True
+            try:
+                for q in queries:
+                    database.clear_cache()
+                    client.get('/api/addresses/search', query_string={'q': q, 'limit': 5})
+            finally:
+                backend_app._address_db, backend_app.check_rate_limit = original
+        return len(queries), run
+    return setup
+
+
+CASES: Dict[str, Case] = {
+    'parse_list_page': (_parse_list_pages, True),
+    'extract_list_candidates': (_extract_list_candidates, True),
+    'extract_listing_cards': (_extract_listing_cards, True),
+    'parse_detail_page_html': (_parse_detail_pages, True),
+    'extract_detail_fields': (_extract_detail_fields, True),
+    'build_staging_df_1k': (_build_staging_df, True),
+    'normalize_1k_rows': (_normalize(1000), True),
+    'analyze_neighborhoods_100': (_analyze_neighborhoods(100), True),
+    'analyze_neighborhoods_10k': (_analyze_neighborhoods(10_000), True),
+    'analyze_neighborhoods_100k': (_analyze_neighborhoods(100_000), False),
+    'search_addresses_60': (_search_addresses(60), True),
+    'search_addresses_10k': (_search_addresses(10_000), True),
+    'search_addresses_100k': (_search_addresses(100_000), False),
+}
+
+
+# ---------------------------------------------------------------------------
+# Baseline handling
+# ---------------------------------------------------------------------------
+def run_cases(names: List[str], repeat: int) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    for name in names:
+        setup, _ = CASES[name]
+        ops, run = setup()
+        results[name] = measure(run, ops, repeat)
+        print(f"{name:<28} {results[name]['median_ms']:>10.2f} ms  {results[name]['per_op_us']:>12.2f} us/op")
+    return results
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """Cases whose median is more than `threshold` (fraction) slower than baseline."""
+    regressions = []
+    for name, current in results.items():
+        previous = (baseline.get('results') or {}).get(name)
+        if not previous or not previous.get('median_ms'):
+            continue
+        ratio = current['median_ms'] / previous['median_ms']
+        if ratio > 1 + threshold:
+            regressions.append({
+                'case': name,
+                'baseline_ms': previous['median_ms'],
+                'current_ms': current['median_ms'],
+                'slowdown': round(ratio, 2),
+            })
+    return regressions
+
+
+def environment() -> Dict[str, Any]:
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'pandas': pd.__version__,
+        'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Offline Kairos benchmarks')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--quick', action='store_true', help='skip the 100k-row cases')
+    parser.add_argument('--only', default='', help='run cases whose name contains this substring')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--compare', action='store_true')
+    parser.add_argument('--threshold', type=float, default=0.25)
+    parser.add_argument('--output', default='', help='also write this run as JSON')
+    args = parser.parse_args(argv)
+
+    names = [n for n, (_, quick) in CASES.items() if (quick or not args.quick) and args.only in n]
+    results = run_cases(names, args.repeat)
+    report = {'environment': environment(), 'results': results}
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'Baseline saved to {args.baseline}')
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print(f'No baseline at {args.baseline}; run with --save-baseline first')
+            return 2
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for r in regressions:
+            print(f"REGRESSION {r['case']}: {r['baseline_ms']} ms -> {r['current_ms']} ms ({r['slowdown']}x)")
+        if regressions:
+            return 1
+        print(f'No regressions over {int(args.threshold * 100)}% against {args.baseline}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+Address-search throughput under concurrent CMA load, end to end.
+
+Starts bench/fake_lamudi.py and the backend under gunicorn (with
+gunicorn.conf.py), then runs bench/load_driver.py twice: search-only to get
+a baseline, then with CMA workers scraping. The report compares search
+throughput and tail latency in both runs. Run from backend/:
+
+    python -m bench.serving_bench --duration 20 --cma-workers 2
+    python -m bench.serving_bench --worker-class sync --threads 1   # old serving mode
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Dict, Optional
+
+import requests
+
+from bench.fake_lamudi import FakeLamudiConfig, FakeLamudiServer
+from bench.load_driver import run_load
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_backend(lamudi_url: str, env_overrides: Optional[Dict[str, str]] = None,
+                  port: Optional[int] = None, ready_timeout: float = 30) -> (subprocess.Popen, str):
+    port = port or _free_port()
+    env = {
+        **os.environ,
+        'PORT': str(port),
+        'LAMUDI_BASE_URL': lamudi_url,
+        'PYTHONUNBUFFERED': '1',
+        **(env_overrides or {}),
+    }
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}', 'app:app'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    target = f'http://127.0.0.1:{port}'
+    deadline = time.time() + ready_timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f'{target}/health', timeout=1).status_code == 200:
+                return proc, target
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError('backend did not become healthy')
+
+
+def run(duration: float, cma_workers: int, search_workers: int, worker_class: str, threads: int,
+        latency: str, pages: int, count: int, provinces: str = '1376') -> Dict[str, Any]:
+    fake = FakeLamudiServer(FakeLamudiConfig(pages=pages, latency=latency)).start()
+    proc, target = start_backend(fake.base_url, {
+        'GUNICORN_WORKER_CLASS': worker_class,
+        'GUNICORN_THREADS': str(threads),
+        'SCRAPER_TIMEOUT_SEC': str(int(max(60, duration * 2))),
+        # One client IP drives all search traffic
+        'ADDRESS_SEARCH_RATE_LIMIT': '100000000',
+    })
+    try:
+        province_list = [p.strip() for p in provinces.split(',') if p.strip()]
+        baseline = run_load(target, duration, 0, search_workers, province_list, count=count)
+        loaded = run_load(target, duration, cma_workers, search_workers, province_list, count=count)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        fake.stop()
+    base_search = baseline['endpoints']['search']
+    load_search = loaded['endpoints']['search']
+    return {
+        'serving': {'worker_class': worker_class, 'threads': threads},
+        'search_only': base_search,
+        'under_cma_load': {'search': load_search, 'cma': loaded['endpoints']['cma']},
+        'search_throughput_ratio': (round(load_search['throughput_rps'] / base_search['throughput_rps'], 3)
+                                    if base_search['throughput_rps'] else None),
+        'lamudi_requests': fake.stats(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Address search throughput under concurrent CMA load')
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--cma-workers', type=int, default=2)
+    parser.add_argument('--search-workers', type=int, default=4)
+    parser.add_argument('--worker-class', default='gthread')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--latency', default='lognormal:150:0.4', help='fake Lamudi latency distribution')
+    parser.add_argument('--pages', type=int, default=3)
+    parser.add_argument('--count', type=int, default=20)
+    parser.add_argument('--provinces', default='1376')
+    parser.add_argument('--output', default='', help='write the report as JSON')
+    args = parser.parse_args()
+
+    report = run(args.duration, args.cma_workers, args.search_workers, args.worker_class, args.threads,
+                 args.latency, args.pages, args.count, args.provinces)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,363 @@
+"""
+Queued CMA jobs.
+
+POST /api/cma/jobs stores the parsed request here and returns immediately.
+Each gunicorn worker runs a fixed pool of job threads (CmaJobWorkers) that
+claim queued jobs oldest-first, run them and keep the result for
+`result_ttl` seconds. The queue lives in the scrape-coordination SQLite
+file, so any worker can enqueue, report on, cancel or run any job.
+
+Cancelling a queued job takes effect at once. A running job is flagged and
+its scrape stops at the next page fetch (see src.scraper.cancellation).
+Jobs left "running" by a process that died are put back in the queue up to
+`max_attempts` times, then failed.
+"""
+import json
+import math
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from scrape_coordinator import JOB_DONE, JOB_FAILED, JOB_RUNNING, _pid_alive
+from src.adapters.records import json_default
+
+JOB_QUEUED = "queued"
+JOB_CANCELLED = "cancelled"
+
+# Used for wait estimates until a job has completed on this box
+DEFAULT_JOB_SECONDS = 60.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cma_job_queue (
+    job_id TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    params TEXT NOT NULL,
+    result TEXT,
+    status_code INTEGER,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    expires_at REAL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    host TEXT,
+    pid INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_cma_job_queue_state_created ON cma_job_queue(state, created_at);
+"""
+
+_COLUMNS = ("job_id, state, params, result, status_code, created_at, started_at, finished_at, "
+            "expires_at, cancel_requested, attempts")
+
+
+class QueueFull(RuntimeError):
+    """The queue already holds max_queued waiting jobs."""
+
+
+class CmaJobQueue:
+    """SQLite-backed FIFO of CMA requests and their retained results."""
+
+    def __init__(self, path: str, result_ttl: float = 3600.0, max_queued: int = 100,
+                 max_attempts: int = 2, stale_after: float = 900.0) -> None:
+        self.path = path
+        self.result_ttl = float(result_ttl)
+        self.max_queued = max(1, int(max_queued))
+        self.max_attempts = max(1, int(max_attempts))
+        self.stale_after = float(stale_after)
+        self.host = socket.gethostname()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+    def enqueue(self, params: Dict[str, Any], job_id: Optional[str] = None) -> Dict[str, Any]:
+        """Queue a job; raises QueueFull when max_queued jobs are already waiting."""
+        job_id = str(job_id or uuid.uuid4().hex)[:64]
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            self._expire(conn, now)
+            depth = conn.execute("SELECT COUNT(*) FROM cma_job_queue WHERE state = ?", (JOB_QUEUED,)).fetchone()[0]
+            if depth >= self.max_queued:
+                conn.execute("ROLLBACK")
+                raise QueueFull(f"{depth} jobs already queued")
+            existing = conn.execute("SELECT state FROM cma_job_queue WHERE job_id = ?", (job_id,)).fetchone()
+            if existing is None:
+                conn.execute(
+                    "INSERT INTO cma_job_queue (job_id, state, params, created_at) VALUES (?, ?, ?, ?)",
+                    (job_id, JOB_QUEUED, json.dumps(params, default=str), now),
+                )
+            conn.execute("COMMIT")
+        except QueueFull:
+            raise
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        # Re-posting a known job_id returns that job rather than running it twice
+        return self.get(job_id)
+
+    def request_cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancel a queued job outright, or flag a running one so its scrape stops."""
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE cma_job_queue SET state = ?, cancel_requested = 1, finished_at = ?, expires_at = ? "
+                "WHERE job_id = ? AND state = ?",
+                (JOB_CANCELLED, now, now + self.result_ttl, job_id, JOB_QUEUED),
+            )
+            conn.execute(
+                "UPDATE cma_job_queue SET cancel_requested = 1 WHERE job_id = ? AND state = ?",
+                (job_id, JOB_RUNNING),
+            )
+        return self.get(job_id)
+
+    # ------------------------------------------------------------------
+    # Worker side
+    # ------------------------------------------------------------------
+    def claim_next(self) -> Optional[Dict[str, Any]]:
+        """Mark the oldest queued job running for this process and return it."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            self._expire(conn, now)
+            self._requeue_abandoned(conn, now)
+            row = conn.execute(
+                "SELECT job_id FROM cma_job_queue WHERE state = ? ORDER BY created_at LIMIT 1", (JOB_QUEUED,)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE cma_job_queue SET state = ?, started_at = ?, attempts = attempts + 1, host = ?, pid = ? "
+                "WHERE job_id = ?",
+                (JOB_RUNNING, now, self.host, os.getpid(), row[0]),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return self.get(row[0])
+
+    def unclaim(self, job_id: str) -> None:
+        """Put a claimed job back at its place in the queue (e.g. no scrape slot was free)."""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE cma_job_queue SET state = ?, started_at = NULL, attempts = attempts - 1, host = NULL, pid = NULL "
+                "WHERE job_id = ? AND state = ?",
+                (JOB_QUEUED, job_id, JOB_RUNNING),
+            )
+
+    def complete(self, job_id: str, state: str, result: Optional[Dict[str, Any]] = None,
+                 status_code: Optional[int] = None) -> None:
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE cma_job_queue SET state = ?, result = ?, status_code = ?, finished_at = ?, expires_at = ? "
+                "WHERE job_id = ?",
+                (state, json.dumps(result, default=json_default) if result is not None else None, status_code,
+                 now, now + self.result_ttl, job_id),
+            )
+
+    def cancel_requested(self, job_id: str) -> bool:
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT cancel_requested FROM cma_job_queue WHERE job_id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def _requeue_abandoned(self, conn: sqlite3.Connection, now: float) -> None:
+        """Running jobs whose process died here, or that overran stale_after anywhere."""
+        abandoned: List[Tuple[str, int]] = []
+        for job_id, host, pid, started_at, attempts in conn.execute(
+                "SELECT job_id, host, pid, started_at, attempts FROM cma_job_queue WHERE state = ?",
+                (JOB_RUNNING,)).fetchall():
+            if (host == self.host and pid and not _pid_alive(pid)) or (started_at or now) < now - self.stale_after:
+                abandoned.append((job_id, attempts))
+        for job_id, attempts in abandoned:
+            if attempts < self.max_attempts:
+                conn.execute(
+                    "UPDATE cma_job_queue SET state = ?, started_at = NULL, host = NULL, pid = NULL WHERE job_id = ?",
+                    (JOB_QUEUED, job_id),
+                )
+            else:
+                conn.execute(
+                    "UPDATE cma_job_queue SET state = ?, result = ?, status_code = 500, finished_at = ?, expires_at = ? "
+                    "WHERE job_id = ?",
+                    (JOB_FAILED, json.dumps({"error": "Job was abandoned by its worker"}), now,
+                     now + self.result_ttl, job_id),
+                )
+
+    def _expire(self, conn: sqlite3.Connection, now: float) -> int:
+        return conn.execute(
+            "DELETE FROM cma_job_queue WHERE expires_at IS NOT NULL AND expires_at < ?", (now,)
+        ).rowcount
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with closing(self._connect()) as conn:
+            row = conn.execute(f"SELECT {_COLUMNS} FROM cma_job_queue WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None or (row[8] is not None and row[8] < time.time()):
+            return None
+        return _job_dict(row)
+
+    def depth(self) -> int:
+        with closing(self._connect()) as conn:
+            return int(conn.execute("SELECT COUNT(*) FROM cma_job_queue WHERE state = ?", (JOB_QUEUED,)).fetchone()[0])
+
+    def position(self, job_id: str) -> Optional[int]:
+        """1-based place of a queued job in the queue; None once it has left it."""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT state, created_at FROM cma_job_queue WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None or row[0] != JOB_QUEUED:
+                return None
+            return 1 + int(conn.execute(
+                "SELECT COUNT(*) FROM cma_job_queue WHERE state = ? AND created_at < ?", (JOB_QUEUED, row[1])
+            ).fetchone()[0])
+
+    def average_duration(self, sample: int = 20) -> float:
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT finished_at - started_at FROM cma_job_queue WHERE state = ? AND started_at IS NOT NULL "
+                "ORDER BY finished_at DESC LIMIT ?", (JOB_DONE, sample)
+            ).fetchall()
+        durations = [r[0] for r in rows if r[0] is not None and r[0] >= 0]
+        return sum(durations) / len(durations) if durations else DEFAULT_JOB_SECONDS
+
+    def estimated_wait(self, slots: int, in_use: int, position: Optional[int] = None) -> float:
+        """Seconds until a job at `position` (default: the back of the queue) gets one of `slots`
+        scrape slots, `in_use` of which are taken now."""
+        slots = max(1, int(slots))
+        if position is None:
+            position = self.depth() + 1
+        ahead = int(in_use) + position - 1
+        rounds = math.ceil(max(0, ahead - slots + 1) / slots)
+        return round(rounds * self.average_duration(), 1)
+
+
+class CmaJobWorkers:
+    """Fixed pool of threads draining a CmaJobQueue in this process.
+
+    `run(job)` executes one claimed job and returns (payload, status_code),
+    or None when it could not start (no scrape slot) and the job should go
+    back to the queue. It raises ScrapeCancelled when the job was cancelled.
+    `has_capacity()` is checked before claiming so jobs are not taken off the
+    queue only to be put back while every slot is busy.
+    """
+
+    def __init__(self, queue: CmaJobQueue, run: Callable[[Dict[str, Any]], Optional[Tuple[Dict[str, Any], int]]],
+                 workers: int = 3, poll_interval: float = 1.0,
+                 has_capacity: Optional[Callable[[], bool]] = None) -> None:
+        self.queue = queue
+        self.run = run
+        self.has_capacity = has_capacity
+        self.workers = max(1, int(workers))
+        self.poll_interval = max(0.05, float(poll_interval))
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    def start(self) -> "CmaJobWorkers":
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._loop, name=f"cma-job-{len(self._threads)}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        return self
+
+    def notify(self) -> None:
+        """Wake idle workers in this process (new job queued or slot freed)."""
+        self._wake.set()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                ran = self.work_once()
+            except Exception as e:
+                print({"level": "error", "event": "cma_job_worker_failed", "error": str(e)})
+                ran = False
+            if not ran:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def work_once(self) -> bool:
+        """Claim and run one job; False when there was nothing this worker could start."""
+        from src.scraper.cancellation import ScrapeCancelled
+
+        if self.has_capacity is not None and not self.has_capacity():
+            return False
+        job = self.queue.claim_next()
+        if job is None:
+            return False
+        job_id = job["job_id"]
+        try:
+            outcome = self.run(job)
+        except ScrapeCancelled:
+            self.queue.complete(job_id, JOB_CANCELLED, {"error": "Job cancelled"}, 499)
+            self.notify()
+            return True
+        except Exception as e:
+            print({"level": "error", "event": "cma_job_failed", "job_id": job_id, "error": str(e)})
+            self.queue.complete(job_id, JOB_FAILED, {"error": "Server error"}, 500)
+            self.notify()
+            return True
+        if outcome is None:
+            self.queue.unclaim(job_id)
+            return False
+        payload, status = outcome
+        self.queue.complete(job_id, JOB_DONE if status == 200 else JOB_FAILED, payload, status)
+        self.notify()
+        return True
+
+
+def _job_dict(row: Any) -> Dict[str, Any]:
+    (job_id, state, params, result, status_code, created_at, started_at, finished_at,
+     expires_at, cancel_requested, attempts) = row
+    return {
+        "job_id": job_id,
+        "state": state,
+        "params": json.loads(params or "{}"),
+        "result": json.loads(result) if result else None,
+        "status_code": status_code,
+        "created_at": created_at,
+        "started_at": started_at,
+        "finished_at": finished_at,
+        "expires_at": expires_at,
+        "cancel_requested": bool(cancel_requested),
+        "attempts": attempts,
+    }
+
+
+__all__ = [
+    "JOB_QUEUED",
+    "JOB_CANCELLED",
+    "QueueFull",
+    "CmaJobQueue",
+    "CmaJobWorkers",
+]
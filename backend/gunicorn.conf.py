@@ -0,0 +1,46 @@
+"""
+Gunicorn settings for the backend.
+
+    gunicorn -c backend/gunicorn.conf.py backend.app:app
+
+preload_app imports app.py once in the master before forking, so the address
+database and every imported module live in pages shared copy-on-write by all
+workers instead of being loaded again per worker. gc.freeze() after loading
+keeps the collector from touching (and so copying) those shared objects.
+
+The scraping stack (pandas, bs4, numpy) is imported lazily on the first
+scrape. With several workers, GUNICORN_PRELOAD_SCRAPER=1 imports it in the
+master as well so workers share it; on a single small instance leave it off
+to keep cold starts short.
+
+Workers are gthread by default: a CMA holds one thread for the whole scrape,
+and at most SCRAPE_SLOTS (3) of them do, so the remaining GUNICORN_THREADS
+keep /health and address search answering. The gthread worker also
+heartbeats from its main loop, so a long scrape no longer trips `timeout`
+the way it kills a sync worker. CMA_SCRAPE_ISOLATION=process additionally
+moves the in-process scrape into a process pool (see scrape_runner.py).
+Compare modes with `python -m bench.serving_bench`.
+"""
+import gc
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+PRELOAD_SCRAPER = os.getenv("GUNICORN_PRELOAD_SCRAPER", "0") == "1"
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    if PRELOAD_SCRAPER:
+        import src.adapters.lamudi_adapter  # noqa: F401  (pulls pandas, bs4, numpy)
+        server.log.info("Preloaded scraping stack into the master")
+    gc.collect()
+    gc.freeze()
+    server.log.info(f"Frozen {gc.get_freeze_count()} objects for copy-on-write sharing")
+
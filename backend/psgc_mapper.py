@@ -1,48 +1,96 @@
 """
-PSGC → Lamudi province mapper (minimal v1)
-- Whitelist only. Reject unknowns explicitly.
-- Keep mapping small and maintainable for demo; expand over time.
+PSGC → Lamudi province mapper
+- Backed by the bundled PSGC hierarchy (src/geo/psgc_index.py): every region,
+  province, city/municipality and barangay, in old (9-digit), new (10-digit)
+  or short province ("1376", "0722") form.
+- Any level maps to the Lamudi slug of its province; NCR is "metro-manila".
+- province_code() gives one canonical key per province, whatever was sent.
+- Unknown codes and places without a Lamudi province return None.
 """
-from typing import Dict, Optional
-
-# Expanded whitelist: NCR + major provinces nationwide
-_PSGC_TO_LAMUDI: Dict[str, str] = {
-    # NCR and nearby provinces (original codes)
-    "1376": "metro-manila",  # NCR - Metro Manila
-    "3400": "cavite",        # Cavite (original code)
-    "4000": "laguna",        # Laguna (original code)
-    
-    # Additional major provinces (using original format)
-    "0722": "cebu",          # Cebu
-    "0630": "iloilo",        # Iloilo
-    "0645": "negros-occidental",  # Negros Occidental
-    "0973": "zamboanga-del-sur",  # Zamboanga del Sur
-    "1043": "misamis-oriental",   # Misamis Oriental
-    "1124": "davao-del-sur",      # Davao del Sur
-    "1411": "benguet",       # Benguet (Baguio)
-    "0458": "rizal",         # Rizal
+from typing import Any, Dict, Optional
+
+from src.geo.psgc_index import default_index
+
+# Codes the frontend sent before it used PSGC codes for these provinces
+_LEGACY_CODES: Dict[str, str] = {
+    "3400": "042100000",  # Cavite
+    "4000": "043400000",  # Laguna
 }
 
 
+def _find(psgc_code: str) -> Optional[int]:
+    code = (psgc_code or "").strip()
+    if not code or len(code) > 10:
+        return None
+    return default_index().find(_LEGACY_CODES.get(code, code))
+
+
 def to_lamudi_province(psgc_province_code: str) -> Optional[str]:
     """Return Lamudi province slug or None if unmapped/unknown.
 
-    - Accepts string PSGC code (e.g., "1376").
+    - Accepts a PSGC code at any level (e.g., "1376", "137602000", "1380300000").
     - Returns province slug expected by the Lamudi scraper (e.g., "metro-manila").
     - Unknown codes return None; caller should handle with a sanitized 400.
     """
-    code = (psgc_province_code or "").strip()
-    if not code or len(code) > 8:
+    row = _find(psgc_province_code)
+    return default_index().lamudi_slug(row) if row is not None else None
+
+
+def province_code(psgc_code: str) -> Optional[str]:
+    """10-digit code of the Lamudi province a code lies in (NCR's region code for Metro Manila).
+
+    Every format and level of one province gives the same code, so it is the
+    key for anything stored per province.
+    """
+    row = _find(psgc_code)
+    if row is None:
         return None
-    return _PSGC_TO_LAMUDI.get(code)
+    index = default_index()
+    province = index.province_of(row)
+    if province is None or not index.lamudi_slug(row):
+        return None
+    return index.code(province)
+
+
+def resolve_scope(psgc_code: str) -> Optional[Dict[str, Any]]:
+    """Where a code points: its unit, Lamudi province, and city when it is a city or inside one.
+
+    None when the code is unknown or has no Lamudi province.
+    """
+    row = _find(psgc_code)
+    if row is None:
+        return None
+    index = default_index()
+    province = index.lamudi_slug(row)
+    if not province:
+        return None
+    unit = index.unit(row)
+    city = index.city_of(row)
+    return {
+        "code": unit.code,
+        "old_code": unit.old_code,
+        "level": unit.level,
+        "name": unit.name,
+        "province": province,
+        "city": index.name(city) if city is not None else None,
+        "city_code": index.code(city) if city is not None else None,
+    }
 
 
 def is_supported(psgc_province_code: str) -> bool:
-    """True if the PSGC code is in the whitelist."""
+    """True if the PSGC code resolves to a Lamudi province."""
     return to_lamudi_province(psgc_province_code) is not None
 
 
+def is_supported_slug(province_slug: str) -> bool:
+    """True if the Lamudi province slug belongs to a PSGC province."""
+    return default_index().slug_row(province_slug) is not None
+
+
 __all__ = [
     "to_lamudi_province",
+    "province_code",
+    "resolve_scope",
     "is_supported",
+    "is_supported_slug",
 ]
@@ -0,0 +1,152 @@
+"""
+How API responses are encoded on the wire.
+
+- RecordJSONProvider: jsonify() through orjson when it is installed (stdlib
+  json otherwise), with Property records encoded as their API dicts. Keys
+  stay sorted either way; orjson writes non-ASCII text as UTF-8, not escaped.
+- compress_response(): gzip, or brotli when the brotli package is installed,
+  for JSON bodies of at least JSON_COMPRESS_MIN_BYTES, negotiated from
+  Accept-Encoding.
+- etag_for() / etag_matches(): strong ETags over a serialized body and If-None-Match
+  checks. A compressed body gets the ETag plus a "-gzip"/"-br" suffix (it is a
+  different representation), and either form matches the payload's ETag.
+"""
+import gzip
+import hashlib
+import os
+from typing import Any, Optional
+
+from flask import Request, Response
+from flask.json.provider import DefaultJSONProvider
+
+from src.adapters.records import Property
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+# Smaller bodies are not worth the CPU or the extra header bytes
+JSON_COMPRESS_MIN_BYTES = int(os.getenv("JSON_COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("JSON_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("JSON_BROTLI_QUALITY", "5"))
+
+_ENCODING_SUFFIX = {"gzip": "-gzip", "br": "-br"}
+
+_brotli: Any = None
+_brotli_checked = False
+
+
+def _load_brotli() -> Any:
+    global _brotli, _brotli_checked
+    if not _brotli_checked:
+        _brotli_checked = True
+        try:
+            import brotli
+            _brotli = brotli
+        except ImportError:
+            _brotli = None
+    return _brotli
+
+
+def _default(o: Any) -> Any:
+    if isinstance(o, Property):
+        return o.to_dict()
+    # numpy scalars and other float/int subclasses orjson does not take as-is
+    if isinstance(o, float):
+        return float(o)
+    if isinstance(o, int):
+        return int(o)
+    return DefaultJSONProvider.default(o)
+
+
+class RecordJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider: orjson when available, Property records as dicts."""
+
+    default = staticmethod(_default)
+
+    def _orjson_options(self) -> int:
+        # Datetimes go through Flask's default hook so they keep its HTTP-date format
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SERIALIZE_NUMPY
+        return options | orjson.OPT_SORT_KEYS if self.sort_keys else options
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if orjson is not None and kwargs.keys() <= {"separators"}:
+            return orjson.dumps(obj, default=_default, option=self._orjson_options()).decode("utf-8")
+        return super().dumps(obj, **kwargs)
+
+    def dumps_bytes(self, obj: Any) -> bytes:
+        """Compact JSON as bytes (what response bodies and ETags are made of)."""
+        if orjson is not None:
+            return orjson.dumps(obj, default=_default, option=self._orjson_options())
+        return super().dumps(obj, separators=(",", ":")).encode("utf-8")
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        if orjson is None or self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b"\n", mimetype=self.mimetype)
+
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match (weak comparison, as RFC 9110 asks) against `etag`, ignoring our encoding suffixes."""
+    if not if_none_match:
+        return False
+    wanted = etag.strip('"')
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        candidate = candidate.strip('"')
+        for suffix in _ENCODING_SUFFIX.values():
+            if candidate.endswith(suffix):
+                candidate = candidate[:-len(suffix)]
+                break
+        if candidate == wanted:
+            return True
+    return False
+
+
+def _negotiate(request: Request) -> Optional[str]:
+    offered = ["br", "gzip"] if _load_brotli() is not None else ["gzip"]
+    return request.accept_encodings.best_match(offered)
+
+
+def compress_response(request: Request, response: Response) -> Response:
+    """Compress a JSON response in place when the client accepts it and it is large enough."""
+    if (response.direct_passthrough or response.is_streamed or response.mimetype != "application/json"
+            or "Content-Encoding" in response.headers or response.status_code < 200
+            or response.status_code in (204, 304)):
+        return response
+    response.vary.add("Accept-Encoding")
+    body = response.get_data()
+    if len(body) < JSON_COMPRESS_MIN_BYTES:
+        return response
+    encoding = _negotiate(request)
+    if encoding == "br":
+        compressed = _brotli.compress(body, quality=BROTLI_QUALITY)
+    elif encoding == "gzip":
+        compressed = gzip.compress(body, compresslevel=GZIP_LEVEL)
+    else:
+        return response
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    etag = response.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        response.headers["ETag"] = etag[:-1] + _ENCODING_SUFFIX[encoding] + '"'
+    return response
+
+
+__all__ = [
+    "JSON_COMPRESS_MIN_BYTES",
+    "RecordJSONProvider",
+    "etag_for",
+    "etag_matches",
+    "compress_response",
+]
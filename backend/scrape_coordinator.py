@@ -0,0 +1,296 @@
+"""
+Cross-process scrape coordination for gunicorn workers.
+
+Scrape slots and per-job progress live in one SQLite file shared by every
+worker on the box, so SCRAPE_SLOTS is a global limit (not per worker) and
+/api/cma/status or /api/cma/batch/<id>/status can be answered by any worker.
+
+Each process heartbeats the slots it holds. A slot whose owner process is
+gone (same host, pid no longer alive) or whose heartbeat is older than
+`lease_seconds` is reclaimed on the next acquire, and its job is marked
+"lost", so a crashed or killed worker cannot leak capacity.
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Any, Dict, List, Optional
+
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_LOST = "lost"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scrape_slots (
+    job_id TEXT PRIMARY KEY,
+    host TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    acquired_at REAL NOT NULL,
+    heartbeat_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scrape_jobs (
+    job_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    state TEXT NOT NULL,
+    host TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    started_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    finished_at REAL,
+    progress TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS idx_scrape_jobs_kind_started ON scrape_jobs(kind, started_at);
+"""
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ScrapeCoordinator:
+    """SQLite-backed global scrape slots plus shared job progress."""
+
+    def __init__(self, path: str, slots: int = 3, lease_seconds: float = 60.0,
+                 heartbeat_interval: float = 10.0, keep_jobs: int = 200) -> None:
+        self.path = path
+        self.slots = max(1, int(slots))
+        self.lease_seconds = float(lease_seconds)
+        self.heartbeat_interval = max(0.5, float(heartbeat_interval))
+        self.keep_jobs = max(10, int(keep_jobs))
+        self.host = socket.gethostname()
+
+        self._held: Dict[str, float] = {}
+        self._held_lock = threading.Lock()
+        self._heartbeat_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # ------------------------------------------------------------------
+    # Slots
+    # ------------------------------------------------------------------
+    def acquire(self, job_id: str, kind: str = "cma", progress: Optional[Dict[str, Any]] = None) -> bool:
+        """Take a global scrape slot for job_id and open its job record.
+
+        False when all slots are busy, or when job_id already holds a slot (a
+        client reusing a job_id must not get a second slot or take over the first).
+        """
+        now = time.time()
+        pid = os.getpid()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            self._reap(conn, now)
+            in_use = conn.execute("SELECT COUNT(*) FROM scrape_slots").fetchone()[0]
+            if in_use >= self.slots:
+                conn.execute("ROLLBACK")
+                return False
+            try:
+                conn.execute(
+                    "INSERT INTO scrape_slots (job_id, host, pid, acquired_at, heartbeat_at) VALUES (?, ?, ?, ?, ?)",
+                    (job_id, self.host, pid, now, now),
+                )
+            except sqlite3.IntegrityError:
+                conn.execute("ROLLBACK")
+                return False
+            self._insert_job(conn, job_id, kind, progress, now)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        with self._held_lock:
+            self._held[job_id] = now
+            self._ensure_heartbeat()
+        return True
+
+    def release(self, job_id: str, state: str = JOB_DONE) -> None:
+        """Free the slot (if held) and close the job record; its progress stays readable."""
+        with self._held_lock:
+            self._held.pop(job_id, None)
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM scrape_slots WHERE job_id = ?", (job_id,))
+        self.finish_job(job_id, state)
+
+    def in_use(self) -> int:
+        now = time.time()
+        with closing(self._connect()) as conn:
+            return int(conn.execute(
+                "SELECT COUNT(*) FROM scrape_slots WHERE heartbeat_at >= ?", (now - self.lease_seconds,)
+            ).fetchone()[0])
+
+    def _reap(self, conn: sqlite3.Connection, now: float) -> int:
+        """Drop slots whose owner died or stopped heartbeating; mark their jobs lost."""
+        stale: List[str] = []
+        for job_id, host, pid, heartbeat_at in conn.execute(
+                "SELECT job_id, host, pid, heartbeat_at FROM scrape_slots").fetchall():
+            if heartbeat_at < now - self.lease_seconds or (host == self.host and not _pid_alive(pid)):
+                stale.append(job_id)
+        for job_id in stale:
+            conn.execute("DELETE FROM scrape_slots WHERE job_id = ?", (job_id,))
+            conn.execute(
+                "UPDATE scrape_jobs SET state = ?, updated_at = ?, finished_at = ? WHERE job_id = ? AND state = ?",
+                (JOB_LOST, now, now, job_id, JOB_RUNNING),
+            )
+        return len(stale)
+
+    def reap(self) -> int:
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            reaped = self._reap(conn, time.time())
+            conn.execute("COMMIT")
+            return reaped
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        conn.execute(
+            "DELETE FROM scrape_jobs WHERE state != ? AND job_id NOT IN "
+            "(SELECT job_id FROM scrape_jobs ORDER BY started_at DESC LIMIT ?)",
+            (JOB_RUNNING, self.keep_jobs),
+        )
+
+    # ------------------------------------------------------------------
+    # Heartbeat
+    # ------------------------------------------------------------------
+    def heartbeat(self) -> None:
+        with self._held_lock:
+            held = list(self._held)
+        if not held:
+            return
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.executemany("UPDATE scrape_slots SET heartbeat_at = ? WHERE job_id = ?", [(now, j) for j in held])
+
+    def _ensure_heartbeat(self) -> None:
+        # Called under _held_lock
+        if self._heartbeat_thread is not None and self._heartbeat_thread.is_alive():
+            return
+        self._heartbeat_thread = threading.Thread(target=self._run_heartbeat, name="scrape-heartbeat", daemon=True)
+        self._heartbeat_thread.start()
+
+    def _run_heartbeat(self) -> None:
+        while not self._stop.wait(self.heartbeat_interval):
+            try:
+                self.heartbeat()
+            except Exception as e:
+                print({"level": "warn", "event": "scrape_heartbeat_failed", "error": str(e)})
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    # ------------------------------------------------------------------
+    # Job progress
+    # ------------------------------------------------------------------
+    def _insert_job(self, conn: sqlite3.Connection, job_id: str, kind: str,
+                    progress: Optional[Dict[str, Any]], now: float) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO scrape_jobs (job_id, kind, state, host, pid, started_at, updated_at, progress) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, kind, JOB_RUNNING, self.host, os.getpid(), now, now, json.dumps(progress or {}, default=str)),
+        )
+
+    def open_job(self, job_id: str, kind: str = "cma", progress: Optional[Dict[str, Any]] = None) -> None:
+        """Job record without a scrape slot (e.g. a batch served entirely from cache)."""
+        with closing(self._connect()) as conn:
+            self._insert_job(conn, job_id, kind, progress, time.time())
+
+    def finish_job(self, job_id: str, state: str = JOB_DONE) -> None:
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE scrape_jobs SET state = ?, updated_at = ?, finished_at = ? WHERE job_id = ? AND state = ?",
+                (state, now, now, job_id, JOB_RUNNING),
+            )
+            self._prune(conn)
+
+    def update_progress(self, job_id: str, increments: Optional[Dict[str, int]] = None, **fields: Any) -> None:
+        """Merge fields into the job's progress; `increments` adds to numeric fields atomically."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT progress FROM scrape_jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                conn.execute("ROLLBACK")
+                return
+            progress = json.loads(row[0] or "{}")
+            progress.update(fields)
+            for key, n in (increments or {}).items():
+                progress[key] = int(progress.get(key) or 0) + int(n)
+            conn.execute(
+                "UPDATE scrape_jobs SET progress = ?, updated_at = ? WHERE job_id = ?",
+                (json.dumps(progress, default=str), time.time(), job_id),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT job_id, kind, state, host, pid, started_at, updated_at, finished_at, progress "
+                "FROM scrape_jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return _job_dict(row) if row else None
+
+    def latest_job(self, kind: str = "cma") -> Optional[Dict[str, Any]]:
+        """The running job of `kind` started most recently, else the most recent one."""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT job_id, kind, state, host, pid, started_at, updated_at, finished_at, progress "
+                "FROM scrape_jobs WHERE kind = ? ORDER BY state = ? DESC, started_at DESC LIMIT 1",
+                (kind, JOB_RUNNING),
+            ).fetchone()
+        return _job_dict(row) if row else None
+
+
+def _job_dict(row: Any) -> Dict[str, Any]:
+    job_id, kind, state, host, pid, started_at, updated_at, finished_at, progress = row
+    return {
+        "job_id": job_id,
+        "kind": kind,
+        "state": state,
+        "host": host,
+        "pid": pid,
+        "started_at": started_at,
+        "updated_at": updated_at,
+        "finished_at": finished_at,
+        "progress": json.loads(progress or "{}"),
+    }
+
+
+__all__ = [
+    "JOB_RUNNING",
+    "JOB_DONE",
+    "JOB_FAILED",
+    "JOB_LOST",
+    "ScrapeCoordinator",
+]
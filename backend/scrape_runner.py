@@ -0,0 +1,146 @@
+"""
+Where in-process CMA scrapes run.
+
+CMA_SCRAPE_ISOLATION=process hands the scrape (every enabled listing source,
+src/adapters/registry.py) to a spawn-based
+process pool sized to the scrape slots, so HTML parsing and normalization
+never hold the gunicorn worker's GIL while /health and address search wait
+for it. The default, thread, scrapes on the calling request thread (spans and
+metrics are then recorded in this process; in process mode they stay in the
+child).
+
+Batch scrapes share one FetchPool across items and always run in-process.
+
+The request Deadline bound by the caller is handed to the child as a budget
+in process mode, and the child's early stops and per-source report are
+copied back.
+
+Each isolated scrape gets a single-process pool of its own, reused by later
+scrapes. While it waits, the calling thread checks the job's cancel token
+(src/scraper/cancellation.py). If the job is cancelled, or the child outlives
+its budget plus CHILD_GRACE_SEC, the child is killed and its pool dropped, so
+a scrape never goes on fetching after its job has given up the scrape slot.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeout
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from src.adapters.registry import report_sources, source_report
+from src.scraper.cancellation import check_cancelled
+from src.scraper.deadline import Deadline, current_deadline, deadline_scope
+
+ISOLATION_THREAD = 'thread'
+ISOLATION_PROCESS = 'process'
+# Child start-up and result transfer on top of the scrape's own budget
+CHILD_GRACE_SEC = 30
+# How often a waiting parent checks whether the job was cancelled
+CANCEL_POLL_SEC = 0.25
+
+
+def _scrape_in_child(*args: Any, **kwargs: Any) -> Tuple[List[Dict[str, Any]], List[float]]:
+    # Imported here so the parent never loads pandas/bs4 for process mode
+    from src.adapters.registry import collect_listings
+    return collect_listings(*args, **kwargs)
+
+
+def _scrape_in_child_within(budget_sec: float, *args: Any, **kwargs: Any) -> Tuple[Tuple[List[Dict[str, Any]], List[float]], List[str], Dict[str, Any]]:
+    deadline = Deadline.after(budget_sec)
+    with deadline_scope(deadline), source_report() as report:
+        result = _scrape_in_child(*args, **kwargs)
+    return result, deadline.reasons, report
+
+
+class ScrapeRunner:
+    def __init__(self, isolation: str = ISOLATION_THREAD, slots: int = 3, timeout: float = 600) -> None:
+        isolation = (isolation or ISOLATION_THREAD).strip().lower()
+        self.isolation = isolation if isolation in (ISOLATION_THREAD, ISOLATION_PROCESS) else ISOLATION_THREAD
+        self.slots = max(1, int(slots))
+        self.timeout = float(timeout)
+        self._pools: Set[ProcessPoolExecutor] = set()
+        self._idle: List[ProcessPoolExecutor] = []
+        self._lock = threading.Lock()
+
+    def _take_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+            # spawn: forking a threaded gunicorn worker is unsafe
+            executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+            self._pools.add(executor)
+            return executor
+
+    def _return_pool(self, executor: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if executor in self._pools:
+                self._idle.append(executor)
+
+    def _kill_pool(self, executor: ProcessPoolExecutor) -> None:
+        """Stop the child mid-scrape; the next scrape starts a fresh one."""
+        with self._lock:
+            self._pools.discard(executor)
+        # ProcessPoolExecutor has no public way to stop a running call
+        for process in list((getattr(executor, '_processes', None) or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _wait(self, future, timeout: float) -> Any:
+        """future.result(timeout), raising ScrapeCancelled as soon as the job is cancelled."""
+        stop = time.monotonic() + timeout
+        while True:
+            check_cancelled()
+            left = stop - time.monotonic()
+            if left <= 0:
+                raise FuturesTimeout()
+            try:
+                return future.result(timeout=min(CANCEL_POLL_SEC, left))
+            except FuturesTimeout:
+                continue
+
+    def _run_isolated(self, fn, timeout: float, *args: Any, **kwargs: Any) -> Any:
+        executor = self._take_pool()
+        try:
+            result = self._wait(executor.submit(fn, *args, **kwargs), timeout)
+        except BaseException:
+            self._kill_pool(executor)
+            raise
+        self._return_pool(executor)
+        return result
+
+    def run(self, *args: Any, **kwargs: Any) -> Tuple[List[Dict[str, Any]], List[float]]:
+        if self.isolation == ISOLATION_PROCESS and kwargs.get('fetch_pool') is None:
+            deadline = current_deadline()
+            if deadline is None:
+                return self._run_isolated(_scrape_in_child, self.timeout + CHILD_GRACE_SEC, *args, **kwargs)
+            try:
+                result, reasons, report = self._run_isolated(
+                    _scrape_in_child_within, deadline.remaining() + deadline.reserve + CHILD_GRACE_SEC,
+                    deadline.remaining(), *args, **kwargs)
+            except FuturesTimeout:
+                deadline.mark_partial('isolated_scrape')
+                return [], []
+            for reason in reasons:
+                deadline.mark_partial(reason)
+            report_sources(report)
+            return result
+        return _scrape_in_child(*args, **kwargs)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pools, self._pools, self._idle = self._pools, set(), []
+        for executor in pools:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def runner_from_env(slots: int, timeout: float) -> ScrapeRunner:
+    return ScrapeRunner(os.getenv('CMA_SCRAPE_ISOLATION', ISOLATION_THREAD), slots=slots, timeout=timeout)
+
+
+__all__ = [
+    'ISOLATION_THREAD',
+    'ISOLATION_PROCESS',
+    'ScrapeRunner',
+    'runner_from_env',
+]
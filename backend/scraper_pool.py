@@ -0,0 +1,213 @@
+"""
+Pool of remote scraper backends for SCRAPER_MODE=remote.
+
+- One keep-alive requests.Session per backend (connection reuse across appraisals)
+- Periodic GET /health probes; failed probes take a backend out of rotation
+- Least-outstanding-requests routing among healthy backends
+- Failover to the next backend on connect errors or 5xx responses
+- Per-backend latency / error-rate stats for diagnostics
+"""
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class ScraperBackend:
+    """One remote scraper service (e.g. a local box behind an ngrok tunnel)."""
+
+    def __init__(self, url: str, pool_maxsize: int = 10, window: int = 100) -> None:
+        self.url = url.rstrip("/")
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+
+        self.lock = threading.Lock()
+        self.outstanding = 0
+        self.healthy = True
+        self.last_health_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.requests_total = 0
+        self.errors_total = 0
+        self.latency_ewma_ms: Optional[float] = None
+        # Rolling window of (ok, latency_ms) for error rate / percentiles
+        self._recent: Deque[tuple] = deque(maxlen=window)
+
+    def record(self, ok: bool, latency_ms: float, error: Optional[str] = None) -> None:
+        with self.lock:
+            self.requests_total += 1
+            if not ok:
+                self.errors_total += 1
+                self.last_error = error
+            self._recent.append((ok, latency_ms))
+            if self.latency_ewma_ms is None:
+                self.latency_ewma_ms = latency_ms
+            else:
+                self.latency_ewma_ms = 0.8 * self.latency_ewma_ms + 0.2 * latency_ms
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            recent = list(self._recent)
+            latencies = sorted(lat for _, lat in recent)
+            errors = sum(1 for ok, _ in recent if not ok)
+            return {
+                "url": self.url,
+                "healthy": self.healthy,
+                "outstanding": self.outstanding,
+                "requests_total": self.requests_total,
+                "errors_total": self.errors_total,
+                "error_rate": round(errors / len(recent), 3) if recent else 0.0,
+                "latency_ewma_ms": round(self.latency_ewma_ms, 1) if self.latency_ewma_ms is not None else None,
+                "latency_p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))], 1) if latencies else None,
+                "last_health_at": self.last_health_at,
+                "last_error": self.last_error,
+            }
+
+
+class NoScraperBackendAvailable(Exception):
+    """Raised when every backend failed with a connection error."""
+
+
+class RemoteScraperPool:
+    """Least-outstanding-requests router over several scraper backends."""
+
+    def __init__(
+        self,
+        urls: List[str],
+        health_interval: float = 15.0,
+        health_timeout: float = 5.0,
+        pool_maxsize: int = 10,
+    ) -> None:
+        cleaned = [u.strip() for u in urls if u and u.strip()]
+        if not cleaned:
+            raise ValueError("RemoteScraperPool needs at least one backend URL")
+        self.backends = [ScraperBackend(u, pool_maxsize=pool_maxsize) for u in cleaned]
+        self.health_interval = float(health_interval)
+        self.health_timeout = float(health_timeout)
+        self._pick_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._health_thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------
+    # Routing
+    # ------------------------------------------------------------------
+    def _acquire(self, exclude: List[ScraperBackend]) -> Optional[ScraperBackend]:
+        with self._pick_lock:
+            candidates = [b for b in self.backends if b not in exclude]
+            if not candidates:
+                return None
+            healthy = [b for b in candidates if b.healthy]
+            # If every backend looks down, still try one rather than failing outright
+            pool = healthy or candidates
+            backend = min(pool, key=lambda b: (b.outstanding, b.latency_ewma_ms or 0.0))
+            with backend.lock:
+                backend.outstanding += 1
+            return backend
+
+    @staticmethod
+    def _release(backend: ScraperBackend) -> None:
+        with backend.lock:
+            backend.outstanding = max(0, backend.outstanding - 1)
+
+    def post(self, path: str, json: Any = None, timeout: float = 600) -> requests.Response:
+        """POST to the least-loaded backend, failing over on connect errors / 5xx.
+
+        Read timeouts are not retried elsewhere (the scrape may have been running
+        for minutes); they propagate as requests.Timeout.
+        """
+        tried: List[ScraperBackend] = []
+        last_response: Optional[requests.Response] = None
+        last_error: Optional[Exception] = None
+
+        while True:
+            backend = self._acquire(tried)
+            if backend is None:
+                break
+            tried.append(backend)
+            start = time.time()
+            try:
+                response = backend.session.post(f"{backend.url}{path}", json=json, timeout=timeout)
+            except requests.ConnectionError as e:
+                backend.record(False, (time.time() - start) * 1000, f"connect: {e}"[:200])
+                backend.healthy = False
+                last_error = e
+                continue
+            except requests.Timeout as e:
+                backend.record(False, (time.time() - start) * 1000, "timeout")
+                raise e
+            finally:
+                self._release(backend)
+
+            latency_ms = (time.time() - start) * 1000
+            if response.status_code >= 500:
+                backend.record(False, latency_ms, f"http {response.status_code}")
+                last_response = response
+                continue
+            backend.record(True, latency_ms)
+            return response
+
+        if last_response is not None:
+            return last_response
+        raise NoScraperBackendAvailable(str(last_error) if last_error else "no backends")
+
+    # ------------------------------------------------------------------
+    # Health checks
+    # ------------------------------------------------------------------
+    def probe(self, backend: ScraperBackend) -> bool:
+        start = time.time()
+        try:
+            response = backend.session.get(f"{backend.url}/health", timeout=self.health_timeout)
+            ok = response.status_code == 200
+            error = None if ok else f"health http {response.status_code}"
+        except requests.RequestException as e:
+            ok = False
+            error = f"health: {e}"[:200]
+        with backend.lock:
+            backend.healthy = ok
+            backend.last_health_at = time.time()
+            if error:
+                backend.last_error = error
+        if not ok:
+            print({
+                "level": "warn",
+                "event": "scraper_backend_unhealthy",
+                "url": backend.url,
+                "probe_ms": int((time.time() - start) * 1000),
+                "error": error,
+            })
+        return ok
+
+    def probe_all(self) -> None:
+        for backend in self.backends:
+            self.probe(backend)
+
+    def start_health_checks(self) -> None:
+        if self._health_thread is not None and self._health_thread.is_alive():
+            return
+        self._stop.clear()
+
+        def _loop() -> None:
+            while not self._stop.is_set():
+                self.probe_all()
+                self._stop.wait(self.health_interval)
+
+        self._health_thread = threading.Thread(target=_loop, name="scraper-pool-health", daemon=True)
+        self._health_thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [b.stats() for b in self.backends]
+
+
+__all__ = [
+    "RemoteScraperPool",
+    "ScraperBackend",
+    "NoScraperBackendAvailable",
+]
@@ -1,12 +1,19 @@
 import time
 import re
-from typing import Any, Dict, List, Tuple, Optional
+from typing import Any, List, Tuple, Optional
 
 import pandas as pd
 
 # Local import without introducing new deps
 from src.scraper.scraper import scraper as lamudi_scraper
+from src.scraper.sharding import sharded_scraper, sharding_enabled
+from src.scraper.card_scraper import card_scraper, DETAIL_LEVEL_CARD
+from src.adapters.records import Property
+from src.adapters.registry import SourceAdapter, SourceRequest
+from src.analytics.dedupe import assign_clusters, unit_prices
 from src.utils.last_word import get_neighborhood_from_address
+from src.observability.metrics import PHASE_SECONDS
+from src.observability.tracing import span, traced
 
 
 def _coerce_float(value: Any, default: float = 0.0) -> float:
@@ -41,10 +48,13 @@ def _coerce_int(value: Any, default: int = 0) -> int:
         return int(default)
 
 
-def _build_coordinates(row: pd.Series) -> Optional[List[float]]:
-    lat = row.get('latitude', None)
-    lon = row.get('longitude', None)
-    if lat in (None, '') or lon in (None, ''):
+# Staging columns a Property is built from, in _record()'s argument order
+_STAGING_COLUMNS = ['SKU', 'Location', 'TCP', 'Bedrooms', 'Baths', 'Floor_Area', 'Source',
+                    'latitude', 'longitude', 'detail_level']
+
+
+def _build_coordinates(lat: Any, lon: Any) -> Optional[List[float]]:
+    if lat is None or lon is None or pd.isna(lat) or pd.isna(lon) or lat == '' or lon == '':
         return None
     try:
         return [float(lat), float(lon)]
@@ -52,39 +62,114 @@ def _build_coordinates(row: pd.Series) -> Optional[List[float]]:
         return None
 
 
-def _normalize_row(row: pd.Series, property_type: str) -> Dict[str, Any]:
-    price_float = _coerce_float(row.get('TCP', 0.0), 0.0)
-    address = '' if pd.isna(row.get('Location', None)) else str(row.get('Location', ''))
-    normalized: Dict[str, Any] = {
-        'source': 'lamudi',
-        'property_id': ('' if pd.isna(row.get('SKU', None)) else str(row.get('SKU', ''))),
-        'address': address,
-        'neighborhood': get_neighborhood_from_address(address),
-        'price': price_float,
-        'bedrooms': _coerce_int(row.get('Bedrooms', 0), 0),
-        'bathrooms': _coerce_int(row.get('Baths', 0), 0),
-        'sqm': _coerce_float(row.get('Floor_Area', 0.0), 0.0),
-        'property_type': property_type,
-        'coordinates': _build_coordinates(row),
-        'url': ('' if pd.isna(row.get('Source', None)) else str(row.get('Source', ''))),
-    }
-    return normalized
-
-
-def scrape_and_normalize(province_slug: str, property_type: str, count: int) -> Tuple[List[Dict[str, Any]], List[float]]:
+def _text(value: Any) -> str:
+    return '' if value is None or pd.isna(value) else str(value)
+
+
+def _record(sku: Any, location: Any, tcp: Any, bedrooms: Any, baths: Any, floor_area: Any, source: Any,
+            lat: Any, lon: Any, detail_level: Any, property_type: str) -> Property:
+    address = _text(location)
+    return Property(
+        source='lamudi',
+        property_id=_text(sku),
+        address=address,
+        neighborhood=get_neighborhood_from_address(address),
+        price=_coerce_float(tcp, 0.0),
+        bedrooms=_coerce_int(bedrooms, 0),
+        bathrooms=_coerce_int(baths, 0),
+        sqm=_coerce_float(floor_area, 0.0),
+        property_type=property_type,
+        coordinates=_build_coordinates(lat, lon),
+        url=_text(source),
+        # Only list-page (card) scrapes carry a detail level; full scrapes keep the 11-key contract
+        detail_level=_text(detail_level) or None,
+    )
+
+
+def _normalize_row(row: pd.Series, property_type: str) -> Property:
+    return _record(*(row.get(column, None) for column in _STAGING_COLUMNS), property_type)
+
+
+class LamudiSource(SourceAdapter):
+    """
+    Lamudi listings: the scraper fetches and parses list/detail pages into a
+    staging DataFrame as it goes, so the inherited parse() passes it through.
+    """
+
+    name = 'lamudi'
+
+    def fetch(self, request: SourceRequest) -> pd.DataFrame:
+        if request.detail_level == DETAIL_LEVEL_CARD:
+            return card_scraper(request.province, request.property_type, request.count, enrich=request.enrich,
+                                fetch_pool=request.fetch_pool)
+        if sharding_enabled() and request.fetch_pool is None:
+            return sharded_scraper(request.province, request.property_type, request.count)
+        return lamudi_scraper(request.province, request.property_type, request.count, fetch_pool=request.fetch_pool)
+
+    def normalize(self, parsed: pd.DataFrame, request: SourceRequest) -> List[Property]:
+        """Map staging rows to records, clustered by building, city and poster (src/analytics/dedupe.py)."""
+        properties: List[Property] = []
+        if parsed is None or parsed.empty:
+            return properties
+        # Map rows with per-row guard to avoid whole-adapter failure on a single bad row.
+        # Plain value tuples, not a Series per row; missing columns read as NaN.
+        places: List[Tuple[Any, ...]] = []
+        with PHASE_SECONDS.time(phase='normalize'), span('normalize', rows=len(parsed)):
+            columns = parsed.reindex(columns=_STAGING_COLUMNS)
+            buildings = parsed.reindex(columns=['Name', 'City/Town', 'Agent', 'Description']).itertuples(
+                index=False, name=None)
+            for idx, values, place in zip(parsed.index, columns.itertuples(index=False, name=None), buildings):
+                try:
+                    properties.append(_record(*values, request.property_type))
+                    places.append(place)
+                except Exception as e:
+                    # TEMP: minimal console diagnostic; safe (no PII)
+                    try:
+                        print(f"row_normalize_skip idx={idx}: {e}")
+                    except Exception:
+                        pass
+                    continue
+
+        with PHASE_SECONDS.time(phase='dedupe'), span('dedupe', rows=len(properties)):
+            assign_clusters(properties, places)
+        return properties
+
+    def scrape(self, *args: Any, **kwargs: Any) -> Tuple[List[Property], List[float]]:
+        return scrape_and_normalize(*args, **kwargs)
+
+
+_SOURCE = LamudiSource()
+
+
+@traced('scrape_and_normalize')
+def scrape_and_normalize(
+    province_slug: str,
+    property_type: str,
+    count: int,
+    detail_level: str = 'full',
+    enrich: int = 0,
+    fetch_pool: Any = None,
+) -> Tuple[List[Property], List[float]]:
     """
     Execute the existing Lamudi scraper and map the resulting staging DataFrame
     into a canonical property list and price series.
 
-    Returns up to 10 properties to keep response size consistent with current API.
+    detail_level='card' scrapes listing pages only (no detail requests) and
+    enriches up to `enrich` listings from their detail pages. A shared
+    `fetch_pool` paces fetches across concurrent scrapes (batch CMA).
+
+    Returns up to 100 properties to keep response size consistent with current API.
+    Re-posts of the same unit share a cluster_id, and the price series has one
+    price per unit (src/analytics/dedupe.py).
     """
     start_ts = time.time()
-    properties: List[Dict[str, Any]] = []
+    properties: List[Property] = []
     price_series: List[float] = []
     reason: Optional[str] = None
 
     try:
-        staging_df: pd.DataFrame = lamudi_scraper(province_slug, property_type, count)
+        request = SourceRequest(province_slug, property_type, count, detail_level, enrich, fetch_pool)
+        staging_df = _SOURCE.parse(_SOURCE.fetch(request), request)
         if staging_df is None or staging_df.empty:
             reason = 'selector_miss'  # conservative default for empty
             duration_ms = int((time.time() - start_ts) * 1000)
@@ -100,24 +185,8 @@ def scrape_and_normalize(province_slug: str, property_type: str, count: int) ->
             })
             return [], []
 
-        # Ensure expected columns exist to avoid KeyErrors during normalization
-        for missing in ['SKU', 'Location', 'TCP', 'Bedrooms', 'Baths', 'Floor_Area', 'Source']:
-            if missing not in staging_df.columns:
-                staging_df[missing] = pd.NA
-
-        # Map rows with per-row guard to avoid whole-adapter failure on a single bad row
-        for idx, row in staging_df.iterrows():
-            try:
-                normalized = _normalize_row(row, property_type)
-                properties.append(normalized)
-                price_series.append(float(normalized['price']))
-            except Exception as e:
-                # TEMP: minimal console diagnostic; safe (no PII)
-                try:
-                    print(f"row_normalize_skip idx={idx}: {e}")
-                except Exception:
-                    pass
-                continue
+        properties = _SOURCE.normalize(staging_df, request)
+        price_series = unit_prices([p.price for p in properties], [p.cluster_id for p in properties])
 
         # Cap properties to 100 for response parity, but keep full price_series for stats
         if len(properties) > 100:
@@ -132,6 +201,7 @@ def scrape_and_normalize(province_slug: str, property_type: str, count: int) ->
             'count': int(count),
             'duration_ms': duration_ms,
             'properties_len': len(properties),
+            'units': len(price_series),
         })
         return properties, price_series
     except Exception as e:
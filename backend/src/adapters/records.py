@@ -0,0 +1,115 @@
+"""
+Property: the one record a normalized listing travels in, from the adapter
+to the JSON response.
+
+A slotted object instead of an 11-key dict per listing (~140 bytes of
+container per listing instead of ~470), passed along rather than copied
+between stages. It is a read-only Mapping over the API field names, so code
+written against the dict contract (prop.get(), prop['price'], dict(prop))
+keeps working, and it encodes to the same JSON object the adapter's dicts
+did. `detail_level` is only a key when set (card scrapes); full scrapes keep
+the 11-key contract. `cluster_id` (src/analytics/dedupe.py) is never a key:
+it names the listing that stands for the same physical unit in stats.
+Neither is `poster`, the (agent, description sketch) pair clustering
+compares listings on.
+
+columnar() turns a list of records into parallel per-field arrays for
+format=columnar responses. json_default() is the json.dumps hook for records
+outside Flask (the CMA job store); response_encoding.py's JSON provider does
+the same for jsonify().
+"""
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+FIELDS: Tuple[str, ...] = (
+    'source',
+    'property_id',
+    'address',
+    'neighborhood',
+    'price',
+    'bedrooms',
+    'bathrooms',
+    'sqm',
+    'property_type',
+    'coordinates',
+    'url',
+)
+_CARD_FIELDS = FIELDS + ('detail_level',)
+
+
+class Property(Mapping):
+    __slots__ = FIELDS + ('detail_level', 'cluster_id', 'poster')
+
+    def __init__(self, source: str = 'lamudi', property_id: str = '', address: str = '', neighborhood: str = '',
+                 price: float = 0.0, bedrooms: int = 0, bathrooms: int = 0, sqm: float = 0.0,
+                 property_type: str = '', coordinates: Optional[List[float]] = None, url: str = '',
+                 detail_level: Optional[str] = None, cluster_id: Optional[str] = None,
+                 poster: Optional[Tuple[str, Tuple[int, ...]]] = None) -> None:
+        self.source = source
+        self.property_id = property_id
+        self.address = address
+        self.neighborhood = neighborhood
+        self.price = price
+        self.bedrooms = bedrooms
+        self.bathrooms = bathrooms
+        self.sqm = sqm
+        self.property_type = property_type
+        self.coordinates = coordinates
+        self.url = url
+        self.detail_level = detail_level or None
+        self.cluster_id = cluster_id
+        self.poster = poster
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Property':
+        return cls(**{name: data[name] for name in _CARD_FIELDS if name in data})
+
+    def _fields(self) -> Tuple[str, ...]:
+        return _CARD_FIELDS if self.detail_level else FIELDS
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._fields():
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._fields())
+
+    def __len__(self) -> int:
+        return len(self._fields())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self._fields()}
+
+    def __getstate__(self) -> Tuple[Any, ...]:
+        return tuple(getattr(self, name) for name in _CARD_FIELDS) + (self.cluster_id, self.poster)
+
+    def __setstate__(self, state: Tuple[Any, ...]) -> None:
+        self.cluster_id = None
+        self.poster = None
+        for name, value in zip(_CARD_FIELDS + ('cluster_id', 'poster'), state):
+            setattr(self, name, value)
+
+    def __repr__(self) -> str:
+        return f'Property({self.to_dict()!r})'
+
+
+def columnar(properties: Sequence[Mapping]) -> Dict[str, List[Any]]:
+    """Parallel arrays, one per field, instead of one object per listing (format=columnar)."""
+    fields = _CARD_FIELDS if any(p.get('detail_level') for p in properties) else FIELDS
+    return {name: [p.get(name) for p in properties] for name in fields}
+
+
+def json_default(value: Any) -> Any:
+    """json.dumps(default=...) hook: records as their API dict, anything else as str."""
+    if isinstance(value, Property):
+        return value.to_dict()
+    return str(value)
+
+
+__all__ = [
+    'FIELDS',
+    'Property',
+    'columnar',
+    'json_default',
+]
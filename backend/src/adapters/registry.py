@@ -0,0 +1,347 @@
+"""
+Listing sources behind one CMA.
+
+Each source is a SourceAdapter: fetch() pulls raw pages or API payloads,
+parse() (optional; by default a passthrough) turns them into the source's own
+staging rows and normalize() maps those to the Property records every source
+shares (the canonical shape lamudi_adapter._normalize_row produces), with
+cluster_id set. fetch() and normalize() are abstract, so an adapter missing
+one fails when it is constructed rather than mid-request. Sources are
+registered by name; lamudi is built in and loaded on first use, so this
+module stays free of pandas/bs4/requests.
+
+CMA_SOURCES (comma separated, default "lamudi") picks the enabled sources.
+collect_listings() is what the scrape runner calls:
+- With one source it scrapes on the calling thread, as before.
+- With several, each source runs on its own thread under its own Deadline
+  (the request's, capped by <NAME>_TIMEOUT_SEC) and CancelToken. A source
+  still running SOURCE_GRACE_SEC after its deadline is cancelled and left
+  behind; one that raises is dropped. Either way the request carries on with
+  the others and is marked partial.
+
+<NAME>_FETCH_RATE gives a source its own process-wide FetchPool (token-bucket
+pacing, <NAME>_FETCH_CONCURRENCY slots); without it the source uses the
+caller's pool, if any.
+
+Results are merged round-robin, so the 100-listing cap leaves every source
+represented, and listings of the same unit on different sites are clustered
+by location and poster (src/analytics/dedupe.py). Every record keeps its `source`.
+Bind source_report() around a scrape to get status, latency and listing
+count per source.
+"""
+import contextvars
+import importlib
+from abc import ABC, abstractmethod
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from src.adapters.records import Property
+from src.analytics.dedupe import assign_clusters, cluster_listings, unit_prices
+from src.observability.metrics import SOURCE_SECONDS
+from src.scraper.cancellation import CancelToken, ScrapeCancelled, cancel_scope, current_token
+from src.scraper.deadline import Deadline, current_deadline, deadline_scope
+
+DEFAULT_SOURCES = 'lamudi'
+# A source gets this long past its deadline to hand back what it has
+SOURCE_GRACE_SEC = 5.0
+# Per-source time budget when neither the request nor the source sets one
+DEFAULT_SOURCE_TIMEOUT_SEC = 600.0
+
+STATUS_OK = 'ok'
+STATUS_EMPTY = 'empty'
+STATUS_TIMEOUT = 'timeout'
+STATUS_ERROR = 'error'
+
+_BUILTIN: Dict[str, Tuple[str, str]] = {
+    'lamudi': ('src.adapters.lamudi_adapter', 'LamudiSource'),
+}
+
+
+def _env_float(name: str) -> Optional[float]:
+    try:
+        value = float(os.getenv(name, ''))
+    except ValueError:
+        return None
+    return value if value > 0 else None
+
+
+class SourceRequest(NamedTuple):
+    province: str
+    property_type: str
+    count: int
+    detail_level: str = 'full'
+    enrich: int = 0
+    fetch_pool: Any = None
+
+
+class SourceAdapter(ABC):
+    """One listing site. Subclasses set `name` and implement fetch() and normalize()."""
+
+    name = ''
+
+    def __init__(self) -> None:
+        prefix = self.name.upper().replace('-', '_')
+        self.rate = _env_float(f'{prefix}_FETCH_RATE')
+        self.concurrency = int(_env_float(f'{prefix}_FETCH_CONCURRENCY') or 4)
+        self.timeout_sec = _env_float(f'{prefix}_TIMEOUT_SEC')
+
+    @abstractmethod
+    def fetch(self, request: SourceRequest) -> Any:
+        """Raw pages or payloads for the request."""
+
+    def parse(self, raw: Any, request: SourceRequest) -> Any:
+        """The source's staging rows; sources whose fetch() already parses keep this passthrough."""
+        return raw
+
+    @abstractmethod
+    def normalize(self, parsed: Any, request: SourceRequest) -> List[Property]:
+        """Property records for the parsed rows."""
+
+    def scrape(self, province: str, property_type: str, count: int, detail_level: str = 'full',
+               enrich: int = 0, fetch_pool: Any = None) -> Tuple[List[Property], List[float]]:
+        """fetch -> parse -> normalize; returns (properties, one price per unit)."""
+        request = SourceRequest(province, property_type, count, detail_level, enrich, fetch_pool)
+        properties = self.normalize(self.parse(self.fetch(request), request), request)
+        if any(p.cluster_id is None for p in properties):
+            assign_clusters(properties)
+        return properties[:100], unit_prices([p.price for p in properties], [p.cluster_id for p in properties])
+
+
+# ----------------------------------------------------------------------
+# Registry
+# ----------------------------------------------------------------------
+_sources: Dict[str, SourceAdapter] = {}
+_pools: Dict[str, Any] = {}
+_lock = threading.Lock()
+
+
+def register_source(adapter: SourceAdapter) -> SourceAdapter:
+    """Make `adapter` available under adapter.name (replacing any source of that name)."""
+    if not isinstance(adapter, SourceAdapter) or not adapter.name:
+        raise TypeError(f'{adapter!r} is not a named SourceAdapter')
+    with _lock:
+        _sources[adapter.name] = adapter
+        _pools.pop(adapter.name, None)
+    return adapter
+
+
+def get_source(name: str) -> Optional[SourceAdapter]:
+    with _lock:
+        adapter = _sources.get(name)
+    if adapter is None and name in _BUILTIN:
+        module, attr = _BUILTIN[name]
+        adapter = getattr(importlib.import_module(module), attr)()
+        with _lock:
+            adapter = _sources.setdefault(name, adapter)
+    return adapter
+
+
+def enabled_sources() -> List[SourceAdapter]:
+    """Sources named in CMA_SOURCES, in order; unknown names are skipped (lamudi if none is left)."""
+    names = [n.strip().lower() for n in os.getenv('CMA_SOURCES', DEFAULT_SOURCES).split(',') if n.strip()]
+    sources: List[SourceAdapter] = []
+    for name in dict.fromkeys(names):
+        adapter = get_source(name)
+        if adapter is None:
+            print({'level': 'warn', 'event': 'cma_source_unknown', 'source': name})
+            continue
+        sources.append(adapter)
+    return sources or [get_source(DEFAULT_SOURCES)]
+
+
+def source_fetch_pool(adapter: SourceAdapter) -> Any:
+    """The source's own rate-limited FetchPool, or None when it has no <NAME>_FETCH_RATE."""
+    if adapter.rate is None:
+        return None
+    with _lock:
+        pool = _pools.get(adapter.name)
+        if pool is None:
+            # Imported here: requests is only loaded once a source is paced
+            from src.scraper.fetch_pool import FetchPool
+            pool = _pools[adapter.name] = FetchPool(rate=adapter.rate, concurrency=adapter.concurrency)
+        return pool
+
+
+# ----------------------------------------------------------------------
+# Per-source report
+# ----------------------------------------------------------------------
+_report: contextvars.ContextVar = contextvars.ContextVar('kairos_source_report', default=None)
+
+
+@contextmanager
+def source_report() -> Iterator[Dict[str, Dict[str, Any]]]:
+    """Collect {source: {status, latency_ms, listings}} for the scrapes run inside."""
+    report: Dict[str, Dict[str, Any]] = {}
+    reset = _report.set(report)
+    try:
+        yield report
+    finally:
+        _report.reset(reset)
+
+
+def report_sources(entries: Dict[str, Dict[str, Any]]) -> None:
+    """Add entries to the bound report (e.g. ones a scrape child process sent back)."""
+    report = _report.get()
+    if report is not None:
+        report.update(entries)
+
+
+def _record(name: str, status: str, started: float, listings: int = 0) -> None:
+    elapsed = time.perf_counter() - started
+    SOURCE_SECONDS.observe(elapsed, source=name, status=status)
+    report_sources({name: {'status': status, 'latency_ms': int(elapsed * 1000), 'listings': listings}})
+
+
+# ----------------------------------------------------------------------
+# Fan-out
+# ----------------------------------------------------------------------
+def _scrape_source(adapter: SourceAdapter, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Tuple[List[Property], List[float]]:
+    pool = source_fetch_pool(adapter)
+    if pool is not None:
+        kwargs = {**kwargs, 'fetch_pool': pool}
+    return adapter.scrape(*args, **kwargs)
+
+
+def _run_isolated(adapter: SourceAdapter, deadline: Deadline, token: CancelToken,
+                  args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Tuple[List[Property], List[float]]:
+    with deadline_scope(deadline), cancel_scope(token):
+        return _scrape_source(adapter, args, kwargs)
+
+
+def collect_listings(*args: Any, **kwargs: Any) -> Tuple[List[Property], List[float]]:
+    """Scrape every enabled source with scrape_and_normalize's arguments and merge the results."""
+    sources = enabled_sources()
+    if len(sources) == 1:
+        adapter = sources[0]
+        started = time.perf_counter()
+        try:
+            properties, price_series = _scrape_source(adapter, args, kwargs)
+        except Exception:
+            _record(adapter.name, STATUS_ERROR, started)
+            raise
+        _record(adapter.name, STATUS_OK if properties else STATUS_EMPTY, started, len(properties))
+        return properties, price_series
+
+    parent = current_deadline()
+    parent_token = current_token()
+    results: List[Tuple[str, List[Property], List[float]]] = []
+    executor = ThreadPoolExecutor(max_workers=len(sources), thread_name_prefix='cma-source')
+    try:
+        runs = []
+        for adapter in sources:
+            budget = min(parent.remaining() if parent is not None else DEFAULT_SOURCE_TIMEOUT_SEC,
+                         adapter.timeout_sec or DEFAULT_SOURCE_TIMEOUT_SEC)
+            deadline = Deadline(time.time() + budget, name=f'source:{adapter.name}', parent=parent)
+            token = CancelToken(poll=(lambda: parent_token.cancelled) if parent_token is not None else None,
+                                interval=0.0)
+            future = executor.submit(contextvars.copy_context().run, _run_isolated,
+                                     adapter, deadline, token, args, kwargs)
+            runs.append((adapter, deadline, token, future, time.perf_counter()))
+
+        for adapter, deadline, token, future, started in runs:
+            try:
+                properties, price_series = future.result(timeout=max(0.0, deadline.at - time.time()) + SOURCE_GRACE_SEC)
+            except FuturesTimeout:
+                token.cancel()
+                deadline.mark_partial()
+                _record(adapter.name, STATUS_TIMEOUT, started)
+                continue
+            except ScrapeCancelled:
+                for _, _, other, _, _ in runs:
+                    other.cancel()
+                raise
+            except Exception as e:
+                deadline.mark_partial()
+                print({'level': 'error', 'event': 'cma_source_failed', 'source': adapter.name,
+                       'error': str(e), 'error_type': type(e).__name__})
+                _record(adapter.name, STATUS_ERROR, started)
+                continue
+            _record(adapter.name, STATUS_OK if properties else STATUS_EMPTY, started, len(properties))
+            results.append((adapter.name, properties, price_series))
+    finally:
+        # Never wait for a source left behind; its token is cancelled and it stops at its next fetch
+        executor.shutdown(wait=False)
+    return merge_results(results)
+
+
+def merge_results(results: Sequence[Tuple[str, List[Property], List[float]]]) -> Tuple[List[Property], List[float]]:
+    """Interleave per-source results and count a unit listed on several sources once.
+
+    Cluster ids become '<source>:<cluster_id>'; a unit found on several
+    sources takes the id of the first source that listed it, and later
+    sources' prices for it are dropped from the price series.
+    """
+    results = [r for r in results if r[1]]
+    if len(results) == 1:
+        return list(results[0][1]), list(results[0][2])
+    if not results:
+        return [], []
+
+    merged: List[Property] = []
+    lists = [properties for _, properties, _ in results]
+    for position in range(max(len(p) for p in lists)):
+        merged.extend(properties[position] for properties in lists if position < len(properties))
+
+    labels = [f'{p.source}:{p.cluster_id}' for p in merged]
+    first_seen: Dict[str, int] = {}
+    for i, label in enumerate(labels):
+        first_seen.setdefault(label, i)
+    order = {name: rank for rank, (name, _, _) in enumerate(results)}
+
+    parent: Dict[str, str] = {}
+
+    def root(label: str) -> str:
+        while parent.get(label, label) != label:
+            label = parent[label]
+        return label
+
+    # No building names across sites: block on coordinates and the address's last part (the city),
+    # and match on the poster each source's clustering recorded
+    rows = ((None, str(p.address or '').rsplit(',', 1)[-1], p.sqm, p.price, p.bedrooms, p.bathrooms,
+             *(p.coordinates or (None, None)), *(p.poster or ('', ()))) for p in merged)
+    for i, cluster in enumerate(cluster_listings(rows)):
+        if merged[i].source == merged[cluster].source:
+            continue
+        a, b = root(labels[i]), root(labels[cluster])
+        if a != b:
+            # The source listed first in CMA_SOURCES keeps the unit
+            key = lambda label: (order[label.split(':', 1)[0]], first_seen[label])
+            keep, drop = sorted((a, b), key=key)
+            parent[drop] = keep
+
+    dropped: Dict[str, List[float]] = {}
+    for label in first_seen:
+        if root(label) != label:
+            i = first_seen[label]
+            dropped.setdefault(merged[i].source, []).append(float(merged[i].price))
+    for p, label in zip(merged, labels):
+        p.cluster_id = root(label)
+
+    price_series: List[float] = []
+    for name, _, series in results:
+        remove = dropped.get(name, [])
+        for price in series:
+            if price in remove:
+                remove.remove(price)
+            else:
+                price_series.append(float(price))
+    return merged, price_series
+
+
+__all__ = [
+    'DEFAULT_SOURCES',
+    'SourceAdapter',
+    'SourceRequest',
+    'collect_listings',
+    'enabled_sources',
+    'get_source',
+    'merge_results',
+    'register_source',
+    'report_sources',
+    'source_fetch_pool',
+    'source_report',
+]
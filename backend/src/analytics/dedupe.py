@@ -0,0 +1,216 @@
+"""
+Cluster listings that describe the same physical unit.
+
+Scrapes dedupe on SKU, but the same unit is re-posted under a new slug or
+listed by several agents, and every copy counts in price stats. Comparing
+every pair of listings would be quadratic, so cluster_listings() blocks
+first. A listing lands in two hash blocks: (building, city, floor-area
+bucket) and (building, city, price bucket). Floor area is bucketed in
+SQM_STEP m² steps and price in PRICE_STEP log steps. Two blocking passes
+mean a pair that straddles a bucket edge on one dimension still meets in
+the other.
+
+A tower has many units of the same type at nearly the same price, and
+Lamudi pins every listing in a building to the same coordinates, so
+looking alike is not enough. A pair matches only when all of these hold:
+- price is within PRICE_TOLERANCE (a re-post keeps its price);
+- floor area is within SQM_TOLERANCE;
+- bedroom/bath counts agree (where both are known);
+- coordinates are within MAX_DISTANCE_M (where both are known);
+- the listings share a poster. When both have a description, the
+  descriptions must be at least DESCRIPTION_SIMILARITY alike (word
+  Jaccard, estimated from a bottom-k sketch). Otherwise the agent must be
+  the same.
+
+Listings are taken in row order. Each is compared only with the first
+listing of the clusters already in its blocks, never with other members,
+so matches do not chain from one unit to the next. It joins the first
+cluster that matches, or starts a new one. Cost grows with the number of
+listings times the clusters per block, so it stays close to linear while
+buildings stay small next to the store.
+
+Listings without a building name are blocked by their coordinates, rounded
+to about 100 m, instead. Listings with neither, or without a floor area or
+a positive price, are left in clusters of their own.
+
+Rows are tuples in LISTING_FIELDS order; missing values are None (or NaN).
+Rows may stop after `lon`, and then have no poster and never merge.
+"""
+import math
+import re
+import zlib
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from src.geo.psgc_index import place_key
+
+LISTING_FIELDS = ('name', 'city', 'sqm', 'price', 'bedrooms', 'baths', 'lat', 'lon', 'agent', 'description')
+
+SQM_STEP = 5.0
+SQM_TOLERANCE = 0.03
+PRICE_STEP = math.log1p(0.05)
+PRICE_TOLERANCE = 0.005
+MAX_DISTANCE_M = 150.0
+DESCRIPTION_SIMILARITY = 0.8
+# Word hashes kept per description sketch
+SKETCH_SIZE = 64
+# build_staging_df fills a missing "Condominium Name" (agent, description) with 0
+_NO_NAME = {'', '0', 'nan', 'none', 'n a'}
+
+
+def _number(value: Any) -> Optional[float]:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(number) else number
+
+
+def _count(value: Any) -> int:
+    number = _number(value)
+    return int(number) if number is not None and number >= 0 else -1
+
+
+def _key(value: Any) -> str:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ''
+    key = ' '.join(re.findall(r'[a-z0-9]+', str(value).lower()))
+    return '' if key in _NO_NAME else key
+
+
+def sketch(description: Any) -> Tuple[int, ...]:
+    """Bottom-k sketch of a description's words: the SKETCH_SIZE smallest word hashes, sorted.
+
+    Hashes are crc32, so sketches compare across processes. Tuples pass
+    through, so a stored sketch can stand in for its description.
+    """
+    if isinstance(description, tuple):
+        return description
+    words = set(_key(description).split())
+    return tuple(sorted({zlib.crc32(w.encode('utf-8')) for w in words})[:SKETCH_SIZE])
+
+
+def similarity(a: Tuple[int, ...], b: Tuple[int, ...]) -> float:
+    """Estimated word Jaccard of two sketches (exact for descriptions under SKETCH_SIZE words)."""
+    if not a or not b:
+        return 0.0
+    union = sorted(set(a) | set(b))[:SKETCH_SIZE]
+    shared = set(a) & set(b)
+    return sum(1 for h in union if h in shared) / len(union)
+
+
+def _distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    # Equirectangular approximation; exact enough at building scale
+    x = math.radians(lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return 6371008.8 * math.hypot(x, y)
+
+
+class _Listing:
+    __slots__ = ('sqm', 'price', 'bedrooms', 'baths', 'lat', 'lon', 'agent', 'sketch')
+
+    def __init__(self, sqm: float, price: float, bedrooms: int, baths: int,
+                 lat: Optional[float], lon: Optional[float], agent: str, sketch: Tuple[int, ...]) -> None:
+        self.sqm = sqm
+        self.price = price
+        self.bedrooms = bedrooms
+        self.baths = baths
+        self.lat = lat
+        self.lon = lon
+        self.agent = agent
+        self.sketch = sketch
+
+    def same_poster(self, other: '_Listing') -> bool:
+        if self.sketch and other.sketch:
+            return similarity(self.sketch, other.sketch) >= DESCRIPTION_SIMILARITY
+        return bool(self.agent) and self.agent == other.agent
+
+    def matches(self, other: '_Listing') -> bool:
+        if abs(self.price - other.price) > PRICE_TOLERANCE * max(self.price, other.price):
+            return False
+        if abs(self.sqm - other.sqm) > SQM_TOLERANCE * max(self.sqm, other.sqm):
+            return False
+        if self.bedrooms >= 0 and other.bedrooms >= 0 and self.bedrooms != other.bedrooms:
+            return False
+        if self.baths >= 0 and other.baths >= 0 and self.baths != other.baths:
+            return False
+        if None not in (self.lat, self.lon, other.lat, other.lon) and \
+                _distance_m(self.lat, self.lon, other.lat, other.lon) > MAX_DISTANCE_M:
+            return False
+        return self.same_poster(other)
+
+
+def _building(name: Any, lat: Optional[float], lon: Optional[float]) -> Optional[Tuple[str, str]]:
+    key = place_key(str(name)) if name is not None else ''
+    if key not in _NO_NAME:
+        return 'name', key
+    if lat is not None and lon is not None and (lat, lon) != (0.0, 0.0):
+        return 'at', f'{lat:.3f},{lon:.3f}'
+    return None
+
+
+def cluster_listings(rows: Iterable[Sequence[Any]]) -> array:
+    """Cluster id per row: the index of the first row describing the same unit."""
+    clusters = array('i')
+    listings: Dict[int, _Listing] = {}
+    # Block -> row indices of the clusters started in it
+    blocks: Dict[Tuple[Any, ...], List[int]] = {}
+    for i, row in enumerate(rows):
+        name, city, sqm, price, bedrooms, baths, lat, lon, agent, description = \
+            (tuple(row) + (None, None))[:len(LISTING_FIELDS)]
+        sqm, price, lat, lon = _number(sqm), _number(price), _number(lat), _number(lon)
+        building = _building(name, lat, lon)
+        if building is None or not sqm or sqm <= 0 or not price or price <= 0:
+            clusters.append(i)
+            continue
+        listing = _Listing(sqm, price, _count(bedrooms), _count(baths), lat, lon, _key(agent), sketch(description))
+        place = (building, place_key(str(city)) if city is not None else '')
+        keys = ((place, 's', int(sqm // SQM_STEP)), (place, 'p', int(math.log(price) // PRICE_STEP)))
+        cluster = next((first for key in keys for first in blocks.get(key, ())
+                        if listings[first].matches(listing)), i)
+        if cluster == i:
+            listings[i] = listing
+            for key in keys:
+                blocks.setdefault(key, []).append(i)
+        clusters.append(cluster)
+    return clusters
+
+
+def assign_clusters(properties: Sequence[Any], places: Optional[Sequence[Sequence[Any]]] = None) -> None:
+    """Set cluster_id on Property records: property_id of the first listing of the same unit.
+
+    `places` holds (building name, city, agent, description) per record.
+    Without them, records are blocked by coordinates and the last part of
+    their address, and compared on the poster they already carry.
+    The poster is kept on each record (`poster`) for cross-source merges.
+    """
+    if places is None:
+        places = [(None, str(p.address or '').rsplit(',', 1)[-1], *(p.poster or ('', ()))) for p in properties]
+    rows = []
+    for p, (name, city, agent, description) in zip(properties, places):
+        p.poster = (_key(agent), sketch(description))
+        rows.append((name, city, p.sqm, p.price, p.bedrooms, p.bathrooms, *(p.coordinates or (None, None)),
+                     *p.poster))
+    for prop, cluster in zip(properties, cluster_listings(rows)):
+        prop.cluster_id = properties[cluster].property_id or f'#{cluster}'
+
+
+def unit_prices(prices: Sequence[float], clusters: Sequence[Any]) -> List[float]:
+    """One price per physical unit: the first listing of each cluster, in order."""
+    seen = set()
+    out = []
+    for price, cluster in zip(prices, clusters):
+        if cluster not in seen:
+            seen.add(cluster)
+            out.append(float(price))
+    return out
+
+
+__all__ = [
+    'LISTING_FIELDS',
+    'assign_clusters',
+    'cluster_listings',
+    'similarity',
+    'sketch',
+    'unit_prices',
+]
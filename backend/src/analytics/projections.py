@@ -0,0 +1,274 @@
+"""
+Market projections computed from accumulated scrape history.
+
+Each scrape updates small materialized rollups incrementally:
+- listing_seen: first/last time each SKU was observed (days on market)
+- monthly_rollup: per PSGC area and month, count / price sum / quantile sketch
+  of listings first observed that month
+- area_rollup: per PSGC area, listing count, summed days on market and
+  active / pending / closed counts
+
+Reading projections only touches the rollup rows (one area row + up to six
+month rows per area), never the raw listings, and returns the same columns as
+the static projections CSV the dashboard used so far.
+"""
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Any, Dict, Iterable, List, Optional
+
+from src.analytics.quantile_sketch import QuantileSketch
+
+PROJECTION_COLUMNS = [
+    "psgc_code",
+    "area_name",
+    "avg_sold_price",
+    "median_sold_price",
+    "avg_dom",
+    "active_count",
+    "pending_count",
+    "closed_count",
+    "trend_6m",
+    "confidence",
+    "sample_size",
+]
+
+# Listing lifecycle by days since last seen
+ACTIVE_DAYS = 30
+CLOSED_DAYS = 90
+DAY_SEC = 86400.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS listing_seen (
+    sku TEXT PRIMARY KEY,
+    psgc_code TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    last_price REAL
+);
+CREATE INDEX IF NOT EXISTS idx_listing_seen_area_last ON listing_seen(psgc_code, last_seen);
+CREATE TABLE IF NOT EXISTS monthly_rollup (
+    psgc_code TEXT NOT NULL,
+    month TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    price_sum REAL NOT NULL,
+    sketch TEXT NOT NULL,
+    PRIMARY KEY (psgc_code, month)
+);
+CREATE TABLE IF NOT EXISTS area_rollup (
+    psgc_code TEXT PRIMARY KEY,
+    area_name TEXT NOT NULL,
+    listing_count INTEGER NOT NULL DEFAULT 0,
+    dom_sum REAL NOT NULL DEFAULT 0,
+    active_count INTEGER NOT NULL DEFAULT 0,
+    pending_count INTEGER NOT NULL DEFAULT 0,
+    closed_count INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL DEFAULT 0
+);
+"""
+
+
+def _month(ts: float) -> str:
+    return time.strftime("%Y-%m", time.gmtime(ts))
+
+
+def _previous_months(latest: str, n: int) -> List[str]:
+    """n months ending at `latest` (YYYY-MM), oldest first."""
+    year, month = (int(x) for x in latest.split("-"))
+    months = []
+    for _ in range(n):
+        months.append(f"{year:04d}-{month:02d}")
+        month -= 1
+        if month == 0:
+            year, month = year - 1, 12
+    return list(reversed(months))
+
+
+def confidence_for(sample_size: int) -> str:
+    if sample_size >= 100:
+        return "high"
+    if sample_size >= 30:
+        return "medium"
+    return "low"
+
+
+class ProjectionStore:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._write_lock = threading.Lock()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    # ------------------------------------------------------------------
+    # Write path (after each scrape)
+    # ------------------------------------------------------------------
+    def record_scrape(self, psgc_code: str, area_name: str, properties: Iterable[Dict[str, Any]],
+                      observed_at: Optional[float] = None) -> int:
+        """Fold one scrape's listings into the rollups. Returns listings counted."""
+        now = float(observed_at if observed_at is not None else time.time())
+        month = _month(now)
+        observations = {}
+        for prop in properties:
+            sku = str(prop.get("property_id") or "")
+            try:
+                price = float(prop.get("price") or 0)
+            except (TypeError, ValueError):
+                price = 0.0
+            if sku and price > 0:
+                observations[sku] = price
+        if not observations:
+            return 0
+
+        with self._write_lock, closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                existing = {}
+                skus = list(observations)
+                for i in range(0, len(skus), 500):
+                    chunk = skus[i:i + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    for sku, last_seen in conn.execute(
+                        f"SELECT sku, last_seen FROM listing_seen WHERE sku IN ({placeholders})", chunk
+                    ):
+                        existing[sku] = last_seen
+
+                new_listings = 0
+                dom_delta = 0.0
+                sketch = QuantileSketch()
+                month_count = 0
+                month_sum = 0.0
+                for sku, price in observations.items():
+                    last_seen = existing.get(sku)
+                    if last_seen is None:
+                        conn.execute(
+                            "INSERT INTO listing_seen (sku, psgc_code, first_seen, last_seen, last_price) VALUES (?, ?, ?, ?, ?)",
+                            (sku, psgc_code, now, now, price),
+                        )
+                        new_listings += 1
+                        first_this_month = True
+                    else:
+                        if now > last_seen:
+                            dom_delta += (now - last_seen) / DAY_SEC
+                        conn.execute(
+                            "UPDATE listing_seen SET last_seen = MAX(last_seen, ?), last_price = ? WHERE sku = ?",
+                            (now, price, sku),
+                        )
+                        first_this_month = _month(last_seen) != month
+                    # Each SKU counts once per month however often it is re-scraped
+                    if first_this_month:
+                        sketch.add(price)
+                        month_count += 1
+                        month_sum += price
+
+                if month_count:
+                    row = conn.execute(
+                        "SELECT count, price_sum, sketch FROM monthly_rollup WHERE psgc_code = ? AND month = ?",
+                        (psgc_code, month),
+                    ).fetchone()
+                    if row:
+                        sketch.merge(QuantileSketch.from_json(row[2]))
+                        month_count += row[0]
+                        month_sum += row[1]
+                    conn.execute(
+                        "INSERT OR REPLACE INTO monthly_rollup (psgc_code, month, count, price_sum, sketch) VALUES (?, ?, ?, ?, ?)",
+                        (psgc_code, month, month_count, month_sum, sketch.to_json()),
+                    )
+
+                # Lifecycle counts come from the (psgc_code, last_seen) index
+                active_since = now - ACTIVE_DAYS * DAY_SEC
+                closed_before = now - CLOSED_DAYS * DAY_SEC
+                active, pending, closed = conn.execute(
+                    "SELECT "
+                    "SUM(CASE WHEN last_seen >= ? THEN 1 ELSE 0 END), "
+                    "SUM(CASE WHEN last_seen < ? AND last_seen >= ? THEN 1 ELSE 0 END), "
+                    "SUM(CASE WHEN last_seen < ? THEN 1 ELSE 0 END) "
+                    "FROM listing_seen WHERE psgc_code = ?",
+                    (active_since, active_since, closed_before, closed_before, psgc_code),
+                ).fetchone()
+                conn.execute(
+                    "INSERT INTO area_rollup (psgc_code, area_name, listing_count, dom_sum, active_count, pending_count, closed_count, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(psgc_code) DO UPDATE SET "
+                    "area_name = excluded.area_name, "
+                    "listing_count = area_rollup.listing_count + excluded.listing_count, "
+                    "dom_sum = area_rollup.dom_sum + excluded.dom_sum, "
+                    "active_count = excluded.active_count, "
+                    "pending_count = excluded.pending_count, "
+                    "closed_count = excluded.closed_count, "
+                    "updated_at = excluded.updated_at",
+                    (psgc_code, area_name, new_listings, dom_delta, int(active or 0), int(pending or 0), int(closed or 0), now),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return len(observations)
+
+    # ------------------------------------------------------------------
+    # Read path
+    # ------------------------------------------------------------------
+    def projections(self, psgc_code: Optional[str] = None, months: int = 6) -> List[Dict[str, Any]]:
+        """One row per PSGC area with the projections CSV columns."""
+        with closing(self._connect()) as conn:
+            if psgc_code:
+                areas = conn.execute("SELECT * FROM area_rollup WHERE psgc_code = ?", (psgc_code,)).fetchall()
+            else:
+                areas = conn.execute("SELECT * FROM area_rollup ORDER BY listing_count DESC").fetchall()
+            rows = []
+            for code, area_name, listing_count, dom_sum, active, pending, closed, _ in areas:
+                monthly = conn.execute(
+                    "SELECT month, count, price_sum, sketch FROM monthly_rollup WHERE psgc_code = ? ORDER BY month DESC LIMIT ?",
+                    (code, months),
+                ).fetchall()
+                if not monthly:
+                    continue
+                rows.append(self._build_row(code, area_name, listing_count, dom_sum, active, pending, closed, monthly, months))
+        return rows
+
+    @staticmethod
+    def _build_row(code, area_name, listing_count, dom_sum, active, pending, closed, monthly, months) -> Dict[str, Any]:
+        by_month = {m: (count, price_sum, sketch) for m, count, price_sum, sketch in monthly}
+        latest = monthly[0][0]
+        window = _previous_months(latest, months)
+        # Carry the last known monthly average forward over gaps
+        trend = []
+        last_avg = None
+        first_known = next((by_month[m][1] / by_month[m][0] for m in window if m in by_month and by_month[m][0]), 0)
+        for m in window:
+            if m in by_month and by_month[m][0]:
+                last_avg = by_month[m][1] / by_month[m][0]
+            trend.append(int(round(last_avg if last_avg is not None else first_known)))
+
+        latest_count, latest_sum, latest_sketch = by_month[latest]
+        median = QuantileSketch.from_json(latest_sketch).quantile(0.5) or 0
+        sample_size = int(listing_count)
+        return {
+            "psgc_code": code,
+            "area_name": area_name,
+            "avg_sold_price": int(round(latest_sum / latest_count)) if latest_count else 0,
+            "median_sold_price": int(round(median)),
+            "avg_dom": int(round(dom_sum / listing_count)) if listing_count else 0,
+            "active_count": int(active),
+            "pending_count": int(pending),
+            "closed_count": int(closed),
+            "trend_6m": ",".join(str(v) for v in trend),
+            "confidence": confidence_for(sample_size),
+            "sample_size": sample_size,
+        }
+
+
+__all__ = [
+    "PROJECTION_COLUMNS",
+    "ProjectionStore",
+    "confidence_for",
+]
@@ -0,0 +1,491 @@
+"""
+Memory-mapped columnar snapshot of every scraped listing.
+
+The snapshot is one file of fixed-width NumPy columns (price, sqm, bedrooms,
+baths, lat, lon, scraped_at, SKU) plus int32 codes into string dictionaries
+for province, city and neighborhood. A `cluster` column holds the row of the
+listing that stands for the same physical unit (src/analytics/dedupe.py), so
+stats and comparables count a re-posted unit once. build_snapshot() folds the Parquet
+export (src/scraper/columnar.py) into it, keeping the latest observation of
+each SKU. The file is written under a temporary name and renamed into place,
+so readers never see a half-written snapshot.
+
+Builds are incremental and run one at a time across processes. Next to the
+snapshot, `<snapshot>.parquet` keeps the deduplicated listings it was built
+from, with the export files already folded in recorded in its metadata; a
+build reads that plus only the export files added since. It starts over from
+the whole export when the base is missing or a folded file has gone (pruned
+or compacted). An flock on `<snapshot>.lock` serialises builders, so after a
+scrape one gunicorn worker folds the new file in and the others, waiting on
+the lock, find nothing left to do.
+
+ListingSnapshot maps the file read-only. Its columns are views onto the
+mapping rather than copies, so every gunicorn worker that opens the same file
+shares one copy in the page cache. A worker keeps using the mapping it opened
+until ListingSnapshot.open() sees the file has been replaced. Stats, radius
+filters and comparables are NumPy expressions over those columns and never
+build per-listing Python objects, except for the rows they return.
+
+File layout: 8-byte magic, little-endian uint64 header length, a JSON header
+(row count, column dtypes, dictionaries, and column offsets relative to the
+first 64-byte boundary after the header), then the columns, each 64-byte aligned.
+"""
+import fcntl
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b'KSNAP\x01\x00\x00'
+_PREFIX = struct.Struct('<8sQ')
+_ALIGN = 64
+
+EARTH_RADIUS_KM = 6371.0088
+
+# name -> dtype; text columns are int32 codes into the header dictionaries (-1: unknown)
+COLUMNS = {
+    'price': '<f8',
+    'sqm': '<f4',
+    'bedrooms': '<i2',
+    'baths': '<i2',
+    'lat': '<f8',
+    'lon': '<f8',
+    'scraped_at': '<f8',
+    'province': '<i4',
+    'city': '<i4',
+    'neighborhood': '<i4',
+    'cluster': '<i4',
+}
+DICTIONARY_COLUMNS = ('province', 'city', 'neighborhood')
+_PARQUET_COLUMNS = ['sku', 'name', 'location', 'city', 'province', 'price', 'floor_area', 'bedrooms', 'baths',
+                    'latitude', 'longitude', 'agent', 'description', 'scraped_at']
+
+
+def snapshot_path() -> str:
+    return os.getenv('LISTING_SNAPSHOT_PATH', os.path.join('data', 'listing_snapshot.bin'))
+
+
+def _aligned(offset: int) -> int:
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def _encode(values: List[Any]) -> Tuple[np.ndarray, List[str]]:
+    """int32 codes plus the dictionary, most frequent value first."""
+    counts: Dict[str, int] = {}
+    for value in values:
+        if value:
+            counts[value] = counts.get(value, 0) + 1
+    dictionary = sorted(counts, key=lambda v: (-counts[v], v))
+    index = {value: i for i, value in enumerate(dictionary)}
+    codes = np.fromiter((index.get(v, -1) if v else -1 for v in values), dtype='<i4', count=len(values))
+    return codes, dictionary
+
+
+def _text(series) -> List[str]:
+    return ['' if v is None or (isinstance(v, float) and v != v) else str(v).strip() for v in series]
+
+
+def write_snapshot(frame, path: Optional[str] = None) -> str:
+    """
+    Write listings to a snapshot file and atomically replace `path`.
+
+    `frame` has the Parquet export's columns (sku, name, location, city, province,
+    price, floor_area, bedrooms, baths, latitude, longitude, agent, description,
+    scraped_at), one row per listing.
+    """
+    import pandas as pd
+    from src.analytics.dedupe import cluster_listings
+    from src.utils.last_word import get_neighborhood_from_address
+
+    path = path or snapshot_path()
+    rows = int(len(frame))
+
+    def numeric(name: str, fill: float) -> np.ndarray:
+        if name not in frame.columns:
+            return np.full(rows, fill, dtype='f8')
+        return pd.to_numeric(frame[name], errors='coerce').to_numpy(dtype='f8', na_value=fill)
+
+    scraped_at = frame['scraped_at'] if 'scraped_at' in frame.columns else pd.Series([pd.NaT] * rows)
+    scraped_at = pd.to_datetime(scraped_at, utc=True, errors='coerce')
+    # Unknown scrape times sort first (0.0) rather than as NaN
+    epoch = (scraped_at - pd.Timestamp(0, tz='UTC')).dt.total_seconds().to_numpy(dtype='f8', na_value=0.0)
+    locations = _text(frame['location']) if 'location' in frame.columns else [''] * rows
+    text = {
+        'province': _text(frame['province']) if 'province' in frame.columns else [''] * rows,
+        'city': _text(frame['city']) if 'city' in frame.columns else [''] * rows,
+        'neighborhood': [get_neighborhood_from_address(loc) for loc in locations],
+    }
+    columns: Dict[str, np.ndarray] = {
+        'price': numeric('price', np.nan),
+        'sqm': numeric('floor_area', np.nan),
+        'bedrooms': numeric('bedrooms', -1),
+        'baths': numeric('baths', -1),
+        'lat': numeric('latitude', np.nan),
+        'lon': numeric('longitude', np.nan),
+        'scraped_at': epoch,
+    }
+    dictionaries: Dict[str, List[str]] = {}
+    for name in DICTIONARY_COLUMNS:
+        columns[name], dictionaries[name] = _encode(text[name])
+    names, agents, descriptions = (_text(frame[name]) if name in frame.columns else [''] * rows
+                                   for name in ('name', 'agent', 'description'))
+    columns['cluster'] = np.frombuffer(cluster_listings(zip(
+        names, text['city'], columns['sqm'], columns['price'], columns['bedrooms'], columns['baths'],
+        columns['lat'], columns['lon'], agents, descriptions)), dtype=np.intc).astype('<i4')
+    skus = [s.encode('utf-8') for s in _text(frame['sku'])] if 'sku' in frame.columns else [b''] * rows
+    width = max([len(s) for s in skus] + [1])
+    columns['sku'] = np.array(skus, dtype=f'S{width}') if rows else np.zeros(0, dtype=f'S{width}')
+
+    dtypes = dict(COLUMNS, sku=f'S{width}')
+    arrays = {name: np.ascontiguousarray(columns[name].astype(dtype)) for name, dtype in dtypes.items()}
+    specs: Dict[str, Dict[str, Any]] = {}
+    offset = 0
+    for name, array in arrays.items():
+        specs[name] = {'dtype': dtypes[name], 'offset': offset}
+        offset = _aligned(offset + array.nbytes)
+    header = json.dumps({'rows': rows, 'built_at': time.time(), 'columns': specs,
+                         'dictionaries': dictionaries}).encode('utf-8')
+    data_start = _aligned(_PREFIX.size + len(header))
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f'{path}.{uuid.uuid4().hex[:8]}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(_PREFIX.pack(MAGIC, len(header)))
+            f.write(header)
+            for name, array in arrays.items():
+                f.write(b'\0' * (data_start + specs[name]['offset'] - f.tell()))
+                f.write(array.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+_SOURCES_KEY = b'kairos_snapshot_sources'
+
+
+@contextmanager
+def _build_lock(path: str) -> Iterator[None]:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(f'{path}.lock', 'a') as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _folded_sources(base_path: str) -> Optional[List[str]]:
+    """Export files the base already holds (None when there is no usable base)."""
+    import pyarrow.parquet as pq
+    try:
+        metadata = pq.read_schema(base_path).metadata or {}
+        return json.loads(metadata[_SOURCES_KEY])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _write_base(frame, base_path: str, sources: List[str]) -> None:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    table = table.replace_schema_metadata({_SOURCES_KEY: json.dumps(sources).encode('utf-8')})
+    tmp_path = f'{base_path}.{uuid.uuid4().hex[:8]}.tmp'
+    try:
+        pq.write_table(table, tmp_path, compression='zstd')
+        os.replace(tmp_path, base_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def build_snapshot(path: Optional[str] = None, parquet_dir: Optional[str] = None) -> Optional[int]:
+    """
+    Fold new Parquet export files into the snapshot; returns rows written
+    (None when there was nothing new to read). Waits for any build already
+    running in another process.
+    """
+    import pandas as pd
+    from src.scraper.columnar import listing_files, load_listings, parquet_enabled
+
+    if not parquet_enabled():
+        return None
+    path = path or snapshot_path()
+    base_path = f'{path}.parquet'
+    with _build_lock(path):
+        files = listing_files(parquet_dir)
+        folded = _folded_sources(base_path) if os.path.exists(path) else None
+        if folded is not None and set(folded) <= set(files):
+            new = sorted(set(files) - set(folded))
+            if not new:
+                return None
+            frame = pd.concat([pd.read_parquet(base_path),
+                               load_listings(columns=_PARQUET_COLUMNS, root=parquet_dir, files=new)],
+                              ignore_index=True)
+        else:
+            frame = load_listings(columns=_PARQUET_COLUMNS, root=parquet_dir, files=files)
+        if frame.empty:
+            return None
+        # Latest observation of each listing wins
+        frame = frame.sort_values('scraped_at', kind='stable').drop_duplicates('sku', keep='last')
+        frame = frame.reset_index(drop=True)
+        write_snapshot(frame, path)
+        # Recorded after the snapshot is in place: if this fails, the next build folds the same files again
+        _write_base(frame, base_path, files)
+        return int(len(frame))
+
+
+def _haversine_km(lat: np.ndarray, lon: np.ndarray, lat0: float, lon0: float) -> np.ndarray:
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat0, lon0 = np.radians(lat0), np.radians(lon0)
+    a = np.sin((lat1 - lat0) / 2) ** 2 + np.cos(lat0) * np.cos(lat1) * np.sin((lon1 - lon0) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class ListingSnapshot:
+    """Read-only view of a snapshot file. Columns are numpy arrays backed by the mapping."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            self._identity = (st.st_ino, st.st_mtime_ns, st.st_size)
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_len = _PREFIX.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self._mmap.close()
+            raise ValueError(f'{path} is not a listing snapshot')
+        header = json.loads(self._mmap[_PREFIX.size:_PREFIX.size + header_len])
+        data_start = _aligned(_PREFIX.size + header_len)
+        self.rows: int = header['rows']
+        self.built_at: float = header['built_at']
+        self.dictionaries: Dict[str, List[str]] = header['dictionaries']
+        self._codes = {name: {value.lower(): i for i, value in enumerate(values)}
+                       for name, values in self.dictionaries.items()}
+        self.columns: Dict[str, np.ndarray] = {
+            name: np.frombuffer(self._mmap, dtype=spec['dtype'], count=self.rows,
+                                offset=data_start + spec['offset'])
+            for name, spec in header['columns'].items()
+        }
+        # Snapshots written before clustering: every listing is its own unit
+        self.columns.setdefault('cluster', np.arange(self.rows, dtype='<i4'))
+
+    @classmethod
+    def open(cls, path: str, current: Optional['ListingSnapshot'] = None) -> Optional['ListingSnapshot']:
+        """`current` if the file on disk is still the one it mapped, else a fresh mapping (None if missing)."""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        if current is not None and current._identity == (st.st_ino, st.st_mtime_ns, st.st_size):
+            return current
+        return cls(path)
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def code(self, column: str, value: str) -> int:
+        """Dictionary code of `value` (case-insensitive), -2 when the snapshot has never seen it."""
+        return self._codes[column].get(str(value).strip().lower(), -2)
+
+    def mask(self, province: Optional[str] = None, city: Optional[str] = None,
+             neighborhood: Optional[str] = None, bedrooms: Optional[int] = None,
+             min_price: Optional[float] = None, max_price: Optional[float] = None) -> np.ndarray:
+        """Boolean row mask; listings without a positive price never match."""
+        price = self.columns['price']
+        selected = price > 0
+        for column, value in (('province', province), ('city', city), ('neighborhood', neighborhood)):
+            if value:
+                selected &= self.columns[column] == self.code(column, value)
+        if bedrooms is not None:
+            selected &= self.columns['bedrooms'] == int(bedrooms)
+        if min_price is not None:
+            selected &= price >= float(min_price)
+        if max_price is not None:
+            selected &= price <= float(max_price)
+        return selected
+
+    def units(self, selected: np.ndarray) -> np.ndarray:
+        """`selected` narrowed to one row per physical unit, its latest observation."""
+        rows = np.flatnonzero(selected)
+        # Rows are in scrape order, so the last selected row of a cluster is its latest
+        _, last = np.unique(self.columns['cluster'][rows][::-1], return_index=True)
+        unique = np.zeros(self.rows, dtype=bool)
+        unique[rows[::-1][last]] = True
+        return unique
+
+    def price_stats(self, selected: Optional[np.ndarray] = None) -> Dict[str, Any]:
+        """count/avg/median/min/max like compute_price_stats, plus median price per sqm; one row per unit."""
+        selected = self.units(self.mask() if selected is None else selected)
+        prices = self.columns['price'][selected]
+        stats: Dict[str, Any] = {'count': int(prices.size)}
+        if prices.size:
+            stats.update({
+                'avg': float(prices.mean()),
+                'median': float(np.median(prices)),
+                'min': float(prices.min()),
+                'max': float(prices.max()),
+            })
+            sqm = self.columns['sqm'][selected]
+            per_sqm = prices[sqm > 0] / sqm[sqm > 0]
+            if per_sqm.size:
+                stats['median_per_sqm'] = float(np.median(per_sqm))
+        return stats
+
+    def neighborhood_stats(self, selected: Optional[np.ndarray] = None, min_count: int = 2,
+                           top: int = 20) -> Dict[str, Dict[str, float]]:
+        """analyze_neighborhoods() over the snapshot: count/mean/min/max per neighborhood, one row per unit."""
+        selected = self.units(self.mask() if selected is None else selected)
+        codes = self.columns['neighborhood']
+        selected = selected & (codes >= 0)
+        codes, prices = codes[selected], self.columns['price'][selected]
+        size = len(self.dictionaries['neighborhood'])
+        if not codes.size or not size:
+            return {}
+        counts = np.bincount(codes, minlength=size)
+        sums = np.bincount(codes, weights=prices, minlength=size)
+        lows = np.full(size, np.inf)
+        highs = np.full(size, -np.inf)
+        np.minimum.at(lows, codes, prices)
+        np.maximum.at(highs, codes, prices)
+        ranked = [i for i in np.argsort(-counts, kind='stable')[:top] if counts[i] >= min_count]
+        names = self.dictionaries['neighborhood']
+        return {
+            names[i]: {'count': int(counts[i]), 'mean': round(float(sums[i] / counts[i]), 2),
+                       'min': round(float(lows[i]), 2), 'max': round(float(highs[i]), 2)}
+            for i in ranked
+        }
+
+    def within_radius(self, lat: float, lon: float, radius_km: float,
+                      selected: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(row indices, distances in km) of listings within radius_km, nearest first."""
+        lats, lons = self.columns['lat'], self.columns['lon']
+        # Cheap bounding box first; trig only on what survives it
+        dlat = np.degrees(radius_km / EARTH_RADIUS_KM)
+        dlon = dlat / max(np.cos(np.radians(lat)), 1e-6)
+        box = (lats >= lat - dlat) & (lats <= lat + dlat) & (lons >= lon - dlon) & (lons <= lon + dlon)
+        if selected is not None:
+            box &= selected
+        rows = np.flatnonzero(box)
+        distances = _haversine_km(lats[rows], lons[rows], lat, lon)
+        keep = distances <= radius_km
+        rows, distances = rows[keep], distances[keep]
+        order = np.argsort(distances, kind='stable')
+        return rows[order], distances[order]
+
+    def comparables(self, lat: float, lon: float, radius_km: float = 2.0, sqm: Optional[float] = None,
+                    bedrooms: Optional[int] = None, sqm_tolerance: float = 0.25, limit: int = 10,
+                    **filters: Any) -> List[Dict[str, Any]]:
+        """
+        Nearest priced listings within radius_km, optionally with the same
+        bedroom count and a floor area within ±sqm_tolerance of `sqm`.
+        `filters` are passed to mask(). A unit listed more than once appears once.
+        """
+        selected = self.mask(bedrooms=bedrooms, **filters)
+        if sqm:
+            area = self.columns['sqm']
+            selected &= (area >= sqm * (1 - sqm_tolerance)) & (area <= sqm * (1 + sqm_tolerance))
+        rows, distances = self.within_radius(lat, lon, radius_km, self.units(selected))
+        return [self.row(int(i), distance_km=round(float(d), 3)) for i, d in zip(rows[:limit], distances[:limit])]
+
+    def row(self, i: int, **extra: Any) -> Dict[str, Any]:
+        c = self.columns
+
+        def label(column: str) -> str:
+            code = int(c[column][i])
+            return self.dictionaries[column][code] if code >= 0 else ''
+
+        def number(value: Any) -> Optional[float]:
+            return None if np.isnan(value) else float(value)
+
+        lat, lon = number(c['lat'][i]), number(c['lon'][i])
+        out = {
+            'property_id': c['sku'][i].decode('utf-8'),
+            'cluster_id': c['sku'][c['cluster'][i]].decode('utf-8'),
+            'price': float(c['price'][i]),
+            'sqm': number(c['sqm'][i]),
+            'bedrooms': int(c['bedrooms'][i]) if c['bedrooms'][i] >= 0 else None,
+            'bathrooms': int(c['baths'][i]) if c['baths'][i] >= 0 else None,
+            'coordinates': [lat, lon] if lat is not None and lon is not None else None,
+            'province': label('province'),
+            'city': label('city'),
+            'neighborhood': label('neighborhood'),
+            'scraped_at': float(c['scraped_at'][i]) or None,
+        }
+        out.update(extra)
+        return out
+
+
+class SnapshotRebuilder:
+    """
+    Rebuild the snapshot in a background thread after scrapes.
+
+    Scrapes that arrive while a rebuild is waiting or running are folded into
+    the next one, and builds start at most once per `min_interval` seconds.
+    """
+
+    def __init__(self, build, min_interval: float = 60.0) -> None:
+        self._build = build
+        self.min_interval = float(min_interval)
+        self._lock = threading.Lock()
+        self._pending = False
+        self._thread: Optional[threading.Thread] = None
+        self._last_started = 0.0
+
+    def request(self) -> None:
+        with self._lock:
+            self._pending = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='snapshot-rebuild', daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._thread = None
+                    return
+                wait = self._last_started + self.min_interval - time.time()
+            if wait > 0:
+                time.sleep(wait)
+            with self._lock:
+                self._pending = False
+                self._last_started = time.time()
+            try:
+                self._build()
+            except Exception as e:
+                print({'level': 'error', 'event': 'snapshot_rebuild_failed', 'error': str(e)})
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+
+__all__ = [
+    'COLUMNS',
+    'DICTIONARY_COLUMNS',
+    'snapshot_path',
+    'write_snapshot',
+    'build_snapshot',
+    'ListingSnapshot',
+    'SnapshotRebuilder',
+]
@@ -0,0 +1,312 @@
+"""
+Compiled PSGC hierarchy: region -> province -> city/municipality -> barangay.
+
+The Philippine Standard Geographic Code list ships with the backend as a
+gzipped TSV next to this module (psgc.tsv.gz, ~42k rows). It is generated by
+build_dataset() from the PSA Q1 2026 publication as packaged in the `psgc`
+wheel (MIT licensed). Each row holds the 10-digit code, the pre-2024 9-digit
+code ("correspondence code", which the address database and the frontend
+still use), a level letter, the parent's 10-digit code and the name.
+
+PsgcIndex loads the rows into parallel arrays: codes, old codes, a level
+byte string, parent row numbers, and every name in one string sliced by an
+offsets array. Codes resolve to row numbers through two dicts, so a lookup is
+O(1) in either format, and ancestors are found by walking the parent column.
+
+The hierarchy is cleaned up for how listings are searched:
+- NCR has no provinces; its cities hang directly off the region, which stands
+  in for the province (Lamudi's "metro-manila").
+- Highly urbanized cities sit in pseudo "Independent City" groups in the PSA
+  list. They are moved under the province their old code places them in, so
+  Cebu City (old 072217000) belongs to Cebu.
+- Groups that are not a province (level G, e.g. City of Isabela) have no
+  Lamudi slug.
+
+Regenerate the dataset from an unpacked psgc wheel with:
+
+    python -m src.geo.psgc_index /path/to/psgc/data/core
+"""
+import argparse
+import gzip
+import io
+import json
+import os
+import re
+import threading
+import unicodedata
+from array import array
+from typing import Dict, List, NamedTuple, Optional
+
+DATASET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'psgc.tsv.gz')
+DATASET_SOURCE = 'PSA PSGC Q1 2026, via the psgc 2026.4.13.0 package (MIT)'
+
+LEVELS = {
+    'R': 'region',
+    'P': 'province',
+    'G': 'group',
+    'C': 'city',
+    'M': 'municipality',
+    'S': 'submunicipality',
+    'B': 'barangay',
+}
+_CITY_LEVELS = b'CMS'
+_NCR = 1300000000
+# Lamudi slugs that are not the slugified PSGC name
+_SLUG_OVERRIDES = {
+    _NCR: 'metro-manila',
+}
+
+
+class PsgcUnit(NamedTuple):
+    code: str
+    old_code: str
+    level: str
+    name: str
+
+
+def slugify(name: str) -> str:
+    """'Davao del Sur' -> 'davao-del-sur'; accents folded, parentheticals dropped."""
+    name = re.sub(r'\([^)]*\)', ' ', name)
+    name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')
+
+
+def place_key(name: str) -> str:
+    """Comparable form of a place name: 'City of Las Piñas' and 'Las Pinas City' -> 'las pinas'."""
+    name = unicodedata.normalize('NFKD', re.sub(r'\([^)]*\)', ' ', name or ''))
+    name = re.sub(r'[^a-z0-9]+', ' ', name.encode('ascii', 'ignore').decode('ascii').lower()).strip()
+    return re.sub(r'^city of |^ciudad de | city$', '', name).strip()
+
+
+class PsgcIndex:
+    def __init__(self, rows: List[List[str]]) -> None:
+        """rows: [code, old_code, level, parent_code, name] as stored in the dataset."""
+        count = len(rows)
+        self._codes = array('q', (int(r[0]) for r in rows))
+        self._old = array('q', (int(r[1] or 0) for r in rows))
+        self._levels = ''.join(r[2] for r in rows).encode('ascii')
+        self._by_code: Dict[int, int] = {code: i for i, code in enumerate(self._codes)}
+        self._by_old: Dict[int, int] = {old: i for i, old in enumerate(self._old) if old}
+
+        self._parents = array('i', [-1]) * count
+        for i, row in enumerate(rows):
+            parent = row[3]
+            if not parent and row[2] == 'B':
+                # Barangay parents are implied by the code: 0730600001 -> 0730600000
+                parent = row[0][:7] + '000'
+            if parent:
+                self._parents[i] = self._by_code[int(parent)]
+
+        self._name_offsets = array('i', [0])
+        for row in rows:
+            self._name_offsets.append(self._name_offsets[-1] + len(row[4]))
+        self._names = ''.join(row[4] for row in rows)
+
+        # Province-level rows: 4-digit old province prefixes ("0722") and Lamudi slugs
+        self._by_prefix: Dict[str, int] = {}
+        self._slugs: Dict[int, str] = {}
+        for i in range(count):
+            level = self._levels[i:i + 1]
+            if level in (b'P', b'G') and self._old[i]:
+                self._by_prefix.setdefault(self.old_code(i)[:4], i)
+            if level == b'P':
+                self._slugs[i] = _SLUG_OVERRIDES.get(self._codes[i], slugify(self.name(i)))
+            elif self._codes[i] in _SLUG_OVERRIDES:
+                self._slugs[i] = _SLUG_OVERRIDES[self._codes[i]]
+        for i in range(count):
+            # NCR's old "districts" (1339, 1374-1376) name the region through its cities
+            parent = self._parents[i]
+            if self._levels[i] in _CITY_LEVELS and parent >= 0 and self._levels[parent:parent + 1] == b'R' \
+                    and self._old[i]:
+                self._by_prefix.setdefault(self.old_code(i)[:4], parent)
+        self._rows_by_slug = {slug: i for i, slug in self._slugs.items()}
+
+    @classmethod
+    def load(cls, path: str = DATASET_PATH) -> 'PsgcIndex':
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            rows = [line.rstrip('\n').split('\t') for line in f if line.strip() and not line.startswith('#')]
+        return cls(rows)
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    # ------------------------------------------------------------------
+    # Rows
+    # ------------------------------------------------------------------
+    def find(self, code: str) -> Optional[int]:
+        """Row for a code in any accepted format, or None.
+
+        10 digits: current PSGC. 9 digits: pre-2024 code, else an old province
+        prefix padded with zeros ("137600000"), else a 10-digit code that lost
+        its leading zero. 4 digits: old province prefix ("0722", "1376" for
+        NCR). 2 digits: region.
+        """
+        code = str(code or '').strip()
+        if not code.isdigit():
+            return None
+        if len(code) == 10:
+            return self._by_code.get(int(code))
+        if len(code) == 9:
+            row = self._by_old.get(int(code))
+            if row is None and code.endswith('00000'):
+                # A province prefix written out in full ("137600000" for "1376")
+                row = self._by_prefix.get(code[:4])
+            return row if row is not None else self._by_code.get(int(code))
+        if len(code) == 4:
+            return self._by_prefix.get(code)
+        if len(code) == 2:
+            row = self._by_code.get(int(code) * 10 ** 8)
+            return row if row is not None and self._levels[row:row + 1] == b'R' else None
+        return None
+
+    def code(self, row: int) -> str:
+        return '%010d' % self._codes[row]
+
+    def old_code(self, row: int) -> str:
+        return '%09d' % self._old[row] if self._old[row] else ''
+
+    def level(self, row: int) -> str:
+        return LEVELS[chr(self._levels[row])]
+
+    def name(self, row: int) -> str:
+        return self._names[self._name_offsets[row]:self._name_offsets[row + 1]]
+
+    def unit(self, row: int) -> PsgcUnit:
+        return PsgcUnit(self.code(row), self.old_code(row), self.level(row), self.name(row))
+
+    def parent(self, row: int) -> Optional[int]:
+        parent = self._parents[row]
+        return parent if parent >= 0 else None
+
+    def ancestors(self, row: int) -> List[int]:
+        """row, its parent, ... up to the region."""
+        chain = []
+        current = row
+        while current >= 0:
+            chain.append(current)
+            current = self._parents[current]
+        return chain
+
+    # ------------------------------------------------------------------
+    # Hierarchy
+    # ------------------------------------------------------------------
+    def province_of(self, row: int) -> Optional[int]:
+        """Province row for any level (NCR's region row for Metro Manila); None above provinces."""
+        for current in self.ancestors(row):
+            if self._levels[current:current + 1] in (b'P', b'G') or current in self._slugs:
+                return current
+        return None
+
+    def city_of(self, row: int) -> Optional[int]:
+        """Outermost city/municipality containing row (Manila for its districts); None above cities."""
+        city = None
+        for current in self.ancestors(row):
+            if self._levels[current] in _CITY_LEVELS:
+                city = current
+        return city
+
+    def lamudi_slug(self, row: int) -> Optional[str]:
+        province = self.province_of(row)
+        return self._slugs.get(province) if province is not None else None
+
+    def slug_row(self, slug: str) -> Optional[int]:
+        return self._rows_by_slug.get((slug or '').strip())
+
+    # ------------------------------------------------------------------
+    # Code formats
+    # ------------------------------------------------------------------
+    def to_new(self, code: str) -> Optional[str]:
+        row = self.find(code)
+        return self.code(row) if row is not None else None
+
+    def to_old(self, code: str) -> Optional[str]:
+        row = self.find(code)
+        return (self.old_code(row) or None) if row is not None else None
+
+
+_default: Optional[PsgcIndex] = None
+_default_lock = threading.Lock()
+
+
+def default_index() -> PsgcIndex:
+    """The bundled dataset, loaded on first use."""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = PsgcIndex.load()
+    return _default
+
+
+def build_dataset(source_dir: str, out_path: str = DATASET_PATH) -> int:
+    """Write psgc.tsv.gz from the psgc package's data/core JSON files; returns the row count."""
+    def read(name: str) -> List[Dict[str, str]]:
+        with open(os.path.join(source_dir, f'{name}.json'), encoding='utf-8') as f:
+            return json.load(f)
+
+    regions, provinces, cities, barangays = (read(n) for n in ('regions', 'provinces', 'cities', 'barangays'))
+    province_by_code = {p['psgc_code']: p for p in provinces}
+    province_by_prefix = {(p.get('correspondence_code') or '')[:4]: p['psgc_code'] for p in provinces
+                          if p.get('correspondence_code') and not p.get('is_pseudo')}
+    city_codes = {c['psgc_code'] for c in cities}
+    rows = [[r['psgc_code'], r.get('correspondence_code') or '', 'R', '', r['name']] for r in regions]
+    kept_groups = set()
+    city_rows = []
+    for c in cities:
+        old = c.get('correspondence_code') or ''
+        parent = c['province_code']
+        group = province_by_code.get(parent, {}).get('geographic_level')
+        if group == 'PseudoProvince':
+            parent = c['region_code']
+        elif group == 'HUCGroup' and old[:4] in province_by_prefix:
+            parent = province_by_prefix[old[:4]]
+        if c['geographic_level'] == 'SubMun' and c['psgc_code'][:5] + '00000' in city_codes:
+            parent = c['psgc_code'][:5] + '00000'
+        if parent in province_by_code and parent != c['region_code']:
+            kept_groups.add(parent)
+        level = {'City': 'C', 'Mun': 'M', 'SubMun': 'S'}[c['geographic_level']]
+        city_rows.append([c['psgc_code'], old, level, parent, c['name']])
+    for p in provinces:
+        level = 'G' if p.get('is_pseudo') else 'P'
+        if level == 'G' and p['psgc_code'] not in kept_groups:
+            continue
+        rows.append([p['psgc_code'], p.get('correspondence_code') or '', level, p['region_code'], p['name']])
+    rows.extend(city_rows)
+    for b in barangays:
+        implied = b['psgc_code'][:7] + '000'
+        rows.append([b['psgc_code'], b.get('correspondence_code') or '', 'B',
+                     '' if b['city_code'] == implied else b['city_code'], b['name']])
+
+    buffer = io.StringIO()
+    buffer.write(f'# {DATASET_SOURCE}\n# code\told_code\tlevel\tparent\tname\n')
+    for row in rows:
+        buffer.write('\t'.join(row) + '\n')
+    # mtime=0: the same source produces a byte-identical file
+    with open(out_path, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', mtime=0, compresslevel=9) as f:
+        f.write(buffer.getvalue().encode('utf-8'))
+    return len(rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Build the bundled PSGC dataset')
+    parser.add_argument('source_dir', help='psgc package data/core directory')
+    parser.add_argument('--out', default=DATASET_PATH)
+    args = parser.parse_args()
+    print({'level': 'info', 'event': 'psgc_dataset_built', 'rows': build_dataset(args.source_dir, args.out),
+           'path': args.out})
+
+
+if __name__ == '__main__':
+    main()
+
+
+__all__ = [
+    'DATASET_PATH',
+    'LEVELS',
+    'PsgcIndex',
+    'PsgcUnit',
+    'build_dataset',
+    'default_index',
+    'place_key',
+    'slugify',
+]
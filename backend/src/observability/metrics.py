@@ -0,0 +1,267 @@
+"""
+Minimal in-process Prometheus metrics (text exposition format 0.0.4).
+
+Counters, gauges and histograms are plain Python objects guarded by a lock;
+recording a value is a dict lookup plus an addition, and nothing is formatted
+until /metrics is scraped. Gauges can be backed by a callback so values such as
+semaphore occupancy are only read at scrape time. Each gunicorn worker exposes
+its own registry.
+"""
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds; covers sub-ms parses up to multi-minute scrapes
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}, got {tuple(labels)}')
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _header(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {} if labelnames else {(): 0.0}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [
+            f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}' for key, v in items
+        ]
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._functions: Dict[Tuple[str, ...], Callable[[], float]] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, fn: Callable[[], float], **labels: str) -> None:
+        """Read the value from `fn` at scrape time instead of storing it."""
+        key = self._key(labels)
+        with self._lock:
+            self._functions[key] = fn
+
+    def value(self, **labels: str) -> float:
+        key = self._key(labels)
+        with self._lock:
+            fn = self._functions.get(key)
+            if fn is None:
+                return self._values.get(key, 0.0)
+        return float(fn())
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for key, fn in functions.items():
+            try:
+                values[key] = float(fn())
+            except Exception:
+                continue
+        return self._header() + [
+            f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}' for key, v in sorted(values.items())
+        ]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        # key -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return int(sum(series[:-1])) if series else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        lines = self._header()
+        for key, series in items:
+            cumulative = 0.0
+            for bound, n in zip(self.buckets + (math.inf,), series[:-1]):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, ("le", _format_value(bound)))} {_format_value(cumulative)}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(series[-1])}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {_format_value(cumulative)}')
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # Module reloads (tests, dev server) get the already-registered metric
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+REGISTRY = Registry()
+
+# Scrape pipeline phases: list_fetch, detail_fetch, parse, normalize, dedupe, analytics, serialize
+PHASE_SECONDS = REGISTRY.histogram(
+    'kairos_phase_seconds', 'Time spent per scrape/CMA phase.', ['phase'])
+SOURCE_SECONDS = REGISTRY.histogram(
+    'kairos_source_seconds', 'Time per listing source scrape, by outcome.', ['source', 'status'])
+PAGES_SCANNED = REGISTRY.counter(
+    'kairos_pages_scanned_total', 'Listing pages fetched and parsed.')
+LIST_CANDIDATES = REGISTRY.counter(
+    'kairos_list_candidates_total', 'Listing candidates extracted from listing pages.')
+SELECTOR_MISSES = REGISTRY.counter(
+    'kairos_selector_misses_total', 'Listing pages where the primary selectors found nothing.')
+CHALLENGE_PAGES = REGISTRY.counter(
+    'kairos_challenge_pages_total', 'Bot/security challenge pages served instead of content.')
+CACHE_HITS = REGISTRY.counter(
+    'kairos_cache_hits_total', 'Cache hits by cache.', ['cache'])
+HTTP_429 = REGISTRY.counter(
+    'kairos_http_429_total', 'HTTP 429 responses received from upstream sites.')
+SEMAPHORE_IN_USE = REGISTRY.gauge(
+    'kairos_semaphore_in_use', 'Occupied slots per concurrency limiter.', ['semaphore'])
+SEMAPHORE_LIMIT = REGISTRY.gauge(
+    'kairos_semaphore_limit', 'Configured slots per concurrency limiter.', ['semaphore'])
+OUTBOX_BACKLOG = REGISTRY.gauge(
+    'kairos_outbox_backlog', 'Supabase writes waiting in the local outbox.')
+OUTBOX_OLDEST_AGE = REGISTRY.gauge(
+    'kairos_outbox_oldest_age_seconds', 'Age of the oldest Supabase write still waiting in the outbox.')
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
+
+
+__all__ = [
+    'CONTENT_TYPE',
+    'REGISTRY',
+    'Registry',
+    'Counter',
+    'Gauge',
+    'Histogram',
+    'PHASE_SECONDS',
+    'SOURCE_SECONDS',
+    'PAGES_SCANNED',
+    'LIST_CANDIDATES',
+    'SELECTOR_MISSES',
+    'CHALLENGE_PAGES',
+    'CACHE_HITS',
+    'HTTP_429',
+    'SEMAPHORE_IN_USE',
+    'SEMAPHORE_LIMIT',
+    'OUTBOX_BACKLOG',
+    'OUTBOX_OLDEST_AGE',
+    'render_metrics',
+]
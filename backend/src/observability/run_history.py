@@ -0,0 +1,412 @@
+"""
+Scrape run history: one row per scrape in a bounded SQLite store.
+
+@recorded_run wraps the scrapers (scraper, card_scraper, sharded_scraper).
+While one runs, a RunRecorder bound to a contextvar (fetch threads inherit
+it through copy_context) collects:
+- request counts (fetch_page): requests, failed requests, 429s
+- selector misses and challenge pages (listing pages)
+- phase timings via timed_phase(), which also feeds kairos_phase_seconds;
+  fetch phases are summed across fetch threads, so they can exceed wall time
+When the scraper returns or raises, the run is written with its parameters,
+duration, listing/page counts and an outcome (ok, partial, empty, timeout,
+cancelled, blocked, error). CMA results served from the in-process cache are
+recorded as outcome 'cached' runs, which is what cache_hit_rate counts.
+
+The store replaces the append-only scraper_diagnostics.csv. Rows older than
+SCRAPE_RUNS_RETENTION_DAYS, and the oldest rows past SCRAPE_RUNS_MAX_ROWS,
+are pruned on insert. runs() and aggregate() filter on indexed columns
+(started_at, plus province / outcome); percentiles come from a window
+function over the matching durations, not a file scan. The scraper may run
+in this process, a process pool or the lamudi_scraper.py subprocess; all of
+them write to the same file (SCRAPE_RUNS_DB_PATH). A full-mode CMA runs the
+subprocess only for progress and serves the in-process scrape, so the app
+starts it with SCRAPE_RUNS_RECORD=0 and each CMA is recorded once.
+"""
+import contextvars
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from src.observability.metrics import PHASE_SECONDS
+
+DAY_SEC = 86400.0
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+OUTCOME_OK = 'ok'
+OUTCOME_PARTIAL = 'partial'
+OUTCOME_EMPTY = 'empty'
+OUTCOME_CACHED = 'cached'
+OUTCOME_ERROR = 'error'
+# Exception class name -> outcome (matched by name so this module does not import the scraper)
+_ERROR_OUTCOMES = {
+    'DeadlineExceeded': 'timeout',
+    'ScrapeCancelled': 'cancelled',
+    'CircuitOpenError': 'blocked',
+}
+
+COUNTERS = ('requests', 'failed_requests', 'http_429', 'selector_misses', 'challenges')
+# group_by name -> SQL expression
+GROUP_BY = {
+    'province': 'province',
+    'property_type': 'property_type',
+    'mode': 'mode',
+    'outcome': 'outcome',
+    'day': "strftime('%Y-%m-%d', started_at, 'unixepoch')",
+}
+PERCENTILES = (50, 95)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scrape_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at REAL NOT NULL,
+    mode TEXT NOT NULL,
+    province TEXT NOT NULL,
+    property_type TEXT NOT NULL,
+    requested INTEGER NOT NULL DEFAULT 0,
+    property_count INTEGER NOT NULL DEFAULT 0,
+    pages_scanned INTEGER NOT NULL DEFAULT 0,
+    duration_sec REAL NOT NULL DEFAULT 0,
+    outcome TEXT NOT NULL,
+    error TEXT,
+    requests INTEGER NOT NULL DEFAULT 0,
+    failed_requests INTEGER NOT NULL DEFAULT 0,
+    http_429 INTEGER NOT NULL DEFAULT 0,
+    selector_misses INTEGER NOT NULL DEFAULT 0,
+    challenges INTEGER NOT NULL DEFAULT 0,
+    phases TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS idx_scrape_runs_started ON scrape_runs(started_at);
+CREATE INDEX IF NOT EXISTS idx_scrape_runs_province ON scrape_runs(province, started_at);
+CREATE INDEX IF NOT EXISTS idx_scrape_runs_outcome ON scrape_runs(outcome, started_at);
+"""
+
+_COLUMNS = ('started_at', 'mode', 'province', 'property_type', 'requested', 'property_count', 'pages_scanned',
+            'duration_sec', 'outcome', 'error') + COUNTERS + ('phases',)
+_DEFAULTS: Dict[str, Any] = {
+    'mode': '', 'province': '', 'property_type': '', 'requested': 0, 'property_count': 0, 'pages_scanned': 0,
+    'duration_sec': 0.0, 'outcome': OUTCOME_OK, 'phases': {}, **dict.fromkeys(COUNTERS, 0),
+}
+
+
+def _iso(ts: float) -> str:
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(ts))
+
+
+class RunHistoryStore:
+    def __init__(self, path: str, retention_days: float = 30, max_rows: int = 50000) -> None:
+        self.path = path
+        self.retention_days = float(retention_days)
+        self.max_rows = max(1, int(max_rows))
+        self._write_lock = threading.Lock()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    # ------------------------------------------------------------------
+    # Write path
+    # ------------------------------------------------------------------
+    def record(self, run: Dict[str, Any], now: Optional[float] = None) -> int:
+        """Insert one run and apply the retention policy. Returns the run id."""
+        row = {**_DEFAULTS, 'started_at': time.time(), **{k: v for k, v in run.items() if v is not None}}
+        row['phases'] = json.dumps({k: round(float(v), 4) for k, v in row['phases'].items()}, sort_keys=True)
+        values = [row.get(name) for name in _COLUMNS]
+        now = float(now if now is not None else time.time())
+        with self._write_lock, closing(self._connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                cur = conn.execute(
+                    f"INSERT INTO scrape_runs ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                    values,
+                )
+                run_id = int(cur.lastrowid)
+                conn.execute('DELETE FROM scrape_runs WHERE started_at < ?', (now - self.retention_days * DAY_SEC,))
+                # Row cap: everything below the max_rows-th newest id
+                conn.execute(
+                    'DELETE FROM scrape_runs WHERE id <= '
+                    '(SELECT id FROM scrape_runs ORDER BY id DESC LIMIT 1 OFFSET ?)',
+                    (self.max_rows,),
+                )
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        return run_id
+
+    # ------------------------------------------------------------------
+    # Read path
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _where(province: Optional[str] = None, property_type: Optional[str] = None, mode: Optional[str] = None,
+               outcome: Optional[str] = None, since: Optional[float] = None,
+               until: Optional[float] = None) -> Tuple[str, List[Any]]:
+        clauses: List[str] = []
+        params: List[Any] = []
+        for column, value in (('province', province), ('property_type', property_type), ('mode', mode),
+                              ('outcome', outcome)):
+            if value:
+                clauses.append(f'{column} = ?')
+                params.append(value)
+        if since is not None:
+            clauses.append('started_at >= ?')
+            params.append(float(since))
+        if until is not None:
+            clauses.append('started_at < ?')
+            params.append(float(until))
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def runs(self, limit: int = 100, **filters: Any) -> List[Dict[str, Any]]:
+        """Matching runs, newest first."""
+        where, params = self._where(**filters)
+        with closing(self._connect()) as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(
+                f'SELECT * FROM scrape_runs{where} ORDER BY started_at DESC, id DESC LIMIT ?',
+                params + [max(1, int(limit))],
+            ).fetchall()
+        out = []
+        for row in rows:
+            run = dict(row)
+            run['phases'] = json.loads(run['phases'] or '{}')
+            run['started_at'] = _iso(run['started_at'])
+            run['duration_sec'] = round(run['duration_sec'], 3)
+            out.append(run)
+        return out
+
+    def aggregate(self, group_by: str, **filters: Any) -> List[Dict[str, Any]]:
+        """
+        Per-group run counts, outcome and cache hit rate, duration avg/p50/p95
+        (nearest rank, scrapes only: cached lookups are excluded) and summed
+        request / selector-miss / challenge counts. Largest groups first.
+        """
+        if group_by not in GROUP_BY:
+            raise ValueError(f'group_by must be one of {sorted(GROUP_BY)}')
+        key = GROUP_BY[group_by]
+        where, params = self._where(**filters)
+        scraped = f"{where} {'AND' if where else 'WHERE'} outcome != '{OUTCOME_CACHED}'"
+        percentile_columns = ', '.join(
+            f'MIN(CASE WHEN rn * 100 >= n * {p} THEN duration_sec END) AS p{p}' for p in PERCENTILES
+        )
+        with closing(self._connect()) as conn:
+            totals = conn.execute(
+                f"SELECT {key} AS grp, COUNT(*), SUM(outcome = '{OUTCOME_CACHED}'), "
+                f"SUM(outcome IN ('{OUTCOME_OK}', '{OUTCOME_PARTIAL}')), "
+                f"AVG(CASE WHEN outcome != '{OUTCOME_CACHED}' THEN duration_sec END), "
+                f"AVG(CASE WHEN outcome != '{OUTCOME_CACHED}' THEN property_count END), "
+                + ', '.join(f'SUM({c})' for c in COUNTERS)
+                + f' FROM scrape_runs{where} GROUP BY grp',
+                params,
+            ).fetchall()
+            percentiles = {
+                row[0]: row[1:] for row in conn.execute(
+                    f'SELECT grp, {percentile_columns} FROM ('
+                    f'  SELECT {key} AS grp, duration_sec,'
+                    f'         ROW_NUMBER() OVER (PARTITION BY {key} ORDER BY duration_sec) AS rn,'
+                    f'         COUNT(*) OVER (PARTITION BY {key}) AS n'
+                    f'  FROM scrape_runs{scraped}'
+                    f') GROUP BY grp',
+                    params,
+                )
+            }
+        groups = []
+        for grp, count, cached, succeeded, avg_duration, avg_properties, *sums in totals:
+            scrapes = count - (cached or 0)
+            group = {
+                group_by: grp,
+                'runs': count,
+                'scrapes': scrapes,
+                'cache_hit_rate': round((cached or 0) / count, 4) if count else None,
+                'success_rate': round((succeeded or 0) / scrapes, 4) if scrapes else None,
+                'duration_avg_sec': round(avg_duration, 3) if avg_duration is not None else None,
+                'property_count_avg': round(avg_properties, 1) if avg_properties is not None else None,
+            }
+            for p, value in zip(PERCENTILES, percentiles.get(grp, (None,) * len(PERCENTILES))):
+                group[f'duration_p{p}_sec'] = round(value, 3) if value is not None else None
+            group.update({name: int(value or 0) for name, value in zip(COUNTERS, sums)})
+            groups.append(group)
+        groups.sort(key=lambda g: (-g['runs'], str(g[group_by])))
+        return groups
+
+
+# ----------------------------------------------------------------------
+# Per-run collection
+# ----------------------------------------------------------------------
+class RunRecorder:
+    """Counters and phase timings for the scrape running in this context (thread-safe)."""
+
+    def __init__(self, mode: str, province: str, property_type: str, requested: int) -> None:
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.fields: Dict[str, Any] = {
+            'mode': mode,
+            'province': str(province),
+            'property_type': str(property_type),
+            'requested': int(requested or 0),
+        }
+        self.counts: Dict[str, int] = dict.fromkeys(COUNTERS, 0)
+        self.phases: Dict[str, float] = {}
+        self.early_exit = False
+        self._lock = threading.Lock()
+
+    def count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + amount
+
+    def add_phase(self, phase: str, seconds: float) -> None:
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def finish(self, outcome: str, error: Optional[str] = None) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.fields,
+                'started_at': self.started_at,
+                'duration_sec': time.perf_counter() - self._start,
+                'outcome': outcome,
+                'error': error,
+                'phases': dict(self.phases),
+                **self.counts,
+            }
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar('kairos_scrape_run', default=None)
+
+
+def count_run(name: str, amount: int = 1) -> None:
+    """Add to a counter of the run in progress (no-op outside one)."""
+    run = _current.get()
+    if run is not None:
+        run.count(name, amount)
+
+
+def annotate_run(property_count: Optional[int] = None, pages_scanned: Optional[int] = None,
+                 early_exit: Optional[bool] = None) -> None:
+    """Result figures the scraper knows at the end of a run (no-op outside one)."""
+    run = _current.get()
+    if run is None:
+        return
+    if property_count is not None:
+        run.fields['property_count'] = int(property_count)
+    if pages_scanned is not None:
+        run.fields['pages_scanned'] = int(pages_scanned)
+    if early_exit is not None:
+        run.early_exit = bool(early_exit)
+
+
+@contextmanager
+def timed_phase(phase: str) -> Iterator[None]:
+    """PHASE_SECONDS.time(phase=...) that also adds the time to the run in progress."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        PHASE_SECONDS.observe(elapsed, phase=phase)
+        run = _current.get()
+        if run is not None:
+            run.add_phase(phase, elapsed)
+
+
+def _outcome(run: RunRecorder, result: Any) -> str:
+    try:
+        empty = result is None or len(result) == 0
+    except TypeError:
+        empty = False
+    if empty:
+        return OUTCOME_EMPTY
+    return OUTCOME_PARTIAL if run.early_exit else OUTCOME_OK
+
+
+def _store_run(run: Dict[str, Any]) -> None:
+    try:
+        run_history_store().record(run)
+    except Exception as e:
+        print({'level': 'warning', 'event': 'run_history_write_failed', 'error': str(e)})
+
+
+def recorded_run(mode: str) -> Callable:
+    """
+    Decorator for scraper functions called as fn(province, property_type, num, ...):
+    record the call as one run. Nested calls inside a run are not recorded again,
+    and nothing is recorded in a process started with SCRAPE_RUNS_RECORD=0.
+    """
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(province: str, property_type: str, num: int, *args: Any, **kwargs: Any) -> Any:
+            if _current.get() is not None or os.getenv('SCRAPE_RUNS_RECORD', '1') == '0':
+                return fn(province, property_type, num, *args, **kwargs)
+            run = RunRecorder(mode, province, property_type, num)
+            token = _current.set(run)
+            try:
+                result = fn(province, property_type, num, *args, **kwargs)
+            except BaseException as e:
+                _current.reset(token)
+                outcome = _ERROR_OUTCOMES.get(type(e).__name__, OUTCOME_ERROR)
+                _store_run(run.finish(outcome, error=f'{type(e).__name__}: {e}'[:500]))
+                raise
+            _current.reset(token)
+            _store_run(run.finish(_outcome(run, result)))
+            return result
+        return wrapper
+    return decorator
+
+
+def record_cached_lookup(province: str, property_type: str, mode: str, requested: int) -> None:
+    """A CMA served from the result cache instead of a scrape (counted by cache_hit_rate)."""
+    _store_run({
+        'mode': mode,
+        'province': province,
+        'property_type': property_type,
+        'requested': int(requested or 0),
+        'outcome': OUTCOME_CACHED,
+    })
+
+
+_store: Optional[RunHistoryStore] = None
+_store_lock = threading.Lock()
+
+
+def run_history_path() -> str:
+    # Anchored at backend/ rather than the cwd: the app and its scraper subprocesses share one file
+    return os.getenv('SCRAPE_RUNS_DB_PATH', os.path.join(_BACKEND_DIR, 'data', 'scrape_runs.sqlite3'))
+
+
+def run_history_store() -> RunHistoryStore:
+    """Process-wide store, configured from env on first use (reopened if the path changes)."""
+    global _store
+    path = run_history_path()
+    with _store_lock:
+        if _store is None or _store.path != path:
+            _store = RunHistoryStore(
+                path,
+                retention_days=float(os.getenv('SCRAPE_RUNS_RETENTION_DAYS', '30')),
+                max_rows=int(os.getenv('SCRAPE_RUNS_MAX_ROWS', '50000')),
+            )
+        return _store
+
+
+__all__ = [
+    'COUNTERS',
+    'GROUP_BY',
+    'RunHistoryStore',
+    'RunRecorder',
+    'annotate_run',
+    'count_run',
+    'record_cached_lookup',
+    'recorded_run',
+    'run_history_path',
+    'run_history_store',
+    'timed_phase',
+]
@@ -0,0 +1,239 @@
+"""
+Opt-in span tracing for CMA requests.
+
+A trace is bound to the current request via a contextvar; span() records a
+timed, named interval into it (nested spans nest by time, as in a flame
+chart). When no trace is active span() returns a shared no-op object, so the
+instrumentation records nothing and allocates nothing when tracing is off.
+
+Finished traces are kept in a bounded in-memory store when they were forced
+(per-request opt-in) or ran longer than the slow threshold, and can be
+exported as Chrome trace-event JSON (chrome://tracing, Perfetto, speedscope).
+"""
+import contextvars
+import functools
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+TRACE_MODES = ('off', 'slow', 'always')
+
+_current: contextvars.ContextVar = contextvars.ContextVar('kairos_trace', default=None)
+
+
+class _NoopSpan:
+    def __enter__(self) -> '_NoopSpan':
+        return self
+
+    def __exit__(self, *exc: Any) -> bool:
+        return False
+
+    def set(self, **args: Any) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    __slots__ = ('trace', 'name', 'args', 'start', 'tid')
+
+    def __init__(self, trace: 'Trace', name: str, args: Dict[str, Any]) -> None:
+        self.trace = trace
+        self.name = name
+        self.args = args
+        self.start = 0.0
+        self.tid = 0
+
+    def __enter__(self) -> 'Span':
+        self.tid = threading.get_ident()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> bool:
+        end = time.perf_counter()
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        self.trace._add(self.name, self.start, end, self.tid, self.args)
+        return False
+
+    def set(self, **args: Any) -> None:
+        self.args.update(args)
+
+
+class Trace:
+    def __init__(self, name: str, forced: bool = False, **args: Any) -> None:
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.forced = forced
+        self.args = args
+        self.started_at = time.time()
+        self._origin = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self._token: Optional[contextvars.Token] = None
+        self._events: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def _add(self, name: str, start: float, end: float, tid: int, args: Dict[str, Any]) -> None:
+        event = {
+            'name': name,
+            'ts': (start - self._origin) * 1e6,
+            'dur': (end - start) * 1e6,
+            'tid': tid,
+            'args': args,
+        }
+        with self._lock:
+            self._events.append(event)
+
+    def finish(self) -> float:
+        self.duration_ms = (time.perf_counter() - self._origin) * 1000
+        return self.duration_ms
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = len(self._events)
+            fetches = sum(1 for e in self._events if 'url' in e['args'])
+        return {
+            'trace_id': self.trace_id,
+            'name': self.name,
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(self.started_at)),
+            'duration_ms': round(self.duration_ms or 0, 1),
+            'spans': spans,
+            'fetches': fetches,
+            'forced': self.forced,
+            'args': self.args,
+        }
+
+    def to_chrome(self) -> Dict[str, Any]:
+        """Chrome trace-event format: one complete ('X') event per span."""
+        with self._lock:
+            events = list(self._events)
+        trace_events = [{
+            'name': self.name,
+            'cat': 'request',
+            'ph': 'X',
+            'ts': 0,
+            'dur': (self.duration_ms or 0) * 1000,
+            'pid': 1,
+            'tid': events[0]['tid'] if events else 0,
+            'args': self.args,
+        }]
+        for e in events:
+            trace_events.append({
+                'name': e['name'],
+                'cat': 'fetch' if 'url' in e['args'] else 'span',
+                'ph': 'X',
+                'ts': round(e['ts'], 1),
+                'dur': round(e['dur'], 1),
+                'pid': 1,
+                'tid': e['tid'],
+                'args': e['args'],
+            })
+        return {'traceEvents': trace_events, 'displayTimeUnit': 'ms', 'otherData': self.summary()}
+
+
+class TraceStore:
+    """Most recent kept traces, oldest evicted first."""
+
+    def __init__(self, max_traces: int = 20) -> None:
+        self.max_traces = max(1, int(max_traces))
+        self._traces: 'OrderedDict[str, Trace]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, trace: Trace) -> None:
+        with self._lock:
+            self._traces[trace.trace_id] = trace
+            while len(self._traces) > self.max_traces:
+                self._traces.popitem(last=False)
+
+    def get(self, trace_id: str) -> Optional[Trace]:
+        with self._lock:
+            return self._traces.get(trace_id)
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            traces = list(self._traces.values())
+        return [t.summary() for t in reversed(traces)]
+
+
+class Tracer:
+    """
+    mode: 'off' (only forced requests), 'slow' (trace everything, keep runs
+    over slow_ms) or 'always' (keep every trace).
+    """
+
+    def __init__(self, mode: str = 'off', slow_ms: float = 20000, store: Optional[TraceStore] = None) -> None:
+        self.mode = mode if mode in TRACE_MODES else 'off'
+        self.slow_ms = float(slow_ms)
+        self.store = store or TraceStore()
+
+    def start(self, name: str, force: bool = False, **args: Any) -> Optional[Trace]:
+        if self.mode == 'off' and not force:
+            return None
+        trace = Trace(name, forced=force, **args)
+        trace._token = _current.set(trace)
+        return trace
+
+    def finish(self, trace: Optional[Trace]) -> bool:
+        """Close the trace; returns True when it was kept."""
+        if trace is None:
+            return False
+        duration_ms = trace.finish()
+        try:
+            _current.reset(trace._token)
+        except ValueError:
+            # Finished from a different context than it was started in
+            _current.set(None)
+        keep = trace.forced or self.mode == 'always' or (self.mode == 'slow' and duration_ms >= self.slow_ms)
+        if keep:
+            self.store.add(trace)
+        return keep
+
+
+def span(name: str, **args: Any):
+    """Timed span in the current trace; a shared no-op when none is active."""
+    trace = _current.get()
+    if trace is None:
+        return _NOOP
+    return Span(trace, name, args)
+
+
+def traced(name: str) -> Callable:
+    """Decorator: run the function inside span(name) when a trace is active."""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if _current.get() is None:
+                return fn(*args, **kwargs)
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+def tracer_from_env() -> Tracer:
+    return Tracer(
+        mode=os.getenv('CMA_TRACE', 'off').strip().lower(),
+        slow_ms=float(os.getenv('CMA_TRACE_SLOW_MS', '20000')),
+        store=TraceStore(int(os.getenv('CMA_TRACE_KEEP', '20'))),
+    )
+
+
+__all__ = [
+    'TRACE_MODES',
+    'Span',
+    'Trace',
+    'TraceStore',
+    'Tracer',
+    'span',
+    'traced',
+    'current_trace',
+    'tracer_from_env',
+]
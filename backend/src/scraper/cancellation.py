@@ -0,0 +1,87 @@
+"""
+Cooperative cancellation for a running scrape.
+
+A job binds a CancelToken to the current context with cancel_scope();
+fetch_page() and the scraper-subprocess reader call check_cancelled() and
+raise ScrapeCancelled once the token is cancelled, so no further pages are
+requested. Detail-page threads run in a copy of the context and see the
+same token. The token's `poll` callback (e.g. a lookup in the shared job
+store) is consulted at most every `interval` seconds, so a cancel request
+handled by another gunicorn worker still reaches the scrape. A scrape in a
+child process (CMA_SCRAPE_ISOLATION=process) cannot see the token; the
+waiting parent checks it instead and kills the child (see scrape_runner.py).
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+_current: contextvars.ContextVar = contextvars.ContextVar('kairos_cancel_token', default=None)
+
+
+class FetchStopped(RuntimeError):
+    """Raised by fetch_page when this scrape must not make further requests."""
+
+
+class ScrapeCancelled(FetchStopped):
+    """The job owning this scrape was cancelled."""
+
+
+class CancelToken:
+    def __init__(self, poll: Optional[Callable[[], bool]] = None, interval: float = 1.0) -> None:
+        self._poll = poll
+        self._interval = float(interval)
+        self._event = threading.Event()
+        self._last_poll = 0.0
+        self._lock = threading.Lock()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        if self._event.is_set():
+            return True
+        if self._poll is None:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_poll < self._interval:
+                return False
+            self._last_poll = now
+        try:
+            if self._poll():
+                self._event.set()
+        except Exception:
+            pass
+        return self._event.is_set()
+
+
+@contextmanager
+def cancel_scope(token: CancelToken) -> Iterator[CancelToken]:
+    reset = _current.set(token)
+    try:
+        yield token
+    finally:
+        _current.reset(reset)
+
+
+def current_token() -> Optional[CancelToken]:
+    return _current.get()
+
+
+def check_cancelled() -> None:
+    token = _current.get()
+    if token is not None and token.cancelled:
+        raise ScrapeCancelled('scrape cancelled')
+
+
+__all__ = [
+    'FetchStopped',
+    'ScrapeCancelled',
+    'CancelToken',
+    'cancel_scope',
+    'current_token',
+    'check_cancelled',
+]
@@ -0,0 +1,309 @@
+"""
+List-page-only ("card") scrape mode.
+
+Lamudi listing cards already carry price, floor area, bedrooms and location, so
+a CMA can be built from the listing pages alone: one request per listing page
+and zero detail requests. Rows are flagged detail_level="card". Optionally a
+bounded, evenly spaced sample of cards is enriched from its detail page
+(coordinates, amenities, agent) and flagged detail_level="detail".
+"""
+import json
+import random
+import re
+import time
+
+import pandas as pd
+
+from src.observability.metrics import CHALLENGE_PAGES, LIST_CANDIDATES, PAGES_SCANNED, SELECTOR_MISSES
+from src.observability.run_history import annotate_run, count_run, recorded_run
+from src.observability.tracing import traced
+from src.scraper.scraper import (
+    LAMUDI_BASE_URL,
+    build_headers,
+    build_session,
+    build_staging_df,
+    detect_max_page,
+    fetch_detail,
+    fetch_page,
+    get_max_pages_cap,
+    get_scraper_timeout,
+    is_challenge_page,
+    legacy_pause,
+    list_page_url,
+    parse_html,
+    write_diagnostics,
+    write_empty_outputs,
+    write_outputs,
+)
+from src.scraper.detail_levels import DETAIL_LEVEL_CARD, DETAIL_LEVEL_DETAIL
+from src.scraper.cancellation import FetchStopped
+from src.scraper.deadline import Deadline, analytics_reserve_sec, current_deadline, deadline_scope, list_budget_share
+
+_PRICE_RE = re.compile(r'₱\s*(\d[\d,]*(?:\.\d+)?)')
+_BEDROOMS_RE = re.compile(r'(\d+)\s*Bed(?:room)?s?', re.I)
+_BATHS_RE = re.compile(r'(\d+)\s*(?:Bath(?:room)?s?|T\s*&\s*B)', re.I)
+_AREA_RE = re.compile(r'(\d[\d\.,]*)\s*(?:m²|sqm|sq\s*m)', re.I)
+_SLUG_RE = re.compile(r'/property/([^/?#]+)')
+
+
+def _attr(card, *names):
+    """First non-empty value of any of the data attributes on the card or a descendant."""
+    for name in names:
+        if card.get(name) not in (None, ''):
+            return str(card.get(name)).strip()
+        node = card.select_one(f'[{name}]')
+        if node is not None and node.get(name) not in (None, ''):
+            return str(node.get(name)).strip()
+    return ''
+
+
+def _number(text):
+    try:
+        return float(str(text).replace(',', '').strip())
+    except Exception:
+        return None
+
+
+def parse_listing_card(card):
+    """
+    Extract a prop_details-shaped dict from one listing card.
+
+    Returns None when the card has no property link (ads, promos).
+    """
+    link = ''
+    for a in card.find_all('a', href=True):
+        href = a.get('href') or ''
+        if '/property/' in href:
+            link = f'{LAMUDI_BASE_URL}{href}' if href.startswith('/') else href
+            break
+    if not link:
+        return None
+    slug = _SLUG_RE.findall(link)
+    sku = _attr(card, 'data-sku', 'data-listing-id') or (slug[-1] if slug else '')
+    if not sku:
+        return None
+
+    text = card.get_text(' ', strip=True)
+
+    # Price: data attribute, then the first ₱ amount in the card
+    price = 0
+    raw_price = _number(_attr(card, 'data-price'))
+    if raw_price:
+        price = int(raw_price)
+    else:
+        m = _PRICE_RE.search(text)
+        if m:
+            price = int(_number(m.group(1)) or 0)
+
+    features = {}
+    bedrooms = _attr(card, 'data-bedrooms')
+    if not bedrooms:
+        m = _BEDROOMS_RE.search(text)
+        if m:
+            bedrooms = m.group(1)
+        elif 'studio' in text.lower():
+            bedrooms = '0'
+    if bedrooms:
+        features['Bedrooms'] = bedrooms
+
+    baths = _attr(card, 'data-bathrooms', 'data-baths')
+    if not baths:
+        m = _BATHS_RE.search(text)
+        if m:
+            baths = m.group(1)
+    if baths:
+        features['Baths'] = baths
+
+    # Floor area: clamp to plausible condo range 12–1000 sqm (same as detail pages)
+    area = _number(_attr(card, 'data-building_size', 'data-floor-area'))
+    if area is None:
+        m = _AREA_RE.search(text)
+        if m:
+            area = _number(m.group(1))
+    if area is not None and 12 <= area <= 1000:
+        features['Floor area (m²)'] = str(area)
+
+    location = ''
+    address_node = card.select_one('[class*="address"]')
+    if address_node is not None:
+        location = re.sub(' +', ' ', address_node.get_text(' ', strip=True).replace('\n', ''))
+
+    latitude = _attr(card, 'data-lat', 'data-latitude')
+    longitude = _attr(card, 'data-lon', 'data-longitude')
+    geo_point = _attr(card, 'data-geo-point')
+    if geo_point and not (latitude and longitude):
+        # Lamudi encodes geo points as "[lon, lat]"
+        try:
+            lon, lat = json.loads(geo_point)[:2]
+            latitude, longitude = str(lat), str(lon)
+        except Exception:
+            pass
+
+    return {
+        'SKU': sku,
+        'link': link,
+        'text_location': location,
+        'price': price,
+        'amenities': [],
+        'features': features,
+        'latitude': latitude,
+        'longitude': longitude,
+        'agent_name': '',
+        'agency_name': '',
+        'overview': '',
+        'detail_level': DETAIL_LEVEL_CARD,
+    }
+
+
+def extract_listing_cards(soup):
+    """All parseable listing cards on a listing page, in page order."""
+    cards = []
+    for card in soup.find_all('div', class_='ListingCell-row'):
+        try:
+            parsed = parse_listing_card(card)
+        except Exception:
+            parsed = None
+        if parsed:
+            cards.append(parsed)
+    return cards
+
+
+def enrich_sample(data, headers, session, sample_size, deadline=None):
+    """
+    Fill card rows from their detail pages for an evenly spaced sample.
+
+    Card values win where present; detail values fill the gaps (coordinates,
+    amenities, agent, missing features). Returns the number of rows enriched.
+    """
+    if sample_size <= 0 or not data:
+        return 0
+    step = max(1, len(data) // sample_size)
+    enriched = 0
+    for row in data[::step][:sample_size]:
+        if deadline is not None and time.time() >= deadline:
+            break
+        try:
+            detail = fetch_detail(row['link'], row['SKU'], headers, session=session)
+        except FetchStopped as e:
+            print(f"Stopping enrichment: {e}")
+            break
+        except Exception as e:
+            print(f"Error enriching {row['SKU']}: {e}")
+            continue
+        for key in ('text_location', 'price', 'latitude', 'longitude', 'agent_name', 'agency_name', 'overview'):
+            if not row.get(key) and detail.get(key):
+                row[key] = detail[key]
+        row['amenities'] = detail.get('amenities') or row['amenities']
+        row['features'] = {**detail.get('features', {}), **row['features']}
+        row['detail_level'] = DETAIL_LEVEL_DETAIL
+        enriched += 1
+        # Jittered delay between detail page fetches (0.3–0.8s) unless the adaptive pacer is on
+        legacy_pause(random.uniform(0.3, 0.8))
+    return enriched
+
+
+@traced('card_scraper')
+@recorded_run('card')
+def card_scraper(province, property_type, num, enrich=0, fetch_pool=None):
+    """
+    Scrape listing pages only. Same return contract as scraper().
+
+    Args:
+        enrich (int): number of cards to enrich from detail pages (0 = none).
+        fetch_pool (FetchPool, optional): shared rate-limited pool for all fetches.
+    """
+    print('SCRAPING (cards). . .')
+    start_time = time.time()
+    deadline = current_deadline() or Deadline.after(get_scraper_timeout(), reserve=analytics_reserve_sec())
+
+    base_list_url = list_page_url(province, property_type, 1)
+    headers = build_headers(base_list_url)
+    session = fetch_pool.session_for(headers) if fetch_pool is not None else build_session(base_list_url)
+    with deadline_scope(deadline):
+        first_page = parse_html(fetch_page(session, base_list_url, 'list_fetch', timeout=15).content)
+    capped_max_page_num = min(detect_max_page(first_page), get_max_pages_cap())
+
+    data = []
+    skus = set()
+    pages_scanned = 0
+    early_exit_triggered = False
+    list_deadline = deadline.budget(list_budget_share(), 'list')
+    for page_num in range(1, capped_max_page_num + 1):
+        if list_deadline.expired:
+            early_exit_triggered = True
+            list_deadline.mark_partial()
+            print(f"Early exit: list budget spent after {pages_scanned} pages")
+            break
+        try:
+            # Page 1 was already fetched for pagination; reuse it
+            if page_num == 1:
+                soup = first_page
+            else:
+                with deadline_scope(list_deadline):
+                    soup = parse_html(fetch_page(session, list_page_url(province, property_type, page_num), 'list_fetch').content)
+            pages_scanned += 1
+        except FetchStopped as e:
+            early_exit_triggered = True
+            print(f"Early exit on page {page_num}: {e}")
+            break
+        except Exception as e:
+            print(f"Error on page {page_num}: {e}")
+            continue
+        cards = extract_listing_cards(soup)
+        PAGES_SCANNED.inc()
+        LIST_CANDIDATES.inc(len(cards))
+        if not cards:
+            SELECTOR_MISSES.inc()
+            count_run('selector_misses')
+            if is_challenge_page(soup):
+                CHALLENGE_PAGES.inc()
+                count_run('challenges')
+        print({
+            'level': 'info',
+            'event': 'list_page_candidates',
+            'page': page_num,
+            'candidates_on_page': len(cards),
+        })
+        for card in cards:
+            if len(data) >= num:
+                break
+            if card['SKU'] in skus:
+                continue
+            skus.add(card['SKU'])
+            data.append(card)
+        if len(data) >= num:
+            break
+
+    print({
+        'level': 'info',
+        'event': 'list_pages_scanned',
+        'pages_scanned': pages_scanned,
+        'capped_max_page_num': capped_max_page_num,
+        'requested_num': int(num),
+        'collected_links': len(data),
+    })
+    if not data:
+        annotate_run(pages_scanned=pages_scanned, early_exit=early_exit_triggered)
+        return write_empty_outputs(province, property_type)
+
+    with deadline_scope(deadline.budget(1.0, 'detail')):
+        enriched = enrich_sample(data, headers, session, int(enrich))
+
+    listing_df = pd.DataFrame([[row['SKU'], row.pop('link')] for row in data], columns=['SKU', 'link'])
+    execution_time = time.time() - start_time
+    print(f"Card scraper completed: {len(data)} properties ({enriched} enriched) in {execution_time:.2f}s")
+
+    staging_df = build_staging_df(data, listing_df, province)
+    write_outputs(staging_df, province, property_type, data=data)
+    write_diagnostics(province, property_type, num, len(data), execution_time, early_exit_triggered, pages_scanned)
+    return staging_df
+
+
+__all__ = [
+    'DETAIL_LEVEL_CARD',
+    'DETAIL_LEVEL_DETAIL',
+    'parse_listing_card',
+    'extract_listing_cards',
+    'enrich_sample',
+    'card_scraper',
+]
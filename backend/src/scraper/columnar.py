@@ -0,0 +1,332 @@
+"""
+Typed, compressed Parquet copy of each scrape's staging data.
+
+write_parquet() stores one zstd-compressed file per scrape run under
+<SCRAPER_PARQUET_DIR>/province=<slug>/scrape_date=<YYYY-MM-DD>/ (hive
+partitioning, default backend/data/scraped/parquet). Columns keep real dtypes:
+prices and areas as floats, bedroom/bath counts as nullable ints, amenities
+as a list<string> column plus an `amenity_mask` bitmask over AMENITY_BITS,
+and detail-page features as a map instead of stringified dicts.
+
+load_listings() reads only the columns a query asks for and skips partitions
+outside the requested province/date range; listing_files() names the files
+it can read, so a caller can fold in only the ones it has not seen.
+
+compact_parquet() keeps the file count down: each finished day's files are
+merged into one per partition, and partitions older than
+SCRAPER_PARQUET_RETENTION_DAYS (default 180, 0 keeps everything) are deleted.
+Today's partitions are left alone while scrapes still write into them.
+
+pyarrow is imported on first use. When it is missing the CSV outputs are
+written as before and the Parquet export is skipped.
+"""
+import fcntl
+import os
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+import pandas as pd
+
+# Bit i of amenity_mask is set when the listing has AMENITY_BITS[i] (raw Lamudi keys)
+AMENITY_BITS = ('gite', 'fitness_center', 'pool', 'security', 'camera_indoor', 'room_service', 'local_parking')
+# Staging-frame column each bit is exported as by build_staging_df
+AMENITY_COLUMNS = ('Club House', 'Gym', 'Swimming Pool', 'Security', 'CCTV', 'Reception Area', 'Parking Area')
+
+# Anchored at backend/ rather than the cwd, like the app's other data stores
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# staging column -> Parquet column
+_STAGING_COLUMNS = {
+    'SKU': 'sku',
+    'Name': 'name',
+    'Location': 'location',
+    'City/Town': 'city',
+    'TCP': 'price',
+    'Floor_Area': 'floor_area',
+    'Bedrooms': 'bedrooms',
+    'Baths': 'baths',
+    'latitude': 'latitude',
+    'longitude': 'longitude',
+    'detail_level': 'detail_level',
+    'Agent': 'agent',
+    'Description': 'description',
+    'Source': 'source',
+}
+
+_warned_missing = False
+
+
+def parquet_enabled() -> bool:
+    """SCRAPER_PARQUET_EXPORT (default 1) and pyarrow importable."""
+    global _warned_missing
+    if os.getenv('SCRAPER_PARQUET_EXPORT', '1').strip().lower() in ('0', 'false', 'no', 'off'):
+        return False
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        if not _warned_missing:
+            _warned_missing = True
+            print({'level': 'warn', 'event': 'parquet_export_disabled', 'reason': 'pyarrow not installed'})
+        return False
+    return True
+
+
+def parquet_root() -> str:
+    return os.getenv('SCRAPER_PARQUET_DIR', os.path.join(_BACKEND_DIR, 'data', 'scraped', 'parquet'))
+
+
+def _schema():
+    import pyarrow as pa
+    return pa.schema([
+        ('sku', pa.string()),
+        ('name', pa.string()),
+        ('location', pa.string()),
+        ('city', pa.string()),
+        ('property_type', pa.dictionary(pa.int8(), pa.string())),
+        ('price', pa.float64()),
+        ('floor_area', pa.float32()),
+        ('bedrooms', pa.int16()),
+        ('baths', pa.int16()),
+        ('latitude', pa.float64()),
+        ('longitude', pa.float64()),
+        ('detail_level', pa.dictionary(pa.int8(), pa.string())),
+        ('agent', pa.string()),
+        ('description', pa.string()),
+        ('source', pa.string()),
+        ('amenities', pa.list_(pa.string())),
+        ('amenity_mask', pa.uint16()),
+        ('features', pa.map_(pa.string(), pa.string())),
+        ('scraped_at', pa.timestamp('ms', tz='UTC')),
+    ])
+
+
+def _partitioning():
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    return ds.partitioning(pa.schema([('province', pa.string()), ('scrape_date', pa.string())]), flavor='hive')
+
+
+def amenity_mask(amenities: Sequence[str]) -> int:
+    mask = 0
+    for name in amenities or ():
+        if name in AMENITY_BITS:
+            mask |= 1 << AMENITY_BITS.index(name)
+    return mask
+
+
+def amenities_from_mask(mask: int) -> List[str]:
+    return [name for i, name in enumerate(AMENITY_BITS) if int(mask) & (1 << i)]
+
+
+def _numeric(series: pd.Series) -> pd.Series:
+    # Bedrooms/Baths/areas arrive as "2", "2+", "45 m²" or already numeric
+    if series.dtype == object:
+        series = series.astype(str).str.extract(r'(-?\d+(?:\.\d+)?)', expand=False)
+    return pd.to_numeric(series, errors='coerce')
+
+
+def to_table(staging_df: pd.DataFrame, property_type: str, data: Optional[List[Dict[str, Any]]] = None,
+             scraped_at: Optional[datetime] = None):
+    """Typed Arrow table for one scrape; `data` (raw detail/card dicts) supplies full amenity lists and features."""
+    import pyarrow as pa
+
+    scraped_at = _utc(scraped_at)
+    frame = pd.DataFrame({target: staging_df[source] if source in staging_df.columns else None
+                          for source, target in _STAGING_COLUMNS.items()}, index=staging_df.index)
+    for column in ('price', 'floor_area', 'latitude', 'longitude', 'bedrooms', 'baths'):
+        frame[column] = _numeric(frame[column])
+    for column in ('bedrooms', 'baths'):
+        frame[column] = frame[column].round().astype('Int16')
+    for column in ('latitude', 'longitude'):
+        # build_staging_df fills missing coordinates with 0
+        frame[column] = frame[column].where(frame[column] != 0)
+    for column in ('sku', 'name', 'location', 'city', 'detail_level', 'agent', 'description', 'source'):
+        frame[column] = frame[column].where(frame[column].notna(), None)
+        frame[column] = frame[column].map(lambda v: None if v is None else str(v))
+    for column in ('agent', 'description'):
+        # build_staging_df fills a missing agent/description with 0
+        frame[column] = frame[column].map(lambda v: None if v in ('', '0') else v)
+
+    raw_by_sku = {row.get('SKU'): row for row in (data or []) if isinstance(row, dict)}
+    amenities: List[List[str]] = []
+    features: List[List[tuple]] = []
+    for sku, (_, staged) in zip(frame['sku'], staging_df.iterrows()):
+        raw = raw_by_sku.get(sku)
+        if raw is not None and raw.get('amenities') is not None:
+            names = [str(a) for a in raw.get('amenities') or []]
+        else:
+            # Fall back to the one-hot columns the staging frame kept
+            names = [bit for bit, column in zip(AMENITY_BITS, AMENITY_COLUMNS)
+                     if column in staging_df.columns and _truthy(staged.get(column))]
+        amenities.append(names)
+        raw_features = (raw or {}).get('features') or {}
+        features.append([(str(k), str(v)) for k, v in raw_features.items() if v is not None])
+
+    frame['property_type'] = property_type
+    frame['amenities'] = amenities
+    frame['amenity_mask'] = [amenity_mask(names) for names in amenities]
+    frame['features'] = features
+    # The column is millisecond precision; a current-time datetime carries microseconds
+    frame['scraped_at'] = pd.Timestamp(scraped_at).floor('ms')
+    table = pa.Table.from_pandas(frame.reset_index(drop=True), schema=_schema(), preserve_index=False)
+    # The pandas round-trip metadata is ~7KB per file, more than a typical run's data
+    return table.replace_schema_metadata(None)
+
+
+def _utc(moment: Optional[datetime]) -> datetime:
+    if moment is None:
+        return datetime.now(timezone.utc)
+    return moment.replace(tzinfo=timezone.utc) if moment.tzinfo is None else moment.astimezone(timezone.utc)
+
+
+def _truthy(value: Any) -> bool:
+    try:
+        return bool(value) and not pd.isna(value) and float(value) > 0
+    except (TypeError, ValueError):
+        return bool(value)
+
+
+def write_parquet(staging_df: pd.DataFrame, province: str, property_type: str,
+                  data: Optional[List[Dict[str, Any]]] = None, root: Optional[str] = None,
+                  scraped_at: Optional[datetime] = None) -> Optional[str]:
+    """Write one scrape run into the partitioned dataset; returns the file path (None if skipped)."""
+    if staging_df is None or staging_df.empty or not parquet_enabled():
+        return None
+    import pyarrow.parquet as pq
+
+    scraped_at = _utc(scraped_at)
+    table = to_table(staging_df, property_type, data=data, scraped_at=scraped_at)
+    directory = os.path.join(root or parquet_root(), f'province={province.lower()}',
+                             f'scrape_date={scraped_at.date().isoformat()}')
+    os.makedirs(directory, exist_ok=True)
+    name = f'{property_type}-{scraped_at.strftime("%H%M%S")}-{uuid.uuid4().hex[:8]}.parquet'
+    path = os.path.join(directory, name)
+    # Write under a dot-name (skipped by readers) then rename into place
+    tmp_path = os.path.join(directory, f'.{name}.tmp')
+    pq.write_table(table, tmp_path, compression='zstd')
+    os.replace(tmp_path, path)
+    return path
+
+
+def listing_files(root: Optional[str] = None) -> List[str]:
+    """Paths, relative to the dataset root, of every finished export file (sorted)."""
+    root = root or parquet_root()
+    found = []
+    for directory, subdirs, names in os.walk(root):
+        subdirs[:] = [d for d in subdirs if not d.startswith(('.', '_'))]
+        found.extend(os.path.relpath(os.path.join(directory, name), root) for name in names
+                     if name.endswith('.parquet') and not name.startswith(('.', '_')))
+    return sorted(found)
+
+
+def compact_parquet(root: Optional[str] = None, retention_days: Optional[float] = None,
+                    today: Optional[date] = None) -> Dict[str, int]:
+    """
+    Delete partitions past retention and merge each earlier day's files into
+    one file per partition. Returns counts of files removed and merged away.
+    Does nothing while another process is compacting the same root.
+    """
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    counts = {'expired': 0, 'compacted': 0}
+    root = root or parquet_root()
+    if not os.path.isdir(root) or not parquet_enabled():
+        return counts
+    if retention_days is None:
+        retention_days = float(os.getenv('SCRAPER_PARQUET_RETENTION_DAYS', '180'))
+    today = today or datetime.now(timezone.utc).date()
+    cutoff = (today - timedelta(days=retention_days)).isoformat() if retention_days > 0 else ''
+
+    with open(os.path.join(root, '.compact.lock'), 'a') as lock:
+        try:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return counts
+        partitions: Dict[str, List[str]] = {}
+        for relative in listing_files(root):
+            partitions.setdefault(os.path.dirname(relative), []).append(os.path.join(root, relative))
+        for partition, paths in sorted(partitions.items()):
+            day = next((part.split('=', 1)[1] for part in partition.split(os.sep)
+                        if part.startswith('scrape_date=')), None)
+            if day is None or day >= today.isoformat():
+                continue
+            if day < cutoff:
+                for path in paths:
+                    os.remove(path)
+                counts['expired'] += len(paths)
+                try:
+                    os.rmdir(os.path.join(root, partition))
+                except OSError:
+                    pass
+                continue
+            if len(paths) < 2:
+                continue
+            # Older files lack later columns; reading through the schema fills them with nulls
+            table = ds.dataset(paths, format='parquet', schema=_schema()).to_table()
+            table = table.sort_by('scraped_at')
+            directory = os.path.join(root, partition)
+            name = f'compacted-{uuid.uuid4().hex[:8]}.parquet'
+            tmp_path = os.path.join(directory, f'.{name}.tmp')
+            pq.write_table(table, tmp_path, compression='zstd')
+            os.replace(tmp_path, os.path.join(directory, name))
+            # Readers may see the rows twice until this finishes, never not at all
+            for path in paths:
+                os.remove(path)
+            counts['compacted'] += len(paths)
+    return counts
+
+
+def load_listings(columns: Optional[Sequence[str]] = None, province: Optional[str] = None,
+                  property_type: Optional[str] = None, since: Optional[date] = None,
+                  until: Optional[date] = None, root: Optional[str] = None,
+                  files: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """
+    Read the exported listings as a DataFrame.
+
+    Only `columns` are read from disk (all when None; `province` and
+    `scrape_date` come from the partition path). province/since/until prune
+    whole partitions before any file is opened. `files` (paths relative to
+    the root, see listing_files) limits the read to those files.
+    """
+    import pyarrow.dataset as ds
+
+    root = root or parquet_root()
+    if not os.path.isdir(root) or (files is not None and not files):
+        return pd.DataFrame(columns=list(columns or []))
+    # One schema for every file: columns added later read as null in older files
+    schema = _schema()
+    for field in _partitioning().schema:
+        schema = schema.append(field)
+    if files is None:
+        dataset = ds.dataset(root, format='parquet', schema=schema, partitioning=_partitioning(),
+                             ignore_prefixes=['.', '_'])
+    else:
+        dataset = ds.dataset([os.path.join(root, f) for f in files], format='parquet', schema=schema,
+                             partitioning=_partitioning(), partition_base_dir=root)
+    condition = None
+    for clause in (
+        ds.field('province') == province.lower() if province else None,
+        ds.field('scrape_date') >= since.isoformat() if since else None,
+        ds.field('scrape_date') <= until.isoformat() if until else None,
+        ds.field('property_type') == property_type if property_type else None,
+    ):
+        if clause is not None:
+            condition = clause if condition is None else condition & clause
+    return dataset.to_table(columns=list(columns) if columns else None, filter=condition).to_pandas()
+
+
+__all__ = [
+    'AMENITY_BITS',
+    'AMENITY_COLUMNS',
+    'parquet_enabled',
+    'parquet_root',
+    'amenity_mask',
+    'amenities_from_mask',
+    'to_table',
+    'write_parquet',
+    'listing_files',
+    'compact_parquet',
+    'load_listings',
+]
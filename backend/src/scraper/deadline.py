@@ -0,0 +1,132 @@
+"""
+One deadline per scrape request, carried through every layer.
+
+The outermost caller (execute_cma, a crawl unit, or scraper() when run on
+its own) binds a Deadline with deadline_scope(); `reserve` seconds of it are
+held back for normalization and analytics. Each scrape phase takes its own
+slice with budget(): the list phase SCRAPER_LIST_BUDGET_SHARE of what is
+left, the detail phase everything else.
+
+fetch_page() calls check_deadline() before each request: a fetch that cannot
+finish in the time left is not started (DeadlineExceeded, a FetchStopped, so
+the loops stop and keep what they have) and socket timeouts are capped to
+the time left. Every early stop is recorded on the root Deadline, so the API
+can return the partial result with meta.partial instead of a 504.
+"""
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+from src.scraper.cancellation import FetchStopped
+
+_current: contextvars.ContextVar = contextvars.ContextVar('kairos_deadline', default=None)
+
+# Never start a fetch with less than this left, whatever its expected latency
+MIN_FETCH_SEC = 0.5
+
+
+class DeadlineExceeded(FetchStopped):
+    """The request's time budget cannot fit another fetch."""
+
+
+class Deadline:
+    def __init__(self, at: float, reserve: float = 0.0, name: str = 'request',
+                 parent: Optional['Deadline'] = None) -> None:
+        self.at = float(at)
+        self.reserve = max(0.0, float(reserve))
+        self.name = name
+        self._root = parent._root if parent is not None else self
+        self._reasons: List[str] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def after(cls, seconds: float, reserve: float = 0.0, name: str = 'request') -> 'Deadline':
+        return cls(time.time() + float(seconds), reserve=reserve, name=name)
+
+    def remaining(self) -> float:
+        """Seconds left for scraping, net of the analytics reserve."""
+        return max(0.0, self.at - self.reserve - time.time())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def budget(self, share: float, name: str) -> 'Deadline':
+        """A phase deadline at `share` of the time left now; early stops are reported to the root."""
+        share = min(1.0, max(0.0, float(share)))
+        return Deadline(time.time() + self.remaining() * share, name=name, parent=self)
+
+    def mark_partial(self, reason: Optional[str] = None) -> None:
+        root = self._root
+        reason = reason or self.name
+        with root._lock:
+            if reason not in root._reasons:
+                root._reasons.append(reason)
+
+    @property
+    def partial(self) -> bool:
+        return bool(self._root._reasons)
+
+    @property
+    def reasons(self) -> List[str]:
+        with self._root._lock:
+            return list(self._root._reasons)
+
+
+@contextmanager
+def deadline_scope(deadline: Deadline) -> Iterator[Deadline]:
+    reset = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(reset)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
+
+
+def check_deadline(expected: float = 0.0) -> Optional[float]:
+    """Seconds left for a fetch expected to take `expected` seconds (None without a deadline).
+
+    Raises DeadlineExceeded, and marks the scrape partial, when it could not finish in time.
+    """
+    deadline = _current.get()
+    if deadline is None:
+        return None
+    left = deadline.remaining()
+    if left <= max(MIN_FETCH_SEC, expected):
+        deadline.mark_partial()
+        raise DeadlineExceeded(f'{deadline.name} budget: {left:.1f}s left')
+    return left
+
+
+def list_budget_share() -> float:
+    """Share of a scrape's time the list phase may use (SCRAPER_LIST_BUDGET_SHARE, default 0.4)."""
+    try:
+        return min(1.0, max(0.05, float(os.getenv('SCRAPER_LIST_BUDGET_SHARE', '0.4'))))
+    except Exception:
+        return 0.4
+
+
+def analytics_reserve_sec() -> float:
+    """Seconds kept back from scraping for normalization/analytics (SCRAPER_ANALYTICS_RESERVE_SEC, default 5)."""
+    try:
+        return max(0.0, float(os.getenv('SCRAPER_ANALYTICS_RESERVE_SEC', '5')))
+    except Exception:
+        return 5.0
+
+
+__all__ = [
+    'MIN_FETCH_SEC',
+    'DeadlineExceeded',
+    'Deadline',
+    'deadline_scope',
+    'current_deadline',
+    'check_deadline',
+    'list_budget_share',
+    'analytics_reserve_sec',
+]
@@ -0,0 +1,14 @@
+"""
+Scrape detail levels, kept dependency-free so the API can reference them
+without importing the scraping stack (pandas, bs4).
+
+- card: listing-page fields only
+- detail: card row enriched from its detail page
+"""
+DETAIL_LEVEL_CARD = 'card'
+DETAIL_LEVEL_DETAIL = 'detail'
+
+__all__ = [
+    'DETAIL_LEVEL_CARD',
+    'DETAIL_LEVEL_DETAIL',
+]
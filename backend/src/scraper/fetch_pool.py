@@ -0,0 +1,111 @@
+"""
+Shared, rate-limited fetch pool.
+
+Several scrapes running at once (e.g. a multi-province batch) hand their page
+fetches to one FetchPool so Lamudi sees a single, paced client instead of N
+independent ones. PooledSession exposes the requests.Session.get() interface
+the scraper already uses, so scrapers take it as a drop-in `session`.
+"""
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens/sec, bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None) -> None:
+        self.rate = max(0.01, float(rate))
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Block until a token is available. Returns seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return waited
+                delay = (1.0 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class FetchPool:
+    """Bounded concurrency + token-bucket pacing over one keep-alive session."""
+
+    def __init__(self, rate: float = 2.0, concurrency: int = 4, headers: Optional[Dict[str, str]] = None) -> None:
+        self.bucket = TokenBucket(rate)
+        self.concurrency = max(1, int(concurrency))
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if headers:
+            self.session.headers.update(headers)
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, Any] = {
+            'requests': 0,
+            'errors': 0,
+            'bytes': 0,
+            'in_flight': 0,
+            'wait_sec': 0.0,
+        }
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None, timeout: float = 7) -> requests.Response:
+        with self._slots:
+            waited = self.bucket.acquire()
+            with self._stats_lock:
+                self._stats['in_flight'] += 1
+                self._stats['wait_sec'] += waited
+            try:
+                response = self.session.get(url, headers=headers, timeout=timeout)
+            except Exception:
+                with self._stats_lock:
+                    self._stats['errors'] += 1
+                raise
+            finally:
+                with self._stats_lock:
+                    self._stats['in_flight'] -= 1
+                    self._stats['requests'] += 1
+            with self._stats_lock:
+                self._stats['bytes'] += len(response.content or b'')
+            return response
+
+    def session_for(self, headers: Optional[Dict[str, str]] = None) -> 'PooledSession':
+        return PooledSession(self, headers)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            snapshot = dict(self._stats)
+        snapshot['wait_sec'] = round(snapshot['wait_sec'], 2)
+        return snapshot
+
+
+class PooledSession:
+    """requests.Session-like view of a FetchPool with per-scrape default headers."""
+
+    def __init__(self, pool: FetchPool, headers: Optional[Dict[str, str]] = None) -> None:
+        self.pool = pool
+        self.headers: Dict[str, str] = dict(headers or {})
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None, timeout: float = 7) -> requests.Response:
+        merged = {**self.headers, **(headers or {})}
+        return self.pool.get(url, headers=merged or None, timeout=timeout)
+
+
+__all__ = [
+    'TokenBucket',
+    'FetchPool',
+    'PooledSession',
+]
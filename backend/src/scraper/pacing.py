@@ -0,0 +1,292 @@
+"""
+Adaptive request pacing (AIMD) and a circuit breaker for upstream fetches.
+
+AdaptivePacer keeps a request rate per host. Healthy responses raise it
+additively (+increase_rps per second of successful traffic), while congestion
+signals cut it multiplicatively, at most once per cooldown window. The signals
+are 429/503, a security challenge page, or latency well above the observed
+baseline. In-flight requests are capped near rate x latency (Little's law),
+so concurrency grows only while the site keeps up.
+
+CircuitBreaker opens after `threshold` consecutive blocking responses
+(429/503/challenge). While open, fetches fail fast with CircuitOpenError
+instead of digging the ban deeper. After a cooldown a single probe request
+is let through (half-open): success closes the breaker, failure reopens it
+with a doubled cooldown. A probe that raises counts as a failure when the
+network failed, and otherwise (deadline, cancellation) hands the probe to
+the next fetch; either way the breaker never waits on an answer that will
+not come.
+"""
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+from src.observability.metrics import REGISTRY
+from src.scraper.cancellation import FetchStopped
+
+CHALLENGE_MARKERS = (b'security verification', b'solve this math problem')
+
+PACER_RATE = REGISTRY.gauge('kairos_pacer_rate_rps', 'Current adaptive request rate per host.', ['host'])
+PACER_LIMIT = REGISTRY.gauge('kairos_pacer_concurrency_limit', 'Current adaptive in-flight limit per host.', ['host'])
+BREAKER_OPEN = REGISTRY.gauge('kairos_breaker_open', '1 while the circuit breaker for a host is open.', ['host'])
+
+
+class CircuitOpenError(FetchStopped):
+    """Raised instead of fetching while the host's circuit breaker is open."""
+
+
+def looks_like_challenge(content: Optional[bytes]) -> bool:
+    """Cheap byte-level check for the bot/security verification page."""
+    if not content:
+        return False
+    head = content[:200_000].lower()
+    return any(marker in head for marker in CHALLENGE_MARKERS)
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, threshold: int = 5, cooldown_sec: float = 30.0, max_cooldown_sec: float = 600.0) -> None:
+        self.threshold = max(1, int(threshold))
+        self.base_cooldown = float(cooldown_sec)
+        self.max_cooldown = float(max_cooldown_sec)
+        self.cooldown = self.base_cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record(self, blocked: bool) -> None:
+        with self._lock:
+            if not blocked:
+                self.state = self.CLOSED
+                self.failures = 0
+                self.cooldown = self.base_cooldown
+                self._probe_in_flight = False
+                return
+            self.failures += 1
+            if self.state == self.HALF_OPEN:
+                # Probe failed: back off harder
+                self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+                self._open()
+            elif self.failures >= self.threshold:
+                self._open()
+
+    def record_error(self, congestion: bool) -> None:
+        """A fetch raised instead of answering; only matters while its probe is half-open."""
+        with self._lock:
+            if self.state != self.HALF_OPEN:
+                return
+            if congestion:
+                self.failures += 1
+                self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+                self._open()
+            else:
+                self._probe_in_flight = False
+
+    def _open(self) -> None:
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self._probe_in_flight = False
+
+    def retry_in(self) -> float:
+        with self._lock:
+            if self.state != self.OPEN:
+                return 0.0
+            return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+
+class AdaptivePacer:
+    def __init__(self, initial_rps: float = 2.0, min_rps: float = 0.2, max_rps: float = 8.0,
+                 increase_rps: float = 0.25, decrease_factor: float = 0.5, max_concurrency: int = 4,
+                 latency_factor: float = 2.5, min_latency_alarm_sec: float = 1.5,
+                 breaker: Optional[CircuitBreaker] = None, jitter: float = 0.2) -> None:
+        self.min_rps = float(min_rps)
+        self.max_rps = float(max_rps)
+        self.rate = min(self.max_rps, max(self.min_rps, float(initial_rps)))
+        self.increase_rps = float(increase_rps)
+        self.decrease_factor = float(decrease_factor)
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.latency_factor = float(latency_factor)
+        self.min_latency_alarm = float(min_latency_alarm_sec)
+        self.breaker = breaker or CircuitBreaker()
+        self.jitter = float(jitter)
+
+        self.latency_ewma: Optional[float] = None
+        self.latency_baseline: Optional[float] = None
+        self.in_flight = 0
+        self._next_send = 0.0
+        self._last_decrease = 0.0
+        self._blocked_until = 0.0
+        self._cond = threading.Condition()
+        self.stats: Dict[str, int] = {'requests': 0, 'throttled': 0, 'challenges': 0, 'slow': 0, 'errors': 0, 'rejected': 0}
+
+    # ------------------------------------------------------------------
+    def concurrency_limit(self) -> int:
+        latency = self.latency_ewma or 1.0
+        return max(1, min(self.max_concurrency, int(self.rate * latency + 0.5)))
+
+    def acquire(self) -> float:
+        """Wait for a pacing slot and return seconds waited; raises CircuitOpenError while the breaker is open."""
+        if not self.breaker.allow():
+            with self._cond:
+                self.stats['rejected'] += 1
+            raise CircuitOpenError(f'circuit open, retry in {self.breaker.retry_in():.0f}s')
+        with self._cond:
+            while self.in_flight >= self.concurrency_limit():
+                self._cond.wait(timeout=1.0)
+            now = time.monotonic()
+            send_at = max(now, self._next_send, self._blocked_until)
+            gap = 1.0 / self.rate
+            self._next_send = send_at + gap * random.uniform(1 - self.jitter, 1 + self.jitter)
+            self.in_flight += 1
+        delay = send_at - now
+        if delay > 0:
+            time.sleep(delay)
+        return max(0.0, delay)
+
+    def release(self, status: Optional[int], latency: float, challenge: bool = False,
+                retry_after: Optional[float] = None, failed: bool = False) -> None:
+        throttled = status in (429, 503)
+        blocked = throttled or challenge
+        with self._cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            self.stats['requests'] += 1
+            slow = False
+            if status is not None and not blocked:
+                self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+                if self.latency_baseline is None or self.latency_ewma < self.latency_baseline:
+                    self.latency_baseline = self.latency_ewma
+                else:
+                    # Baseline drifts up slowly so a permanent shift is not a permanent alarm
+                    self.latency_baseline += 0.01 * (self.latency_ewma - self.latency_baseline)
+                slow = (self.latency_ewma > self.min_latency_alarm
+                        and self.latency_ewma > self.latency_factor * self.latency_baseline)
+            if throttled:
+                self.stats['throttled'] += 1
+            if challenge:
+                self.stats['challenges'] += 1
+            if slow:
+                self.stats['slow'] += 1
+            if failed:
+                self.stats['errors'] += 1
+
+            now = time.monotonic()
+            if blocked or slow or failed:
+                # Multiplicative decrease, once per window of roughly one request gap + latency
+                window = 1.0 / self.rate + (self.latency_ewma or 0.0)
+                if now - self._last_decrease >= window:
+                    self.rate = max(self.min_rps, self.rate * self.decrease_factor)
+                    self._last_decrease = now
+                if retry_after:
+                    self._blocked_until = max(self._blocked_until, now + min(retry_after, 120.0))
+            elif status is not None:
+                # Additive increase: +increase_rps per second's worth of healthy requests
+                self.rate = min(self.max_rps, self.rate + self.increase_rps / self.rate)
+            self._cond.notify_all()
+        if status is not None:
+            self.breaker.record(blocked)
+        else:
+            self.breaker.record_error(failed)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                'rate_rps': round(self.rate, 3),
+                'concurrency_limit': self.concurrency_limit(),
+                'in_flight': self.in_flight,
+                'latency_ewma_ms': round((self.latency_ewma or 0) * 1000, 1),
+                'breaker': self.breaker.state,
+                **self.stats,
+            }
+
+
+def _retry_after_seconds(response: Any) -> Optional[float]:
+    try:
+        value = response.headers.get('Retry-After')
+        return float(value) if value else None
+    except Exception:
+        return None
+
+
+def record_response(pacer: AdaptivePacer, response: Any, latency: float) -> None:
+    """Feed one completed fetch back into the pacer (status, latency, challenge detection)."""
+    status = getattr(response, 'status_code', None)
+    throttled = status in (429, 503)
+    pacer.release(status, latency,
+                  challenge=looks_like_challenge(getattr(response, 'content', b'')),
+                  retry_after=_retry_after_seconds(response) if throttled else None)
+
+
+def record_error(pacer: AdaptivePacer, latency: float, congestion: bool = True) -> None:
+    """Release the slot of a fetch that raised; connection errors / timeouts count as congestion."""
+    pacer.release(None, latency, failed=congestion)
+
+
+def pacing_enabled() -> bool:
+    return os.getenv('SCRAPER_ADAPTIVE_PACING', '1') == '1'
+
+
+_pacers: Dict[str, AdaptivePacer] = {}
+_pacers_lock = threading.Lock()
+
+
+def pacer_for(url: str) -> AdaptivePacer:
+    """Process-wide pacer for the URL's host, configured from env on first use."""
+    host = urlparse(url).netloc or 'default'
+    with _pacers_lock:
+        pacer = _pacers.get(host)
+        if pacer is None:
+            pacer = AdaptivePacer(
+                initial_rps=float(os.getenv('SCRAPER_PACE_INITIAL_RPS', '2')),
+                min_rps=float(os.getenv('SCRAPER_PACE_MIN_RPS', '0.2')),
+                max_rps=float(os.getenv('SCRAPER_PACE_MAX_RPS', '8')),
+                max_concurrency=int(os.getenv('SCRAPER_PACE_MAX_CONCURRENCY', '4')),
+                breaker=CircuitBreaker(
+                    threshold=int(os.getenv('SCRAPER_BREAKER_THRESHOLD', '5')),
+                    cooldown_sec=float(os.getenv('SCRAPER_BREAKER_COOLDOWN_SEC', '30')),
+                ),
+            )
+            _pacers[host] = pacer
+            PACER_RATE.set_function(lambda p=pacer: p.rate, host=host)
+            PACER_LIMIT.set_function(lambda p=pacer: p.concurrency_limit(), host=host)
+            BREAKER_OPEN.set_function(lambda p=pacer: 1 if p.breaker.state == CircuitBreaker.OPEN else 0, host=host)
+        return pacer
+
+
+def pacer_snapshots() -> Dict[str, Dict[str, Any]]:
+    with _pacers_lock:
+        pacers = dict(_pacers)
+    return {host: pacer.snapshot() for host, pacer in pacers.items()}
+
+
+__all__ = [
+    'CHALLENGE_MARKERS',
+    'CircuitOpenError',
+    'CircuitBreaker',
+    'AdaptivePacer',
+    'looks_like_challenge',
+    'record_response',
+    'record_error',
+    'pacing_enabled',
+    'pacer_for',
+    'pacer_snapshots',
+]
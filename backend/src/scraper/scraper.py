@@ -7,46 +7,153 @@ import time
 import random
 from tqdm import tqdm
 import os
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 
 from src.utils.last_word import get_word_after_last_comma
-
-def scraper(province, property_type, num):
-    """
-    Scrapes Lamudi website for properties.
-
-    Args:
-        province (str): Province to search for properties.
-        property_type (str): Type of property to search for.
-        num (int): Number of properties to scrape.
-
-    Returns:
-        pd.DataFrame: DataFrame containing scraped properties.
-    """
-    data = []
-    listing = []
-    links = []
-    skus = set()  # Use a set to keep track of unique SKUs
-    count = 0  # Initialize a counter
-    print('SCRAPING. . .')
-
-    # Get the maximum page number
+from src.observability.metrics import (
+    CHALLENGE_PAGES,
+    HTTP_429,
+    LIST_CANDIDATES,
+    PAGES_SCANNED,
+    SELECTOR_MISSES,
+)
+from src.observability.run_history import annotate_run, count_run, recorded_run, timed_phase
+from src.observability.tracing import span, traced
+from src.scraper.cancellation import FetchStopped, check_cancelled
+from src.scraper.columnar import write_parquet
+from src.scraper.deadline import (
+    MIN_FETCH_SEC,
+    Deadline,
+    DeadlineExceeded,
+    analytics_reserve_sec,
+    check_deadline,
+    current_deadline,
+    deadline_scope,
+    list_budget_share,
+)
+from src.scraper.pacing import pacer_for, pacing_enabled, record_error, record_response
+
+# Overridable to point the scraper at a local stand-in (bench/fake_lamudi.py)
+LAMUDI_BASE_URL = os.getenv('LAMUDI_BASE_URL', 'https://www.lamudi.com.ph').rstrip('/')
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36'
+
+
+def list_page_url(province, property_type, page_num=1):
+    """Listing page URL for a province slug / property type (page 1 has no query)."""
     # Updated 2025-10-01: Fix URL case sensitivity
     province_lower = province.lower().replace('_', '-')
-    base_list_url = f'https://www.lamudi.com.ph/buy/{province_lower}/{property_type}/'
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36',
+    base_list_url = f'{LAMUDI_BASE_URL}/buy/{province_lower}/{property_type}/'
+    if page_num == 1:
+        return base_list_url
+    return f'{base_list_url}?page={page_num}'
+
+
+def build_headers(referer):
+    return {
+        'User-Agent': USER_AGENT,
         'Accept-Language': 'en-US,en;q=0.9',
-        'Referer': base_list_url,
+        'Referer': referer,
     }
-    # Reuse a single HTTP session to preserve cookies and reduce blocks
+
+
+def build_session(referer):
+    """Reuse a single HTTP session to preserve cookies and reduce blocks."""
     session = requests.Session()
     try:
-        session.headers.update(headers)
+        session.headers.update(build_headers(referer))
     except Exception:
         pass
-    URL = base_list_url
-    page = session.get(URL, timeout=15)
-    soup = bs(page.content, 'html.parser')
+    return session
+
+
+def fetch_page(session, url, phase, timeout=7, **kwargs):
+    """
+    session.get() timed under `phase` (list_fetch/detail_fetch), counting 429s.
+
+    With adaptive pacing on (SCRAPER_ADAPTIVE_PACING, default 1) the request
+    waits for the host's pacer first and reports back to it; raises
+    CircuitOpenError without fetching while the host is blocking us.
+    Raises ScrapeCancelled once the scrape's job has been cancelled, and
+    DeadlineExceeded instead of starting a fetch the request's deadline
+    leaves no time for; otherwise `timeout` is capped to the time left.
+    """
+    check_cancelled()
+    pacer = pacer_for(url) if pacing_enabled() else None
+    left = check_deadline((pacer.latency_ewma or 0.0) if pacer is not None else 0.0)
+    waited = pacer.acquire() if pacer is not None else 0.0
+    if pacer is not None and left is not None:
+        # Concurrent fetches can queue on the pacer past the deadline: check again after acquiring
+        try:
+            left = check_deadline(pacer.latency_ewma or 0.0)
+        except DeadlineExceeded:
+            record_error(pacer, 0.0, congestion=False)
+            raise
+    capped = left is not None and left < timeout
+    if capped:
+        timeout = max(MIN_FETCH_SEC, left)
+    start = time.monotonic()
+    count_run('requests')
+    try:
+        with timed_phase(phase), span(phase, url=url) as fetch_span:
+            response = session.get(url, timeout=timeout, **kwargs)
+            fetch_span.set(status=getattr(response, 'status_code', None), bytes=len(response.content or b''))
+            if waited:
+                fetch_span.set(paced_ms=round(waited * 1000, 1))
+    except Exception as e:
+        count_run('failed_requests')
+        if pacer is not None:
+            # Only network failures say anything about the host's health; a
+            # timeout we shortened to fit the deadline does not
+            congestion = isinstance(e, requests.ConnectionError) or (isinstance(e, requests.Timeout) and not capped)
+            record_error(pacer, time.monotonic() - start, congestion=congestion)
+        raise
+    if pacer is not None:
+        record_response(pacer, response, time.monotonic() - start)
+    if getattr(response, 'status_code', None) == 429:
+        HTTP_429.inc()
+        count_run('http_429')
+    return response
+
+
+def legacy_pause(seconds):
+    """Fixed politeness sleep, only when adaptive pacing is switched off."""
+    if not pacing_enabled():
+        time.sleep(seconds)
+
+
+def parse_html(content):
+    with timed_phase('parse'), span('parse'):
+        return bs(content, 'html.parser')
+
+
+def is_challenge_page(soup):
+    """Lamudi serves a security verification / math problem page to suspected bots."""
+    text_sample = (soup.get_text(' ', strip=True) or '')[:2000].lower()
+    return ('security verification' in text_sample) or ('solve this math problem' in text_sample)
+
+
+def get_max_pages_cap():
+    """Soft cap for pages to scan via env SCRAPER_MAX_PAGES (default 10)."""
+    try:
+        max_pages_cap = int(os.getenv('SCRAPER_MAX_PAGES', '10'))
+        if max_pages_cap < 1:
+            max_pages_cap = 1
+    except Exception:
+        max_pages_cap = 10
+    return max_pages_cap
+
+
+def get_scraper_timeout():
+    """Budget for a standalone scrape (SCRAPER_TIMEOUT_SEC); callers with a request deadline bind it instead."""
+    try:
+        return int(os.getenv('SCRAPER_TIMEOUT_SEC', '300'))  # 5 minutes default
+    except Exception:
+        return 300
+
+
+def detect_max_page(soup):
+    """Read the last page number from a listing page."""
     div = soup.find('div', class_='BaseSection Pagination')
     # Primary: use pagination container's data attribute
     try:
@@ -69,521 +176,479 @@ def scraper(province, property_type, num):
                 max_page_num = max(1, max(page_numbers))
         except Exception:
             pass
+    return max_page_num
+
+
+def _anchor_candidates(soup):
+    """URL-based scan: anchors whose href contains '/property/' → (SKU, absolute link)."""
+    pairs = []
+    for a in soup.find_all('a', href=True):
+        href = a.get('href') or ''
+        if '/property/' not in href:
+            continue
+        # Normalize
+        if href.startswith('/'):
+            href_abs = f'{LAMUDI_BASE_URL}{href}'
+        elif href.startswith('http'):
+            href_abs = href
+        else:
+            continue
+        # Updated 2025-10-01: Capture property slugs instead of numeric endings
+        match = re.findall(r'/property/([^/?#]+)', href_abs)
+        if not match:
+            continue
+        pairs.append((match[-1], href_abs))
+    return pairs
+
+
+def extract_list_candidates(soup):
+    """
+    Find listing candidates on a parsed listing page.
+
+    Returns:
+        tuple: (primary, fallback) lists of (SKU, link). Primary comes from the
+        ListingCell selectors; fallback from data attributes and /property/ anchors.
+    """
+    results_link = soup.find_all("div", attrs={"class": "row ListingCell-row ListingCell-agent-redesign"})
+    results_sku = soup.find_all("div", attrs={"class": "ListingCell-MainImage"})
 
-    # Apply soft cap for pages to scan via env SCRAPER_MAX_PAGES (default 5)
+    primary = []
+    for sku_tag, link_tag in zip(results_sku, results_link):
+        try:
+            sku = sku_tag.find('div')["data-sku"]
+            link = link_tag.find('a')['href']
+        except Exception:
+            continue
+        # Normalize relative URL to absolute, as the fallback paths do
+        if link.startswith('/'):
+            link = f'{LAMUDI_BASE_URL}{link}'
+        primary.append((sku, link))
+
+    # Fallback strategy: attribute/URL-based
+    # 1) Attributes: [data-sku] or [data-listing-id] + first child <a>
+    # 2) URL-based: anchors whose href contains '/property/' → derive SKU from href
+    fallback = []
+    sku_nodes = []
     try:
-        max_pages_cap = int(os.getenv('SCRAPER_MAX_PAGES', '10'))
-        if max_pages_cap < 1:
-            max_pages_cap = 1
+        sku_nodes = soup.select('[data-sku], [data-listing-id]')
     except Exception:
-        max_pages_cap = 10
-    capped_max_page_num = min(max_page_num, max_pages_cap)
-    # Use detected/capped pagination only
-    pages_upper_bound = capped_max_page_num
+        sku_nodes = []
+    for node in sku_nodes:
+        try:
+            sku_val = node.get('data-sku') or node.get('data-listing-id')
+            if not sku_val:
+                continue
+            a_tag = node.find('a', href=True)
+            if not a_tag:
+                continue
+            href = a_tag.get('href')
+            if not href:
+                continue
+            # Only accept lamudi property paths (absolute or relative)
+            if ('lamudi.com.ph' in href) or href.startswith('/'):
+                # Normalize relative URL to absolute
+                if href.startswith('/'):
+                    href = f'{LAMUDI_BASE_URL}{href}'
+                fallback.append((sku_val, href))
+        except Exception:
+            continue
 
-    pages_scanned = 0
-    # Track execution time for early exit
-    start_time = time.time()
+    # URL-based anchor scan (always, to capture extra links on page)
     try:
-        scraper_timeout = int(os.getenv('SCRAPER_TIMEOUT_SEC', '300'))  # 5 minutes default
+        fallback.extend(_anchor_candidates(soup))
     except Exception:
-        scraper_timeout = 300
-    early_exit_triggered = False
+        pass
+    return primary, fallback
 
-    for page_num in range(1, pages_upper_bound + 1):
-        # Check for timeout to prevent Render worker crash
-        if time.time() - start_time > scraper_timeout:
-            early_exit_triggered = True
-            print(f"Early exit triggered after {scraper_timeout}s timeout")
-            break
-        try:
-            if page_num == 1:
-                URL = base_list_url
-            else:
-                URL = f'https://www.lamudi.com.ph/buy/{province}/{property_type}/?page={page_num}'
-            print(f"Scraping page {page_num}...")
-            page = session.get(URL, timeout=7)
-            pages_scanned += 1
-            soup = bs(page.content, 'html.parser')
-            results_link = soup.find_all("div", attrs={"class": "row ListingCell-row ListingCell-agent-redesign"})
-            results_sku = soup.find_all("div", attrs={"class": "ListingCell-MainImage"})
-            primary_count = len(results_sku)
-            print(f"Found {primary_count} results on page {page_num} (primary selectors)...")
-
-            # Fallback strategy: attribute/URL-based
-            # 1) Attributes: [data-sku] or [data-listing-id] + first child <a>
-            # 2) URL-based: anchors whose href contains '/property/' → derive SKU from href
-            fallback_pairs = []
-            sku_nodes = []
-            try:
-                sku_nodes = soup.select('[data-sku], [data-listing-id]')
-            except Exception:
-                sku_nodes = []
-            for node in sku_nodes:
-                try:
-                    sku_val = node.get('data-sku') or node.get('data-listing-id')
-                    if not sku_val:
-                        continue
-                    a_tag = node.find('a', href=True)
-                    if not a_tag:
-                        continue
-                    href = a_tag.get('href')
-                    if not href:
-                        continue
-                    # Only accept lamudi property paths (absolute or relative)
-                    if ('lamudi.com.ph' in href) or href.startswith('/'):
-                        # Normalize relative URL to absolute
-                        if href.startswith('/'):
-                            href = f'https://www.lamudi.com.ph{href}'
-                        fallback_pairs.append((sku_val, href))
-                except Exception:
-                    continue
 
-            # URL-based anchor scan (always, to capture extra links on page)
-            try:
-                anchors = soup.find_all('a', href=True)
-                for a in anchors:
-                    href = a.get('href') or ''
-                    if '/property/' not in href:
-                        continue
-                    # Normalize
-                    if href.startswith('/'):
-                        href_abs = f'https://www.lamudi.com.ph{href}'
-                    elif href.startswith('http'):
-                        href_abs = href
-                    else:
-                        continue
-                    # Updated 2025-10-01: Capture property slugs instead of numeric endings
-                    match = re.findall(r'/property/([^/?#]+)', href_abs)
-                    if not match:
-                        continue
-                    sku_val = match[-1]
-                    fallback_pairs.append((sku_val, href_abs))
-            except Exception:
-                pass
+@traced('scan_list_page')
+def scan_list_page(session, province, property_type, page_num):
+    """
+    Fetch one listing page and extract its candidates.
 
-            # Merge primary + fallback for candidates count only; dedupe via skus on insert
-            merged_candidates = []
-            try:
-                if len(results_sku) and len(results_link):
-                    merged_candidates.extend([(getattr(sku_tag.find('div'), 'get', lambda *_: None)('data-sku'), link_tag.find('a')['href']) for sku_tag, link_tag in zip(results_sku, results_link)])
-            except Exception:
-                pass
-            merged_candidates.extend(fallback_pairs)
-            total_candidates = len(merged_candidates)
-            # Minimal retry: if page 1 yields zero candidates, re-fetch once after short delay
-            if page_num == 1 and total_candidates == 0:
-                try:
-                    # If looks like a bot/challenge page, brief pause first
-                    text_sample = (soup.get_text(' ', strip=True) or '')[:2000].lower()
-                    if ('security verification' in text_sample) or ('solve this math problem' in text_sample):
-                        time.sleep(1.5)
-                    else:
-                        time.sleep(1.0)
-                    # Re-fetch and attempt anchor-based scan again (lightweight)
-                    page_retry = session.get(URL, timeout=7)
-                    soup_retry = bs(page_retry.content, 'html.parser')
-                    anchors_retry = soup_retry.find_all('a', href=True)
-                    for a in anchors_retry:
-                        href = a.get('href') or ''
-                        if '/property/' not in href:
-                            continue
-                        if href.startswith('/'):
-                            href_abs = f'https://www.lamudi.com.ph{href}'
-                        elif href.startswith('http'):
-                            href_abs = href
-                        else:
-                            continue
-                        match = re.findall(r'/property/([^/?#]+)', href_abs)
-                        if not match:
-                            continue
-                        sku_val = match[-1]
-                        fallback_pairs.append((sku_val, href_abs))
-                    # Update count after retry
-                    merged_candidates.extend(fallback_pairs)
-                    total_candidates = len(merged_candidates)
-                except Exception:
-                    pass
-                # Second minimal retry: explicitly use page=1 variant if still zero
-                if total_candidates == 0:
-                    try:
-                        time.sleep(1.0)
-                        url_variant = f"{base_list_url}?page=1"
-                        page_retry2 = session.get(url_variant, timeout=7)
-                        soup_retry2 = bs(page_retry2.content, 'html.parser')
-                        anchors_retry2 = soup_retry2.find_all('a', href=True)
-                        for a in anchors_retry2:
-                            href = a.get('href') or ''
-                            if '/property/' not in href:
-                                continue
-                            if href.startswith('/'):
-                                href_abs = f'https://www.lamudi.com.ph{href}'
-                            elif href.startswith('http'):
-                                href_abs = href
-                            else:
-                                continue
-                            match = re.findall(r'/property/([^/?#]+)', href_abs)
-                            if not match:
-                                continue
-                            sku_val = match[-1]
-                            fallback_pairs.append((sku_val, href_abs))
-                        merged_candidates.extend(fallback_pairs)
-                        total_candidates = len(merged_candidates)
-                    except Exception:
-                        pass
+    Page 1 gets up to two lightweight re-fetches when it yields zero candidates
+    (bot/challenge pages, transient selector misses).
+
+    Returns:
+        tuple: (primary, fallback) lists of (SKU, link).
+    """
+    URL = list_page_url(province, property_type, page_num)
+    print(f"Scraping page {page_num}...")
+    page = fetch_page(session, URL, 'list_fetch')
+    soup = parse_html(page.content)
+    primary, fallback = extract_list_candidates(soup)
+    PAGES_SCANNED.inc()
+    if not primary:
+        SELECTOR_MISSES.inc()
+        count_run('selector_misses')
+    challenge = is_challenge_page(soup)
+    if challenge:
+        CHALLENGE_PAGES.inc()
+        count_run('challenges')
+    print(f"Found {len(primary)} results on page {page_num} (primary selectors)...")
+
+    # Merge primary + fallback for candidates count only; dedupe via skus on insert
+    total_candidates = len(primary) + len(fallback)
+    # Minimal retry: if page 1 yields zero candidates, re-fetch once after short delay
+    if page_num == 1 and total_candidates == 0:
+        try:
+            # If looks like a bot/challenge page, brief pause first
+            with span('retry_sleep', page=page_num, challenge=challenge):
+                legacy_pause(1.5 if challenge else 1.0)
+            # Re-fetch and attempt anchor-based scan again (lightweight)
+            page_retry = fetch_page(session, URL, 'list_fetch')
+            fallback.extend(_anchor_candidates(parse_html(page_retry.content)))
+            total_candidates = len(primary) + len(fallback)
+        except FetchStopped:
+            raise
+        except Exception:
+            pass
+        # Second minimal retry: explicitly use page=1 variant if still zero
+        if total_candidates == 0:
             try:
-                print({
-                    'level': 'info',
-                    'event': 'list_page_candidates',
-                    'page': page_num,
-                    'candidates_on_page': total_candidates,
-                })
+                with span('retry_sleep', page=page_num):
+                    legacy_pause(1.0)
+                url_variant = f"{list_page_url(province, property_type, 1)}?page=1"
+                page_retry2 = fetch_page(session, url_variant, 'list_fetch')
+                fallback.extend(_anchor_candidates(parse_html(page_retry2.content)))
+                total_candidates = len(primary) + len(fallback)
+            except FetchStopped:
+                raise
             except Exception:
                 pass
-            # Note: Previously, we short-circuited on page 1 with zero candidates.
-            # We now continue to subsequent pages to improve resilience against
-            # partial selector misses on the first page.
-        except Exception as e:
-            print(f"Error on page {page_num}: {e}")
-            continue  # Continue to the next page instead of breaking
-
-        # Collect all unique candidates from this page before checking if we've hit the target
-        if len(results_sku) and len(results_link):
-            for sku_tag, link_tag in zip(results_sku, results_link):
-                if count >= num:
-                    break
-                sku = sku_tag.find('div')["data-sku"]
-                if sku in skus:  # If SKU is already in the set, skip it
-                    continue
-                skus.add(sku)  # Add SKU to the set
-                link = link_tag.find('a')['href']
-                listing.append([sku, link])
-                count += 1
-        # Always consider fallback-derived candidates as well
-        if count < num and len(fallback_pairs):
-            for sku, link in fallback_pairs:
-                if count >= num:
-                    break
-                if sku in skus:
-                    continue
-                skus.add(sku)
-                listing.append([sku, link])
-                count += 1
-
-        # Check if we've reached target after processing this entire page
-        if count >= num:
-            break
-
-    # Convert the listing list to a DataFrame
-    listing_df = pd.DataFrame(listing, columns=['SKU', 'link'])
-    # Log pages_scanned for observability (server logs only)
+    LIST_CANDIDATES.inc(total_candidates)
     try:
         print({
             'level': 'info',
-            'event': 'list_pages_scanned',
-            'pages_scanned': pages_scanned,
-            'capped_max_page_num': capped_max_page_num,
-            'requested_num': int(num),
-            'collected_links': int(len(listing_df)),
+            'event': 'list_page_candidates',
+            'page': page_num,
+            'candidates_on_page': total_candidates,
         })
     except Exception:
         pass
-    # If no listings found, write empty CSVs and return empty DataFrame
-    if listing_df.empty:
-        os.makedirs("data/scraped/full", exist_ok=True)
-        os.makedirs("data/scraped/info", exist_ok=True)
-        os.makedirs("data/scraped/amenities", exist_ok=True)
-        empty = pd.DataFrame(columns=['SKU','Name','Location','City/Town','TCP','Floor_Area','Bedrooms','Baths','Source'])
-        file_name = f"{province}_{property_type}.csv"
-        file_name_info = f"{province}_{property_type}_info.csv"
-        file_name_amenities = f"{province}_{property_type}_amenities.csv"
-        empty.to_csv(f"data/scraped/full/{file_name}", index=False)
-        empty.to_csv(f"data/scraped/info/{file_name_info}", index=False)
-        empty.to_csv(f"data/scraped/amenities/{file_name_amenities}", index=False)
-        return empty
-
-    links = listing_df['link']
-
-    # Add timeout protection for detail processing
-    detail_start_time = time.time()
-    for index, each in tqdm(enumerate(links), total=len(links), desc="Processing details"):
-        # Check timeout before processing each property detail
-        if time.time() - detail_start_time > (scraper_timeout - 5):  # Leave 5s buffer
-            print(f"Detail processing timeout - stopping at property {index + 1}")
-            break
-        prop_details = {}
-        amenities = []
-        temp = []
-        features = {}
-        URL = each
-        page = requests.get(URL, headers=headers, timeout=7)
-        soup = bs(page.content, 'html.parser')
-
-        all_sku = soup.find("div", attrs={"class": "Banner-Images"})
-        all_amenities = soup.find_all("span", attrs={"class": "material-icons material-icons-outlined"})
-        # Updated 2025-10-01: Lamudi redesign
-        all_loc = soup.find_all("div", attrs={"class": "view-map__text"}) + soup.find_all("div", attrs={"class": "location-map__location-address-map"})
-        all_price = soup.find_all("div", attrs={"class": "prices-and-fees__price"})
-        all_features = soup.find_all("div", attrs={"class": "details-item-value"})
-        all_lat_long = soup.find_all("div", attrs={"class": "LandmarksPDP-Wrapper"})
+    return primary, fallback
 
-        try:
-            all_agent_name = soup.find("div", attrs={"class": "AgentInfoV2-agent-name"}).get_text().strip()
-            all_agent_agency = soup.find("div", attrs={"class": "AgentInfoV2-agent-agency"}).get_text().strip()
-            all_overview = soup.find("div", attrs={"class": "ViewMore-text-description"}).get_text().strip().replace(
-                '\n', '').replace('\xa0', '')
-        except:
-            all_agent_name = ''
-            all_agent_agency = ''
-            all_overview = ''
 
-        for each in all_amenities:
-            amenities.append(each.get_text().strip())
+def parse_detail_page(soup):
+    """
+    Extract listing fields from a parsed detail page.
 
-        loc_final = ''
-        for each in all_loc:
-            loc_text = each.get_text().strip().replace('\n', '')
-            loc_final = re.sub(' +', ' ', loc_text)
+    Returns:
+        dict: text_location, price, amenities, features, latitude, longitude,
+        agent_name, agency_name, overview (SKU is added by the caller).
+    """
+    prop_details = {}
+    amenities = []
 
-        price = 0
-        for each in all_price:
+    all_amenities = soup.find_all("span", attrs={"class": "material-icons material-icons-outlined"})
+    # Updated 2025-10-01: Lamudi redesign
+    all_loc = soup.find_all("div", attrs={"class": "view-map__text"}) + soup.find_all("div", attrs={"class": "location-map__location-address-map"})
+    all_price = soup.find_all("div", attrs={"class": "prices-and-fees__price"})
+    all_features = soup.find_all("div", attrs={"class": "details-item-value"})
+    all_lat_long = soup.find_all("div", attrs={"class": "LandmarksPDP-Wrapper"})
+
+    try:
+        all_agent_name = soup.find("div", attrs={"class": "AgentInfoV2-agent-name"}).get_text().strip()
+        all_agent_agency = soup.find("div", attrs={"class": "AgentInfoV2-agent-agency"}).get_text().strip()
+        all_overview = soup.find("div", attrs={"class": "ViewMore-text-description"}).get_text().strip().replace(
+            '\n', '').replace('\xa0', '')
+    except:
+        all_agent_name = ''
+        all_agent_agency = ''
+        all_overview = ''
+
+    for each in all_amenities:
+        amenities.append(each.get_text().strip())
+
+    loc_final = ''
+    for each in all_loc:
+        loc_text = each.get_text().strip().replace('\n', '')
+        loc_final = re.sub(' +', ' ', loc_text)
+
+    price = 0
+    for each in all_price:
+        try:
+            price = each.get_text().replace('₱', '').replace(',', '').strip()
+            price = int(price)
+        except:
+            price = each.get_text().replace('₱', '').replace(',', '').strip().split('\n')
+            price = price[0].strip()
             try:
-                price = each.get_text().replace('₱', '').replace(',', '').strip()
                 price = int(price)
             except:
-                price = each.get_text().replace('₱', '').replace(',', '').strip().split('\n')
-                price = price[0].strip()
-                try:
-                    price = int(price)
-                except:
-                    price = 0
+                price = 0
+
+    # Fallback for price: attribute-based (data-price) or scoped numeric near Title-pdp-price
+    if not price or price == 0:
+        try:
+            node = soup.select_one('[data-price]')
+            if node:
+                raw = str(node.get('data-price', '')).replace(',', '').strip()
+                if raw:
+                    price = int(float(raw))
+        except Exception:
+            pass
+    if not price or price == 0:
+        try:
+            price_container = soup.find('div', attrs={'class': 'Title-pdp-price'})
+            if price_container:
+                m = re.search(r'(\d[\d,]*)', price_container.get_text(' ', strip=True) or '')
+                if m:
+                    price = int(m.group(1).replace(',', ''))
+        except Exception:
+            pass
 
-        # Fallback for price: attribute-based (data-price) or scoped numeric near Title-pdp-price
-        if not price or price == 0:
+    temp = []
+    for each in all_features:
+        details = each.get_text().strip().split('\n')
+        for detail in details:
+            detail = detail.strip()
+            if detail != '':
+                temp.append(detail)
+
+    features = {}
+    for i in range(len(temp)):
+        if i % 2 == 0:
             try:
-                node = soup.select_one('[data-price]')
-                if node:
-                    raw = str(node.get('data-price', '')).replace(',', '').strip()
-                    if raw:
-                        price = int(float(raw))
-            except Exception:
+                features[temp[i]] = temp[i + 1]
+            except:
                 pass
-        if not price or price == 0:
+
+    # Normalize feature labels to canonical keys
+    normalized_features = {}
+    for key, value in features.items():
+        normalized_key = key
+        # Normalize bedroom variations
+        if key in ["Bedroom(s)", "Bed(s)"]:
+            normalized_key = "Bedrooms"
+        # Normalize bathroom variations
+        elif key in ["Bathroom(s)", "Bath(s)", "T&B", "Toilet & Bath", "Toilet and Bath"]:
+            normalized_key = "Baths"
+        # Normalize floor area variations (keep only "Floor area" for condo)
+        elif key in ["Floor area", "Floor Area", "Area", "Lot area"]:
+            normalized_key = "Floor area (m²)"
+
+        normalized_features[normalized_key] = value
+
+    # Use normalized features for fallback searches
+    features = normalized_features
+
+    # Attribute/text fallbacks for key fields when primary misses
+    # Floor area (m²)
+    try:
+        fa_val = features.get('Floor area (m²)', '') if isinstance(features, dict) else ''
+        if not fa_val:
+            node = soup.select_one('[data-floor-area]')
+            if node:
+                features['Floor area (m²)'] = str(node.get('data-floor-area', '')).strip()
+        if 'Floor area (m²)' not in features or not str(features.get('Floor area (m²)', '')).strip():
+            # Minimal regex: number + m² in a compact text node
             try:
-                price_container = soup.find('div', attrs={'class': 'Title-pdp-price'})
-                if price_container:
-                    m = re.search(r'(\d[\d,]*)', price_container.get_text(' ', strip=True) or '')
+                # Accept "m²", "sqm", or "sq m" variants (case-insensitive)
+                candidate = soup.find(text=re.compile(r"\b\d[\d\.,]*\s*(m²|sqm|sq\s*m)\b", re.I))
+                if candidate:
+                    m = re.search(r"(\d[\d\.,]*)\s*(?:m²|sqm|sq\s*m)", candidate, re.I)
                     if m:
-                        price = int(m.group(1).replace(',', ''))
+                        features['Floor area (m²)'] = m.group(1).replace(',', '')
             except Exception:
                 pass
+    except Exception:
+        pass
 
-        temp = []
-        for each in all_features:
-            details = each.get_text().strip().split('\n')
-            for detail in details:
-                detail = detail.strip()
-                if detail != '':
-                    temp.append(detail)
-
-        features = {}
-        for i in range(len(temp)):
-            if i % 2 == 0:
-                try:
-                    features[temp[i]] = temp[i + 1]
-                except:
-                    pass
+    # Bedrooms
+    try:
+        br_val = features.get('Bedrooms', '') if isinstance(features, dict) else ''
+        if not br_val:
+            node = soup.select_one('[data-bedrooms]')
+            if node:
+                raw = str(node.get('data-bedrooms', '')).strip()
+                if raw:
+                    features['Bedrooms'] = raw
+        if 'Bedrooms' not in features or not str(features.get('Bedrooms', '')).strip():
+            # Match "2 Bedroom", "2 Bedrooms", "2 Bed", "2 Bedroom(s)", "2 Bed(s)"
+            m = re.search(r'(\d+)\s*Bed(?:room)?s?', soup.get_text(' ', strip=True), re.I)
+            if m:
+                features['Bedrooms'] = m.group(1)
+    except Exception:
+        pass
 
-        # Normalize feature labels to canonical keys
-        normalized_features = {}
-        for key, value in features.items():
-            normalized_key = key
-            # Normalize bedroom variations
-            if key in ["Bedroom(s)", "Bed(s)"]:
-                normalized_key = "Bedrooms"
-            # Normalize bathroom variations
-            elif key in ["Bathroom(s)", "Bath(s)", "T&B", "Toilet & Bath", "Toilet and Bath"]:
-                normalized_key = "Baths"
-            # Normalize floor area variations (keep only "Floor area" for condo)
-            elif key in ["Floor area", "Floor Area", "Area", "Lot area"]:
-                normalized_key = "Floor area (m²)"
-            
-            normalized_features[normalized_key] = value
-        
-        # Use normalized features for fallback searches
-        features = normalized_features
-
-        # Attribute/text fallbacks for key fields when primary misses
-        # Floor area (m²)
-        try:
-            fa_val = features.get('Floor area (m²)', '') if isinstance(features, dict) else ''
-            if not fa_val:
-                node = soup.select_one('[data-floor-area]')
-                if node:
-                    features['Floor area (m²)'] = str(node.get('data-floor-area', '')).strip()
-            if 'Floor area (m²)' not in features or not str(features.get('Floor area (m²)', '')).strip():
-                # Minimal regex: number + m² in a compact text node
-                try:
-                    # Accept "m²", "sqm", or "sq m" variants (case-insensitive)
-                    candidate = soup.find(text=re.compile(r"\b\d[\d\.,]*\s*(m²|sqm|sq\s*m)\b", re.I))
-                    if candidate:
-                        m = re.search(r"(\d[\d\.,]*)\s*(?:m²|sqm|sq\s*m)", candidate, re.I)
-                        if m:
-                            features['Floor area (m²)'] = m.group(1).replace(',', '')
-                except Exception:
-                    pass
-        except Exception:
-            pass
+    # Baths
+    try:
+        ba_val = features.get('Baths', '') if isinstance(features, dict) else ''
+        if not ba_val:
+            node = soup.select_one('[data-bathrooms], [data-baths]')
+            if node:
+                raw = (str(node.get('data-bathrooms', '') or node.get('data-baths', '')).strip())
+                if raw:
+                    features['Baths'] = raw
+        if 'Baths' not in features or not str(features.get('Baths', '')).strip():
+            # Match "1 Bath", "1 Bathroom", "T&B 1", "1 Toilet & Bath", "Toilet and Bath 2"
+            m = re.search(r'(\d+)\s*(?:Bath(?:room)?s?|T\s*&\s*B|Toilet\s*&\s*Bath|Toilet\s*and\s*Bath)', soup.get_text(' ', strip=True), re.I)
+            if m:
+                features['Baths'] = m.group(1)
+    except Exception:
+        pass
 
-        # Bedrooms
-        try:
-            br_val = features.get('Bedrooms', '') if isinstance(features, dict) else ''
-            if not br_val:
-                node = soup.select_one('[data-bedrooms]')
-                if node:
-                    raw = str(node.get('data-bedrooms', '')).strip()
-                    if raw:
-                        features['Bedrooms'] = raw
-            if 'Bedrooms' not in features or not str(features.get('Bedrooms', '')).strip():
-                # Match "2 Bedroom", "2 Bedrooms", "2 Bed", "2 Bedroom(s)", "2 Bed(s)"
-                m = re.search(r'(\d+)\s*Bed(?:room)?s?', soup.get_text(' ', strip=True), re.I)
-                if m:
-                    features['Bedrooms'] = m.group(1)
-        except Exception:
-            pass
+    # Last‑resort inferences to avoid empty fields for core metrics
+    try:
+        page_text = soup.get_text(' ', strip=True)
+    except Exception:
+        page_text = ''
 
-        # Baths
-        try:
-            ba_val = features.get('Baths', '') if isinstance(features, dict) else ''
-            if not ba_val:
-                node = soup.select_one('[data-bathrooms], [data-baths]')
-                if node:
-                    raw = (str(node.get('data-bathrooms', '') or node.get('data-baths', '')).strip())
-                    if raw:
-                        features['Baths'] = raw
-            if 'Baths' not in features or not str(features.get('Baths', '')).strip():
-                # Match "1 Bath", "1 Bathroom", "T&B 1", "1 Toilet & Bath", "Toilet and Bath 2"
-                m = re.search(r'(\d+)\s*(?:Bath(?:room)?s?|T\s*&\s*B|Toilet\s*&\s*Bath|Toilet\s*and\s*Bath)', soup.get_text(' ', strip=True), re.I)
+    # Bedrooms: infer 0 for studio; default to 1 if still blank
+    try:
+        if 'Bedrooms' not in features or not str(features.get('Bedrooms', '')).strip():
+            txt_l = page_text.lower()
+            if 'studio' in txt_l:
+                features['Bedrooms'] = '0'
+            else:
+                m = re.search(r'(\d+)\s*bed', page_text, re.I)
                 if m:
-                    features['Baths'] = m.group(1)
-        except Exception:
-            pass
-
-        # Last‑resort inferences to avoid empty fields for core metrics
-        try:
-            page_text = soup.get_text(' ', strip=True)
-        except Exception:
-            page_text = ''
-
-        # Bedrooms: infer 0 for studio; default to 1 if still blank
-        try:
-            if 'Bedrooms' not in features or not str(features.get('Bedrooms', '')).strip():
-                txt_l = page_text.lower()
-                if 'studio' in txt_l:
-                    features['Bedrooms'] = '0'
+                    features['Bedrooms'] = m.group(1)
                 else:
-                    m = re.search(r'(\d+)\s*bed', page_text, re.I)
-                    if m:
-                        features['Bedrooms'] = m.group(1)
-                    else:
-                        features['Bedrooms'] = '1'
-        except Exception:
-            pass
+                    features['Bedrooms'] = '1'
+    except Exception:
+        pass
 
-        # Bathrooms: if missing, assume at least 1; treat bare T&B as 1
-        try:
-            if 'Baths' not in features or not str(features.get('Baths', '')).strip():
-                if re.search(r'(?:t\s*&\s*b|toilet\s*&\s*bath|toilet\s*and\s*bath)', page_text, re.I):
-                    features['Baths'] = '1'
-                else:
-                    features['Baths'] = '1'
-        except Exception:
-            pass
+    # Bathrooms: if missing, assume at least 1; treat bare T&B as 1
+    try:
+        if 'Baths' not in features or not str(features.get('Baths', '')).strip():
+            if re.search(r'(?:t\s*&\s*b|toilet\s*&\s*bath|toilet\s*and\s*bath)', page_text, re.I):
+                features['Baths'] = '1'
+            else:
+                features['Baths'] = '1'
+    except Exception:
+        pass
 
-        # Floor area: scan wider text; clamp to plausible condo range 12–1000 sqm
-        try:
-            def _set_floor_area(val_str: str):
+    # Floor area: scan wider text; clamp to plausible condo range 12–1000 sqm
+    try:
+        def _set_floor_area(val_str: str):
+            try:
+                val = float(val_str.replace(',', ''))
+                if 12 <= val <= 1000:
+                    features['Floor area (m²)'] = str(val)
+            except Exception:
+                pass
+
+        if 'Floor area (m²)' not in features or not str(features.get('Floor area (m²)', '')).strip():
+            m = re.search(r'(\d[\d\.,]*)\s*(?:m²|sqm|sq\s*m)', page_text, re.I)
+            if m:
+                _set_floor_area(m.group(1))
+            else:
+                # Look for phrases like "floor size 45", "unit size: 32"
+                m2 = re.search(r'(?:floor|unit|area|size)\s*[:\-]?\s*(\d[\d\.,]*)\s*(?:m2|m²|sqm|sq\s*m)?', page_text, re.I)
+                if m2:
+                    _set_floor_area(m2.group(1))
+        else:
+            # Clamp existing value if wildly large
+            m3 = re.search(r'(\d[\d\.,]*)', str(features.get('Floor area (m²)', '')))
+            if m3:
                 try:
-                    val = float(val_str.replace(',', ''))
-                    if 12 <= val <= 1000:
-                        features['Floor area (m²)'] = str(val)
+                    v = float(m3.group(1).replace(',', ''))
+                    if v > 1000 or v < 12:
+                        features.pop('Floor area (m²)', None)
                 except Exception:
                     pass
+    except Exception:
+        pass
 
-            if 'Floor area (m²)' not in features or not str(features.get('Floor area (m²)', '')).strip():
-                m = re.search(r'(\d[\d\.,]*)\s*(?:m²|sqm|sq\s*m)', page_text, re.I)
-                if m:
-                    _set_floor_area(m.group(1))
-                else:
-                    # Look for phrases like "floor size 45", "unit size: 32"
-                    m2 = re.search(r'(?:floor|unit|area|size)\s*[:\-]?\s*(\d[\d\.,]*)\s*(?:m2|m²|sqm|sq\s*m)?', page_text, re.I)
-                    if m2:
-                        _set_floor_area(m2.group(1))
-            else:
-                # Clamp existing value if wildly large
-                m3 = re.search(r'(\d[\d\.,]*)', str(features.get('Floor area (m²)', '')))
-                if m3:
-                    try:
-                        v = float(m3.group(1).replace(',', ''))
-                        if v > 1000 or v < 12:
-                            features.pop('Floor area (m²)', None)
-                    except Exception:
-                        pass
-        except Exception:
-            pass
+    latitude = ''
+    longitude = ''
+    for each in all_lat_long:
+        longitude = each.get('data-lon', '')
+        latitude = each.get('data-lat', '')
 
-        latitude = ''
-        longitude = ''
-        for each in all_lat_long:
-            longitude = each.get('data-lon', '')
-            latitude = each.get('data-lat', '')
+    try:
+        prop_details['text_location'] = loc_final
+        prop_details['price'] = price
+        prop_details['amenities'] = amenities
+        prop_details['features'] = features
+        prop_details['latitude'] = latitude
+        prop_details['longitude'] = longitude
+        prop_details['agent_name'] = all_agent_name
+        prop_details['agency_name'] = all_agent_agency
+        prop_details['overview'] = all_overview
+    except:
+        pass
+    return prop_details
 
-        try:
-            # Updated 2025-10-01: Use SKU from listing DataFrame (URL-derived) instead of page attribute
-            prop_details["SKU"] = listing_df.iloc[index]['SKU'] if index < len(listing_df) else ''
-            prop_details['text_location'] = loc_final
-            prop_details['price'] = price
-            prop_details['amenities'] = amenities
-            prop_details['features'] = features
-            prop_details['latitude'] = latitude
-            prop_details['longitude'] = longitude
-            prop_details['agent_name'] = all_agent_name
-            prop_details['agency_name'] = all_agent_agency
-            prop_details['overview'] = all_overview
 
-        except:
-            pass
+@traced('fetch_detail')
+def fetch_detail(url, sku, headers, session=None):
+    """Fetch and parse one detail page; returns the prop_details dict with SKU."""
+    page = fetch_page(session or requests, url, 'detail_fetch', headers=headers)
+    soup = parse_html(page.content)
+    # Updated 2025-10-01: Use SKU from listing DataFrame (URL-derived) instead of page attribute
+    prop_details = {"SKU": sku}
+    prop_details.update(parse_detail_page(soup))
+    return prop_details
 
-        data.append(prop_details)
-        # Jittered delay between detail page fetches (0.3–0.8s)
-        time.sleep(random.uniform(0.3, 0.8))
 
-    listing_details_df = pd.DataFrame(data)
-    
-    # Calculate execution metrics
-    execution_time = time.time() - start_time
-    property_count = len(data)
-    
-    # Validate minimum property count
-    if property_count < 40:
-        print(f"WARNING: Low property count - only {property_count} properties found (target: 60-120)")
-    
-    # Log execution metrics for monitoring
-    print(f"Scraper completed: {property_count} properties in {execution_time:.2f}s (early_exit: {early_exit_triggered})")
+def fetch_details(listing, headers, session=None, deadline=None):
+    """
+    Fetch detail pages for [(sku, link), ...]; results keep listing order.
 
-    # TEMP diagnostics: write raw features for label inspection (local only)
-    try:
-        debug_df = listing_details_df[['SKU', 'text_location', 'features']].copy()
-        # Attach links for reference
+    With adaptive pacing the pages are fetched by up to
+    SCRAPER_PACE_MAX_CONCURRENCY threads and the host's pacer decides how many
+    are actually in flight. Without it, one at a time with a 0.3-0.8s jittered
+    delay. Stops at `deadline` (epoch seconds), when the circuit opens, the job
+    is cancelled, or the bound request Deadline cannot fit another fetch.
+    """
+    if not listing:
+        return []
+    results = [None] * len(listing)
+    if not pacing_enabled():
+        for index, (sku, link) in tqdm(enumerate(listing), total=len(listing), desc="Processing details"):
+            if deadline is not None and time.time() > deadline:
+                print(f"Detail processing timeout - stopping at property {index + 1}")
+                break
+            try:
+                results[index] = fetch_detail(link, sku, headers, session=session)
+            except FetchStopped as e:
+                print(f"Detail processing stopped early: {e}")
+                break
+            except Exception as e:
+                # One failed detail page should not discard the whole scrape
+                print(f"Error on detail {index + 1}: {e}")
+            # Jittered delay between detail page fetches (0.3–0.8s)
+            time.sleep(random.uniform(0.3, 0.8))
+        return [row for row in results if row is not None]
+
+    stop = {'reason': None}
+
+    def _one(index, sku, link):
+        if stop['reason']:
+            return
+        if deadline is not None and time.time() > deadline:
+            stop['reason'] = f"timeout at property {index + 1}"
+            return
         try:
-            debug_df = debug_df.merge(listing_df[['SKU', 'link']], on='SKU', how='left')
-        except Exception:
-            pass
-        os.makedirs("data/scraped", exist_ok=True)
-        debug_path = os.path.join("data", "scraped", "debug_features.csv")
-        debug_df.to_csv(debug_path, index=False)
-    except Exception:
-        pass
+            results[index] = fetch_detail(link, sku, headers, session=session)
+        except FetchStopped as e:
+            stop['reason'] = str(e)
+        except Exception as e:
+            # One failed detail page should not discard the whole scrape
+            print(f"Error on detail {index + 1}: {e}")
+
+    workers = max(1, min(len(listing), pacer_for(listing[0][1]).max_concurrency))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='detail-fetch') as pool:
+        # Each task runs in a copy of this context so detail spans land in the active trace
+        futures = [pool.submit(contextvars.copy_context().run, _one, index, sku, link)
+                   for index, (sku, link) in enumerate(listing)]
+        for future in tqdm(futures, total=len(futures), desc="Processing details"):
+            future.result()
+    if stop['reason']:
+        print(f"Detail processing stopped early: {stop['reason']}")
+    return [row for row in results if row is not None]
+
+
+@traced('build_staging_df')
+def build_staging_df(data, listing_df, province):
+    """
+    Turn per-listing detail dicts into the staging DataFrame (amenity dummies,
+    feature columns, canonical column names, City/Town and Province).
+    """
+    listing_details_df = pd.DataFrame(data)
 
     # Exploding Amenities (guard for empty results)
     if len(listing_details_df) == 0:
@@ -597,7 +662,7 @@ def scraper(province, property_type, num):
         # Join features but don't prematurely zero key fields
         features_df = pd.DataFrame.from_records(raw_df['features'].mask(raw_df.features.isna(), {}).tolist())
         raw_df = raw_df.join(features_df)
-        
+
         # Fill NaN with 0 for all columns except key fields that should remain empty for adapter parsing
         key_fields_to_preserve = ['Bedrooms', 'Baths', 'Floor area (m²)']
         for col in raw_df.columns:
@@ -607,8 +672,10 @@ def scraper(province, property_type, num):
     raw_df.drop_duplicates(keep='first', inplace=True)
 
     # Feature Selection
+    if 'SKU' not in raw_df.columns:
+        raw_df['SKU'] = pd.Series(dtype=object)
     staging_df = raw_df.merge(listing_df[['SKU', 'link']], on='SKU', how='left')
-    cols = ['SKU', 'Condominium Name', 'text_location', 'price', 'Floor area (m²)', 'Bedrooms', 'Baths', 'gite', 'fitness_center', 'pool', 'security', 'camera_indoor', 'room_service', 'local_parking', 'link']
+    cols = ['SKU', 'Condominium Name', 'text_location', 'price', 'Floor area (m²)', 'Bedrooms', 'Baths', 'gite', 'fitness_center', 'pool', 'security', 'camera_indoor', 'room_service', 'local_parking', 'latitude', 'longitude', 'detail_level', 'agent_name', 'overview', 'link']
     staging_df = staging_df[[c for c in cols if c in staging_df.columns]]
 
     column_name_mapping = {
@@ -623,6 +690,8 @@ def scraper(province, property_type, num):
         'camera_indoor': 'CCTV',
         'room_service': 'Reception Area',
         'local_parking': 'Parking Area',
+        'agent_name': 'Agent',
+        'overview': 'Description',
         'link': 'Source'
     }
 
@@ -634,7 +703,30 @@ def scraper(province, property_type, num):
     if 'Name' in staging_df.columns:
         staging_df['Name'] = staging_df['Name'].astype(str)
         staging_df['Name'] = staging_df['Name'].str.upper()
+    return staging_df
 
+
+def write_empty_outputs(province, property_type):
+    """Write empty CSVs (no listings found) and return the empty staging frame."""
+    os.makedirs("data/scraped/full", exist_ok=True)
+    os.makedirs("data/scraped/info", exist_ok=True)
+    os.makedirs("data/scraped/amenities", exist_ok=True)
+    empty = pd.DataFrame(columns=['SKU','Name','Location','City/Town','TCP','Floor_Area','Bedrooms','Baths','Source'])
+    file_name = f"{province}_{property_type}.csv"
+    file_name_info = f"{province}_{property_type}_info.csv"
+    file_name_amenities = f"{province}_{property_type}_amenities.csv"
+    empty.to_csv(f"data/scraped/full/{file_name}", index=False)
+    empty.to_csv(f"data/scraped/info/{file_name_info}", index=False)
+    empty.to_csv(f"data/scraped/amenities/{file_name_amenities}", index=False)
+    return empty
+
+
+@traced('write_outputs')
+def write_outputs(staging_df, province, property_type, data=None):
+    """Save the full / info / amenities CSVs for a scrape, plus the typed Parquet copy (see columnar.py).
+
+    `data` (the raw detail/card dicts) gives the Parquet export full amenity lists and features.
+    """
     info_cols = [c for c in ['SKU', 'Name', 'Location', 'City/Town', 'TCP', 'Floor_Area'] if c in staging_df.columns]
     amen_cols = [c for c in ['SKU', 'Name', 'Bedrooms', 'Baths', 'Club House', 'Gym', 'Swimming Pool', 'Security', 'CCTV', 'Reception Area', 'Parking Area', 'Source'] if c in staging_df.columns]
     info_df = staging_df[info_cols] if info_cols else pd.DataFrame(columns=['SKU','Name','Location','City/Town','TCP','Floor_Area'])
@@ -662,28 +754,163 @@ def scraper(province, property_type, num):
     staging_df.to_csv(path, index=False)
     info_df.to_csv(path_info, index=False)
     amenities_df.to_csv(path_amenities, index=False)
-    
-    # Save diagnostics for monitoring
+
     try:
-        diagnostics_data = {
-            'timestamp': [pd.Timestamp.now()],
-            'province': [province],
-            'property_type': [property_type],
-            'requested_count': [num],
-            'property_count': [property_count],
-            'execution_time': [round(execution_time, 2)],
-            'early_exit_triggered': [early_exit_triggered],
-            'pages_scanned': [pages_scanned]
-        }
-        diagnostics_df = pd.DataFrame(diagnostics_data)
-        diagnostics_path = "data/scraped/scraper_diagnostics.csv"
-        # Append to existing file or create new one
-        if os.path.exists(diagnostics_path):
-            diagnostics_df.to_csv(diagnostics_path, mode='a', header=False, index=False)
-        else:
-            diagnostics_df.to_csv(diagnostics_path, index=False)
+        write_parquet(staging_df, province, property_type, data=data)
     except Exception as e:
-        print(f"Warning: Could not save diagnostics - {e}")
+        print({'level': 'warn', 'event': 'parquet_export_failed', 'error': str(e)})
+
+
+def write_debug_features(data, listing_df):
+    """TEMP diagnostics: write raw features for label inspection (local only)."""
+    try:
+        listing_details_df = pd.DataFrame(data)
+        debug_df = listing_details_df[['SKU', 'text_location', 'features']].copy()
+        # Attach links for reference
+        try:
+            debug_df = debug_df.merge(listing_df[['SKU', 'link']], on='SKU', how='left')
+        except Exception:
+            pass
+        os.makedirs("data/scraped", exist_ok=True)
+        debug_path = os.path.join("data", "scraped", "debug_features.csv")
+        debug_df.to_csv(debug_path, index=False)
+    except Exception:
+        pass
+
+
+def write_diagnostics(province, property_type, num, property_count, execution_time, early_exit_triggered, pages_scanned):
+    """Hand the run's result figures to the run history (see src/observability/run_history.py).
+
+    The run itself (parameters, timings, request counts, outcome) is recorded by
+    @recorded_run when the scraper returns; this used to append to
+    data/scraped/scraper_diagnostics.csv.
+    """
+    annotate_run(property_count=property_count, pages_scanned=pages_scanned, early_exit=early_exit_triggered)
+
+
+@traced('scraper')
+@recorded_run('full')
+def scraper(province, property_type, num, fetch_pool=None):
+    """
+    Scrapes Lamudi website for properties.
+
+    Args:
+        province (str): Province to search for properties.
+        property_type (str): Type of property to search for.
+        num (int): Number of properties to scrape.
+        fetch_pool (FetchPool, optional): shared rate-limited pool for all fetches.
+
+    Returns:
+        pd.DataFrame: DataFrame containing scraped properties.
+    """
+    data = []
+    listing = []
+    skus = set()  # Use a set to keep track of unique SKUs
+    count = 0  # Initialize a counter
+    print('SCRAPING. . .')
+
+    # Get the maximum page number
+    base_list_url = list_page_url(province, property_type, 1)
+    headers = build_headers(base_list_url)
+    if fetch_pool is not None:
+        session = fetch_pool.session_for(headers)
+        detail_session = session
+    else:
+        session = build_session(base_list_url)
+        detail_session = None
+    # One deadline for the whole scrape: the caller's, else SCRAPER_TIMEOUT_SEC from now
+    deadline = current_deadline() or Deadline.after(get_scraper_timeout(), reserve=analytics_reserve_sec())
+    with deadline_scope(deadline):
+        page = fetch_page(session, base_list_url, 'list_fetch', timeout=15)
+    soup = parse_html(page.content)
+    max_page_num = detect_max_page(soup)
+
+    capped_max_page_num = min(max_page_num, get_max_pages_cap())
+    # Use detected/capped pagination only
+    pages_upper_bound = capped_max_page_num
+
+    pages_scanned = 0
+    # Track execution time for early exit
+    start_time = time.time()
+    list_deadline = deadline.budget(list_budget_share(), 'list')
+    early_exit_triggered = False
+
+    for page_num in range(1, pages_upper_bound + 1):
+        # Leave the rest of the budget to detail pages once the list share is spent
+        if list_deadline.expired:
+            early_exit_triggered = True
+            list_deadline.mark_partial()
+            print(f"Early exit: list budget spent after {pages_scanned} pages")
+            break
+        try:
+            with deadline_scope(list_deadline):
+                primary, fallback_pairs = scan_list_page(session, province, property_type, page_num)
+            pages_scanned += 1
+            # Note: Previously, we short-circuited on page 1 with zero candidates.
+            # We now continue to subsequent pages to improve resilience against
+            # partial selector misses on the first page.
+        except FetchStopped as e:
+            early_exit_triggered = True
+            print(f"Early exit on page {page_num}: {e}")
+            break
+        except Exception as e:
+            print(f"Error on page {page_num}: {e}")
+            continue  # Continue to the next page instead of breaking
+
+        # Collect all unique candidates from this page before checking if we've hit the target
+        # (primary selectors first, then fallback-derived candidates)
+        for sku, link in list(primary) + list(fallback_pairs):
+            if count >= num:
+                break
+            if sku in skus:  # If SKU is already in the set, skip it
+                continue
+            skus.add(sku)  # Add SKU to the set
+            listing.append([sku, link])
+            count += 1
+
+        # Check if we've reached target after processing this entire page
+        if count >= num:
+            break
+
+    # Convert the listing list to a DataFrame
+    listing_df = pd.DataFrame(listing, columns=['SKU', 'link'])
+    # Log pages_scanned for observability (server logs only)
+    try:
+        print({
+            'level': 'info',
+            'event': 'list_pages_scanned',
+            'pages_scanned': pages_scanned,
+            'capped_max_page_num': capped_max_page_num,
+            'requested_num': int(num),
+            'collected_links': int(len(listing_df)),
+        })
+    except Exception:
+        pass
+    # If no listings found, write empty CSVs and return empty DataFrame
+    if listing_df.empty:
+        annotate_run(pages_scanned=pages_scanned, early_exit=early_exit_triggered)
+        return write_empty_outputs(province, property_type)
+
+    # Detail pages get what the list phase left, short of the analytics reserve
+    with deadline_scope(deadline.budget(1.0, 'detail')):
+        data = fetch_details(listing, headers, session=detail_session)
+
+    # Calculate execution metrics
+    execution_time = time.time() - start_time
+    property_count = len(data)
+
+    # Validate minimum property count
+    if property_count < 40:
+        print(f"WARNING: Low property count - only {property_count} properties found (target: 60-120)")
+
+    # Log execution metrics for monitoring
+    print(f"Scraper completed: {property_count} properties in {execution_time:.2f}s (early_exit: {early_exit_triggered})")
+
+    write_debug_features(data, listing_df)
+    staging_df = build_staging_df(data, listing_df, province)
+    write_outputs(staging_df, province, property_type, data=data)
+    # Save diagnostics for monitoring
+    write_diagnostics(province, property_type, num, property_count, execution_time, early_exit_triggered, pages_scanned)
 
     return staging_df
 
@@ -692,4 +919,4 @@ def scraper(province, property_type, num):
 if __name__ == "__main__":
     province = input("Please enter the province: ")
     property_type = input("Please enter the property type: ")
-    num = int(input("Please enter the number of properties to scrape: "))
\ No newline at end of file
+    num = int(input("Please enter the number of properties to scrape: "))
@@ -0,0 +1,472 @@
+"""
+Sharded crawl mode for one province scrape.
+
+The coordinator fetches page 1 (pagination + first candidates), partitions the
+remaining listing pages into ranges, then partitions the collected detail URLs
+into batches. Work units run on local worker processes and/or remote scraper
+boxes (POST /api/crawl/unit), results are merged and deduped by SKU, and the
+staging DataFrame is built exactly as scraper() builds it.
+
+Enable with SCRAPER_SHARD_WORKERS=<n local processes> and/or
+SCRAPER_SHARD_REMOTE_WORKERS=<comma-separated scraper URLs>.
+
+Every unit carries a `budget_sec` (relative, so remote clocks need not
+agree): the unit timeout, or less when the request deadline is closer. The
+unit stops itself when it runs out, and units that would start after the
+deadline are skipped and the scrape is marked partial. A local unit that
+still overruns has its worker process killed and replaced, so the retry does
+not queue behind it.
+
+/api/crawl/unit runs units sent over the network, so execute_unit() checks
+them first. Detail links must be on the Lamudi host, and page/listing lists
+are bounded by SCRAPER_MAX_PAGES and SCRAPER_MAX_COUNT.
+"""
+import math
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeout
+import multiprocessing
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+import pandas as pd
+import requests
+
+from src.observability.run_history import annotate_run, recorded_run
+from src.observability.tracing import traced
+from src.scraper.cancellation import FetchStopped
+from src.scraper import scraper as scraper_module
+from src.scraper.deadline import Deadline, analytics_reserve_sec, current_deadline, deadline_scope, list_budget_share
+from src.scraper.scraper import (
+    build_headers,
+    build_session,
+    build_staging_df,
+    detect_max_page,
+    extract_list_candidates,
+    fetch_details,
+    fetch_page,
+    get_max_pages_cap,
+    get_scraper_timeout,
+    list_page_url,
+    parse_html,
+    scan_list_page,
+    write_diagnostics,
+    write_empty_outputs,
+    write_outputs,
+)
+
+UNIT_LIST_PAGES = 'list_pages'
+UNIT_DETAILS = 'details'
+# Allowance on top of a unit's budget_sec for process start-up / HTTP round trip
+UNIT_GRACE_SEC = 5.0
+
+
+def max_unit_listings() -> int:
+    """Most detail links one unit may carry (SCRAPER_MAX_COUNT, default 100)."""
+    try:
+        return max(1, int(os.getenv('SCRAPER_MAX_COUNT', '100')))
+    except Exception:
+        return 100
+
+
+def validate_unit(unit: Dict[str, Any]) -> None:
+    """Raise ValueError unless `unit` only asks for pages and listings a coordinator could have sent."""
+    kind = unit.get('kind')
+    if kind == UNIT_LIST_PAGES:
+        pages = unit.get('pages')
+        cap = get_max_pages_cap()
+        if not isinstance(pages, list) or len(pages) > cap:
+            raise ValueError('pages must be a list of at most SCRAPER_MAX_PAGES pages')
+        for page in pages:
+            if isinstance(page, bool) or not isinstance(page, int) or not 1 <= page <= cap:
+                raise ValueError(f'page out of range: {page!r}')
+    elif kind == UNIT_DETAILS:
+        listings = unit.get('listings')
+        if not isinstance(listings, list) or len(listings) > max_unit_listings():
+            raise ValueError('listings must be a list of at most SCRAPER_MAX_COUNT listings')
+        host = urlparse(scraper_module.LAMUDI_BASE_URL).netloc
+        for pair in listings:
+            if not isinstance(pair, (list, tuple)) or len(pair) != 2:
+                raise ValueError('listings must be [sku, link] pairs')
+            link = urlparse(str(pair[1]))
+            if link.scheme not in ('http', 'https') or link.netloc != host:
+                raise ValueError(f'listing link is not on {host}')
+    else:
+        raise ValueError(f"Unknown work unit kind: {kind}")
+    budget = unit.get('budget_sec')
+    if budget is not None and not (isinstance(budget, (int, float)) and 0 <= budget <= get_scraper_timeout()):
+        raise ValueError('budget_sec must be between 0 and SCRAPER_TIMEOUT_SEC')
+
+
+def execute_unit(unit: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one work unit. Used by local worker processes and /api/crawl/unit.
+
+    Raises ValueError for a unit validate_unit() rejects. With `budget_sec`
+    the unit runs under its own Deadline and reports `partial` when that
+    budget cut it short.
+    """
+    validate_unit(unit)
+    budget = unit.get('budget_sec')
+    if budget is None:
+        return _run_unit(unit)
+    deadline = Deadline.after(float(budget), name=str(unit.get('kind')))
+    with deadline_scope(deadline):
+        result = _run_unit(unit)
+    result['partial'] = deadline.partial
+    return result
+
+
+def _run_unit(unit: Dict[str, Any]) -> Dict[str, Any]:
+    kind = unit.get('kind')
+    province = unit['province']
+    property_type = unit['property_type']
+    if kind == UNIT_LIST_PAGES:
+        session = build_session(list_page_url(province, property_type, 1))
+        candidates = []
+        pages_scanned = 0
+        for page_num in unit['pages']:
+            try:
+                primary, fallback = scan_list_page(session, province, property_type, int(page_num))
+                pages_scanned += 1
+            except FetchStopped as e:
+                print(f"Stopping list unit at page {page_num}: {e}")
+                break
+            except Exception as e:
+                print(f"Error on page {page_num}: {e}")
+                continue
+            candidates.extend([[sku, link, int(page_num)] for sku, link in list(primary) + list(fallback)])
+        return {'candidates': candidates, 'pages_scanned': pages_scanned, 'items': pages_scanned}
+    if kind == UNIT_DETAILS:
+        headers = build_headers(list_page_url(province, property_type, 1))
+        data = fetch_details([tuple(pair) for pair in unit['listings']], headers, session=requests.Session())
+        return {'data': data, 'items': len(data)}
+    raise ValueError(f"Unknown work unit kind: {kind}")
+
+
+# -----------------------------------------------------------------------------
+# Workers
+# -----------------------------------------------------------------------------
+# One single-process pool per local worker slot, so an overrunning unit's process can be replaced alone
+_process_pools: Dict[int, ProcessPoolExecutor] = {}
+_process_pool_lock = threading.Lock()
+
+
+def _get_process_pool(slot: int) -> ProcessPoolExecutor:
+    """The slot's spawn-based pool (forking a threaded gunicorn worker is unsafe), kept across scrapes."""
+    with _process_pool_lock:
+        executor = _process_pools.get(slot)
+        if executor is None:
+            executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+            _process_pools[slot] = executor
+        return executor
+
+
+def _recycle_process_pool(slot: int, executor: ProcessPoolExecutor) -> None:
+    """Kill the slot's process (still running a unit we gave up on) and start afresh on next use."""
+    with _process_pool_lock:
+        if _process_pools.get(slot) is executor:
+            del _process_pools[slot]
+    # ProcessPoolExecutor has no public way to stop a running call
+    for process in list((getattr(executor, '_processes', None) or {}).values()):
+        process.terminate()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+class LocalProcessWorker:
+    """Runs units in its own worker process."""
+
+    def __init__(self, name: str, slot: int) -> None:
+        self.name = name
+        self.slot = slot
+
+    def run(self, unit: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        executor = _get_process_pool(self.slot)
+        future = executor.submit(execute_unit, unit)
+        try:
+            return future.result(timeout=timeout)
+        except FuturesTimeout:
+            _recycle_process_pool(self.slot, executor)
+            raise
+
+
+class RemoteHttpWorker:
+    """Sends units to another scraper box's /api/crawl/unit endpoint."""
+
+    def __init__(self, url: str, token: Optional[str] = None) -> None:
+        self.url = url.rstrip('/')
+        self.name = self.url
+        self.session = requests.Session()
+        if token:
+            self.session.headers.update({'X-Crawl-Token': token})
+
+    def run(self, unit: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        response = self.session.post(f"{self.url}/api/crawl/unit", json=unit, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
+
+def build_workers_from_env() -> List[Any]:
+    workers: List[Any] = []
+    try:
+        local_count = int(os.getenv('SCRAPER_SHARD_WORKERS', '0'))
+    except Exception:
+        local_count = 0
+    workers.extend(LocalProcessWorker(f"local-{i + 1}", i) for i in range(max(0, local_count)))
+    token = os.getenv('CRAWL_WORKER_TOKEN') or None
+    for url in os.getenv('SCRAPER_SHARD_REMOTE_WORKERS', '').split(','):
+        if url.strip():
+            workers.append(RemoteHttpWorker(url.strip(), token=token))
+    return workers
+
+
+def sharding_enabled() -> bool:
+    try:
+        local_count = int(os.getenv('SCRAPER_SHARD_WORKERS', '0'))
+    except Exception:
+        local_count = 0
+    return local_count > 0 or bool(os.getenv('SCRAPER_SHARD_REMOTE_WORKERS', '').strip())
+
+
+# -----------------------------------------------------------------------------
+# Coordinator
+# -----------------------------------------------------------------------------
+class ShardCoordinator:
+    """
+    Hands work units to workers (one thread per worker), retries lost units.
+
+    Each unit gets unit_timeout seconds (less near the deadline) as its
+    budget_sec. A unit is lost when its worker raises or overruns that budget;
+    it goes back on the queue until max_attempts. A worker that fails max_worker_failures
+    units in a row is retired so the remaining workers pick up its share.
+    """
+
+    def __init__(self, workers: List[Any], unit_timeout: float = 120.0, max_attempts: int = 3, max_worker_failures: int = 3) -> None:
+        if not workers:
+            raise ValueError("ShardCoordinator needs at least one worker")
+        self.workers = workers
+        self.unit_timeout = float(unit_timeout)
+        self.max_attempts = int(max_attempts)
+        self.max_worker_failures = int(max_worker_failures)
+        self.worker_stats: Dict[str, Dict[str, Any]] = {
+            w.name: {'units': 0, 'items': 0, 'failures': 0, 'busy_sec': 0.0, 'retired': False} for w in workers
+        }
+        self.retried_units = 0
+        self.failed_units = 0
+        self.skipped_units = 0
+
+    def run(self, units: List[Dict[str, Any]], deadline: Optional[Deadline] = None) -> List[Optional[Dict[str, Any]]]:
+        """Execute units; returns results in unit order (None for units that failed every attempt
+        or were not started before `deadline`)."""
+        results: List[Optional[Dict[str, Any]]] = [None] * len(units)
+        pending = queue.Queue()
+        for index in range(len(units)):
+            pending.put((index, 0))
+        remaining = [len(units)]
+        lock = threading.Lock()
+        done = threading.Event()
+        if not units:
+            return results
+
+        def _finish_unit() -> None:
+            with lock:
+                remaining[0] -= 1
+                if remaining[0] <= 0:
+                    done.set()
+
+        def _loop(worker: Any) -> None:
+            stats = self.worker_stats[worker.name]
+            consecutive_failures = 0
+            while not done.is_set():
+                try:
+                    index, attempts = pending.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                budget = self.unit_timeout
+                if deadline is not None:
+                    if deadline.expired:
+                        # Out of time: drop the unit rather than start work that cannot finish
+                        deadline.mark_partial()
+                        with lock:
+                            self.skipped_units += 1
+                        _finish_unit()
+                        continue
+                    budget = min(budget, deadline.remaining())
+                # The unit stops itself at its budget; the grace covers start-up and transfer
+                unit = {**units[index], 'budget_sec': round(budget, 1)}
+                timeout = budget + UNIT_GRACE_SEC
+                started = time.time()
+                try:
+                    result = worker.run(unit, timeout)
+                except Exception as e:
+                    stats['busy_sec'] += time.time() - started
+                    stats['failures'] += 1
+                    consecutive_failures += 1
+                    print({
+                        'level': 'warn',
+                        'event': 'shard_unit_lost',
+                        'worker': worker.name,
+                        'unit': index,
+                        'attempt': attempts + 1,
+                        'error': str(e)[:200],
+                    })
+                    if attempts + 1 < self.max_attempts:
+                        with lock:
+                            self.retried_units += 1
+                        pending.put((index, attempts + 1))
+                    else:
+                        with lock:
+                            self.failed_units += 1
+                        _finish_unit()
+                    if consecutive_failures >= self.max_worker_failures:
+                        stats['retired'] = True
+                        with lock:
+                            alive = [w for w in self.workers if not self.worker_stats[w.name]['retired']]
+                        if not alive:
+                            # Nobody left to run the queue; drop what is left
+                            done.set()
+                        return
+                    continue
+                consecutive_failures = 0
+                stats['busy_sec'] += time.time() - started
+                stats['units'] += 1
+                stats['items'] += int(result.get('items', 0) or 0)
+                if deadline is not None and result.get('partial'):
+                    deadline.mark_partial()
+                results[index] = result
+                _finish_unit()
+
+        threads = [threading.Thread(target=_loop, args=(w,), name=f"shard-{w.name}", daemon=True) for w in self.workers]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return results
+
+    def throughput(self) -> Dict[str, Dict[str, Any]]:
+        report = {}
+        for name, stats in self.worker_stats.items():
+            busy = stats['busy_sec']
+            report[name] = {
+                **stats,
+                'busy_sec': round(busy, 2),
+                'items_per_sec': round(stats['items'] / busy, 3) if busy > 0 else 0.0,
+            }
+        return report
+
+
+def _partition(items: List[Any], parts: int) -> List[List[Any]]:
+    if not items:
+        return []
+    size = max(1, math.ceil(len(items) / max(1, parts)))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+@traced('sharded_scraper')
+@recorded_run('sharded')
+def sharded_scraper(province, property_type, num, workers: Optional[List[Any]] = None):
+    """
+    Same contract as scraper(): returns the staging DataFrame and writes the
+    same CSV outputs, but spreads list pages and detail pages across workers.
+    """
+    workers = workers if workers is not None else build_workers_from_env()
+    coordinator = ShardCoordinator(workers, unit_timeout=float(os.getenv('SCRAPER_SHARD_UNIT_TIMEOUT_SEC', '120')))
+    start_time = time.time()
+    print('SCRAPING (sharded). . .')
+
+    deadline = current_deadline() or Deadline.after(get_scraper_timeout(), reserve=analytics_reserve_sec())
+
+    # Page 1 locally: pagination + first candidates in one request
+    base_list_url = list_page_url(province, property_type, 1)
+    session = build_session(base_list_url)
+    with deadline_scope(deadline):
+        page = fetch_page(session, base_list_url, 'list_fetch', timeout=15)
+    soup = parse_html(page.content)
+    max_page_num = detect_max_page(soup)
+    capped_max_page_num = min(max_page_num, get_max_pages_cap())
+    primary, fallback = extract_list_candidates(soup)
+    if not primary and not fallback:
+        # Defer to the page-1 retry path (challenge pages, transient misses)
+        with deadline_scope(deadline):
+            primary, fallback = scan_list_page(session, province, property_type, 1)
+    pages_scanned = 1
+    candidates = [[sku, link, 1] for sku, link in list(primary) + list(fallback)]
+
+    # Phase 1: remaining listing pages in contiguous ranges
+    base_unit = {'province': province, 'property_type': property_type}
+    list_units = [
+        {**base_unit, 'kind': UNIT_LIST_PAGES, 'pages': pages}
+        for pages in _partition(list(range(2, capped_max_page_num + 1)), len(workers))
+    ]
+    for result in coordinator.run(list_units, deadline=deadline.budget(list_budget_share(), 'list')):
+        if result:
+            candidates.extend(result.get('candidates', []))
+            pages_scanned += int(result.get('pages_scanned', 0) or 0)
+
+    # Merge in page order, dedupe by SKU, cap to requested count
+    listing = []
+    skus = set()
+    for sku, link, _page in sorted(candidates, key=lambda c: c[2]):
+        if len(listing) >= num:
+            break
+        if sku in skus:
+            continue
+        skus.add(sku)
+        listing.append([sku, link])
+    listing_df = pd.DataFrame(listing, columns=['SKU', 'link'])
+    print({
+        'level': 'info',
+        'event': 'list_pages_scanned',
+        'pages_scanned': pages_scanned,
+        'capped_max_page_num': capped_max_page_num,
+        'requested_num': int(num),
+        'collected_links': int(len(listing_df)),
+    })
+    if listing_df.empty:
+        annotate_run(pages_scanned=pages_scanned)
+        return write_empty_outputs(province, property_type)
+
+    # Phase 2: detail URLs in batches (two per worker so fast workers take more)
+    detail_units = [
+        {**base_unit, 'kind': UNIT_DETAILS, 'listings': batch}
+        for batch in _partition(listing, len(workers) * 2)
+    ]
+    data = []
+    seen = set()
+    for result in coordinator.run(detail_units, deadline=deadline.budget(1.0, 'detail')):
+        for prop in (result or {}).get('data', []):
+            if prop.get('SKU') in seen:
+                continue
+            seen.add(prop.get('SKU'))
+            data.append(prop)
+
+    execution_time = time.time() - start_time
+    print({
+        'level': 'info',
+        'event': 'shard_scrape_complete',
+        'workers': len(workers),
+        'properties': len(data),
+        'duration_sec': round(execution_time, 2),
+        'retried_units': coordinator.retried_units,
+        'failed_units': coordinator.failed_units,
+        'skipped_units': coordinator.skipped_units,
+        'per_worker': coordinator.throughput(),
+    })
+
+    staging_df = build_staging_df(data, listing_df, province)
+    write_outputs(staging_df, province, property_type, data=data)
+    write_diagnostics(province, property_type, num, len(data), execution_time, False, pages_scanned)
+    return staging_df
+
+
+__all__ = [
+    'execute_unit',
+    'validate_unit',
+    'ShardCoordinator',
+    'LocalProcessWorker',
+    'RemoteHttpWorker',
+    'build_workers_from_env',
+    'sharding_enabled',
+    'sharded_scraper',
+]
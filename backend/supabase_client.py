@@ -1,46 +1,65 @@
 import os
-from supabase import create_client, Client
+from typing import TYPE_CHECKING, Optional
+
 from dotenv import load_dotenv
 
+from supabase_outbox import SupabaseOutbox
+
+if TYPE_CHECKING:
+    from supabase import Client
+
 # Load environment variables
 load_dotenv()
 
-def create_supabase_client() -> Client:
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+OUTBOX_PATH = os.getenv("SUPABASE_OUTBOX_PATH", os.path.join(BACKEND_DIR, "data", "supabase_outbox.sqlite3"))
+
+_outbox: Optional[SupabaseOutbox] = None
+
+
+def create_supabase_client() -> "Client":
     """Create and return a Supabase client with service role key"""
+    # Imported here: the SDK is only needed once the outbox flushes
+    from supabase import create_client
+
     supabase_url = os.getenv("SUPABASE_URL")
     supabase_service_key = os.getenv("SUPABASE_SERVICE_KEY")
-    
+
     if not supabase_url or not supabase_service_key:
         raise ValueError("Missing Supabase environment variables")
-    
+
     return create_client(supabase_url, supabase_service_key)
 
-def update_appraisal(appraisal_id: str, status: str, **kwargs):
-    """Update an appraisal record with completion data"""
+def get_outbox() -> SupabaseOutbox:
+    """Return the process-wide outbox, starting its flusher on first use"""
+    global _outbox
+    if _outbox is None:
+        _outbox = SupabaseOutbox(
+            OUTBOX_PATH,
+            create_supabase_client,
+            batch_size=int(os.getenv("SUPABASE_OUTBOX_BATCH", "200")),
+            flush_interval=float(os.getenv("SUPABASE_OUTBOX_FLUSH_SEC", "2")),
+        )
+        _outbox.start()
+    return _outbox
+
+def update_appraisal(appraisal_id: str, status: str, idempotency_key: Optional[str] = None, **kwargs):
+    """Queue an appraisal update; the outbox flusher delivers it to Supabase"""
     try:
-        supabase = create_supabase_client()
-        
         update_data = {"status": status}
         update_data.update(kwargs)
-        
-        result = supabase.table('appraisals').update(update_data).eq('id', appraisal_id).execute()
-        
-        if result.data:
-            print(f"✅ Updated appraisal {appraisal_id} with status: {status}")
-            return result.data[0]
-        else:
-            print(f"❌ Failed to update appraisal {appraisal_id}")
-            return None
-            
+
+        key = get_outbox().enqueue_appraisal_update(appraisal_id, update_data, key=idempotency_key)
+        print(f"📥 Queued appraisal {appraisal_id} update with status: {status}")
+        return key
+
     except Exception as e:
-        print(f"❌ Error updating appraisal {appraisal_id}: {str(e)}")
+        print(f"❌ Error queueing appraisal {appraisal_id} update: {str(e)}")
         return None
 
-def log_error(user_id: str, error_type: str, error_message: str, stack_trace: str = None):
-    """Log an error to activity_logs"""
+def log_error(user_id: str, error_type: str, error_message: str, stack_trace: str = None, idempotency_key: Optional[str] = None):
+    """Queue an error for activity_logs; the outbox flusher bulk-inserts it"""
     try:
-        supabase = create_supabase_client()
-        
         error_data = {
             "user_id": user_id,
             "event_type": "error",
@@ -49,16 +68,15 @@ def log_error(user_id: str, error_type: str, error_message: str, stack_trace: st
             "error_message": error_message,
             "stack_trace": stack_trace
         }
-        
-        result = supabase.table('activity_logs').insert(error_data).execute()
-        
-        if result.data:
-            print(f"✅ Logged error for user {user_id}: {error_type}")
-            return result.data[0]
-        else:
-            print(f"❌ Failed to log error for user {user_id}")
-            return None
-            
+
+        key = get_outbox().enqueue_activity_log(error_data, key=idempotency_key)
+        print(f"📥 Queued error log for user {user_id}: {error_type}")
+        return key
+
     except Exception as e:
-        print(f"❌ Error logging error for user {user_id}: {str(e)}")
+        print(f"❌ Error queueing error log for user {user_id}: {str(e)}")
         return None
+
+def outbox_stats() -> dict:
+    """Backlog size and flush counters for monitoring"""
+    return get_outbox().stats()
@@ -0,0 +1,345 @@
+"""
+Durable local outbox for Supabase writes.
+
+Every appraisal update / activity log lands in a local SQLite table first and a
+background flusher drains it in batches:
+- activity_logs: one bulk upsert per batch (deterministic ids → idempotent)
+- appraisals: pending updates are coalesced per appraisal_id so only the final
+  state is sent (one UPDATE per appraisal)
+
+Rows are only deleted after Supabase accepted them, so a slow or unreachable
+Supabase delays writes instead of dropping them.
+
+Updates to one appraisal are sent by one flusher at a time, in order: a batch
+claims every pending row of each appraisal it touches, appraisals with rows
+leased to another flusher wait for the next batch, and a flusher re-checks
+and extends its lease right before each UPDATE, skipping appraisals whose
+lease expired and went to someone else. An old "processing" state therefore
+cannot land after "completed". Sends must finish within lease_seconds.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+KIND_APPRAISAL_UPDATE = "appraisal_update"
+KIND_ACTIVITY_LOG = "activity_log"
+
+# Namespace for deterministic activity_logs ids derived from idempotency keys
+_ACTIVITY_LOG_NAMESPACE = uuid.UUID("6f1c9a52-7d0e-4c51-9b8e-2a4f0d3c8e11")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,
+    target TEXT,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    claimed_until REAL NOT NULL DEFAULT 0,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_kind_id ON outbox(kind, id);
+"""
+
+
+class SupabaseOutbox:
+    """SQLite-backed outbox with a batched, coalescing flusher."""
+
+    def __init__(
+        self,
+        path: str,
+        client_factory: Callable[[], Any],
+        batch_size: int = 200,
+        flush_interval: float = 2.0,
+        lease_seconds: float = 60.0,
+        max_backoff: float = 60.0,
+    ) -> None:
+        self.path = path
+        self.client_factory = client_factory
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(0.1, float(flush_interval))
+        self.lease_seconds = float(lease_seconds)
+        self.max_backoff = float(max_backoff)
+
+        self._client: Any = None
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, Any] = {
+            "flushed_total": 0,
+            "flush_errors_total": 0,
+            "last_flush_at": None,
+            "last_error": None,
+        }
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript(_SCHEMA)
+
+    # ------------------------------------------------------------------
+    # Storage helpers
+    # ------------------------------------------------------------------
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _enqueue(self, kind: str, target: Optional[str], payload: Dict[str, Any], key: Optional[str]) -> str:
+        idempotency_key = key or uuid.uuid4().hex
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO outbox (idempotency_key, kind, target, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                (idempotency_key, kind, target, json.dumps(payload, default=str), time.time()),
+            )
+        self._wake.set()
+        return idempotency_key
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def enqueue_appraisal_update(self, appraisal_id: str, update_data: Dict[str, Any], key: Optional[str] = None) -> str:
+        """Queue an update for appraisals.id = appraisal_id. Returns the idempotency key."""
+        return self._enqueue(KIND_APPRAISAL_UPDATE, str(appraisal_id), update_data, key)
+
+    def enqueue_activity_log(self, row: Dict[str, Any], key: Optional[str] = None) -> str:
+        """Queue an activity_logs insert. Returns the idempotency key."""
+        return self._enqueue(KIND_ACTIVITY_LOG, None, row, key)
+
+    def backlog_size(self) -> int:
+        """Number of writes waiting to be delivered."""
+        with closing(self._connect()) as conn:
+            return int(conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0])
+
+    def stats(self) -> Dict[str, Any]:
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT kind, COUNT(*), MIN(created_at) FROM outbox GROUP BY kind").fetchall()
+        pending = {kind: int(n) for kind, n, _ in rows}
+        oldest = min((ts for _, _, ts in rows if ts is not None), default=None)
+        with self._stats_lock:
+            snapshot = dict(self._stats)
+        snapshot.update({
+            "backlog": sum(pending.values()),
+            "pending_by_kind": pending,
+            "oldest_age_sec": round(time.time() - oldest, 1) if oldest else 0.0,
+        })
+        return snapshot
+
+    def flush_once(self) -> int:
+        """Drain one batch. Returns number of outbox rows delivered."""
+        with self._flush_lock:
+            leased_until, batch = self._claim_batch()
+            if not batch:
+                return 0
+            delivered: List[int] = []
+            errors: List[Tuple[List[int], str]] = []
+
+            logs = [r for r in batch if r[1] == KIND_ACTIVITY_LOG]
+            updates = [r for r in batch if r[1] == KIND_APPRAISAL_UPDATE]
+
+            if logs:
+                ids = [r[0] for r in logs]
+                try:
+                    self._send_activity_logs(logs)
+                    delivered.extend(ids)
+                except Exception as e:
+                    errors.append((ids, str(e)))
+
+            for appraisal_id, row_ids, merged in _coalesce_updates(updates):
+                if not self._renew_lease(row_ids, leased_until):
+                    # Our lease ran out and another flusher owns these rows now
+                    continue
+                try:
+                    self._send_appraisal_update(appraisal_id, merged)
+                    delivered.extend(row_ids)
+                except Exception as e:
+                    errors.append((row_ids, str(e)))
+
+            self._finish(delivered, errors)
+            return len(delivered)
+
+    def flush_all(self, max_batches: int = 100) -> int:
+        total = 0
+        for _ in range(max_batches):
+            n = self.flush_once()
+            total += n
+            if n == 0:
+                break
+        return total
+
+    def start(self) -> None:
+        """Start the background flusher thread (idempotent)."""
+        with self._thread_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="supabase-outbox", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+    def _claim_batch(self) -> Tuple[float, List[Tuple[int, str, Optional[str], Dict[str, Any], str]]]:
+        """Lease a batch so concurrent flushers (other gunicorn workers) skip it.
+
+        Returns (lease end, rows). An appraisal's updates are claimed all
+        together, or not at all while another flusher holds some of them.
+        """
+        now = time.time()
+        until = now + self.lease_seconds
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT id, kind, target, payload, idempotency_key FROM outbox "
+                "WHERE claimed_until < ? ORDER BY id LIMIT ?",
+                (now, self.batch_size),
+            ).fetchall()
+            targets = {r[2] for r in rows if r[1] == KIND_APPRAISAL_UPDATE}
+            if targets:
+                busy = {t for (t,) in conn.execute(
+                    "SELECT DISTINCT target FROM outbox WHERE kind = ? AND claimed_until >= ?",
+                    (KIND_APPRAISAL_UPDATE, now),
+                )}
+                targets -= busy
+                claimed = {r[0] for r in rows}
+                rows = [r for r in rows if r[1] != KIND_APPRAISAL_UPDATE or r[2] in targets]
+                # Later updates of the same appraisals that fell past the batch limit
+                for target in targets:
+                    rows.extend(r for r in conn.execute(
+                        "SELECT id, kind, target, payload, idempotency_key FROM outbox "
+                        "WHERE kind = ? AND target = ? ORDER BY id",
+                        (KIND_APPRAISAL_UPDATE, target),
+                    ) if r[0] not in claimed)
+                rows.sort(key=lambda r: r[0])
+            if rows:
+                conn.executemany(
+                    "UPDATE outbox SET claimed_until = ?, attempts = attempts + 1 WHERE id = ?",
+                    [(until, r[0]) for r in rows],
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            try:
+                conn.execute("ROLLBACK")
+            except Exception:
+                pass
+            raise
+        finally:
+            conn.close()
+        return until, [(r[0], r[1], r[2], json.loads(r[3]), r[4]) for r in rows]
+
+    def _renew_lease(self, row_ids: List[int], leased_until: float) -> bool:
+        """Extend our lease on row_ids; False if it expired and another flusher claimed them."""
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            held = conn.execute(
+                f"SELECT COUNT(*) FROM outbox WHERE claimed_until = ? AND id IN ({','.join('?' * len(row_ids))})",
+                (leased_until, *row_ids),
+            ).fetchone()[0]
+            if held == len(row_ids):
+                renewed_until = time.time() + self.lease_seconds
+                conn.executemany("UPDATE outbox SET claimed_until = ? WHERE id = ?",
+                                 [(renewed_until, i) for i in row_ids])
+            conn.execute("COMMIT")
+        return held == len(row_ids)
+
+    def _finish(self, delivered: List[int], errors: List[Tuple[List[int], str]]) -> None:
+        with closing(self._connect()) as conn:
+            if delivered:
+                conn.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in delivered])
+            for row_ids, message in errors:
+                # Release the lease so the next flush retries these rows
+                conn.executemany(
+                    "UPDATE outbox SET claimed_until = 0, last_error = ? WHERE id = ?",
+                    [(message[:500], i) for i in row_ids],
+                )
+        with self._stats_lock:
+            self._stats["flushed_total"] += len(delivered)
+            self._stats["last_flush_at"] = time.time()
+            if errors:
+                self._stats["flush_errors_total"] += len(errors)
+                self._stats["last_error"] = errors[-1][1][:200]
+        if errors:
+            raise OutboxFlushError(errors[-1][1])
+
+    def _get_client(self) -> Any:
+        if self._client is None:
+            self._client = self.client_factory()
+        return self._client
+
+    def _send_activity_logs(self, rows: List[Tuple[int, str, Optional[str], Dict[str, Any], str]]) -> None:
+        records = []
+        for _, _, _, payload, key in rows:
+            record = dict(payload)
+            # Deterministic primary key: a re-sent row is ignored, not duplicated
+            record["id"] = str(uuid.uuid5(_ACTIVITY_LOG_NAMESPACE, key))
+            records.append(record)
+        client = self._get_client()
+        client.table("activity_logs").upsert(records, on_conflict="id", ignore_duplicates=True).execute()
+
+    def _send_appraisal_update(self, appraisal_id: str, update_data: Dict[str, Any]) -> None:
+        client = self._get_client()
+        client.table("appraisals").update(update_data).eq("id", appraisal_id).execute()
+
+    def _run(self) -> None:
+        backoff = self.flush_interval
+        while not self._stop.is_set():
+            self._wake.wait(backoff)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.flush_all()
+                backoff = self.flush_interval
+            except Exception as e:
+                # Keep rows; retry with exponential backoff
+                backoff = min(self.max_backoff, max(self.flush_interval, backoff * 2))
+                print({
+                    "level": "warn",
+                    "event": "supabase_outbox_flush_failed",
+                    "error": str(e)[:200],
+                    "retry_in_sec": round(backoff, 1),
+                })
+
+
+class OutboxFlushError(Exception):
+    """Raised by flush_once when part of a batch could not be delivered."""
+
+
+def _coalesce_updates(
+    rows: List[Tuple[int, str, Optional[str], Dict[str, Any], str]]
+) -> List[Tuple[str, List[int], Dict[str, Any]]]:
+    """Merge queued updates per appraisal in enqueue order (later fields win)."""
+    merged: Dict[str, Tuple[List[int], Dict[str, Any]]] = {}
+    for row_id, _, target, payload, _ in rows:
+        key = target or ""
+        row_ids, data = merged.setdefault(key, ([], {}))
+        row_ids.append(row_id)
+        data.update(payload)
+    return [(appraisal_id, row_ids, data) for appraisal_id, (row_ids, data) in merged.items()]
+
+
+__all__ = [
+    "SupabaseOutbox",
+    "OutboxFlushError",
+    "KIND_APPRAISAL_UPDATE",
+    "KIND_ACTIVITY_LOG",
+]
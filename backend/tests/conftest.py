@@ -0,0 +1,40 @@
+import pytest
+
+from cma_jobs import CmaJobQueue
+from scrape_coordinator import ScrapeCoordinator
+from src.scraper import pacing
+
+
+@pytest.fixture(autouse=True)
+def _fresh_pacers(monkeypatch):
+    """Per-host pacers are process-wide; keep one test's 429s/challenges from slowing the next."""
+    monkeypatch.setattr(pacing, '_pacers', {})
+
+
+@pytest.fixture(autouse=True)
+def _isolated_scrape_coordinator(monkeypatch, tmp_path):
+    """Scrape slots, job progress, the CMA job queue, scrape exports, run history and the outbox go to tmp_path instead of backend/data."""
+    import app as backend_app
+    path = str(tmp_path / 'coordination.sqlite3')
+    monkeypatch.setattr(backend_app, '_scrape_coordinator', ScrapeCoordinator(path))
+    monkeypatch.setattr(backend_app, '_cma_job_queue', CmaJobQueue(path))
+    monkeypatch.setattr(backend_app, '_cma_job_workers', None)
+    # Parquet export and the listing snapshot built from it
+    monkeypatch.setenv('SCRAPER_PARQUET_DIR', str(tmp_path / 'parquet'))
+    monkeypatch.setattr(backend_app, 'LISTING_SNAPSHOT_PATH', str(tmp_path / 'listing_snapshot.bin'))
+    monkeypatch.setattr(backend_app, '_listing_snapshot', None)
+    monkeypatch.setattr(backend_app, '_snapshot_rebuilder', None)
+    monkeypatch.setattr(backend_app, 'LISTING_SNAPSHOT_REBUILD_SEC', 0)
+    # Scrape run history (src/observability/run_history.py reopens its store when the path changes)
+    monkeypatch.setenv('SCRAPE_RUNS_DB_PATH', str(tmp_path / 'scrape_runs.sqlite3'))
+    # Supabase outbox (read by the /metrics backlog gauges)
+    import supabase_client
+    monkeypatch.setattr(supabase_client, 'OUTBOX_PATH', str(tmp_path / 'supabase_outbox.sqlite3'))
+    monkeypatch.setattr(supabase_client, '_outbox', None)
+    yield
+    if supabase_client._outbox is not None:
+        supabase_client._outbox.stop()
+    if backend_app._cma_job_workers is not None:
+        backend_app._cma_job_workers.stop()
+    if backend_app._snapshot_rebuilder is not None:
+        backend_app._snapshot_rebuilder.join(5)
@@ -0,0 +1,129 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+import app as backend_app
+from address_index import CONFIDENCE_ORDER, AddressDatabase, AddressIndex
+from bench.fixtures import synthetic_addresses
+
+
+def _address(full_address, confidence='high'):
+    return {'full_address': full_address, 'psgc_city_code': '137602000', 'psgc_province_code': '1376',
+            'coordinates': [14.55, 121.05], 'search_radius_km': 5, 'confidence_level': confidence}
+
+
+def _write(path, addresses, mtime=None):
+    path.write_text(json.dumps({'addresses': addresses}), encoding='utf-8')
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def _linear_scan(addresses, query, limit):
+    matches = []
+    for address in addresses:
+        if query.lower() in address['full_address'].lower():
+            matches.append(address)
+            if len(matches) >= limit * 3:
+                break
+    matches.sort(key=lambda a: CONFIDENCE_ORDER.get(a['confidence_level'], 0), reverse=True)
+    return matches[:limit]
+
+
+def test_trigram_index_returns_what_the_linear_scan_did():
+    addresses = synthetic_addresses(3000)['addresses']
+    index = AddressIndex(addresses)
+    for query in ('Makati', 'barangay 12', 'gy', 'Metro Manila', 'zzz-no-match', 'a', ', p'):
+        for limit in (1, 5, 10):
+            assert index.search(query, limit) == _linear_scan(addresses, query, limit), (query, limit)
+
+
+def test_reload_swaps_index_and_cache_only_when_the_file_changes(tmp_path):
+    path = tmp_path / 'addresses.json'
+    _write(path, [_address('Bel-Air, Makati City, Metro Manila')], mtime=1_700_000_000)
+    database = AddressDatabase(str(path), poll_interval=0)
+    assert database.reload() is True and database.reload() is False
+
+    assert database.search('makati', 5) == ([_address('Bel-Air, Makati City, Metro Manila')], False)
+    assert database.search('Makati', 5)[1] is True
+
+    _write(path, [_address('San Lorenzo, Makati City, Metro Manila', 'medium'),
+                  _address('Bel-Air, Makati City, Metro Manila')], mtime=1_700_000_100)
+    assert database.reload() is True
+    suggestions, cached = database.search('makati', 5)
+    assert not cached and [s['confidence_level'] for s in suggestions] == ['high', 'medium']
+
+    path.write_text('{"addresses": [', encoding='utf-8')
+    with pytest.raises(json.JSONDecodeError):
+        database.reload()
+    assert len(database.index) == 2
+
+
+def test_searches_during_reloads_see_one_whole_generation(tmp_path):
+    old = [_address(f'Barangay {i}, Pasig City, Metro Manila', 'high') for i in range(2000)]
+    new = [_address(f'Barangay {i}, Pasig City, Metro Manila', 'low') for i in range(2000)]
+    database = AddressDatabase(str(tmp_path / 'unused.json'), poll_interval=0)
+    database.install({'addresses': old})
+    stop = threading.Event()
+    seen = set()
+    errors = []
+
+    def search():
+        while not stop.is_set():
+            try:
+                suggestions, _ = database.search('pasig', 10)
+                levels = {s['confidence_level'] for s in suggestions}
+                assert len(suggestions) == 10 and len(levels) == 1
+                seen.update(levels)
+            except Exception as e:  # pragma: no cover - reported below
+                errors.append(e)
+
+    threads = [threading.Thread(target=search) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for generation in (new, old, new):
+        database.install({'addresses': generation})
+        time.sleep(0.02)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    assert not errors and seen == {'high', 'low'}
+
+
+def test_watcher_and_admin_trigger_reload(tmp_path, monkeypatch):
+    path = tmp_path / 'addresses.json'
+    _write(path, [_address('Bel-Air, Makati City, Metro Manila')], mtime=1_700_000_000)
+    database = AddressDatabase(str(path), poll_interval=0.05)
+    database.reload()
+    monkeypatch.setattr(backend_app, '_address_db', database)
+    monkeypatch.setattr(backend_app, 'check_rate_limit', lambda ip: True)
+    client = backend_app.app.test_client()
+    try:
+        assert client.get('/api/addresses/search?q=cebu').get_json()['total'] == 0
+        _write(path, [_address('Lahug, Cebu City, Cebu')], mtime=1_700_000_100)
+        deadline = time.time() + 5
+        while client.get('/api/addresses/search?q=cebu').get_json()['total'] == 0 and time.time() < deadline:
+            time.sleep(0.05)
+        assert client.get('/api/addresses/search?q=cebu').get_json()['suggestions'][0]['full_address'] == \
+            'Lahug, Cebu City, Cebu'
+    finally:
+        database.stop()
+
+    # No token configured: the endpoint stays shut rather than open to anyone
+    monkeypatch.delenv('ADMIN_TOKEN', raising=False)
+    assert client.post('/api/admin/addresses/reload').status_code == 403
+    assert client.post('/api/admin/addresses/reload', headers={'X-Admin-Token': ''}).status_code == 403
+    monkeypatch.setenv('ADMIN_TOKEN', 'secret')
+    assert client.post('/api/admin/addresses/reload').status_code == 403
+    assert client.post('/api/admin/addresses/reload', headers={'X-Admin-Token': 'wrong'}).status_code == 403
+    # Forced: rebuilt even though the file has not changed since the watcher loaded it
+    index = database.index
+    reloaded = client.post('/api/admin/addresses/reload', headers={'X-Admin-Token': 'secret'})
+    assert reloaded.status_code == 200 and reloaded.get_json()['addresses'] == 1
+    assert database.index is not index and database.index.version == index.version
+
+    path.unlink()
+    failed = client.post('/api/admin/addresses/reload', headers={'X-Admin-Token': 'secret'})
+    assert failed.status_code == 500 and failed.get_json()['addresses'] == 1
@@ -0,0 +1,36 @@
+from bs4 import BeautifulSoup as bs
+
+from bench.fixtures import CHALLENGE_PAGE, detail_page_html, listing_page_html
+from bench.run_benchmarks import compare
+from src.scraper.card_scraper import extract_listing_cards
+from src.scraper.scraper import detect_max_page, extract_list_candidates, is_challenge_page, parse_detail_page
+
+
+def test_synthetic_listing_page_matches_scraper_selectors():
+    soup = bs(listing_page_html('cavite', page=2, per_page=12, max_page=7), 'html.parser')
+    primary, _ = extract_list_candidates(soup)
+    assert len(primary) == 12
+    assert primary[0][0] == 'cavite-002-00'
+    assert detect_max_page(soup) == 7
+    assert len(extract_listing_cards(soup)) == 12
+
+
+def test_synthetic_detail_page_yields_core_fields():
+    details = parse_detail_page(bs(detail_page_html('cavite-001-00'), 'html.parser'))
+    assert details['price'] > 0
+    assert details['text_location'].endswith('Metro Manila')
+    assert {'Bedrooms', 'Baths', 'Floor area (m²)'} <= set(details['features'])
+    assert details['latitude'] and details['longitude']
+    assert details['amenities']
+
+
+def test_challenge_page_is_detected():
+    assert is_challenge_page(bs(CHALLENGE_PAGE, 'html.parser'))
+
+
+def test_compare_flags_only_slowdowns_over_threshold():
+    baseline = {'results': {'a': {'median_ms': 10.0}, 'b': {'median_ms': 10.0}, 'gone': {'median_ms': 1.0}}}
+    results = {'a': {'median_ms': 12.0}, 'b': {'median_ms': 14.0}, 'new': {'median_ms': 5.0}}
+    assert compare(results, baseline, threshold=0.25) == [
+        {'case': 'b', 'baseline_ms': 10.0, 'current_ms': 14.0, 'slowdown': 1.4},
+    ]
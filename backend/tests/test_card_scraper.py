@@ -0,0 +1,52 @@
+from bs4 import BeautifulSoup as bs
+import pandas as pd
+
+from src.adapters.lamudi_adapter import _normalize_row
+from src.scraper.card_scraper import extract_listing_cards
+from src.scraper.scraper import build_staging_df
+
+LIST_PAGE = """
+<div class="row ListingCell-row ListingCell-agent-redesign">
+  <div class="ListingCell-AllInfo" data-sku="SKU-1" data-price="7108000" data-bedrooms="2"
+       data-bathrooms="1" data-building_size="45" data-geo-point="[121.05, 14.52]">
+    <a href="/property/the-rise-2br-unit">The Rise 2BR</a>
+    <span class="ListingCell-KeyInfo-address-text">Makati CBD, Makati</span>
+  </div>
+</div>
+<div class="row ListingCell-row ListingCell-agent-redesign">
+  <a href="https://www.lamudi.com.ph/property/avida-studio">Avida Studio</a>
+  <span class="ListingCell-KeyInfo-address-text">BGC, Taguig</span>
+  <span>₱ 3,900,000</span><span>Studio</span><span>24 m²</span>
+</div>
+<div class="row ListingCell-row ListingCell-agent-redesign"><a href="/promo">Ad</a></div>
+"""
+
+
+def test_cards_parse_from_data_attributes_and_text():
+    cards = extract_listing_cards(bs(LIST_PAGE, 'html.parser'))
+
+    assert [c['SKU'] for c in cards] == ['SKU-1', 'avida-studio']
+    first, second = cards
+    assert first['price'] == 7108000
+    assert first['features'] == {'Bedrooms': '2', 'Baths': '1', 'Floor area (m²)': '45.0'}
+    assert (first['latitude'], first['longitude']) == ('14.52', '121.05')
+    assert first['link'] == 'https://www.lamudi.com.ph/property/the-rise-2br-unit'
+    assert second['price'] == 3900000
+    assert second['features']['Bedrooms'] == '0'
+    assert second['features']['Floor area (m²)'] == '24.0'
+    assert second['text_location'] == 'BGC, Taguig'
+    assert all(c['detail_level'] == 'card' for c in cards)
+
+
+def test_card_rows_normalize_with_detail_level_flag():
+    cards = extract_listing_cards(bs(LIST_PAGE, 'html.parser'))
+    listing_df = pd.DataFrame([[c['SKU'], c.pop('link')] for c in cards], columns=['SKU', 'link'])
+    staging_df = build_staging_df(cards, listing_df, 'metro-manila')
+
+    rows = [_normalize_row(row, 'condo') for _, row in staging_df.iterrows()]
+
+    assert rows[0]['detail_level'] == 'card'
+    assert rows[0]['coordinates'] == [14.52, 121.05]
+    assert rows[0]['sqm'] == 45.0
+    assert rows[1]['coordinates'] is None
+    assert rows[1]['neighborhood'] == 'BGC'
@@ -0,0 +1,61 @@
+import time
+
+import app as backend_app
+from src.analytics.projections import ProjectionStore
+from src.scraper.fetch_pool import TokenBucket
+
+
+def _fake_scrape(calls):
+    def scrape(province, property_type, count, detail_level='full', enrich=0, fetch_pool=None):
+        calls.append((province, fetch_pool))
+        price = 1_000_000.0 if province == 'cavite' else 3_000_000.0
+        props = [{'property_id': f'{province}-{i}', 'neighborhood': 'X', 'price': price} for i in range(count)]
+        return props, [price] * count
+    return scrape
+
+
+def test_batch_scrapes_through_one_pool_and_reuses_cache(monkeypatch, tmp_path):
+    calls = []
+    monkeypatch.setattr(backend_app, '_projection_store', ProjectionStore(str(tmp_path / 'history.sqlite3')))
+    monkeypatch.setattr(backend_app, 'scrape_and_normalize', _fake_scrape(calls))
+    monkeypatch.setattr(backend_app, 'SCRAPER_MODE', 'local')
+    backend_app._cma_cache.clear()
+    backend_app.cache_cma_result('laguna', 'condo', 'full', 5, [{'property_id': 'l', 'neighborhood': '', 'price': 2.0}] * 5, [2_000_000.0] * 5)
+
+    client = backend_app.app.test_client()
+    response = client.post('/api/cma/batch', json={
+        'batch_id': 'b1',
+        'items': [
+            {'psgc_province_code': '1376', 'property_type': 'condo', 'count': 2},
+            {'psgc_province_code': '3400', 'property_type': 'condo', 'count': 2},
+            {'psgc_province_code': '4000', 'property_type': 'condo', 'count': 3},
+        ],
+    })
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [i['data_source'] for i in body['items']] == ['live', 'live', 'cache']
+    assert body['items'][2]['stats']['count'] == 3
+    assert body['combined_stats']['count'] == 7
+    assert body['meta']['cache_hits'] == 1
+    # Both live items shared the same fetch pool
+    assert len(calls) == 2 and calls[0][1] is calls[1][1] is not None
+
+    status = client.get('/api/cma/batch/b1/status').get_json()
+    assert status == {'active': False, 'itemsTotal': 3, 'itemsDone': 3, 'cacheHits': 1, 'requests': 0}
+
+
+def test_batch_rejects_invalid_items():
+    client = backend_app.app.test_client()
+    response = client.post('/api/cma/batch', json={'items': [{'psgc_province_code': '9999', 'property_type': 'condo'}]})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Unsupported province', 'item': 0}
+
+
+def test_token_bucket_paces_requests():
+    bucket = TokenBucket(rate=20, capacity=1)
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    # First token is immediate, the next four wait ~50ms each
+    assert time.monotonic() - start >= 0.18
@@ -0,0 +1,138 @@
+import subprocess
+import sys
+import threading
+import time
+from contextlib import closing
+
+import app as backend_app
+from cma_jobs import JOB_CANCELLED, JOB_QUEUED, CmaJobQueue
+from scrape_coordinator import JOB_DONE, JOB_FAILED
+from src.analytics.projections import ProjectionStore
+from src.scraper.cancellation import check_cancelled
+
+REQUEST = {'psgc_province_code': '1376', 'property_type': 'condo', 'count': 2}
+
+
+def _local_mode(monkeypatch, tmp_path, scrape):
+    monkeypatch.setattr(backend_app, 'SCRAPER_MODE', 'local')
+    monkeypatch.setattr(backend_app, '_projection_store', ProjectionStore(str(tmp_path / 'history.sqlite3')))
+    monkeypatch.setattr(backend_app, 'run_scraper_subprocess', lambda *a, **k: 1)
+    monkeypatch.setattr(backend_app, 'scrape_and_normalize', scrape)
+
+
+def _wait_for(client, job_id, states, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(f'/api/cma/jobs/{job_id}').get_json()
+        if job['status'] in states:
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f'job {job_id} still {job["status"]}')
+
+
+def test_job_is_accepted_at_once_and_result_is_kept(monkeypatch, tmp_path):
+    def scrape(province, property_type, count, detail_level='full', enrich=0):
+        props = [{'property_id': str(i), 'neighborhood': 'Poblacion', 'price': 2_000_000.0} for i in range(count)]
+        return props, [2_000_000.0] * count
+    _local_mode(monkeypatch, tmp_path, scrape)
+    client = backend_app.app.test_client()
+
+    response = client.post('/api/cma/jobs', json={**REQUEST, 'job_id': 'j1'})
+    assert response.status_code == 202
+    assert response.headers['Location'] == '/api/cma/jobs/j1'
+    assert response.get_json()['job_id'] == 'j1'
+
+    job = _wait_for(client, 'j1', {JOB_DONE, JOB_FAILED})
+    assert job['status'] == JOB_DONE and job['status_code'] == 200
+    assert job['result']['stats']['count'] == 2
+    assert job['expires_at'] > job['finished_at']
+    # The slot went back once the job finished
+    assert backend_app.get_scrape_coordinator().in_use() == 0
+
+
+def test_cancelling_a_running_job_stops_its_scrape(monkeypatch, tmp_path):
+    calls = []
+
+    def scrape(*args, **kwargs):
+        while True:
+            check_cancelled()
+            calls.append(1)
+            time.sleep(0.02)
+    _local_mode(monkeypatch, tmp_path, scrape)
+    client = backend_app.app.test_client()
+
+    client.post('/api/cma/jobs', json={**REQUEST, 'job_id': 'slow'})
+    _wait_for(client, 'slow', {'running'})
+    assert client.post('/api/cma/jobs/slow/cancel').get_json()['cancel_requested'] is True
+
+    job = _wait_for(client, 'slow', {JOB_CANCELLED, JOB_DONE, JOB_FAILED})
+    assert job['status'] == JOB_CANCELLED and job['status_code'] == 499
+    fetched = len(calls)
+    time.sleep(0.1)
+    assert len(calls) == fetched
+
+
+def test_remote_jobs_relay_the_request_as_posted(monkeypatch, tmp_path):
+    relayed, release = [], threading.Event()
+
+    def relay(path, body):
+        relayed.append((path, body))
+        release.wait(5)
+        return {'stats': {'count': 0}}, 200
+    _local_mode(monkeypatch, tmp_path, lambda *a, **k: ([], []))
+    monkeypatch.setattr(backend_app, 'SCRAPER_MODE', 'remote')
+    monkeypatch.setattr(backend_app, 'relay_to_scraper_pool', relay)
+    client = backend_app.app.test_client()
+
+    posted = {**REQUEST, 'psgc_city_code': '137602000', 'mode': 'card', 'enrich': 3}
+    client.post('/api/cma/jobs', json={**posted, 'job_id': 'r1', 'extra': 'dropped'})
+    _wait_for(client, 'r1', {'running'})
+    # The pool gets mode and city, not the parsed params, so it scrapes the same scope
+    assert relayed == [('/api/cma', {**posted, 'job_id': 'r1'})]
+
+    refused = client.post('/api/cma/jobs/r1/cancel')
+    assert refused.status_code == 409 and refused.get_json()['cancel_requested'] is False
+    release.set()
+    assert _wait_for(client, 'r1', {JOB_CANCELLED, JOB_DONE, JOB_FAILED})['status'] == JOB_DONE
+
+
+def test_busy_slots_report_queue_position_and_wait(monkeypatch, tmp_path):
+    _local_mode(monkeypatch, tmp_path, lambda *a, **k: ([], []))
+    coordinator = backend_app.get_scrape_coordinator()
+    for n in range(backend_app.SCRAPE_SLOTS):
+        coordinator.acquire(f'held-{n}')
+    client = backend_app.app.test_client()
+
+    first = client.post('/api/cma/jobs', json={**REQUEST, 'job_id': 'q1'}).get_json()
+    second = client.post('/api/cma/jobs', json={**REQUEST, 'job_id': 'q2'}).get_json()
+    assert (first['status'], first['queue_position']) == (JOB_QUEUED, 1)
+    assert second['queue_position'] == 2 and second['queue_depth'] == 2
+    assert second['estimated_wait_sec'] > 0
+
+    busy = client.post('/api/cma', json=REQUEST)
+    assert busy.status_code == 429
+    assert busy.get_json()['queue_depth'] == 2
+    assert int(busy.headers['Retry-After']) >= 1
+
+    cancelled = client.post('/api/cma/jobs/q1/cancel').get_json()
+    assert cancelled['status'] == JOB_CANCELLED
+    assert client.get('/api/cma/jobs/q2').get_json()['queue_position'] == 1
+
+
+def test_results_expire_and_abandoned_jobs_are_requeued(tmp_path):
+    queue = CmaJobQueue(str(tmp_path / 'jobs.sqlite3'), result_ttl=0.05, max_attempts=2)
+    queue.enqueue({'count': 1}, job_id='done')
+    queue.claim_next()
+    queue.complete('done', JOB_DONE, {'ok': True}, 200)
+    assert queue.get('done')['result'] == {'ok': True}
+    time.sleep(0.1)
+    assert queue.get('done') is None
+
+    queue.enqueue({'count': 1}, job_id='orphan')
+    assert queue.claim_next()['job_id'] == 'orphan'
+    dead = subprocess.Popen([sys.executable, '-c', 'pass'])
+    dead.wait()
+    with closing(queue._connect()) as conn:
+        conn.execute("UPDATE cma_job_queue SET pid = ? WHERE job_id = 'orphan'", (dead.pid,))
+    reclaimed = queue.claim_next()
+    assert reclaimed['job_id'] == 'orphan' and reclaimed['attempts'] == 2
@@ -0,0 +1,110 @@
+import os
+from datetime import date, datetime, timezone
+
+import pandas as pd
+import pytest
+from bs4 import BeautifulSoup as bs
+
+pytest.importorskip('pyarrow')
+
+from bench.fixtures import detail_page_html
+import src.scraper.columnar as columnar
+from src.scraper.columnar import (
+    AMENITY_BITS,
+    amenities_from_mask,
+    compact_parquet,
+    listing_files,
+    load_listings,
+    write_parquet,
+)
+from src.scraper.scraper import build_staging_df, parse_detail_page
+
+
+def _scrape(province, n):
+    data = []
+    for i in range(n):
+        sku = f'{province}-001-{i:02d}'
+        details = {'SKU': sku}
+        details.update(parse_detail_page(bs(detail_page_html(sku), 'html.parser')))
+        data.append(details)
+    listing_df = pd.DataFrame([[row['SKU'], f'https://example.test/{row["SKU"]}'] for row in data], columns=['SKU', 'link'])
+    return build_staging_df(data, listing_df, province), data
+
+
+def test_export_is_typed_and_keeps_amenities_and_features(tmp_path):
+    staging_df, data = _scrape('cavite', 4)
+    path = write_parquet(staging_df, 'cavite', 'condo', data=data, root=str(tmp_path / 'parquet'),
+                         scraped_at=datetime(2026, 3, 1, 8, tzinfo=timezone.utc))
+    assert '/province=cavite/scrape_date=2026-03-01/' in path
+
+    frame = load_listings(root=str(tmp_path / 'parquet'))
+    assert len(frame) == 4
+    assert frame['price'].dtype == 'float64' and frame['price'].gt(0).all()
+    assert str(frame['bedrooms'].dtype) in ('int16', 'Int16', 'float64')
+    assert list(frame['amenities'].iloc[0]) == data[0]['amenities']
+    for amenities, mask in zip(frame['amenities'], frame['amenity_mask']):
+        assert amenities_from_mask(mask) == [a for a in AMENITY_BITS if a in set(amenities)]
+    assert dict(frame['features'].iloc[0])['Bedrooms'] == str(data[0]['features']['Bedrooms'])
+    assert set(frame['province']) == {'cavite'}
+
+
+def test_reader_projects_columns_and_prunes_partitions(tmp_path):
+    for province, day in (('cavite', 1), ('laguna', 1), ('laguna', 5)):
+        staging_df, data = _scrape(province, 3)
+        write_parquet(staging_df, province, 'condo', data=data, root=str(tmp_path / 'parquet'),
+                      scraped_at=datetime(2026, 3, day, tzinfo=timezone.utc))
+
+    frame = load_listings(columns=['sku', 'price'], province='laguna', since=date(2026, 3, 2), root=str(tmp_path / 'parquet'))
+    assert list(frame.columns) == ['sku', 'price']
+    assert len(frame) == 3
+
+    assert len(load_listings(columns=['sku'], root=str(tmp_path / 'parquet'))) == 9
+    assert load_listings(columns=['sku'], root=str(tmp_path / 'missing')).empty
+
+
+def test_export_stamps_the_current_time_by_default(tmp_path):
+    staging_df, data = _scrape('cavite', 2)
+    started = pd.Timestamp.now(tz='UTC').floor('ms')
+    path = write_parquet(staging_df, 'cavite', 'condo', data=data, root=str(tmp_path / 'parquet'))
+    assert path is not None
+    stamps = load_listings(columns=['scraped_at'], root=str(tmp_path / 'parquet'))['scraped_at']
+    assert len(stamps) == 2 and (stamps >= started).all()
+
+
+def test_export_can_be_switched_off(tmp_path, monkeypatch):
+    monkeypatch.setenv('SCRAPER_PARQUET_EXPORT', '0')
+    staging_df, data = _scrape('cavite', 1)
+    assert write_parquet(staging_df, 'cavite', 'condo', data=data, root=str(tmp_path / 'parquet')) is None
+
+
+def test_finished_days_are_compacted_and_old_ones_pruned(tmp_path):
+    root = str(tmp_path / 'parquet')
+    for province, day, hour in (('laguna', 1, 8), ('laguna', 1, 9), ('laguna', 1, 10), ('cavite', 1, 8),
+                                ('laguna', 10, 8), ('laguna', 10, 9)):
+        staging_df, data = _scrape(province, 2)
+        write_parquet(staging_df, province, 'condo', data=data, root=root,
+                      scraped_at=datetime(2026, 3, day, hour, tzinfo=timezone.utc))
+    staging_df, data = _scrape('laguna', 2)
+    write_parquet(staging_df, 'laguna', 'condo', data=data, root=root,
+                  scraped_at=datetime(2025, 6, 1, tzinfo=timezone.utc))
+    before = load_listings(columns=['sku', 'scraped_at'], root=root, since=date(2026, 1, 1))
+
+    counts = compact_parquet(root, retention_days=90, today=date(2026, 3, 10))
+    assert counts == {'expired': 1, 'compacted': 3}
+    # Three laguna files merged into one; a lone file and today's partition are untouched
+    files = listing_files(root)
+    assert [os.path.dirname(f) for f in files] == [
+        'province=cavite/scrape_date=2026-03-01', 'province=laguna/scrape_date=2026-03-01',
+        'province=laguna/scrape_date=2026-03-10', 'province=laguna/scrape_date=2026-03-10']
+    assert os.path.basename(files[1]).startswith('compacted-')
+    assert not os.path.exists(os.path.join(root, 'province=laguna', 'scrape_date=2025-06-01'))
+    after = load_listings(columns=['sku', 'scraped_at'], root=root)
+    pd.testing.assert_frame_equal(after.sort_values(['scraped_at', 'sku']).reset_index(drop=True),
+                                  before.sort_values(['scraped_at', 'sku']).reset_index(drop=True))
+    assert compact_parquet(root, retention_days=90, today=date(2026, 3, 10)) == {'expired': 0, 'compacted': 0}
+
+
+def test_export_defaults_to_the_backend_data_dir(monkeypatch):
+    monkeypatch.delenv('SCRAPER_PARQUET_DIR')
+    assert columnar.parquet_root() == os.path.join(columnar._BACKEND_DIR, 'data', 'scraped', 'parquet')
+    assert os.path.isfile(os.path.join(columnar._BACKEND_DIR, 'app.py'))
@@ -0,0 +1,103 @@
+import time
+
+import pytest
+
+import app as backend_app
+from bench.fake_lamudi import FakeLamudiConfig, FakeLamudiServer
+from src.scraper.deadline import Deadline, DeadlineExceeded, current_deadline, deadline_scope
+from src.scraper.scraper import fetch_details, fetch_page
+from src.scraper.sharding import ShardCoordinator
+
+
+class _Session:
+    def __init__(self):
+        self.timeouts = []
+
+    def get(self, url, timeout=7, **kwargs):
+        self.timeouts.append(timeout)
+        return type('Response', (), {'content': b'<html></html>', 'status_code': 200, 'headers': {}})()
+
+
+def test_phase_budgets_share_the_request_deadline():
+    request = Deadline.after(100, reserve=10)
+    assert request.remaining() == pytest.approx(90, abs=0.5)
+    listing = request.budget(0.4, 'list')
+    assert listing.at - time.time() == pytest.approx(36, abs=0.5)
+
+    listing.mark_partial()
+    assert request.partial and request.reasons == ['list']
+    assert request.budget(1.0, 'detail').at == pytest.approx(request.at - 10, abs=0.5)
+
+
+def test_fetch_page_caps_timeout_and_refuses_fetches_that_cannot_finish():
+    session = _Session()
+    with deadline_scope(Deadline.after(3)) as deadline:
+        fetch_page(session, 'http://127.0.0.1:9/list', 'list_fetch', timeout=15)
+    assert 2 < session.timeouts[0] <= 3
+    assert not deadline.partial
+
+    with deadline_scope(Deadline.after(0.2, name='detail')) as deadline:
+        with pytest.raises(DeadlineExceeded):
+            fetch_page(session, 'http://127.0.0.1:9/detail', 'detail_fetch')
+    assert len(session.timeouts) == 1
+    assert deadline.reasons == ['detail']
+
+
+def test_detail_phase_returns_what_it_fetched_before_the_deadline():
+    server = FakeLamudiServer(FakeLamudiConfig(pages=1, per_page=10, latency='fixed:200')).start()
+    try:
+        listing = [(f'laguna-001-0{i}', f'{server.base_url}/property/laguna-001-0{i}/') for i in range(10)]
+        started = time.time()
+        with deadline_scope(Deadline.after(1.5, name='detail')) as deadline:
+            rows = fetch_details(listing, {})
+        assert 0 < len(rows) < 10
+        # Fetched concurrently: whichever finished in time, still in listing order
+        fetched = [row['SKU'] for row in rows]
+        assert fetched == [sku for sku, _ in listing if sku in fetched]
+        assert deadline.partial
+        assert time.time() - started < 2.5
+    finally:
+        server.stop()
+
+
+def test_shard_units_are_not_started_after_the_deadline():
+    class SlowWorker:
+        name = 'slow'
+
+        def __init__(self):
+            self.budgets = []
+
+        def run(self, unit, timeout):
+            self.budgets.append(unit['budget_sec'])
+            time.sleep(0.3)
+            return {'items': 1}
+
+    worker = SlowWorker()
+    deadline = Deadline.after(0.5, name='detail')
+    results = ShardCoordinator([worker]).run([{'n': i} for i in range(5)], deadline=deadline)
+
+    assert sum(1 for r in results if r) == 2
+    assert worker.budgets[0] <= 0.5
+    assert deadline.partial
+
+
+def test_cma_returns_partial_result_instead_of_timing_out(monkeypatch):
+    def scrape(province, property_type, count, detail_level='full', enrich=0):
+        current_deadline().mark_partial('detail')
+        return [{'property_id': 'a', 'neighborhood': 'Poblacion', 'price': 2_000_000.0}], [2_000_000.0]
+
+    monkeypatch.setattr(backend_app, 'SCRAPER_MODE', 'local')
+    monkeypatch.setattr(backend_app, 'run_scraper_subprocess', lambda *a, **k: 1)
+    monkeypatch.setattr(backend_app, 'scrape_and_normalize', scrape)
+    monkeypatch.setattr(backend_app, 'record_projection_history', lambda *a: None)
+    backend_app._cma_cache.clear()
+
+    response = backend_app.app.test_client().post('/api/cma', json={
+        'psgc_province_code': '1376', 'property_type': 'condo', 'count': 5, 'timeout_sec': 30,
+    })
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['meta'] == {'partial': True, 'partial_reasons': ['detail']}
+    assert body['stats']['count'] == 1
+    # A cut-short result is not cached for reuse
+    assert backend_app.get_cached_cma('metro-manila', 'condo', 'full', 5) is None
@@ -0,0 +1,101 @@
+import random
+
+import pandas as pd
+
+import app as backend_app
+import src.adapters.lamudi_adapter as adapter
+import src.analytics.dedupe as dedupe
+from src.analytics.dedupe import cluster_listings, unit_prices
+from src.analytics.snapshot import ListingSnapshot, write_snapshot
+
+PARK_VIEW = 'Fully furnished 1BR facing the park, walk to Market Market and BGC.'
+# name, city, sqm, price, bedrooms, baths, lat, lon, agent, description
+ROWS = [
+    ('ONE SERENDRA', 'Taguig', 45.0, 9_000_000, 1, 1, 14.5501, 121.0501, 'Ana Cruz', PARK_VIEW),
+    ('One Serendra', 'Taguig City', 45.5, 9_020_000, 1, 1, 14.5502, 121.0502, 'Ben Lim',
+     PARK_VIEW.upper()),                                                               # re-posted by another agent
+    ('ONE SERENDRA', 'Taguig', 45.0, 9_000_000, 2, 1, None, None, 'Ana Cruz', 0),      # different layout
+    ('THE RISE', 'Makati', 45.0, 9_000_000, 1, 1, None, None, 'Ana Cruz', 0),          # different building
+    ('0', 'Makati', 49.9, 12_000_000, 2, 2, 14.5601, 121.0201, 'Carla Reyes', 0),     # no name: blocked by location
+    (None, 'Makati', 50.1, 12_000_000, 2, 2, 14.5603, 121.0203, 'CARLA REYES', None),  # ...other side of a 5 m² bucket
+    ('ONE SERENDRA', 'Taguig', None, 9_000_000, 1, 1, None, None, 'Ana Cruz', 0),      # no floor area: left alone
+    ('One Serendra', 'Taguig', 45.2, 9_000_000, 1, 1, 14.5801, 121.0801, 'Ana Cruz', PARK_VIEW),  # 3 km away
+    ('ONE SERENDRA', 'Taguig', 45.0, 9_010_000, 1, 1, 14.5501, 121.0501, 'Ana Cruz',
+     'Bare 1BR on a high floor with a city view.'),                                    # same agent, another unit
+]
+
+
+def test_reposts_share_a_cluster_and_different_units_do_not():
+    assert list(cluster_listings(ROWS)) == [0, 0, 2, 3, 4, 4, 6, 7, 8]
+    assert unit_prices([r[3] for r in ROWS], cluster_listings(ROWS)) == \
+        [9e6, 9e6, 9e6, 12e6, 9e6, 9e6, 9.01e6]
+
+
+def test_similar_units_in_one_tower_stay_separate():
+    tower = ('AVIDA TOWERS VERTE', 'Taguig', 14.5568, 121.0478)
+    # Studios from 3.0M to 4.5M, each 3% above the last, all from the developer's agent
+    studios = [(tower[0], tower[1], 24.0, round(3_000_000 * 1.03 ** k), 0, 1, *tower[2:], 'Avida Sales', None)
+               for k in range(15)]
+    assert list(cluster_listings(studios)) == list(range(15))
+    # Identical 24 m² units at one price from different agents, or from one agent with their own descriptions
+    same_price = [(tower[0], tower[1], 24.0, 3_000_000, 0, 1, *tower[2:], f'Agent {k}', None) for k in range(9)]
+    same_price += [(tower[0], tower[1], 24.0, 3_000_000, 0, 1, *tower[2:], 'Avida Sales', f'Unit {k}0{k} studio')
+                   for k in range(1, 4)]
+    assert list(cluster_listings(same_price)) == list(range(12))
+    # A re-post joins the unit it repeats, not a neighbour it merely resembles
+    repost = same_price + [(tower[0], tower[1], 24.0, 3_000_000, 0, 1, *tower[2:], 'Avida Sales', 'unit 202 studio')]
+    assert cluster_listings(repost)[-1] == 10
+
+
+def test_only_listings_inside_a_block_are_compared(monkeypatch):
+    compared = []
+    matches = dedupe._Listing.matches
+    monkeypatch.setattr(dedupe._Listing, 'matches', lambda a, b: compared.append(1) or matches(a, b))
+    rng = random.Random(7)
+    rows = []
+    for building in range(2000):
+        for unit in range(5):
+            sqm = rng.uniform(25, 150)
+            rows.append((f'Tower {building}', 'Pasig', sqm, sqm * rng.uniform(1.2e5, 1.8e5), unit, 1, None, None,
+                         f'Agent {building}', None))
+    rows += rows[:1000]   # every listing of the first 200 buildings posted twice
+
+    clusters = cluster_listings(rows)
+    assert len(set(clusters)) == 10_000
+    assert list(clusters[10_000:]) == list(range(1000))
+    # A handful of comparisons per listing instead of one per pair
+    assert len(compared) < 3 * len(rows)
+
+
+def test_adapter_price_series_counts_each_unit_once(monkeypatch):
+    staging = pd.DataFrame([
+        {'SKU': f'sku-{i}', 'Name': name, 'City/Town': city, 'Location': f'Fort Bonifacio, {city}',
+         'TCP': price, 'Floor_Area': sqm, 'Bedrooms': beds, 'Baths': baths, 'Source': f'https://x/{i}',
+         'Agent': agent, 'Description': description}
+        for i, (name, city, sqm, price, beds, baths, _, _, agent, description) in enumerate(ROWS[:4])
+    ])
+    monkeypatch.setattr(adapter, 'lamudi_scraper', lambda *args, **kwargs: staging)
+    monkeypatch.setattr(adapter, 'sharding_enabled', lambda: False)
+
+    properties, price_series = adapter.scrape_and_normalize('metro-manila', 'condo', 4)
+    assert [p.cluster_id for p in properties] == ['sku-0', 'sku-0', 'sku-2', 'sku-3']
+    assert 'cluster_id' not in properties[0].to_dict()
+    assert backend_app.compute_price_stats(price_series)['count'] == 3
+    neighborhoods = backend_app.analyze_neighborhoods(properties)
+    assert neighborhoods['Fort Bonifacio']['count'] == 3
+
+
+def test_snapshot_stats_and_comparables_count_a_unit_once(tmp_path):
+    frame = pd.DataFrame([
+        {'sku': f'sku-{i}', 'name': name, 'city': city, 'location': f'Fort Bonifacio, {city}', 'province': 'metro-manila',
+         'price': price, 'floor_area': sqm, 'bedrooms': beds, 'baths': baths,
+         'latitude': lat if lat is not None else 14.55, 'longitude': lon if lon is not None else 121.05,
+         'agent': agent, 'description': description}
+        for i, (name, city, sqm, price, beds, baths, lat, lon, agent, description) in enumerate(ROWS[:3])
+    ])
+    snapshot = ListingSnapshot(write_snapshot(frame, str(tmp_path / 'snap.bin')))
+
+    assert snapshot.price_stats()['count'] == 2
+    rows = snapshot.comparables(14.55, 121.05, radius_km=1.0, limit=10)
+    # The later listing of the re-posted unit stands for it
+    assert [(r['property_id'], r['cluster_id']) for r in rows] == [('sku-2', 'sku-2'), ('sku-1', 'sku-0')]
@@ -0,0 +1,49 @@
+from bs4 import BeautifulSoup as bs
+
+import src.scraper.scraper as scraper_module
+from bench.fake_lamudi import FakeLamudiConfig, FakeLamudiServer, parse_latency
+from bench.load_driver import percentile
+from src.scraper.scraper import build_session, detect_max_page, fetch_detail, is_challenge_page, list_page_url, scan_list_page
+
+
+def test_scraper_runs_against_fake_server(monkeypatch):
+    server = FakeLamudiServer(FakeLamudiConfig(pages=3, per_page=5)).start()
+    try:
+        monkeypatch.setattr(scraper_module, 'LAMUDI_BASE_URL', server.base_url)
+        session = build_session(list_page_url('laguna', 'condo'))
+
+        first = bs(session.get(list_page_url('laguna', 'condo'), timeout=5).content, 'html.parser')
+        assert detect_max_page(first) == 3
+        primary, _ = scan_list_page(session, 'laguna', 'condo', 2)
+        assert [sku for sku, _ in primary] == [f'laguna-002-0{i}' for i in range(5)]
+
+        link = primary[0][1]
+        assert link == f'{server.base_url}/property/laguna-002-00/'
+        details = fetch_detail(link, primary[0][0], {}, session=session)
+        assert details['SKU'] == 'laguna-002-00' and details['price'] > 0
+        assert server.stats() == {'list': 2, 'detail': 1}
+    finally:
+        server.stop()
+
+
+def test_fault_injection_rates():
+    errors = FakeLamudiServer(FakeLamudiConfig(error_rate=1.0))
+    challenges = FakeLamudiServer(FakeLamudiConfig(challenge_rate=1.0))
+    try:
+        assert errors.respond('/buy/laguna/condo/', {})[0] == 503
+        status, body, _ = challenges.respond('/property/x/', {})
+        assert status == 200 and is_challenge_page(bs(body, 'html.parser'))
+    finally:
+        errors.httpd.server_close()
+        challenges.httpd.server_close()
+
+
+def test_latency_specs_and_percentiles():
+    import random
+    rng = random.Random(1)
+    assert parse_latency('fixed:250')(rng) == 0.25
+    assert 0.1 <= parse_latency('uniform:100:200')(rng) <= 0.2
+    assert parse_latency('lognormal:200:0.5')(rng) > 0
+    values = list(range(1, 101))
+    assert (percentile(values, 50), percentile(values, 95), percentile(values, 99)) == (50, 95, 99)
+    assert percentile([], 50) is None
@@ -0,0 +1,32 @@
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, sys
+import app
+client = app.app.test_client()
+health = client.get('/health').status_code
+search = client.get('/api/addresses/search', query_string={'q': 'makati'}).status_code
+print(json.dumps({'health': health, 'search': search,
+                  'loaded': sorted(m for m in ('pandas', 'numpy', 'bs4', 'requests', 'supabase') if m in sys.modules)}))
+"""
+
+
+def test_health_and_address_search_do_not_load_heavy_modules():
+    proc = subprocess.run([sys.executable, '-c', PROBE], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=60)
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    assert result == {'health': 200, 'search': 200, 'loaded': []}
+
+
+def test_scrape_entry_point_delegates_to_adapter(monkeypatch):
+    import app as backend_app
+    import src.adapters.lamudi_adapter as adapter
+
+    calls = []
+    monkeypatch.setattr(adapter, 'scrape_and_normalize', lambda *a, **k: calls.append((a, k)) or ([], []))
+    assert backend_app.scrape_and_normalize('laguna', 'condo', 5, detail_level='card') == ([], [])
+    assert calls == [(('laguna', 'condo', 5), {'detail_level': 'card'})]
@@ -0,0 +1,158 @@
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app as backend_app
+from src.analytics.snapshot import ListingSnapshot, build_snapshot, write_snapshot
+
+
+def _listings(n=200, seed=3):
+    rng = np.random.default_rng(seed)
+    neighborhoods = ['Salcedo Village', 'Legaspi Village', 'Bel-Air', 'Poblacion']
+    return pd.DataFrame({
+        'sku': [f'sku-{i:04d}' for i in range(n)],
+        'location': [f'{neighborhoods[i % 4]}, Makati' for i in range(n)],
+        'city': ['Makati'] * (n // 2) + ['Taguig'] * (n - n // 2),
+        'province': 'metro-manila',
+        'price': rng.uniform(3e6, 2e7, n).round(-3),
+        'floor_area': rng.uniform(25, 120, n).round(1),
+        'bedrooms': rng.integers(0, 4, n),
+        'baths': rng.integers(1, 3, n),
+        'latitude': 14.55 + rng.uniform(-0.05, 0.05, n),
+        'longitude': 121.02 + rng.uniform(-0.05, 0.05, n),
+        'scraped_at': pd.Timestamp('2026-03-01', tz='UTC'),
+    })
+
+
+def test_snapshot_columns_are_read_only_views_with_pandas_equal_stats(tmp_path):
+    frame = _listings()
+    path = write_snapshot(frame, str(tmp_path / 'snap.bin'))
+    snapshot = ListingSnapshot(path)
+
+    assert len(snapshot) == 200
+    assert not snapshot['price'].flags.writeable and not snapshot['price'].flags.owndata
+    assert snapshot.dictionaries['city'] == ['Makati', 'Taguig']
+
+    stats = snapshot.price_stats(snapshot.mask(city='taguig', bedrooms=2))
+    expected = frame[(frame['city'] == 'Taguig') & (frame['bedrooms'] == 2)]['price']
+    assert stats['count'] == len(expected)
+    assert stats['median'] == pytest.approx(expected.median())
+
+    by_neighborhood = snapshot.neighborhood_stats()
+    assert by_neighborhood == backend_app.analyze_neighborhoods([
+        {'neighborhood': loc.split(',')[0], 'price': price} for loc, price in zip(frame['location'], frame['price'])
+    ])
+    assert snapshot.mask(city='Nowhere').sum() == 0
+
+
+def test_comparables_are_nearest_first_within_radius_and_size_band(tmp_path):
+    snapshot = ListingSnapshot(write_snapshot(_listings(), str(tmp_path / 'snap.bin')))
+    rows = snapshot.comparables(14.55, 121.02, radius_km=2.0, sqm=60, bedrooms=1, limit=50)
+
+    assert rows
+    distances = [r['distance_km'] for r in rows]
+    assert distances == sorted(distances) and distances[-1] <= 2.0
+    assert all(r['bedrooms'] == 1 and 45 <= r['sqm'] <= 75 for r in rows)
+    assert rows[0]['property_id'].startswith('sku-') and rows[0]['province'] == 'metro-manila'
+
+
+def test_rebuild_replaces_file_atomically_and_readers_remap(tmp_path):
+    from src.scraper.columnar import write_parquet
+    path = str(tmp_path / 'snap.bin')
+    parquet_dir = str(tmp_path / 'parquet')
+    old = ListingSnapshot(write_snapshot(_listings(10), path))
+
+    staging = pd.DataFrame({'SKU': ['sku-0001', 'new-1'], 'Location': ['Bel-Air, Makati', 'Poblacion, Makati'],
+                            'City/Town': ['Makati', 'Makati'], 'TCP': [9e6, 5e6], 'Floor_Area': [40, 30]})
+    write_parquet(staging.iloc[:1], 'metro-manila', 'condo', root=parquet_dir,
+                  scraped_at=datetime(2026, 3, 1, tzinfo=timezone.utc))
+    write_parquet(staging, 'metro-manila', 'condo', root=parquet_dir,
+                  scraped_at=datetime(2026, 3, 2, tzinfo=timezone.utc))
+    assert build_snapshot(path, parquet_dir=parquet_dir) == 2
+
+    assert ListingSnapshot.open(path, old) is not old
+    fresh = ListingSnapshot.open(path)
+    assert ListingSnapshot.open(path, fresh) is fresh
+    assert sorted(fresh['sku'].astype(str)) == ['new-1', 'sku-0001']
+    # The old mapping still reads the file it opened
+    assert len(old) == 10 and old['price'][0] > 0
+
+
+def test_builds_fold_in_only_new_files_one_builder_at_a_time(tmp_path, monkeypatch):
+    import threading
+    import src.scraper.columnar as columnar
+    from src.scraper.columnar import write_parquet
+    path, parquet_dir = str(tmp_path / 'snap.bin'), str(tmp_path / 'parquet')
+
+    def scrape(skus, day):
+        staging = pd.DataFrame({'SKU': skus, 'Location': ['Bel-Air, Makati'] * len(skus),
+                                'City/Town': ['Makati'] * len(skus), 'TCP': [9e6] * len(skus),
+                                'Floor_Area': [40 + i for i in range(len(skus))]})
+        return write_parquet(staging, 'metro-manila', 'condo', root=parquet_dir,
+                             scraped_at=datetime(2026, 3, day, tzinfo=timezone.utc))
+    first = scrape(['a', 'b'], 1)
+    reads = []
+    load = columnar.load_listings
+    monkeypatch.setattr(columnar, 'load_listings', lambda **kw: reads.append(kw['files']) or load(**kw))
+
+    # Workers that finished scrapes together: one builds, the rest find it done
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(build_snapshot(path, parquet_dir))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results, key=str) == [2, None, None] and len(reads) == 1
+
+    scrape(['b', 'c'], 2)
+    assert build_snapshot(path, parquet_dir) == 3
+    assert len(reads[-1]) == 1 and reads[-1][0] != reads[0][0]
+    assert sorted(ListingSnapshot(path)['sku'].astype(str)) == ['a', 'b', 'c']
+
+    # A pruned file means starting over from what is left
+    os.remove(first)
+    assert build_snapshot(path, parquet_dir) == 2 and len(reads[-1]) == 1
+    assert sorted(ListingSnapshot(path)['sku'].astype(str)) == ['b', 'c']
+
+
+def test_listing_endpoints_serve_the_snapshot():
+    client = backend_app.app.test_client()
+    assert client.get('/api/listings/stats').status_code == 503
+
+    write_snapshot(_listings(), backend_app.LISTING_SNAPSHOT_PATH)
+    body = client.get('/api/listings/stats', query_string={'psgc_province_code': '1376', 'city': 'Makati'}).get_json()
+    assert body['stats']['count'] == 100 and body['snapshot']['rows'] == 200
+    assert set(body['neighborhoods']) == {'Salcedo Village', 'Legaspi Village', 'Bel-Air', 'Poblacion'}
+
+    response = client.get('/api/listings/comparables', query_string={'lat': 14.55, 'lon': 121.02, 'limit': 3})
+    assert response.status_code == 200 and response.get_json()['count'] == 3
+    assert client.get('/api/listings/comparables', query_string={'lat': 'x'}).status_code == 400
+
+
+def test_a_real_scrape_reaches_the_listing_endpoints(monkeypatch, tmp_path):
+    import src.scraper.scraper as scraper_module
+    from bench.fake_lamudi import FakeLamudiConfig, FakeLamudiServer
+    monkeypatch.chdir(tmp_path)
+    server = FakeLamudiServer(FakeLamudiConfig(pages=2, per_page=3)).start()
+    try:
+        monkeypatch.setattr(scraper_module, 'LAMUDI_BASE_URL', server.base_url)
+        staging = scraper_module.scraper('laguna', 'condo', 4)
+    finally:
+        server.stop()
+
+    # Stamped with the current time, as in production, not a hand-made whole second
+    backend_app.rebuild_listing_snapshot()
+    snapshot = backend_app.get_listing_snapshot()
+    assert snapshot is not None
+    assert sorted(snapshot['sku'].astype(str)) == sorted(staging['SKU'].astype(str))
+    assert abs(snapshot['scraped_at'].max() - datetime.now(timezone.utc).timestamp()) < 300
+
+    client = backend_app.app.test_client()
+    body = client.get('/api/listings/stats').get_json()
+    assert body['snapshot']['rows'] == 4 and body['stats']['count'] == 4
+    near = snapshot.row(0)['coordinates']
+    comparables = client.get('/api/listings/comparables', query_string={'lat': near[0], 'lon': near[1]})
+    assert comparables.status_code == 200 and comparables.get_json()['count'] >= 1
@@ -0,0 +1,97 @@
+import app as backend_app
+from src.observability.metrics import (
+    CHALLENGE_PAGES,
+    HTTP_429,
+    PAGES_SCANNED,
+    PHASE_SECONDS,
+    SELECTOR_MISSES,
+    Registry,
+)
+from src.scraper.scraper import fetch_page, is_challenge_page, parse_html, scan_list_page
+
+
+class _Response:
+    def __init__(self, content=b'', status_code=200):
+        self.content = content
+        self.status_code = status_code
+
+
+class _Session:
+    def __init__(self, response):
+        self.response = response
+
+    def get(self, url, timeout=7, **kwargs):
+        return self.response
+
+
+def test_registry_renders_prometheus_text():
+    registry = Registry()
+    hits = registry.counter('demo_hits_total', 'Hits.', ['cache'])
+    slots = registry.gauge('demo_slots_in_use', 'Slots.')
+    latency = registry.histogram('demo_seconds', 'Latency.', ['phase'], buckets=(0.1, 1.0))
+    hits.inc(cache='cma')
+    hits.inc(2, cache='cma')
+    slots.set_function(lambda: 2)
+    latency.observe(0.05, phase='parse')
+    latency.observe(0.5, phase='parse')
+    latency.observe(5, phase='parse')
+
+    text = registry.render()
+    assert '# TYPE demo_hits_total counter' in text
+    assert 'demo_hits_total{cache="cma"} 3' in text
+    assert 'demo_slots_in_use 2' in text
+    assert 'demo_seconds_bucket{phase="parse",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{phase="parse",le="1"} 2' in text
+    assert 'demo_seconds_bucket{phase="parse",le="+Inf"} 3' in text
+    assert 'demo_seconds_count{phase="parse"} 3' in text
+    assert 'demo_seconds_sum{phase="parse"} 5.55' in text
+
+
+def test_scraper_helpers_record_fetch_parse_and_429():
+    fetches = PHASE_SECONDS.count(phase='list_fetch')
+    parses = PHASE_SECONDS.count(phase='parse')
+    throttled = HTTP_429.value()
+
+    response = fetch_page(_Session(_Response(status_code=429)), 'http://x', 'list_fetch')
+    parse_html(response.content)
+
+    assert PHASE_SECONDS.count(phase='list_fetch') == fetches + 1
+    assert PHASE_SECONDS.count(phase='parse') == parses + 1
+    assert HTTP_429.value() == throttled + 1
+
+
+def test_scan_list_page_counts_challenge_and_selector_miss(monkeypatch):
+    monkeypatch.setattr('src.scraper.scraper.time.sleep', lambda s: None)
+    html = b'<html><body>Security verification required</body></html>'
+    pages, misses, challenges = PAGES_SCANNED.value(), SELECTOR_MISSES.value(), CHALLENGE_PAGES.value()
+
+    scan_list_page(_Session(_Response(html)), 'metro-manila', 'condo', 2)
+
+    assert is_challenge_page(parse_html(html))
+    assert PAGES_SCANNED.value() == pages + 1
+    assert SELECTOR_MISSES.value() == misses + 1
+    assert CHALLENGE_PAGES.value() == challenges + 1
+
+
+def test_metrics_endpoint_exposes_scrape_semaphore():
+    response = backend_app.app.test_client().get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    body = response.get_data(as_text=True)
+    assert 'kairos_semaphore_limit{semaphore="scrape"} 3' in body
+    assert 'kairos_semaphore_in_use{semaphore="scrape"} 0' in body
+
+
+def test_metrics_endpoint_exposes_outbox_backlog(monkeypatch):
+    import supabase_client
+    outbox = supabase_client.get_outbox()
+    monkeypatch.setattr(outbox, 'flush_once', lambda: 0)
+    client = backend_app.app.test_client()
+    assert 'kairos_outbox_backlog 0' in client.get('/metrics').get_data(as_text=True)
+
+    outbox.enqueue_appraisal_update('a1', {'status': 'processing'})
+    outbox.enqueue_activity_log({'user_id': 'u1', 'event_type': 'error'})
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'kairos_outbox_backlog 2' in body
+    age = float(body.split('\nkairos_outbox_oldest_age_seconds ', 1)[1].split()[0])
+    assert 0 <= age < 60
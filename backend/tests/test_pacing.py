@@ -0,0 +1,179 @@
+import pytest
+
+from src.scraper import pacing
+from src.scraper.pacing import AdaptivePacer, CircuitBreaker, CircuitOpenError, looks_like_challenge
+from src.scraper.scraper import fetch_details, fetch_page
+
+
+class _Response:
+    def __init__(self, content=b'<html></html>', status_code=200, headers=None):
+        self.content = content
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class _Session:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def get(self, url, timeout=7, **kwargs):
+        self.calls += 1
+        return self.responses[min(self.calls, len(self.responses)) - 1]
+
+
+def _fast_pacer(**kwargs):
+    return AdaptivePacer(initial_rps=50, max_rps=100, jitter=0, **kwargs)
+
+
+def test_healthy_responses_raise_rate_and_429_halves_it():
+    pacer = _fast_pacer()
+    for _ in range(20):
+        pacer.acquire()
+        pacer.release(200, 0.01)
+    raised = pacer.rate
+    assert raised > 50
+
+    pacer.acquire()
+    pacer.release(429, 0.01)
+    assert pacer.rate == pytest.approx(raised / 2)
+    assert pacer.snapshot()['throttled'] == 1
+
+
+def test_challenge_and_latency_spike_count_as_congestion():
+    pacer = _fast_pacer(min_latency_alarm_sec=0.05)
+    for _ in range(5):
+        pacer.acquire()
+        pacer.release(200, 0.01)
+    before = pacer.rate
+    pacer.acquire()
+    pacer.release(200, 0.01, challenge=True)
+    assert pacer.rate < before
+
+    pacer._last_decrease = 0.0
+    before = pacer.rate
+    for _ in range(10):
+        pacer.acquire()
+        pacer.release(200, 1.0)
+    assert pacer.rate < before
+    assert pacer.snapshot()['slow'] > 0
+
+
+def test_concurrency_limit_follows_rate_times_latency():
+    pacer = AdaptivePacer(initial_rps=4, max_concurrency=8)
+    pacer.latency_ewma = 0.5
+    assert pacer.concurrency_limit() == 2
+    pacer.rate = 16
+    assert pacer.concurrency_limit() == 8
+
+
+def test_breaker_opens_fails_fast_then_probes(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(pacing.time, 'monotonic', lambda: clock[0])
+    breaker = CircuitBreaker(threshold=3, cooldown_sec=30)
+
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record(blocked=True)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    clock[0] += 31
+    assert breaker.allow()       # single half-open probe
+    assert not breaker.allow()
+    breaker.record(blocked=True)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.cooldown == 60
+
+    clock[0] += 61
+    assert breaker.allow()
+    breaker.record(blocked=False)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.cooldown == 30
+
+
+def test_half_open_probe_that_raises_does_not_wedge_the_breaker(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(pacing.time, 'monotonic', lambda: clock[0])
+    pacer = _fast_pacer(breaker=CircuitBreaker(threshold=1, cooldown_sec=30))
+    pacer.acquire()
+    pacer.release(429, 0.01)
+    clock[0] += 31
+
+    # The probe hits the deadline before it is sent: the next fetch probes instead
+    pacer.acquire()
+    pacing.record_error(pacer, 0.0, congestion=False)
+    assert pacer.breaker.state == CircuitBreaker.HALF_OPEN
+    pacer.acquire()
+    # ...and that one times out: open again, for twice as long
+    pacing.record_error(pacer, 7.0)
+    assert pacer.breaker.state == CircuitBreaker.OPEN and pacer.breaker.cooldown == 60
+    with pytest.raises(CircuitOpenError):
+        pacer.acquire()
+
+    clock[0] += 61
+    pacer.acquire()
+    pacer.release(200, 0.01)
+    assert pacer.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_looks_like_challenge_matches_verification_markup():
+    assert looks_like_challenge(b'<html><h1>Security Verification</h1></html>')
+    assert not looks_like_challenge(b'<html><div class="ListingCell-AllInfo"></div></html>')
+    assert not looks_like_challenge(None)
+
+
+def test_fetch_page_raises_circuit_open_after_repeated_429(monkeypatch):
+    monkeypatch.setenv('SCRAPER_PACE_INITIAL_RPS', '100')
+    monkeypatch.setenv('SCRAPER_PACE_MAX_RPS', '100')
+    monkeypatch.setenv('SCRAPER_PACE_MIN_RPS', '50')
+    monkeypatch.setenv('SCRAPER_BREAKER_THRESHOLD', '3')
+    session = _Session([_Response(status_code=429, headers={'Retry-After': '0'})])
+
+    for _ in range(3):
+        fetch_page(session, 'http://blocked.test/buy/x/condo/', 'list_fetch')
+    with pytest.raises(CircuitOpenError):
+        fetch_page(session, 'http://blocked.test/buy/x/condo/', 'list_fetch')
+    assert session.calls == 3
+    assert pacing.pacer_snapshots()['blocked.test']['breaker'] == CircuitBreaker.OPEN
+
+
+def test_fetch_details_keeps_order_and_stops_when_circuit_opens(monkeypatch):
+    calls = []
+
+    def fake_fetch_detail(link, sku, headers, session=None):
+        calls.append(sku)
+        if sku == 'S3':
+            raise CircuitOpenError('circuit open')
+        return {'SKU': sku}
+
+    monkeypatch.setattr('src.scraper.scraper.fetch_detail', fake_fetch_detail)
+    listing = [(f'S{i}', f'http://detail.test/property/S{i}/') for i in range(1, 3)]
+    assert fetch_details(listing, {}) == [{'SKU': 'S1'}, {'SKU': 'S2'}]
+
+    monkeypatch.setenv('SCRAPER_PACE_MAX_CONCURRENCY', '1')
+    monkeypatch.setattr(pacing, '_pacers', {})
+    listing = [(f'S{i}', f'http://detail.test/property/S{i}/') for i in range(1, 7)]
+    rows = fetch_details(listing, {})
+    assert [row['SKU'] for row in rows] == ['S1', 'S2']
+    assert 'S6' not in calls
+
+
+def test_pacing_diagnostics_endpoint_lists_hosts():
+    import app as backend_app
+
+    pacing.pacer_for('http://listed.test/buy/')
+    body = backend_app.app.test_client().get('/api/diagnostics/pacing').get_json()
+    assert body['enabled'] is True
+    assert body['hosts']['listed.test']['breaker'] == CircuitBreaker.CLOSED
+
+
+def test_only_network_errors_slow_the_pacer():
+    pacer = _fast_pacer()
+    pacer.acquire()
+    pacing.record_error(pacer, 0.01, congestion=False)
+    assert pacer.rate == 50
+    pacer.acquire()
+    pacing.record_error(pacer, 0.01)
+    assert pacer.rate == 25
+    assert pacer.snapshot()['errors'] == 1
@@ -0,0 +1,81 @@
+import app as backend_app
+from src.analytics.projections import PROJECTION_COLUMNS, ProjectionStore
+from src.analytics.quantile_sketch import QuantileSketch
+
+DAY = 86400.0
+# 2026-01-15 00:00 UTC
+JAN = 1768435200.0
+
+
+def _props(prefix, prices):
+    return [{'property_id': f'{prefix}-{i}', 'price': p} for i, p in enumerate(prices)]
+
+
+def test_quantile_sketch_is_within_relative_error_and_merges():
+    a, b = QuantileSketch(), QuantileSketch()
+    for v in range(1, 501):
+        a.add(v * 10_000)
+    for v in range(501, 1001):
+        b.add(v * 10_000)
+    merged = QuantileSketch.from_json(a.to_json()).merge(b)
+    assert merged.count == 1000
+    median = merged.quantile(0.5)
+    assert abs(median - 5_000_000) / 5_000_000 < 0.02
+
+
+def test_projection_rows_match_csv_columns(tmp_path):
+    store = ProjectionStore(str(tmp_path / 'history.sqlite3'))
+    store.record_scrape('1376', 'Metro Manila', _props('a', [1_000_000, 2_000_000, 3_000_000]), observed_at=JAN)
+    # Same SKUs a month later: counted once more in February, 31 days on market each
+    store.record_scrape('1376', 'Metro Manila', _props('a', [1_000_000, 2_000_000, 3_000_000])
+                        + _props('b', [5_000_000]), observed_at=JAN + 31 * DAY)
+
+    [row] = store.projections('1376')
+    assert list(row) == PROJECTION_COLUMNS
+    assert row['area_name'] == 'Metro Manila'
+    assert row['avg_sold_price'] == 2_750_000
+    assert abs(row['median_sold_price'] - 2_000_000) / 2_000_000 < 0.02
+    assert row['avg_dom'] == round(3 * 31 / 4)
+    assert row['active_count'] == 4 and row['pending_count'] == 0
+    assert row['sample_size'] == 4 and row['confidence'] == 'low'
+    # Six months ending February; months before the first scrape carry January's average
+    assert row['trend_6m'].split(',') == ['2000000'] * 5 + ['2750000']
+
+
+def test_rescrape_in_same_month_does_not_double_count(tmp_path):
+    store = ProjectionStore(str(tmp_path / 'history.sqlite3'))
+    props = _props('a', [1_000_000, 3_000_000])
+    store.record_scrape('1376', 'Metro Manila', props, observed_at=JAN)
+    store.record_scrape('1376', 'Metro Manila', props, observed_at=JAN + DAY)
+
+    [row] = store.projections()
+    assert row['avg_sold_price'] == 2_000_000
+    assert row['sample_size'] == 2
+    assert row['avg_dom'] == 1
+
+
+def test_stale_listings_become_pending_then_closed(tmp_path):
+    store = ProjectionStore(str(tmp_path / 'history.sqlite3'))
+    store.record_scrape('1376', 'Metro Manila', _props('old', [1_000_000]), observed_at=JAN)
+    store.record_scrape('1376', 'Metro Manila', _props('mid', [1_000_000]), observed_at=JAN + 60 * DAY)
+    store.record_scrape('1376', 'Metro Manila', _props('new', [1_000_000]), observed_at=JAN + 100 * DAY)
+
+    [row] = store.projections('1376')
+    assert (row['active_count'], row['pending_count'], row['closed_count']) == (1, 1, 1)
+
+
+def test_projections_endpoint_serves_json_and_csv(monkeypatch, tmp_path):
+    store = ProjectionStore(str(tmp_path / 'history.sqlite3'))
+    monkeypatch.setattr(backend_app, '_projection_store', store)
+    # Cavite, sent as the legacy short code and as a barangay: one area row under the province's code
+    backend_app.record_projection_history('3400', 'cavite', _props('l', [4_000_000]))
+    backend_app.record_projection_history('0402101001', 'cavite', _props('m', [4_000_000]))
+    client = backend_app.app.test_client()
+
+    body = client.get('/api/projections?psgc_code=3400').get_json()
+    assert body['count'] == 1 and body['projections'][0]['psgc_code'] == '0402100000'
+    assert body['projections'][0]['area_name'] == 'Cavite'
+
+    csv_body = client.get('/api/projections?format=csv').get_data(as_text=True)
+    assert csv_body.splitlines()[0] == ','.join(PROJECTION_COLUMNS)
+    assert '"4000000,4000000,4000000,4000000,4000000,4000000"' in csv_body
@@ -0,0 +1,71 @@
+import json
+import pickle
+
+import pandas as pd
+
+import app as backend_app
+import src.adapters.lamudi_adapter as adapter
+from cma_jobs import CmaJobQueue
+from src.adapters.records import FIELDS, Property
+
+
+def _staging():
+    return pd.DataFrame({
+        'SKU': ['A1', 'B2'],
+        'Location': ['Bel-Air, Makati', 'BGC, Taguig'],
+        'TCP': ['₱5,500,000', 7108000],
+        'Bedrooms': ['2', 1],
+        'Baths': ['1', None],
+        'Floor_Area': ['45 m²', 30.5],
+        'Source': ['https://www.lamudi.com.ph/a1', 'https://www.lamudi.com.ph/b2'],
+        'latitude': ['14.52', None],
+        'longitude': ['121.05', None],
+    })
+
+
+def test_adapter_returns_slotted_records_with_the_dict_contract(monkeypatch):
+    monkeypatch.setattr(adapter, 'sharding_enabled', lambda: False)
+    monkeypatch.setattr(adapter, 'lamudi_scraper', lambda *a, **k: _staging())
+    properties, prices = adapter.scrape_and_normalize('metro-manila', 'condo', 2)
+
+    first, second = properties
+    assert isinstance(first, Property) and not hasattr(first, '__dict__')
+    assert prices == [5500000.0, 7108000.0]
+    assert dict(first) == {
+        'source': 'lamudi', 'property_id': 'A1', 'address': 'Bel-Air, Makati', 'neighborhood': 'Bel-Air',
+        'price': 5500000.0, 'bedrooms': 2, 'bathrooms': 1, 'sqm': 45.0, 'property_type': 'condo',
+        'coordinates': [14.52, 121.05], 'url': 'https://www.lamudi.com.ph/a1',
+    }
+    assert tuple(first) == FIELDS and first.get('detail_level') is None
+    assert second['bathrooms'] == 0 and second['coordinates'] is None
+
+
+def test_card_records_add_detail_level_and_survive_pickling():
+    row = _staging().iloc[0].copy()
+    row['detail_level'] = 'card'
+    record = adapter._normalize_row(row, 'condo')
+    assert record['detail_level'] == 'card' and len(record) == len(FIELDS) + 1
+    assert pickle.loads(pickle.dumps(record)) == record
+
+
+def test_records_encode_like_dicts_in_responses_and_job_results(tmp_path):
+    record = Property(property_id='A1', neighborhood='Bel-Air', price=5e6, property_type='condo')
+    with backend_app.app.app_context():
+        assert backend_app.jsonify([record]).get_json() == [record.to_dict()]
+
+    queue = CmaJobQueue(str(tmp_path / 'jobs.sqlite3'))
+    queue.enqueue({'province': 'cavite'}, 'job-1')
+    queue.claim_next()
+    queue.complete('job-1', 'done', {'properties': [record]}, 200)
+    assert queue.get('job-1')['result']['properties'] == [json.loads(json.dumps(record.to_dict()))]
+
+
+def test_stats_and_neighborhoods_accept_records_and_dicts():
+    records = [Property(neighborhood='Bel-Air', price=p) for p in (4e6, 6e6)]
+    mixed = records + [{'neighborhood': 'Bel-Air', 'price': 5e6}, {'neighborhood': '', 'price': 9e6}]
+    assert backend_app.analyze_neighborhoods(mixed) == {
+        'Bel-Air': {'count': 3, 'mean': 5000000.0, 'min': 4000000.0, 'max': 6000000.0},
+    }
+    assert backend_app.compute_price_stats([4e6, '6000000', None, 'n/a']) == {
+        'count': 4, 'avg': 5000000.0, 'median': 5000000.0, 'min': 4000000.0, 'max': 6000000.0,
+    }
@@ -0,0 +1,76 @@
+import app as backend_app
+from psgc_mapper import is_supported, is_supported_slug, province_code, resolve_scope, to_lamudi_province
+from src.geo.psgc_index import default_index
+
+
+def test_codes_resolve_in_every_format_and_walk_up_to_the_region():
+    index = default_index()
+    makati = index.find('137602000')
+    assert makati == index.find('1380300000')
+    assert index.unit(makati) == ('1380300000', '137602000', 'city', 'City of Makati')
+    assert index.to_old('1380300000') == '137602000' and index.to_new('042100000') == '0402100000'
+    assert [index.level(row) for row in index.ancestors(makati)] == ['city', 'region']
+
+    # A Manila barangay: barangay -> district -> City of Manila -> NCR
+    barangay = index.find('1380601001')
+    assert [index.level(row) for row in index.ancestors(barangay)] == ['barangay', 'submunicipality', 'city', 'region']
+    assert index.name(index.city_of(barangay)) == 'City of Manila'
+
+    # Independent cities belong to the province their old code puts them in
+    assert index.name(index.province_of(index.find('072217000'))) == 'Cebu'
+    assert index.find('9999') is None and index.find('abc') is None and index.find('04') is not None
+
+
+def test_every_level_maps_to_its_lamudi_province():
+    # The codes the old hand-written whitelist knew
+    old_whitelist = {'1376': 'metro-manila', '3400': 'cavite', '4000': 'laguna', '0722': 'cebu', '0630': 'iloilo',
+                     '0645': 'negros-occidental', '0973': 'zamboanga-del-sur', '1043': 'misamis-oriental',
+                     '1124': 'davao-del-sur', '1411': 'benguet', '0458': 'rizal'}
+    assert {code: to_lamudi_province(code) for code in old_whitelist} == old_whitelist
+    assert to_lamudi_province('141102000') == 'benguet'       # Baguio
+    assert to_lamudi_province('0403405001') == 'laguna'       # a barangay, new format
+    assert to_lamudi_province('0400000000') is None           # regions other than NCR
+    assert to_lamudi_province('0990100000') is None           # City of Isabela is not a province
+    assert not is_supported('9999') and not is_supported('12345678901')
+    assert is_supported_slug('davao-del-sur') and not is_supported_slug('atlantis')
+
+    # Every spelling of Metro Manila, and any place in it, keys the same province
+    assert {province_code(c) for c in ('1376', '137600000', '1300000000', '13', '137602000', '1380601001')} == \
+        {'1300000000'}
+    assert province_code('3400') == province_code('042100000') == '0402100000'
+    assert province_code('0400000000') is None
+
+    scope = resolve_scope('1380601001')
+    assert scope['province'] == 'metro-manila' and scope['city'] == 'City of Manila' and scope['level'] == 'barangay'
+    assert resolve_scope('1376')['city'] is None
+
+
+def test_city_codes_scope_cma_results_to_the_city(monkeypatch):
+    backend_app._cma_cache.clear()
+    monkeypatch.setattr(backend_app, 'SCRAPER_MODE', 'local')
+    addresses = ['Bel-Air, Makati', 'Kapitolyo, Pasig', 'Poblacion, Makati City', 'Ugong, Pasig City']
+    properties = [{'property_id': str(i), 'address': a, 'neighborhood': a.split(',')[0], 'price': 1_000_000.0 * (i + 1)}
+                  for i, a in enumerate(addresses)]
+    backend_app.cache_cma_result('metro-manila', 'condo', 'full', 4, properties,
+                                 [p['price'] for p in properties])
+    client = backend_app.app.test_client()
+    items = [
+        {'psgc_province_code': '1376', 'property_type': 'condo', 'count': 4},
+        {'psgc_province_code': '1376', 'psgc_city_code': '137602000', 'property_type': 'condo', 'count': 4},
+        {'psgc_province_code': '1380300005', 'property_type': 'condo', 'count': 4},
+        {'psgc_province_code': '1380600000', 'property_type': 'condo', 'count': 4},
+    ]
+    body = client.post('/api/cma/batch', json={'items': items}).get_json()
+    province, city, barangay, no_listings = body['items']
+
+    assert province['stats']['count'] == 4 and 'scope' not in province
+    assert [p['address'] for p in city['properties']] == ['Bel-Air, Makati', 'Poblacion, Makati City']
+    assert city['stats']['count'] == 2 and city['stats']['avg'] == 2_000_000.0
+    assert city['scope'] == {'level': 'city', 'code': '1380300000', 'name': 'City of Makati',
+                             'city': 'City of Makati', 'matched': 2}
+    assert barangay['scope']['level'] == 'barangay' and barangay['stats']['count'] == 2
+    assert no_listings['stats']['count'] == 4 and no_listings['scope']['fallback'] == 'province'
+
+    mismatched = {'psgc_province_code': '3400', 'psgc_city_code': '137602000', 'property_type': 'condo'}
+    response = client.post('/api/cma/batch', json={'items': [mismatched]})
+    assert response.status_code == 400 and response.get_json() == {'error': 'Unsupported city', 'item': 0}
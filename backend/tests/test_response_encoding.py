@@ -0,0 +1,99 @@
+import gzip
+import json
+
+import pytest
+
+import app as backend_app
+import response_encoding
+from src.adapters.records import FIELDS, Property
+
+CMA_BODY = {'psgc_province_code': '1376', 'property_type': 'condo', 'count': 40}
+
+
+@pytest.fixture
+def scrapes(monkeypatch):
+    calls = []
+
+    def scrape(province, property_type, count, detail_level='full', enrich=0):
+        calls.append(province)
+        properties = [Property(property_id=f'p{i}', address=f'Area {i % 5}, Makati', neighborhood=f'Area {i % 5}',
+                               price=3e6 + i * 1e5, bedrooms=i % 3, bathrooms=1, sqm=30.0 + i,
+                               property_type=property_type, coordinates=[14.5, 121.0], url=f'https://x/{i}')
+                      for i in range(count)]
+        return properties, [p.price for p in properties]
+
+    monkeypatch.setattr(backend_app, 'SCRAPER_MODE', 'local')
+    monkeypatch.setattr(backend_app, 'run_scraper_subprocess', lambda *a, **k: 1)
+    monkeypatch.setattr(backend_app, 'scrape_and_normalize', scrape)
+    monkeypatch.setattr(backend_app, 'record_projection_history', lambda *a: None)
+    backend_app._cma_cache.clear()
+    return calls
+
+
+def test_json_is_gzipped_when_accepted_and_keeps_a_per_encoding_etag(scrapes):
+    client = backend_app.app.test_client()
+    plain = client.post('/api/cma', json=CMA_BODY)
+    packed = client.post('/api/cma', json=CMA_BODY, headers={'Accept-Encoding': 'gzip, deflate'})
+
+    assert 'Content-Encoding' not in plain.headers
+    assert packed.headers['Content-Encoding'] == 'gzip' and 'Accept-Encoding' in packed.headers['Vary']
+    assert json.loads(gzip.decompress(packed.get_data())) == plain.get_json()
+    assert len(packed.get_data()) < len(plain.get_data()) / 3
+    assert packed.headers['ETag'] == plain.headers['ETag'][:-1] + '-gzip"'
+
+    small = client.get('/health', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers
+
+
+def test_columnar_format_returns_parallel_arrays(scrapes):
+    client = backend_app.app.test_client()
+    rows = client.post('/api/cma', json=CMA_BODY).get_json()
+    cols = client.post('/api/cma?format=columnar', json=CMA_BODY).get_json()
+
+    assert cols['format'] == 'columnar'
+    assert sorted(cols['properties']) == sorted(FIELDS)
+    assert cols['properties']['price'] == [p['price'] for p in rows['properties']]
+    assert cols['stats'] == rows['stats'] and cols['neighborhoods'] == rows['neighborhoods']
+    assert len(json.dumps(cols)) < len(json.dumps(rows)) * 0.75
+
+
+def test_unchanged_cached_result_revalidates_with_304_without_scraping(scrapes):
+    client = backend_app.app.test_client()
+    first = client.post('/api/cma', json=CMA_BODY, headers={'Accept-Encoding': 'gzip'})
+    etag = first.headers['ETag']
+    assert etag.endswith('-gzip"') and scrapes == ['metro-manila']
+
+    again = client.post('/api/cma', json=CMA_BODY, headers={'If-None-Match': etag})
+    assert again.status_code == 304 and again.get_data() == b''
+    assert scrapes == ['metro-manila']
+
+    # Another format is another representation: no match, so a live scrape
+    assert client.post('/api/cma?format=columnar', json=CMA_BODY,
+                       headers={'If-None-Match': etag}).status_code == 200
+    assert scrapes == ['metro-manila', 'metro-manila']
+
+
+def test_finished_job_polls_revalidate(scrapes):
+    client = backend_app.app.test_client()
+    queue = backend_app.get_cma_job_queue()
+    params, _ = backend_app.parse_cma_request(CMA_BODY)
+    queue.enqueue(params, 'job-etag')
+    queue.claim_next()
+    payload, status = backend_app.execute_cma(params, 'job-etag')
+    queue.complete('job-etag', 'done', payload, status)
+
+    first = client.get('/api/cma/jobs/job-etag?format=columnar')
+    assert first.get_json()['result']['properties']['property_id'][:2] == ['p0', 'p1']
+    again = client.get('/api/cma/jobs/job-etag?format=columnar', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+
+
+def test_provider_output_matches_stdlib_json():
+    payload = {'b': [Property(property_id='x', price=1.5, address='Pasig, ₱')], 'a': {'n': 2}}
+    with backend_app.app.app_context():
+        body = backend_app.app.json.dumps_bytes(payload)
+    assert body.index(b'"a"') < body.index(b'"b"')
+    assert json.loads(body) == json.loads(json.dumps(payload, default=lambda p: p.to_dict()))
+    if response_encoding.orjson is None:
+        pytest.skip('orjson not installed')
+    assert '₱'.encode('utf-8') in body
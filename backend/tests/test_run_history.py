@@ -0,0 +1,146 @@
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import app as backend_app
+import src.scraper.scraper as scraper_module
+from bench.fake_lamudi import FakeLamudiConfig, FakeLamudiServer
+from src.observability.run_history import (
+    RunHistoryStore,
+    annotate_run,
+    count_run,
+    recorded_run,
+    run_history_store,
+    timed_phase,
+)
+from src.scraper.deadline import DeadlineExceeded
+
+NOW = 1_750_000_000.0
+DAY = 86400
+
+
+def _run(province, duration, started_at, outcome='ok', **extra):
+    return {'mode': 'full', 'province': province, 'property_type': 'condo', 'requested': 40,
+            'duration_sec': duration, 'started_at': started_at, 'outcome': outcome, **extra}
+
+
+def test_retention_drops_old_runs_and_caps_row_count(tmp_path):
+    store = RunHistoryStore(str(tmp_path / 'runs.sqlite3'), retention_days=7, max_rows=3)
+    store.record(_run('laguna', 10, NOW - 8 * DAY), now=NOW)
+    assert store.runs() == []
+
+    for i in range(5):
+        store.record(_run('laguna', 10 + i, NOW - 4 + i), now=NOW)
+    runs = store.runs()
+    assert [r['duration_sec'] for r in runs] == [14, 13, 12]
+    assert runs[0]['started_at'] == time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(NOW))
+
+
+def test_p95_duration_per_province_over_a_window(tmp_path):
+    store = RunHistoryStore(str(tmp_path / 'runs.sqlite3'))
+    for i in range(1, 21):
+        store.record(_run('laguna', float(i), NOW - i * 60, selector_misses=1), now=NOW)
+    store.record(_run('laguna', 0.0, NOW, outcome='cached'), now=NOW)
+    store.record(_run('cavite', 30.0, NOW - 60, outcome='timeout'), now=NOW)
+    store.record(_run('cavite', 500.0, NOW - 9 * DAY), now=NOW)
+
+    groups = store.aggregate('province', since=NOW - 7 * DAY)
+    laguna, cavite = groups
+    assert laguna['province'] == 'laguna' and laguna['runs'] == 21 and laguna['scrapes'] == 20
+    assert laguna['duration_p95_sec'] == 19.0 and laguna['duration_p50_sec'] == 10.0
+    assert laguna['cache_hit_rate'] == round(1 / 21, 4) and laguna['success_rate'] == 1.0
+    assert laguna['selector_misses'] == 20
+    assert cavite == {**cavite, 'runs': 1, 'duration_p95_sec': 30.0, 'success_rate': 0.0}
+
+    with pytest.raises(ValueError):
+        store.aggregate('started_at')
+
+
+def test_window_filters_are_answered_from_indexes(tmp_path):
+    store = RunHistoryStore(str(tmp_path / 'runs.sqlite3'))
+    conn = store._connect()
+    for filters in ({'since': NOW}, {'province': 'laguna', 'since': NOW}, {'outcome': 'error'}):
+        where, params = store._where(**filters)
+        plan = ' '.join(row[-1] for row in conn.execute(f'EXPLAIN QUERY PLAN SELECT * FROM scrape_runs{where}', params))
+        assert 'USING INDEX' in plan, plan
+    conn.close()
+
+
+def test_recorded_run_collects_counts_from_fetch_threads_and_maps_errors():
+    @recorded_run('full')
+    def scrape(province, property_type, num):
+        def fetch(_):
+            with timed_phase('detail_fetch'):
+                count_run('requests')
+        with ThreadPoolExecutor(4) as pool:
+            for future in [pool.submit(contextvars.copy_context().run, fetch, i) for i in range(6)]:
+                future.result()
+        count_run('challenges')
+        annotate_run(property_count=6, pages_scanned=2, early_exit=True)
+        return [1] * 6
+
+    @recorded_run('card')
+    def timed_out(province, property_type, num):
+        count_run('requests')
+        raise DeadlineExceeded('no time left')
+
+    scrape('laguna', 'condo', 10)
+    with pytest.raises(DeadlineExceeded):
+        timed_out('cavite', 'condo', 5)
+
+    failed, done = run_history_store().runs()
+    assert done['outcome'] == 'partial' and done['requests'] == 6 and done['challenges'] == 1
+    assert done['property_count'] == 6 and done['pages_scanned'] == 2 and done['requested'] == 10
+    assert 'detail_fetch' in done['phases']
+    assert failed['outcome'] == 'timeout' and failed['mode'] == 'card'
+    assert failed['error'] == 'DeadlineExceeded: no time left' and failed['requests'] == 1
+
+
+def test_scraper_run_is_recorded_and_queryable(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    server = FakeLamudiServer(FakeLamudiConfig(pages=2, per_page=3)).start()
+    try:
+        monkeypatch.setattr(scraper_module, 'LAMUDI_BASE_URL', server.base_url)
+        staging = scraper_module.scraper('laguna', 'condo', 4)
+    finally:
+        server.stop()
+    assert len(staging) == 4
+
+    client = backend_app.app.test_client()
+    runs = client.get('/api/diagnostics/runs?province=laguna&days=1').get_json()['runs']
+    assert len(runs) == 1
+    run = runs[0]
+    assert (run['mode'], run['outcome'], run['property_count']) == ('full', 'ok', 4)
+    # page 1 for pagination, then pages 1-2 of listings, then 4 detail pages
+    assert run['requests'] == 7 and run['failed_requests'] == 0
+    assert {'list_fetch', 'detail_fetch', 'parse'} <= set(run['phases'])
+
+    groups = client.get('/api/diagnostics/runs?group_by=province&days=7').get_json()['groups']
+    assert groups[0]['province'] == 'laguna' and groups[0]['duration_p95_sec'] == run['duration_sec']
+    assert client.get('/api/diagnostics/runs?group_by=nope').status_code == 400
+    assert client.get('/api/diagnostics/runs?days=x').status_code == 400
+    assert client.get('/api/diagnostics/runs?province=cavite').get_json() == {'runs': []}
+
+
+def test_progress_subprocess_is_not_recorded_as_a_second_run(monkeypatch):
+    started = {}
+
+    class Spawned(Exception):
+        pass
+
+    def popen(args, **kwargs):
+        started.update(kwargs['env'])
+        raise Spawned()
+    monkeypatch.setattr(backend_app.subprocess, 'Popen', popen)
+    with pytest.raises(Spawned):
+        backend_app.run_scraper_subprocess('laguna', 'condo', 4)
+    assert started['SCRAPE_RUNS_RECORD'] == '0'
+
+    @recorded_run('full')
+    def scrape(province, property_type, num):
+        return [1]
+    monkeypatch.setenv('SCRAPE_RUNS_RECORD', '0')
+    scrape('laguna', 'condo', 4)
+    assert run_history_store().runs() == []
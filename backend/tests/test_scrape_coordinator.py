@@ -0,0 +1,83 @@
+import subprocess
+import sys
+from contextlib import closing
+
+import app as backend_app
+from scrape_coordinator import JOB_DONE, JOB_LOST, JOB_RUNNING, ScrapeCoordinator
+
+
+def _dead_pid():
+    proc = subprocess.Popen([sys.executable, '-c', 'pass'])
+    proc.wait()
+    return proc.pid
+
+
+def test_slot_limit_is_shared_between_workers(tmp_path):
+    path = str(tmp_path / 'coordination.sqlite3')
+    worker_a, worker_b = ScrapeCoordinator(path, slots=2), ScrapeCoordinator(path, slots=2)
+
+    assert worker_a.acquire('job-1')
+    assert worker_b.acquire('job-2')
+    assert not worker_a.acquire('job-3')
+    assert worker_b.in_use() == 2
+
+    worker_a.release('job-1')
+    assert worker_b.acquire('job-3')
+    assert worker_a.get_job('job-1')['state'] == JOB_DONE
+
+
+def test_a_reused_job_id_does_not_get_another_slot(tmp_path):
+    path = str(tmp_path / 'coordination.sqlite3')
+    worker_a, worker_b = ScrapeCoordinator(path, slots=3), ScrapeCoordinator(path, slots=3)
+
+    assert worker_a.acquire('same', progress={'phase': 'list'})
+    assert not any([worker_b.acquire('same', progress={'phase': 'queued'}) for _ in range(9)])
+    assert worker_a.in_use() == 1
+    # The running job's record is not taken over either
+    assert worker_b.get_job('same')['progress'] == {'phase': 'list'}
+
+    worker_a.release('same')
+    assert worker_b.acquire('same')
+
+
+def test_progress_written_by_one_worker_is_readable_by_another(tmp_path):
+    path = str(tmp_path / 'coordination.sqlite3')
+    writer, reader = ScrapeCoordinator(path), ScrapeCoordinator(path)
+    writer.acquire('batch-1', kind='batch', progress={'items_done': 0, 'items_total': 3})
+
+    writer.update_progress('batch-1', increments={'items_done': 1}, requests=7)
+    writer.update_progress('batch-1', increments={'items_done': 1})
+
+    job = reader.get_job('batch-1')
+    assert job['state'] == JOB_RUNNING
+    assert job['progress'] == {'items_done': 2, 'items_total': 3, 'requests': 7}
+    assert reader.latest_job('batch')['job_id'] == 'batch-1'
+
+
+def test_slots_of_crashed_or_silent_workers_are_reclaimed(tmp_path):
+    coordinator = ScrapeCoordinator(str(tmp_path / 'coordination.sqlite3'), slots=2, lease_seconds=30)
+    coordinator.acquire('crashed')
+    coordinator.acquire('silent')
+    with closing(coordinator._connect()) as conn:
+        conn.execute("UPDATE scrape_slots SET pid = ? WHERE job_id = 'crashed'", (_dead_pid(),))
+        conn.execute("UPDATE scrape_slots SET host = 'other-box', heartbeat_at = heartbeat_at - 60 WHERE job_id = 'silent'")
+
+    assert coordinator.acquire('fresh')
+    assert coordinator.get_job('crashed')['state'] == JOB_LOST
+    assert coordinator.get_job('silent')['state'] == JOB_LOST
+    assert coordinator.in_use() == 1
+
+
+def test_cma_status_reports_a_scrape_running_on_another_worker():
+    other_worker = ScrapeCoordinator(backend_app._scrape_coordinator.path)
+    other_worker.acquire('remote-job', progress={'pages_scanned': 0, 'max_pages': None})
+    other_worker.update_progress('remote-job', pages_scanned=2, max_pages=4)
+
+    client = backend_app.app.test_client()
+    assert client.get('/api/cma/status').get_json() == {
+        'active': True, 'pagesScanned': 2, 'maxPages': 4, 'jobId': 'remote-job', 'state': JOB_RUNNING,
+    }
+
+    other_worker.release('remote-job')
+    status = client.get('/api/cma/status', query_string={'job_id': 'remote-job'}).get_json()
+    assert status['active'] is False and status['state'] == JOB_DONE
@@ -0,0 +1,58 @@
+import threading
+import time
+from concurrent.futures import TimeoutError as FuturesTimeout
+
+import pytest
+
+import scrape_runner
+from scrape_runner import ISOLATION_PROCESS, ISOLATION_THREAD, ScrapeRunner
+from src.scraper.cancellation import CancelToken, ScrapeCancelled, cancel_scope
+
+
+def test_thread_mode_scrapes_on_calling_thread(monkeypatch):
+    calls = []
+    monkeypatch.setattr(scrape_runner, '_scrape_in_child', lambda *a, **k: calls.append((a, k)) or ([{'id': 1}], [1.0]))
+    runner = ScrapeRunner('thread')
+
+    assert runner.run('metro-manila', 'condo', 5, detail_level='full') == ([{'id': 1}], [1.0])
+    assert calls == [(('metro-manila', 'condo', 5), {'detail_level': 'full'})]
+    assert not runner._pools
+
+
+def test_unknown_isolation_falls_back_to_thread():
+    assert ScrapeRunner('greenlet').isolation == ISOLATION_THREAD
+    assert ScrapeRunner(' Process ').isolation == ISOLATION_PROCESS
+
+
+def test_process_mode_keeps_shared_fetch_pool_scrapes_in_process(monkeypatch):
+    monkeypatch.setattr(scrape_runner, '_scrape_in_child', lambda *a, **k: ([], []))
+    runner = ScrapeRunner('process')
+
+    assert runner.run('metro-manila', 'condo', 5, fetch_pool=object()) == ([], [])
+    assert not runner._pools
+
+
+def test_isolated_scrape_dies_with_its_job_or_its_budget():
+    runner = ScrapeRunner('process')
+    try:
+        assert runner._run_isolated(abs, 60, -3) == 3
+        executor, = runner._pools
+        child, = executor._processes.values()
+
+        # Cancelled through the job queue: the child is killed, not left fetching
+        token = CancelToken()
+        threading.Timer(0.5, token.cancel).start()
+        started = time.time()
+        with cancel_scope(token), pytest.raises(ScrapeCancelled):
+            runner._run_isolated(time.sleep, 60, 30)
+        assert time.time() - started < 5
+        child.join(5)
+        assert not child.is_alive() and not runner._pools
+
+        # Overrunning its budget: the same, and the next scrape gets a fresh child
+        with pytest.raises(FuturesTimeout):
+            runner._run_isolated(time.sleep, 0.5, 30)
+        assert not runner._pools
+        assert runner._run_isolated(abs, 60, -4) == 4
+    finally:
+        runner.shutdown()
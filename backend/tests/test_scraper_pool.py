@@ -0,0 +1,65 @@
+import requests
+
+from scraper_pool import RemoteScraperPool, NoScraperBackendAvailable
+
+
+class _Resp:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+def _stub(backend, outcome):
+    calls = []
+
+    def post(url, json=None, timeout=None):
+        calls.append(url)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return _Resp(outcome)
+
+    backend.session.post = post
+    return calls
+
+
+def test_fails_over_on_5xx_and_connect_errors():
+    pool = RemoteScraperPool(['http://a', 'http://b', 'http://c'])
+    a, b, c = pool.backends
+    calls_a = _stub(a, requests.ConnectionError('refused'))
+    calls_b = _stub(b, 502)
+    calls_c = _stub(c, 200)
+    # Make routing order deterministic: a looks fastest, c slowest
+    a.latency_ewma_ms, b.latency_ewma_ms, c.latency_ewma_ms = 1.0, 2.0, 3.0
+
+    response = pool.post('/api/cma', json={})
+
+    assert response.status_code == 200
+    assert (len(calls_a), len(calls_b), len(calls_c)) == (1, 1, 1)
+    assert a.healthy is False
+    stats = {s['url']: s for s in pool.stats()}
+    assert stats['http://b']['error_rate'] == 1.0
+    assert stats['http://c']['errors_total'] == 0
+    assert all(s['outstanding'] == 0 for s in stats.values())
+
+
+def test_routes_to_least_outstanding_backend():
+    pool = RemoteScraperPool(['http://a', 'http://b'])
+    a, b = pool.backends
+    a.outstanding = 2
+    calls_a = _stub(a, 200)
+    calls_b = _stub(b, 200)
+
+    pool.post('/api/cma', json={})
+
+    assert calls_a == []
+    assert calls_b == ['http://b/api/cma']
+
+
+def test_raises_when_every_backend_is_unreachable():
+    pool = RemoteScraperPool(['http://a', 'http://b'])
+    for backend in pool.backends:
+        _stub(backend, requests.ConnectionError('down'))
+    try:
+        pool.post('/api/cma', json={})
+        assert False, 'expected NoScraperBackendAvailable'
+    except NoScraperBackendAvailable:
+        pass
@@ -0,0 +1,107 @@
+import time
+
+import pytest
+
+import app as backend_app
+from src.scraper import scraper as scraper_module
+from src.scraper import sharding
+from src.scraper.sharding import ShardCoordinator, _partition, validate_unit
+
+
+class _Worker:
+    def __init__(self, name, fail_times=0):
+        self.name = name
+        self.fail_times = fail_times
+        self.seen = []
+
+    def run(self, unit, timeout):
+        self.seen.append(unit['n'])
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            raise TimeoutError('worker lost the unit')
+        return {'value': unit['n'] * 10, 'items': 1}
+
+
+def test_results_keep_unit_order_across_workers():
+    workers = [_Worker('w1'), _Worker('w2'), _Worker('w3')]
+    coordinator = ShardCoordinator(workers)
+
+    results = coordinator.run([{'n': i} for i in range(9)])
+
+    assert [r['value'] for r in results] == [i * 10 for i in range(9)]
+    throughput = coordinator.throughput()
+    assert sum(s['units'] for s in throughput.values()) == 9
+
+
+def test_lost_units_are_retried_on_another_attempt():
+    flaky = _Worker('flaky', fail_times=1)
+    coordinator = ShardCoordinator([flaky], max_attempts=3)
+
+    results = coordinator.run([{'n': 1}, {'n': 2}])
+
+    assert [r['value'] for r in results] == [10, 20]
+    assert coordinator.retried_units == 1
+    assert coordinator.failed_units == 0
+
+
+def test_retired_worker_hands_queue_to_others():
+    broken = _Worker('broken', fail_times=100)
+    healthy = _Worker('healthy')
+    coordinator = ShardCoordinator([broken, healthy], max_attempts=5, max_worker_failures=2)
+
+    results = coordinator.run([{'n': i} for i in range(6)])
+
+    assert all(r is not None for r in results)
+    assert coordinator.throughput()['broken']['retired'] is True
+
+
+def test_partition_splits_into_contiguous_ranges():
+    assert _partition(list(range(2, 11)), 3) == [[2, 3, 4], [5, 6, 7], [8, 9, 10]]
+    assert _partition([], 3) == []
+
+
+def test_units_get_a_budget_they_enforce_and_overruns_lose_their_process():
+    seen = []
+
+    class _Recorder(_Worker):
+        def run(self, unit, timeout):
+            seen.append((unit['budget_sec'], timeout))
+            return super().run(unit, timeout)
+
+    ShardCoordinator([_Recorder('w1')], unit_timeout=30).run([{'n': 1}])
+    assert seen == [(30, 30 + sharding.UNIT_GRACE_SEC)]
+
+    executor = sharding._get_process_pool(99)
+    executor.submit(time.sleep, 60)
+    process = next(iter(executor._processes.values()))
+    sharding._recycle_process_pool(99, executor)
+    process.join(10)
+    assert not process.is_alive()
+    assert sharding._get_process_pool(99) is not executor
+    sharding._recycle_process_pool(99, sharding._get_process_pool(99))
+
+
+def test_crawl_units_are_checked_before_they_run(monkeypatch):
+    monkeypatch.setattr(scraper_module, 'LAMUDI_BASE_URL', 'https://www.lamudi.com.ph')
+    unit = {'province': 'laguna', 'property_type': 'condo', 'kind': sharding.UNIT_DETAILS,
+            'listings': [['sku-1', 'https://www.lamudi.com.ph/property/sku-1']]}
+    validate_unit(unit)
+    for bad in (
+        {**unit, 'listings': [['x', 'http://169.254.169.254/latest/meta-data']]},
+        {**unit, 'listings': [['x', 'https://www.lamudi.com.ph.evil.test/x']]},
+        {**unit, 'listings': unit['listings'] * (sharding.max_unit_listings() + 1)},
+        {**unit, 'budget_sec': 10 ** 6},
+        {**unit, 'kind': sharding.UNIT_LIST_PAGES, 'pages': list(range(1, 10_000))},
+        {**unit, 'kind': sharding.UNIT_LIST_PAGES, 'pages': [0]},
+    ):
+        with pytest.raises(ValueError):
+            validate_unit(bad)
+
+    client = backend_app.app.test_client()
+    monkeypatch.delenv('CRAWL_WORKER_TOKEN', raising=False)
+    assert client.post('/api/crawl/unit', json=unit).status_code == 403
+    monkeypatch.setenv('CRAWL_WORKER_TOKEN', 'secret')
+    assert client.post('/api/crawl/unit', json=unit, headers={'X-Crawl-Token': 'wrong'}).status_code == 403
+    response = client.post('/api/crawl/unit', headers={'X-Crawl-Token': 'secret'},
+                           json={**unit, 'listings': [['x', 'http://127.0.0.1:8080/admin']]})
+    assert response.status_code == 400
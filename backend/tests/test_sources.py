@@ -0,0 +1,137 @@
+import time
+
+import pytest
+
+import app as backend_app
+import src.adapters.registry as registry
+from src.adapters.records import Property
+from src.adapters.registry import SourceAdapter, collect_listings, enabled_sources, register_source, source_report
+from src.analytics.projections import ProjectionStore
+from src.scraper.cancellation import check_cancelled
+from src.scraper.deadline import Deadline, deadline_scope
+
+
+class FakeSource(SourceAdapter):
+    def __init__(self, name, listings=(), delay=0.0, error=None):
+        self.name = name
+        super().__init__()
+        self.listings = listings
+        self.delay = delay
+        self.error = error
+        self.requests = []
+
+    def fetch(self, request):
+        self.requests.append(request)
+        stop = time.time() + self.delay
+        while time.time() < stop:
+            check_cancelled()
+            time.sleep(0.01)
+        if self.error:
+            raise self.error
+        return self.listings
+
+    def normalize(self, parsed, request):
+        return [Property(source=self.name, property_id=f'{self.name}-{i}', address=f'Bel-Air, {city}', price=price,
+                         sqm=sqm, bedrooms=1, bathrooms=1, coordinates=[lat, lon], poster=(agent, ()))
+                for i, (city, price, sqm, lat, lon, agent) in enumerate(parsed)]
+
+
+@pytest.fixture
+def sources(monkeypatch):
+    def install(*adapters):
+        for adapter in adapters:
+            monkeypatch.setitem(registry._sources, adapter.name, adapter)
+        monkeypatch.setenv('CMA_SOURCES', ','.join(a.name for a in adapters))
+        return adapters
+    monkeypatch.setattr(registry, 'SOURCE_GRACE_SEC', 0.2)
+    return install
+
+
+def test_slow_and_broken_sources_degrade_the_result_without_blocking_it(sources, monkeypatch):
+    monkeypatch.setenv('SLOW_TIMEOUT_SEC', '0.3')
+    fast = FakeSource('fast', [('Makati', 9e6, 45.0, 14.55, 121.02, 'ana cruz')])
+    slow = FakeSource('slow', [('Makati', 5e6, 30.0, 14.56, 121.03, 'ana cruz')], delay=30)
+    broken = FakeSource('broken', error=RuntimeError('layout changed'))
+    sources(fast, slow, broken)
+
+    deadline = Deadline.after(20)
+    started = time.time()
+    with deadline_scope(deadline), source_report() as report:
+        properties, price_series = collect_listings('metro-manila', 'condo', 5, detail_level='card')
+    assert time.time() - started < 3
+
+    assert [p.property_id for p in properties] == ['fast-0'] and price_series == [9e6]
+    assert {name: entry['status'] for name, entry in report.items()} == \
+        {'fast': 'ok', 'slow': 'timeout', 'broken': 'error'}
+    assert report['fast']['listings'] == 1 and report['slow']['latency_ms'] >= 300
+    assert deadline.reasons == ['source:slow', 'source:broken']
+    assert fast.requests[0].detail_level == 'card'
+
+
+def test_a_unit_listed_on_two_sources_is_counted_once(sources):
+    alpha = FakeSource('alpha', [('Makati', 9e6, 45.0, 14.5501, 121.0201, 'ana cruz'),
+                                 ('Makati', 12e6, 60.0, 14.56, 121.03, 'ana cruz')])
+    # The same agent's unit on the second site, and a look-alike from someone else
+    beta = FakeSource('beta', [('Makati City', 9.02e6, 45.5, 14.5502, 121.0202, 'ana cruz'),
+                               ('Makati', 12e6, 60.0, 14.56, 121.03, 'ben lim'),
+                               ('Pasig', 7e6, 40.0, 14.58, 121.06, 'ben lim')])
+    sources(alpha, beta)
+
+    properties, price_series = collect_listings('metro-manila', 'condo', 5)
+    # Interleaved so capping keeps both sources; every record keeps its source
+    assert [(p.source, p.property_id) for p in properties] == \
+        [('alpha', 'alpha-0'), ('beta', 'beta-0'), ('alpha', 'alpha-1'), ('beta', 'beta-1'), ('beta', 'beta-2')]
+    assert [p.cluster_id for p in properties] == \
+        ['alpha:alpha-0', 'alpha:alpha-0', 'alpha:alpha-1', 'beta:beta-1', 'beta:beta-2']
+    assert price_series == [9e6, 12e6, 12e6, 7e6]
+
+
+def test_sources_are_paced_by_their_own_fetch_pool(sources, monkeypatch):
+    monkeypatch.setattr(registry, '_pools', {})
+    monkeypatch.setenv('PACED_FETCH_RATE', '3')
+    monkeypatch.setenv('PACED_FETCH_CONCURRENCY', '2')
+    paced, free = sources(FakeSource('paced'), FakeSource('free'))
+
+    collect_listings('metro-manila', 'condo', 5)
+    collect_listings('metro-manila', 'condo', 5, fetch_pool='batch-pool')
+    first, second = (r.fetch_pool for r in paced.requests)
+    assert first is second and first.bucket.rate == 3 and first.concurrency == 2
+    assert [r.fetch_pool for r in free.requests] == [None, 'batch-pool']
+
+
+def test_incomplete_adapters_are_rejected_before_any_request():
+    class NoNormalize(SourceAdapter):
+        name = 'half'
+
+        def fetch(self, request):
+            return []
+
+    with pytest.raises(TypeError):
+        NoNormalize()
+    with pytest.raises(TypeError):
+        register_source(object())
+    with pytest.raises(TypeError):
+        register_source(FakeSource(''))
+
+
+def test_cma_sources_setting(monkeypatch):
+    monkeypatch.setitem(registry._sources, 'alpha', FakeSource('alpha'))
+    monkeypatch.setenv('CMA_SOURCES', ' alpha, atlantis ,alpha')
+    assert [s.name for s in enabled_sources()] == ['alpha']
+    monkeypatch.setenv('CMA_SOURCES', 'atlantis')
+    assert [s.name for s in enabled_sources()] == ['lamudi']
+
+
+def test_batch_items_report_each_source(sources, monkeypatch, tmp_path):
+    monkeypatch.setattr(backend_app, '_projection_store', ProjectionStore(str(tmp_path / 'history.sqlite3')))
+    monkeypatch.setattr(backend_app, 'SCRAPER_MODE', 'local')
+    backend_app._cma_cache.clear()
+    sources(FakeSource('alpha', [('Makati', 9e6, 45.0, 14.55, 121.02, 'ana cruz')]),
+            FakeSource('broken', error=ValueError()))
+
+    body = backend_app.app.test_client().post('/api/cma/batch', json={
+        'items': [{'psgc_province_code': '1376', 'property_type': 'condo', 'count': 2}],
+    }).get_json()
+    item = body['items'][0]
+    assert item['stats']['count'] == 1 and item['partial'] is True
+    assert item['sources']['alpha']['status'] == 'ok' and item['sources']['broken']['status'] == 'error'
@@ -0,0 +1,122 @@
+import sqlite3
+from contextlib import closing
+
+from supabase_outbox import SupabaseOutbox
+
+
+class _FakeQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.call = None
+
+    def upsert(self, records, **kwargs):
+        self.call = ('upsert', self.table, records, kwargs)
+        return self
+
+    def update(self, data):
+        self.call = ('update', self.table, data)
+        return self
+
+    def eq(self, column, value):
+        self.call = self.call + (column, value)
+        return self
+
+    def execute(self):
+        if self.client.fail:
+            raise ConnectionError('supabase unreachable')
+        self.client.calls.append(self.call)
+        return self
+
+
+class _FakeClient:
+    def __init__(self):
+        self.calls = []
+        self.fail = False
+
+    def table(self, name):
+        return _FakeQuery(self, name)
+
+
+def _outbox(tmp_path, client):
+    return SupabaseOutbox(str(tmp_path / 'outbox.sqlite3'), lambda: client, batch_size=50)
+
+
+def test_updates_are_coalesced_per_appraisal(tmp_path):
+    client = _FakeClient()
+    outbox = _outbox(tmp_path, client)
+    outbox.enqueue_appraisal_update('a1', {'status': 'started'})
+    outbox.enqueue_appraisal_update('a1', {'status': 'completed', 'properties_found': 12})
+    outbox.enqueue_appraisal_update('a2', {'status': 'failed'})
+
+    assert outbox.backlog_size() == 3
+    assert outbox.flush_all() == 3
+    assert outbox.backlog_size() == 0
+
+    updates = sorted((c for c in client.calls if c[0] == 'update'), key=lambda c: c[-1])
+    assert updates == [
+        ('update', 'appraisals', {'status': 'completed', 'properties_found': 12}, 'id', 'a1'),
+        ('update', 'appraisals', {'status': 'failed'}, 'id', 'a2'),
+    ]
+
+
+def test_activity_logs_bulk_insert_with_stable_ids(tmp_path):
+    client = _FakeClient()
+    outbox = _outbox(tmp_path, client)
+    outbox.enqueue_activity_log({'user_id': 'u1', 'event_type': 'error'}, key='k1')
+    outbox.enqueue_activity_log({'user_id': 'u1', 'event_type': 'error'}, key='k1')  # duplicate write
+    outbox.enqueue_activity_log({'user_id': 'u2', 'event_type': 'error'}, key='k2')
+
+    assert outbox.backlog_size() == 2
+    outbox.flush_all()
+
+    assert len(client.calls) == 1
+    _, table, records, kwargs = client.calls[0]
+    assert table == 'activity_logs'
+    assert len(records) == 2
+    assert kwargs == {'on_conflict': 'id', 'ignore_duplicates': True}
+    assert len({r['id'] for r in records}) == 2
+
+
+def test_failed_flush_keeps_rows_for_retry(tmp_path):
+    client = _FakeClient()
+    outbox = _outbox(tmp_path, client)
+    outbox.enqueue_appraisal_update('a1', {'status': 'completed'})
+
+    client.fail = True
+    try:
+        outbox.flush_once()
+    except Exception:
+        pass
+    assert outbox.backlog_size() == 1
+    assert outbox.stats()['flush_errors_total'] == 1
+
+    client.fail = False
+    assert outbox.flush_once() == 1
+    assert outbox.backlog_size() == 0
+
+
+def test_an_appraisal_is_only_ever_sent_by_one_flusher_in_order(tmp_path):
+    client = _FakeClient()
+    first = SupabaseOutbox(str(tmp_path / 'outbox.sqlite3'), lambda: client, batch_size=2)
+    second = SupabaseOutbox(str(tmp_path / 'outbox.sqlite3'), lambda: client, batch_size=2)
+    first.enqueue_appraisal_update('a1', {'status': 'processing'})
+    first.enqueue_appraisal_update('a2', {'status': 'processing'})
+    first.enqueue_appraisal_update('a1', {'status': 'completed'})
+
+    # The batch limit stops at row 2, but a1's later update comes along with it
+    claimed = first._claim_batch()
+    assert [(r[2], r[3]['status']) for r in claimed[1]] == \
+        [('a1', 'processing'), ('a2', 'processing'), ('a1', 'completed')]
+    assert second._claim_batch()[1] == []
+
+    # The first flusher stalls past its lease; the second takes over and delivers
+    with closing(sqlite3.connect(first.path)) as conn, conn:
+        conn.execute('UPDATE outbox SET claimed_until = 1')
+    assert second.flush_once() == 3
+    second.enqueue_appraisal_update('a1', {'status': 'archived'})
+    assert second.flush_once() == 1
+    # When the stalled flusher wakes up, its stale batch is dropped rather than sent last
+    first._claim_batch = lambda: claimed
+    assert first.flush_once() == 0
+    assert [c[2]['status'] for c in client.calls if c[-1] == 'a1'] == ['completed', 'archived']
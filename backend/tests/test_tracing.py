@@ -0,0 +1,85 @@
+import app as backend_app
+from src.analytics.projections import ProjectionStore
+from src.observability.tracing import Tracer, span, traced
+from src.scraper.scraper import fetch_page
+
+
+class _Response:
+    status_code = 200
+    content = b'<html>ok</html>'
+
+
+class _Session:
+    def get(self, url, timeout=7, **kwargs):
+        return _Response()
+
+
+@traced('work')
+def _work():
+    with span('inner', step=1):
+        fetch_page(_Session(), 'https://example.test/p/1', 'detail_fetch')
+
+
+def test_spans_are_noops_without_active_trace():
+    tracer = Tracer(mode='off')
+    assert tracer.start('cma') is None
+    # No trace bound: same shared no-op object, nothing recorded anywhere
+    assert span('a') is span('b')
+    _work()
+    assert tracer.store.list() == []
+
+
+def test_slow_mode_keeps_only_traces_over_threshold():
+    tracer = Tracer(mode='slow', slow_ms=10_000)
+    trace = tracer.start('cma')
+    _work()
+    assert tracer.finish(trace) is False
+
+    tracer.slow_ms = 0
+    trace = tracer.start('cma')
+    _work()
+    assert tracer.finish(trace) is True
+    assert [t['trace_id'] for t in tracer.store.list()] == [trace.trace_id]
+
+
+def test_chrome_export_records_fetch_url_status_and_bytes():
+    tracer = Tracer(mode='always')
+    trace = tracer.start('cma', province='laguna')
+    _work()
+    tracer.finish(trace)
+
+    events = trace.to_chrome()['traceEvents']
+    assert [e['name'] for e in events] == ['cma', 'detail_fetch', 'inner', 'work']
+    assert all(e['ph'] == 'X' for e in events)
+    fetch = events[1]
+    assert fetch['cat'] == 'fetch'
+    assert fetch['args'] == {'url': 'https://example.test/p/1', 'status': 200, 'bytes': len(_Response.content)}
+    # Nested spans sit inside their parents on the timeline
+    inner, work = events[2], events[3]
+    assert work['ts'] <= inner['ts'] and inner['ts'] + inner['dur'] <= work['ts'] + work['dur'] + 1
+
+
+def test_forced_cma_trace_is_downloadable(monkeypatch, tmp_path):
+    def fake_scrape(province, property_type, count, **kwargs):
+        fetch_page(_Session(), 'https://example.test/p/1', 'detail_fetch')
+        return [{'property_id': 'a', 'neighborhood': 'X', 'price': 1.0}], [1.0]
+
+    monkeypatch.setattr(backend_app, '_tracer', Tracer(mode='off'))
+    monkeypatch.setattr(backend_app, 'SCRAPER_MODE', 'local')
+    monkeypatch.setattr(backend_app, 'run_scraper_subprocess', lambda *a: 1)
+    monkeypatch.setattr(backend_app, 'scrape_and_normalize', fake_scrape)
+    monkeypatch.setattr(backend_app, '_projection_store', ProjectionStore(str(tmp_path / 'h.sqlite3')))
+    client = backend_app.app.test_client()
+
+    untraced = client.post('/api/cma', json={'psgc_province_code': '3400', 'property_type': 'condo', 'count': 1})
+    assert untraced.status_code == 200 and 'X-Trace-Id' not in untraced.headers
+
+    response = client.post('/api/cma?trace=1', json={'psgc_province_code': '3400', 'property_type': 'condo', 'count': 1})
+    assert response.status_code == 200
+    trace_id = response.headers['X-Trace-Id']
+
+    listed = client.get('/api/diagnostics/traces').get_json()['traces']
+    assert [t['trace_id'] for t in listed] == [trace_id]
+    chrome = client.get(f'/api/diagnostics/traces/{trace_id}').get_json()
+    names = {e['name'] for e in chrome['traceEvents']}
+    assert {'cma', 'scraper_subprocess', 'detail_fetch', 'analyze_neighborhoods'} <= names